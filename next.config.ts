@@ -5,6 +5,11 @@ const nextConfig: NextConfig = {
   images: {
     unoptimized: true,
   },
+  // Precompressed module bundles (src/data/modules/build_bundles.py) are read
+  // from disk by the bundles route, so they ship with its function
+  outputFileTracingIncludes: {
+    '/api/bundles/[name]': ['./public/bundles/**/*'],
+  },
   experimental: {
     optimizePackageImports: ['@paper-design/shaders-react'],
   },
@@ -2,6 +2,16 @@ const CACHE_NAME = "learnfmpa-v5";
 const STATIC_CACHE = "learnfmpa-static-v5";
 const API_CACHE = "learnfmpa-api-v5";
 const PAGE_CACHE = "learnfmpa-pages-v5";
+// Not versioned: their contents are revalidated against the bundle manifest
+const BUNDLE_CACHE = "learnfmpa-bundles";
+const IMAGE_CACHE = "learnfmpa-images";
+
+const BUNDLES_PATH = "/api/bundles/";
+const MANIFEST_URL = "/api/bundles/manifest.json";
+const IMAGES_PATH = "/images/";
+const PRECACHE_CONCURRENCY = 4;
+// Least recently used images are evicted past this size
+const IMAGE_CACHE_MAX_BYTES = 50 * 1024 * 1024;
 
 const API_CACHE_TTL = 300000;
 const PAGE_CACHE_TTL = 600000;
@@ -48,12 +58,320 @@ async function cleanupOldCaches() {
           name !== CACHE_NAME &&
           name !== STATIC_CACHE &&
           name !== API_CACHE &&
-          name !== PAGE_CACHE
+          name !== PAGE_CACHE &&
+          name !== BUNDLE_CACHE &&
+          name !== IMAGE_CACHE
       )
       .map((name) => caches.delete(name))
   );
 }
 
+// Bundle manifest (src/data/modules/build_bundles.py) and the precache file it
+// points to: image revisions and the images of each chapter
+let precacheState = null;
+
+async function cachedManifest() {
+  const cache = await caches.open(BUNDLE_CACHE);
+  const response = await cache.match(MANIFEST_URL);
+  return response ? response.json() : null;
+}
+
+async function cachedFetch(cacheName, url) {
+  const cache = await caches.open(cacheName);
+  const cached = await cache.match(url);
+  if (cached) return cached;
+  const response = await fetch(url);
+  if (response.ok) await cache.put(url, response.clone());
+  return response;
+}
+
+async function loadPrecache(manifest) {
+  if (!manifest || !manifest.precache) return null;
+  if (precacheState && precacheState.file === manifest.precache.file) {
+    return precacheState.data;
+  }
+  const response = await cachedFetch(BUNDLE_CACHE, BUNDLES_PATH + manifest.precache.file);
+  if (!response.ok) return null;
+  precacheState = { file: manifest.precache.file, data: await response.json() };
+  return precacheState.data;
+}
+
+function manifestFiles(manifest) {
+  const files = new Set();
+  if (manifest.precache) files.add(manifest.precache.file);
+  for (const module of Object.values(manifest.modules || {})) {
+    files.add(module.file);
+  }
+  return files;
+}
+
+// Size of every cached image, least recently used first. Cache keys keep
+// insertion order and an image is put again when it is served, so the order
+// survives the worker being stopped and is read back from the cache.
+let imageIndex = null;
+
+function loadImageIndex(cache) {
+  if (!imageIndex) {
+    imageIndex = (async () => {
+      const index = new Map();
+      for (const request of await cache.keys()) {
+        const cached = await cache.match(request);
+        index.set(request.url, Number(cached?.headers.get("sw-bytes")) || 0);
+      }
+      return index;
+    })();
+  }
+  return imageIndex;
+}
+
+async function useImage(cache, url, bytes) {
+  const index = await loadImageIndex(cache);
+  const key = new URL(url, self.location.href).href;
+  index.delete(key);
+  index.set(key, bytes);
+  let total = 0;
+  for (const size of index.values()) total += size;
+  for (const [oldest, size] of index) {
+    if (total <= IMAGE_CACHE_MAX_BYTES || oldest === key) break;
+    index.delete(oldest);
+    total -= size;
+    await cache.delete(oldest);
+  }
+}
+
+async function forgetImage(cache, request) {
+  (await loadImageIndex(cache)).delete(request.url);
+  await cache.delete(request);
+}
+
+// Cached images carry the revision they were fetched at, so a new manifest
+// only invalidates the images whose content changed
+async function cacheImage(cache, url, revision) {
+  const response = await fetch(url, { cache: "reload" });
+  if (!response.ok) return response;
+  const body = await response.clone().blob();
+  const headers = new Headers(response.headers);
+  headers.set("sw-revision", revision || "");
+  headers.set("sw-bytes", String(body.size));
+  await cache.put(url, new Response(body, {
+    status: response.status,
+    statusText: response.statusText,
+    headers,
+  }));
+  await useImage(cache, url, body.size);
+  return response;
+}
+
+async function runLimited(items, worker) {
+  const queue = [...items];
+  const runners = Array.from({ length: PRECACHE_CONCURRENCY }, async () => {
+    while (queue.length > 0) {
+      await worker(queue.shift()).catch(() => {});
+    }
+  });
+  await Promise.all(runners);
+}
+
+function fileVersion(file) {
+  return file.split(".").slice(-2, -1)[0];
+}
+
+async function sha384Integrity(bytes) {
+  const digest = new Uint8Array(await crypto.subtle.digest("SHA-384", bytes));
+  return "sha384-" + btoa(String.fromCharCode(...digest));
+}
+
+// Deltas identify questions by position, like Question.id in the app
+function applyDelta(questions, delta) {
+  const next = questions.slice(0, delta.questions);
+  for (const [id, question] of Object.entries({ ...delta.changed, ...delta.added })) {
+    next[Number(id)] = question;
+  }
+  return next;
+}
+
+// Rebuilds a module bundle from an older cached version and the deltas since,
+// and caches it under its new name. False when the delta chain does not reach
+// back to that version or the result does not match the manifest.
+const patching = new Map();
+
+function patchBundle(module, cachedFile) {
+  if (!patching.has(module.file)) {
+    const done = applyDeltas(module, cachedFile)
+      .catch(() => false)
+      .finally(() => patching.delete(module.file));
+    patching.set(module.file, done);
+  }
+  return patching.get(module.file);
+}
+
+async function applyDeltas(module, cachedFile) {
+  const deltas = module.deltas || [];
+  const start = deltas.findIndex((delta) => delta.from === fileVersion(cachedFile));
+  if (start === -1) return false;
+  const cache = await caches.open(BUNDLE_CACHE);
+  const cached = await cache.match(BUNDLES_PATH + cachedFile);
+  if (!cached) return false;
+
+  let questions = await cached.json();
+  for (const delta of deltas.slice(start)) {
+    const response = await fetch(BUNDLES_PATH + delta.file, { integrity: delta.integrity });
+    if (!response.ok) return false;
+    questions = applyDelta(questions, await response.json());
+  }
+  const body = new TextEncoder().encode(JSON.stringify(questions));
+  if ((await sha384Integrity(body)) !== module.integrity) return false;
+  await cache.put(BUNDLES_PATH + module.file, new Response(body, {
+    headers: { "Content-Type": "application/json; charset=utf-8" },
+  }));
+  return true;
+}
+
+// The cached bundle of an earlier build of the module a bundle file belongs to
+async function olderBundle(file) {
+  const manifest = await cachedManifest();
+  const module = Object.values(manifest?.modules || {}).find((m) => m.file === file);
+  if (!module) return null;
+  const prefix = file.slice(0, file.length - `${fileVersion(file)}.json`.length);
+  const cache = await caches.open(BUNDLE_CACHE);
+  for (const request of await cache.keys()) {
+    const cachedFile = new URL(request.url).pathname.slice(BUNDLES_PATH.length);
+    if (cachedFile !== file && cachedFile.startsWith(prefix)) return { module, file: cachedFile };
+  }
+  return null;
+}
+
+async function bundleResponse(request) {
+  const cache = await caches.open(BUNDLE_CACHE);
+  const cached = await cache.match(request);
+  if (cached) return cached;
+  const older = await olderBundle(new URL(request.url).pathname.slice(BUNDLES_PATH.length)).catch(() => null);
+  if (older && (await patchBundle(older.module, older.file))) {
+    const patched = await cache.match(request);
+    if (patched) return patched;
+  }
+  return cachedFetch(BUNDLE_CACHE, request.url);
+}
+
+// Called when the manifest version changes: files of older builds are
+// dropped, and what was cached from them is brought to its new version,
+// from the module's deltas when they cover it
+async function applyManifest(manifest, previous) {
+  const bundleCache = await caches.open(BUNDLE_CACHE);
+  const files = manifestFiles(manifest);
+
+  const renamed = new Map();
+  if (previous) {
+    for (const [moduleId, module] of Object.entries(previous.modules || {})) {
+      const current = manifest.modules?.[moduleId];
+      if (!current) continue;
+      renamed.set(module.file, { file: current.file, module: current });
+    }
+  }
+  const stale = [];
+  for (const request of await bundleCache.keys()) {
+    const path = new URL(request.url).pathname;
+    if (path === MANIFEST_URL || !path.startsWith(BUNDLES_PATH)) continue;
+    const file = path.slice(BUNDLES_PATH.length);
+    if (!files.has(file)) stale.push([request, file]);
+  }
+  const refetch = [];
+  for (const [, file] of stale) {
+    const target = renamed.get(file);
+    if (!target || target.file === file) continue;
+    if (target.module && (await patchBundle(target.module, file))) continue;
+    refetch.push(target.file);
+  }
+  await runLimited(refetch, (file) => cachedFetch(BUNDLE_CACHE, BUNDLES_PATH + file));
+  for (const [request] of stale) {
+    await bundleCache.delete(request);
+  }
+
+  const precache = await loadPrecache(manifest);
+  if (!precache) return;
+  const imageCache = await caches.open(IMAGE_CACHE);
+  const changed = [];
+  for (const request of await imageCache.keys()) {
+    const name = decodeURIComponent(new URL(request.url).pathname.slice(IMAGES_PATH.length));
+    const image = precache.images[name];
+    if (!image) {
+      await forgetImage(imageCache, request);
+      continue;
+    }
+    const cached = await imageCache.match(request);
+    if (cached && cached.headers.get("sw-revision") !== image.revision) {
+      changed.push([request.url, image.revision]);
+    }
+  }
+  await runLimited(changed, ([url, revision]) => cacheImage(imageCache, url, revision));
+}
+
+async function manifestResponse(event) {
+  const { request } = event;
+  try {
+    const response = await fetch(request);
+    if (response.ok) {
+      const manifest = await response.clone().json();
+      const previous = await cachedManifest().catch(() => null);
+      if (!previous || previous.version !== manifest.version) {
+        const bundleCache = await caches.open(BUNDLE_CACHE);
+        await bundleCache.put(MANIFEST_URL, response.clone());
+        event.waitUntil(applyManifest(manifest, previous).catch(() => {}));
+      }
+    }
+    return response;
+  } catch (error) {
+    const cache = await caches.open(BUNDLE_CACHE);
+    const cached = await cache.match(MANIFEST_URL);
+    if (cached) return cached;
+    throw error;
+  }
+}
+
+// Only the question images the precache file lists are kept, so the cache
+// follows the manifest; anything else under /images/ goes to the network
+async function imageResponse(event) {
+  const { request } = event;
+  const cache = await caches.open(IMAGE_CACHE);
+  const cached = await cache.match(request);
+  if (cached) {
+    const bytes = Number(cached.headers.get("sw-bytes")) || 0;
+    event.waitUntil(
+      cache.put(request, cached.clone())
+        .then(() => useImage(cache, request.url, bytes))
+        .catch(() => {})
+    );
+    return cached;
+  }
+  const name = decodeURIComponent(new URL(request.url).pathname.slice(IMAGES_PATH.length));
+  const precache = await cachedManifest().then(loadPrecache).catch(() => null);
+  const image = precache?.images[name];
+  if (!image) return fetch(request);
+  return cacheImage(cache, request.url, image.revision);
+}
+
+// A chapter is made available offline when it is opened: its module bundle
+// and every image its questions show
+async function precacheChapter(moduleId, chapterName) {
+  const manifest = await cachedManifest();
+  const module = manifest?.modules?.[String(moduleId)];
+  if (!module) return;
+  const chapter = (module.chapters || []).find((c) => c.name === chapterName);
+  if (!chapter) return;
+
+  await cachedFetch(BUNDLE_CACHE, BUNDLES_PATH + module.file);
+
+  const precache = await loadPrecache(manifest);
+  const names = precache?.modules?.[String(moduleId)]?.[String(chapter.id)] || [];
+  const imageCache = await caches.open(IMAGE_CACHE);
+  await runLimited(names, async (name) => {
+    const url = IMAGES_PATH + name;
+    if (!(await imageCache.match(url))) {
+      await cacheImage(imageCache, url, precache.images[name]?.revision);
+    }
+  });
+}
+
 function lazyPrecachePages() {
   const pagesToCache = ["/", "/dashboard", "/modules", "/login"];
   caches.open(PAGE_CACHE).then((cache) => {
@@ -94,6 +412,13 @@ self.addEventListener("activate", (event) => {
   });
 });
 
+self.addEventListener("message", (event) => {
+  const data = event.data || {};
+  if (data.type === "precache-chapter") {
+    event.waitUntil(precacheChapter(data.moduleId, data.chapter).catch(() => {}));
+  }
+});
+
 self.addEventListener("fetch", (event) => {
   const { request } = event;
   const url = new URL(request.url);
@@ -102,6 +427,22 @@ self.addEventListener("fetch", (event) => {
 
   if (url.origin !== self.location.origin) return;
 
+  if (url.pathname === MANIFEST_URL) {
+    event.respondWith(manifestResponse(event));
+    return;
+  }
+
+  if (url.pathname.startsWith(BUNDLES_PATH)) {
+    // Content-hashed names: a cached bundle never goes stale
+    event.respondWith(bundleResponse(request));
+    return;
+  }
+
+  if (url.pathname.startsWith(IMAGES_PATH)) {
+    event.respondWith(imageResponse(event));
+    return;
+  }
+
   if (isStaticAsset(url)) {
     event.respondWith(
       caches.match(request).then((cached) => {
@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+"""
+LearnFMPA Admin API Client
+
+Shared HTTP client used by every script in scripts/ (manage_users.py,
+manage_trial_users.py, manage_statistics.py, toggle_signup.py).
+
+Features:
+  - Keep-alive connection pool per API host (one TLS handshake per pooled
+    connection instead of one per request)
+  - Concurrent requests over the pool with request_many()
+  - gzip-compressed responses
+  - Retries with exponential backoff on connection errors, 429 and 5xx
+  - Per-request timing, available in AdminClient.timings
+
+Usage:
+  from admin_client import api_request, get_client
+
+  result = api_request(api_url, admin_secret, "/api/admin/users", "GET")
+
+  client = get_client(api_url, admin_secret)
+  results = client.request_many([
+      ("/api/statistics?module_id=1", "GET", None),
+      ("/api/statistics?module_id=2", "GET", None),
+  ])
+"""
+
+import gzip
+import http.client
+import json
+import queue
+import random
+import threading
+import time
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Tuple
+
+DEFAULT_TIMEOUT = 30
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+DEFAULT_POOL_SIZE = 8
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE"}
+STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.BadStatusLine,
+    BrokenPipeError,
+    ConnectionResetError,
+    ConnectionAbortedError,
+)
+
+
+@dataclass
+class Response:
+    status: int
+    headers: Dict[str, str]
+    body: bytes
+    duration: float
+
+    def json(self) -> dict:
+        return json.loads(self.body.decode("utf-8"))
+
+
+@dataclass
+class RequestTiming:
+    method: str
+    endpoint: str
+    status: int
+    duration: float
+    attempts: int
+    size: int
+    started_at: float = field(default=0.0)
+
+
+class AdminClient:
+    def __init__(
+        self,
+        api_url: str,
+        admin_secret: str,
+        timeout: float = DEFAULT_TIMEOUT,
+        retries: int = DEFAULT_RETRIES,
+        backoff: float = DEFAULT_BACKOFF,
+        pool_size: int = DEFAULT_POOL_SIZE,
+    ):
+        parsed = urllib.parse.urlsplit(api_url)
+        self.api_url = api_url
+        self.admin_secret = admin_secret
+        self.scheme = parsed.scheme or "https"
+        self.host = parsed.hostname or ""
+        self.port = parsed.port
+        self.base_path = parsed.path.rstrip("/")
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.pool_size = pool_size
+        self.timings: List[RequestTiming] = []
+        self._pool: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue(maxsize=pool_size)
+        self._timings_lock = threading.Lock()
+
+    def _new_connection(self) -> http.client.HTTPConnection:
+        if self.scheme == "https":
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def _acquire(self) -> Tuple[http.client.HTTPConnection, bool]:
+        try:
+            return self._pool.get_nowait(), True
+        except queue.Empty:
+            return self._new_connection(), False
+
+    def _release(self, conn: http.client.HTTPConnection):
+        try:
+            self._pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def _path(self, endpoint: str, has_body: bool) -> str:
+        path = f"{self.base_path}{endpoint}"
+        # Requests with a body carry the secret there, out of access logs;
+        # GET and body-less DELETE routes only read it from the query string
+        if not has_body and "admin_secret" not in endpoint:
+            secret = urllib.parse.quote(self.admin_secret, safe="")
+            path = f"{path}{'?' if '?' not in path else '&'}admin_secret={secret}"
+        return path
+
+    def _sleep_before_retry(self, attempt: int):
+        delay = self.backoff * (2 ** attempt)
+        time.sleep(delay + random.uniform(0, delay / 2))
+
+    def send(
+        self,
+        endpoint: str,
+        method: str = "GET",
+        data: Optional[dict] = None,
+        headers: Optional[Dict[str, str]] = None,
+    ) -> Response:
+        """Send one request over a pooled connection and return the raw response.
+
+        Raises OSError / http.client.HTTPException once retries are exhausted.
+        HTTP error statuses are returned, not raised.
+        """
+        method = method.upper()
+        path = self._path(endpoint, data is not None)
+        req_headers = {
+            "Content-Type": "application/json",
+            "Accept-Encoding": "gzip",
+            "Connection": "keep-alive",
+        }
+        if headers:
+            req_headers.update(headers)
+
+        body = None
+        if data is not None:
+            payload = dict(data)
+            payload["admin_secret"] = self.admin_secret
+            body = json.dumps(payload).encode("utf-8")
+
+        idempotent = method in IDEMPOTENT_METHODS
+        started_at = time.time()
+        start = time.perf_counter()
+        attempt = 0
+
+        while True:
+            attempt += 1
+            conn, reused = self._acquire()
+            sent = False
+            try:
+                conn.request(method, path, body=body, headers=req_headers)
+                sent = True
+                raw = conn.getresponse()
+                payload_bytes = raw.read()
+                resp_headers = {k.lower(): v for k, v in raw.getheaders()}
+                if raw.will_close:
+                    conn.close()
+                else:
+                    self._release(conn)
+            except STALE_CONNECTION_ERRORS:
+                conn.close()
+                # A pooled keep-alive connection closed by the server is retried
+                # on a fresh connection; once the request is sent, the server
+                # may have processed it, so only idempotent requests are.
+                if (reused and (idempotent or not sent)) or (idempotent and attempt <= self.retries):
+                    if not reused:
+                        self._sleep_before_retry(attempt - 1)
+                    continue
+                raise
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                if idempotent and attempt <= self.retries:
+                    self._sleep_before_retry(attempt - 1)
+                    continue
+                raise
+
+            if raw.status in RETRY_STATUSES and idempotent and attempt <= self.retries:
+                self._sleep_before_retry(attempt - 1)
+                continue
+            break
+
+        if resp_headers.get("content-encoding") == "gzip":
+            payload_bytes = gzip.decompress(payload_bytes)
+
+        duration = time.perf_counter() - start
+        with self._timings_lock:
+            self.timings.append(RequestTiming(
+                method=method,
+                endpoint=endpoint.split("?")[0],
+                status=raw.status,
+                duration=duration,
+                attempts=attempt,
+                size=len(payload_bytes),
+                started_at=started_at,
+            ))
+        return Response(status=raw.status, headers=resp_headers, body=payload_bytes, duration=duration)
+
+    def request(self, endpoint: str, method: str = "GET", data: Optional[dict] = None) -> dict:
+        """Send a request and return the decoded JSON body, or {"error": ...}."""
+        try:
+            response = self.send(endpoint, method, data)
+        except (OSError, http.client.HTTPException) as e:
+            return {"error": f"Cannot connect to {self.api_url}: {e}"}
+
+        try:
+            return response.json()
+        except Exception:
+            body = response.body.decode("utf-8", errors="replace")
+            if response.status >= 400:
+                return {"error": body or f"HTTP {response.status}"}
+            return {"error": f"Invalid JSON response: {body[:200]}"}
+
+    def request_many(
+        self,
+        calls: Iterable[Tuple[str, str, Optional[dict]]],
+        max_workers: Optional[int] = None,
+    ) -> List[dict]:
+        """Run (endpoint, method, data) calls concurrently; results keep input order."""
+        calls = list(calls)
+        if not calls:
+            return []
+        workers = min(max_workers or self.pool_size, len(calls))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(lambda c: self.request(*c), calls))
+
+    def close(self):
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                break
+
+
+_clients: Dict[Tuple[str, str], AdminClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(api_url: str, admin_secret: str) -> AdminClient:
+    """Return the shared client for this API URL, creating it on first use."""
+    key = (api_url, admin_secret)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = AdminClient(api_url, admin_secret)
+            _clients[key] = client
+        return client
+
+
+def api_request(api_url: str, admin_secret: str, endpoint: str, method: str = "GET", data: dict = None) -> dict:
+    return get_client(api_url, admin_secret).request(endpoint, method, data)
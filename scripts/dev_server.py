@@ -0,0 +1,1245 @@
+#!/usr/bin/env python3
+"""
+LearnFMPA Local API Server
+
+A stand-in for the deployed API so the admin scripts can be developed,
+tested and benchmarked without touching production. It implements the
+contracts the scripts use:
+
+  GET/POST/DELETE  /api/admin/users             (ETag/304, bulk actions)
+  GET              /api/admin/users/progress
+  GET/POST         /api/admin/signup-toggle
+  GET/POST/PUT/DELETE /api/statistics           (question, trend, cursor pages)
+  GET              /api/admin/statistics/live
+  POST             /api/auth/login, /api/answer
+  GET/POST/DELETE  /api/progress
+
+and stands in for a Prometheus pushgateway, so the scripts' --push-metrics
+can be tried locally:
+
+  PUT/POST/DELETE  /metrics/job/<job>{/<label>/<value>}
+  GET              /metrics
+
+over one of two stores:
+
+  memory  everything in process memory (default)
+  redis   a local Redis with the same keys as the app's blob layout
+          (users, users:version, progress:<id>, stats:module_N, signup_open),
+          so a seeded database can also back a local `next dev`
+
+Sessions, trend buckets and the live event feed are kept in process memory
+in both modes.
+
+Fixtures are generated from --seed, so runs are reproducible: --users
+accounts with a realistic mix of inactive / free / paid / trial users, and
+statistics for every question of every registry module. In the memory store
+a user's progress is generated on first read from (seed, user ID), which keeps
+10k users' progress out of memory until it is asked for.
+
+Usage:
+  python dev_server.py --users 10000
+  API_URL=http://127.0.0.1:3001 python manage_users.py list
+  python manage_statistics.py --url http://127.0.0.1:3001 summary
+
+  python dev_server.py --store redis --redis-url redis://localhost:6379/15 --users 10000
+  python dev_server.py --latency 40     # add 40 ms to every response, like a remote API
+
+Requires redis-py (pip install redis) for --store redis only.
+"""
+
+import os
+import re
+import sys
+import gzip
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import urllib.parse
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+from module_registry import load_modules, load_questions, question_options
+import instrumentation
+
+DEFAULT_PORT = 3001
+DEFAULT_ADMIN_SECRET = os.environ.get("ADMIN_SECRET", "learnfmpa2024")
+DEFAULT_SEED = 42
+
+VALID_YEARS = ["1ère année", "2ème année", "3ème année", "4ème année", "5ème année", "6ème année"]
+YEAR_WEIGHTS = [1, 4, 4, 2, 1, 1]
+FIRST_NAMES = ["Amine", "Salma", "Youssef", "Imane", "Hamza", "Khadija", "Omar", "Sara", "Mehdi", "Nour",
+               "Ayoub", "Hiba", "Anas", "Meryem", "Zakaria", "Fatima", "Ilyas", "Aya", "Reda", "Chaimae"]
+LAST_NAMES = ["Benali", "El Amrani", "Ouali", "Idrissi", "Berrada", "Tazi", "Alaoui", "Chraibi", "Fassi",
+              "Bennani", "Lahlou", "Kettani", "Ait Said", "Ouazzani", "Haddad", "Naciri"]
+
+MAX_BULK_ACTIONS = 500
+STATS_PAGE_MAX = 1000
+EVENTS_MAXLEN = 20000
+MAX_EVENTS = 1000
+TREND_SLOTS = {("hourly", False): 168, ("hourly", True): 24, ("daily", False): 90, ("daily", True): 90}
+TREND_BUCKET_SECONDS = {"hourly": 3600, "daily": 86400}
+GZIP_MIN_BYTES = 1024
+PUSH_PREFIX = "/metrics/job/"
+METRIC_NAME = re.compile(r"[a-zA-Z_:][a-zA-Z0-9_:]*")
+FREE_DAILY_LIMIT = 10
+
+
+def now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def iso(dt: datetime) -> str:
+    return dt.isoformat(timespec="milliseconds").replace("+00:00", "Z")
+
+
+def parse_iso(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace("Z", "+00:00"))
+
+
+def hash_password(password: str) -> str:
+    return hashlib.sha256(password.encode("utf-8")).hexdigest()
+
+
+def trial_expired(user: dict) -> bool:
+    if not user.get("activated_at"):
+        return False
+    return datetime.now(timezone.utc) > parse_iso(user["activated_at"]) + timedelta(days=user["activation_days"])
+
+
+# ==================== Fixtures ====================
+
+def seed_users(count: int, seed: int) -> Dict[str, dict]:
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+    users = {}
+    for i in range(count):
+        user_id = f"user_{rng.getrandbits(32):08x}"
+        while user_id in users:
+            user_id = f"user_{rng.getrandbits(32):08x}"
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        local = f"{first[0]}.{last}{i}".lower().replace(" ", "")
+        email = f"{local}@{'gmail.com' if rng.random() < 0.05 else 'edu.uiz.ac.ma'}"
+        created = now - timedelta(days=rng.uniform(0, 300))
+        roll = rng.random()
+        status = "inactive" if roll < 0.1 else "free" if roll < 0.5 else "paid"
+        is_trial = status == "paid" and rng.random() < 0.3
+        activated = created + timedelta(days=rng.uniform(0, 3)) if status != "inactive" else created
+        trial_started = now - timedelta(days=rng.uniform(0, 10)) if is_trial else None
+        users[user_id] = {
+            "id": user_id,
+            "name": f"{first} {last}",
+            "email": email,
+            "password_hash": hash_password(f"pass-{i}"),
+            "must_change_password": rng.random() < 0.2,
+            "created_at": iso(created),
+            "last_login": iso(now - timedelta(days=rng.uniform(0, 30))) if status != "inactive" else None,
+            "is_active": status != "inactive",
+            "years": sorted({rng.choices(VALID_YEARS, YEAR_WEIGHTS)[0] for _ in range(rng.choice([1, 1, 1, 2]))},
+                            key=VALID_YEARS.index),
+            "activation_days": 7 if is_trial else rng.choice([7, 30, 150]),
+            "activated_at": iso(activated),
+            "has_paid": status == "paid" and not is_trial,
+            "is_trial": is_trial,
+            "trial_started_at": iso(trial_started) if trial_started else None,
+            "subscription_status": status,
+            "daily_answer_count": rng.randint(0, 12) if status == "free" else 0,
+            "daily_answer_reset": iso(now - timedelta(hours=rng.uniform(0, 20))),
+        }
+    return users
+
+
+def seed_progress(user: dict, seed: int, answers: int) -> dict:
+    if user.get("subscription_status") != "paid" or answers <= 0:
+        return {}
+    rng = random.Random(f"{seed}:{user['id']}")
+    modules = [m for m in load_modules() if set(m.get("levels", [])) & set(user.get("years", []))] or load_modules()
+    skill = rng.uniform(0.4, 0.85)
+    now = datetime.now(timezone.utc)
+    progress = {}
+    for module in rng.sample(modules, rng.randint(1, len(modules))):
+        size = len(load_questions(module["id"]))
+        chosen = rng.sample(range(size), min(size, int(rng.expovariate(1 / answers))))
+        if chosen:
+            progress[f"module_{module['id']}"] = {
+                str(q): {"is_correct": rng.random() < skill, "answered_at": iso(now - timedelta(minutes=rng.uniform(0, 86400)))}
+                for q in chosen
+            }
+    return progress
+
+
+def seed_stats(seed: int) -> Dict[int, dict]:
+    rng = random.Random(f"{seed}:stats")
+    stats = {}
+    for module in load_modules():
+        module_stats = {}
+        for index, question in enumerate(load_questions(module["id"])):
+            options = question_options(question)
+            if not options:
+                continue
+            total = min(2000, int(rng.lognormvariate(3.5, 1.0)))
+            facility = rng.betavariate(4, 3)
+            correct = round(total * facility)
+            wrong = [i for i, o in enumerate(options) if not o["is_correct"]]
+            weights = [rng.random() ** 2 for _ in wrong]
+            counts = {}
+            for i, option in enumerate(options):
+                if option["is_correct"]:
+                    count = round(total * min(1.0, facility + rng.uniform(0, 0.15)))
+                else:
+                    count = round((total - correct) * weights[wrong.index(i)] / (sum(weights) or 1))
+                if count:
+                    counts[str(i)] = count
+            if total:
+                module_stats[str(index)] = {"total_answers": total, "correct_answers": correct, "option_counts": counts}
+        stats[module["id"]] = module_stats
+    return stats
+
+
+# ==================== Stores ====================
+
+class Store:
+    """Shared behaviour; subclasses keep users, progress, stats and the signup flag."""
+
+    def __init__(self, seed: int, progress_answers: int):
+        self.seed = seed
+        self.progress_answers = progress_answers
+        self.lock = threading.RLock()
+        self.trends: Dict[str, Dict[int, List[int]]] = {}
+        self.events = deque(maxlen=EVENTS_MAXLEN)
+        self.event_seq = 0
+        self.limit_hits: Dict[str, int] = {}
+        self.snapshot = (None, {}, {})
+        self.sessions: Dict[str, str] = {}
+
+    def users_snapshot(self):
+        """(users, email index, version), rebuilt only when users:version moves."""
+        version = self.users_version()
+        if self.snapshot[0] != version:
+            with self.lock:
+                users, version = self.load_users()
+                index = {u["email"].lower(): uid for uid, u in users.items()}
+                self.snapshot = (version, users, index)
+        version, users, index = self.snapshot
+        return users, index, version
+
+    # --- users / progress / stats / signup: implemented by subclasses ---
+
+    def load_users(self):
+        raise NotImplementedError
+
+    def update_users(self, mutate) -> bool:
+        raise NotImplementedError
+
+    def users_version(self) -> int:
+        raise NotImplementedError
+
+    def load_progress(self, user_id: str) -> dict:
+        raise NotImplementedError
+
+    def save_progress(self, user_id: str, progress: dict):
+        raise NotImplementedError
+
+    def load_stats(self, module_id: int) -> dict:
+        raise NotImplementedError
+
+    def save_stats(self, module_id: int, stats: dict):
+        raise NotImplementedError
+
+    def get_signup_open(self) -> bool:
+        raise NotImplementedError
+
+    def set_signup_open(self, open_: bool):
+        raise NotImplementedError
+
+    # --- derived data, in memory for both stores ---
+
+    def record_answers(self, module_id: int, entries: List[tuple]) -> Optional[dict]:
+        """entries are (question_id, options, is_correct); returns the last question's stats."""
+        with self.lock:
+            stats = self.load_stats(module_id)
+            now = time.time()
+            q = None
+            for question_id, options, is_correct in entries:
+                q = stats.setdefault(question_id, {"total_answers": 0, "correct_answers": 0, "option_counts": {}})
+                q["total_answers"] += 1
+                q["correct_answers"] += 1 if is_correct else 0
+                for option in options:
+                    q["option_counts"][str(option)] = q["option_counts"].get(str(option), 0) + 1
+                for key in (f"{module_id}", f"{module_id}:{question_id}"):
+                    for resolution, step in TREND_BUCKET_SECONDS.items():
+                        buckets = self.trends.setdefault(f"{resolution}:{key}", {})
+                        counts = buckets.setdefault(int(now // step), [0, 0])
+                        counts[0] += 1
+                        counts[1] += 1 if is_correct else 0
+            self.save_stats(module_id, stats)
+            self._append_event({"type": "answers", "module_id": module_id,
+                                "answers": [[question_id, int(is_correct)] for question_id, _, is_correct in entries]})
+            return json.loads(json.dumps(q))
+
+    def record_limit_hit(self, user_id: str, first_today: bool):
+        with self.lock:
+            if first_today:
+                today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+                self.limit_hits[today] = self.limit_hits.get(today, 0) + 1
+            self._append_event({"type": "limit", "user_id": user_id})
+
+    def create_session(self, user_id: str, token: str):
+        self.sessions[user_id] = token
+
+    def validate_session(self, user_id: str, token: str) -> bool:
+        return bool(token) and self.sessions.get(user_id) == token
+
+    def reset_questions(self, module_id: int, question_ids: List[str]) -> int:
+        with self.lock:
+            stats = self.load_stats(module_id)
+            removed = 0
+            for question_id in question_ids:
+                for resolution in TREND_BUCKET_SECONDS:
+                    self.trends.pop(f"{resolution}:{module_id}:{question_id}", None)
+                if stats.pop(question_id, None) is not None:
+                    removed += 1
+            if removed:
+                self.save_stats(module_id, stats)
+            return removed
+
+    def trend(self, module_id: int, resolution: str, question_id: Optional[str] = None) -> List[dict]:
+        step = TREND_BUCKET_SECONDS[resolution]
+        current = int(time.time() // step)
+        oldest = current - TREND_SLOTS[(resolution, question_id is not None)] + 1
+        key = f"{resolution}:{module_id}" + (f":{question_id}" if question_id else "")
+        with self.lock:
+            buckets = sorted((b, c) for b, c in self.trends.get(key, {}).items() if oldest <= b <= current)
+        return [{"start": iso(datetime.fromtimestamp(b * step, timezone.utc)), "answers": a, "correct": c}
+                for b, (a, c) in buckets]
+
+    def _append_event(self, event: dict):
+        self.event_seq += 1
+        event["id"] = f"{int(time.time() * 1000)}-{self.event_seq}"
+        self.events.append(event)
+
+    def read_events(self, since: Optional[str], count: int) -> dict:
+        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        with self.lock:
+            if not since:
+                last_id = self.events[-1]["id"] if self.events else "0-0"
+                return {"events": [], "last_id": last_id, "more": False, "limit_hits_today": self.limit_hits.get(today, 0)}
+            after = tuple(int(p) for p in since.split("-"))
+            events = [e for e in self.events if tuple(int(p) for p in e["id"].split("-")) > after][:count]
+        return {
+            "events": events,
+            "last_id": events[-1]["id"] if events else since,
+            "more": len(events) == count,
+            "limit_hits_today": self.limit_hits.get(today, 0),
+        }
+
+
+class MemoryStore(Store):
+    def __init__(self, seed: int, users: int, progress_answers: int):
+        super().__init__(seed, progress_answers)
+        self.users = seed_users(users, seed)
+        self.seeded = dict(self.users)
+        self.version = 1
+        self.email_index = {u["email"].lower(): uid for uid, u in self.users.items()}
+        self.progress: Dict[str, dict] = {}
+        self.stats = seed_stats(seed)
+        self.signup_open = False
+
+    def load_users(self):
+        with self.lock:
+            return {uid: dict(u) for uid, u in self.users.items()}, self.version
+
+    def update_users(self, mutate) -> bool:
+        with self.lock:
+            ids = set(self.users)
+            if not mutate(self.users):
+                return False
+            self.version += 1
+            if ids != self.users.keys():
+                self.email_index = {u["email"].lower(): uid for uid, u in self.users.items()}
+            return True
+
+    def users_snapshot(self):
+        # Kept current by update_users, so logins and answers never rebuild it
+        with self.lock:
+            return dict(self.users), self.email_index, self.version
+
+    def users_version(self) -> int:
+        return self.version
+
+    def load_progress(self, user_id: str) -> dict:
+        if user_id not in self.progress:
+            # Only seeded accounts get generated history; accounts created later start empty
+            user = self.seeded.get(user_id)
+            progress = seed_progress(user, self.seed, self.progress_answers) if user else {}
+            with self.lock:
+                self.progress.setdefault(user_id, progress)
+        return self.progress[user_id]
+
+    def save_progress(self, user_id: str, progress: dict):
+        self.progress[user_id] = progress
+
+    def load_stats(self, module_id: int) -> dict:
+        return self.stats.setdefault(module_id, {})
+
+    def save_stats(self, module_id: int, stats: dict):
+        self.stats[module_id] = stats
+
+    def get_signup_open(self) -> bool:
+        return self.signup_open
+
+    def set_signup_open(self, open_: bool):
+        self.signup_open = open_
+
+
+class RedisStore(Store):
+    def __init__(self, url: str, seed: int, users: int, progress_answers: int, reseed: bool):
+        super().__init__(seed, progress_answers)
+        import redis
+        self.redis_module = redis
+        self.r = redis.Redis.from_url(url, decode_responses=True)
+        if self.r.get("users:layout") == "hash" or self.r.exists("users:ids"):
+            raise RuntimeError("users are in the per-user hash layout; run migrate_users.py rollback or use another database")
+        if reseed or not self.r.exists("users"):
+            self._seed(users)
+
+    def _seed(self, count: int):
+        users = seed_users(count, self.seed)
+        pipe = self.r.pipeline(transaction=False)
+        pipe.set("users", json.dumps({"users": users}, ensure_ascii=False, separators=(",", ":")))
+        pipe.incr("users:version")
+        for user in users.values():
+            progress = seed_progress(user, self.seed, self.progress_answers)
+            if progress:
+                pipe.set(f"progress:{user['id']}", json.dumps(progress, separators=(",", ":")))
+        for module_id, stats in seed_stats(self.seed).items():
+            pipe.delete(f"stats:module_{module_id}:layout")
+            pipe.set(f"stats:module_{module_id}", json.dumps(stats, separators=(",", ":")))
+        pipe.set("signup_open", "false")
+        pipe.execute()
+
+    def load_users(self):
+        raw, version = self.r.pipeline().get("users").get("users:version").execute()
+        return (json.loads(raw) if raw else {"users": {}})["users"], int(version or 0)
+
+    def update_users(self, mutate) -> bool:
+        with self.r.pipeline() as pipe:
+            while True:
+                try:
+                    pipe.watch("users", "users:version")
+                    raw = pipe.get("users")
+                    users = (json.loads(raw) if raw else {"users": {}})["users"]
+                    if not mutate(users):
+                        pipe.unwatch()
+                        return False
+                    pipe.multi()
+                    pipe.set("users", json.dumps({"users": users}, ensure_ascii=False, separators=(",", ":")))
+                    pipe.incr("users:version")
+                    pipe.execute()
+                    return True
+                except self.redis_module.WatchError:
+                    continue
+
+    def users_version(self) -> int:
+        return int(self.r.get("users:version") or 0)
+
+    def load_progress(self, user_id: str) -> dict:
+        raw = self.r.get(f"progress:{user_id}")
+        return json.loads(raw) if raw else {}
+
+    def save_progress(self, user_id: str, progress: dict):
+        self.r.set(f"progress:{user_id}", json.dumps(progress, separators=(",", ":")))
+
+    def load_stats(self, module_id: int) -> dict:
+        raw = self.r.get(f"stats:module_{module_id}")
+        return json.loads(raw) if raw else {}
+
+    def save_stats(self, module_id: int, stats: dict):
+        self.r.set(f"stats:module_{module_id}", json.dumps(stats, separators=(",", ":")))
+
+    def get_signup_open(self) -> bool:
+        return self.r.get("signup_open") == "true"
+
+    def set_signup_open(self, open_: bool):
+        self.r.set("signup_open", "true" if open_ else "false")
+
+
+# ==================== Admin user actions (ported from the users route) ====================
+
+def migrate_user(user: dict) -> dict:
+    if not isinstance(user.get("years"), list):
+        user["years"] = [user["year"]] if isinstance(user.get("year"), str) else ["3ème année"]
+        user.pop("year", None)
+    user["years"] = [y for y in user["years"] if y in VALID_YEARS] or ["3ème année"]
+    if user.get("activation_days") is None:
+        user["activation_days"] = 7
+    if not user.get("activated_at"):
+        user["activated_at"] = user.get("created_at")
+    if user.get("has_paid") is None:
+        user["has_paid"] = False
+    if user.get("is_trial") is None:
+        user["is_trial"] = False
+    user.setdefault("trial_started_at", None)
+    if not user.get("subscription_status"):
+        user["subscription_status"] = "paid" if user["has_paid"] else "free" if user.get("is_active") else "inactive"
+    user.setdefault("daily_answer_count", 0)
+    if not user.get("daily_answer_reset"):
+        user["daily_answer_reset"] = user.get("activated_at") or user.get("created_at")
+    return user
+
+
+def resolve_action(params: dict) -> str:
+    if params.get("action"):
+        return params["action"]
+    email, name = params.get("email"), params.get("name")
+    updates = ("year", "years", "activation_days", "has_paid", "is_trial", "subscription_status")
+    if (email and not name and not params.get("password") and not params.get("new_password")
+            and params.get("is_active") is None and any(params.get(f) is not None for f in updates)):
+        return "update_user"
+    if email and params.get("new_password") and not name:
+        return "reset_password"
+    if email and params.get("is_active") is not None and not name:
+        return "set_active"
+    return "create"
+
+
+def resolve_years(params: dict, default):
+    if isinstance(params.get("years"), list):
+        return [y for y in params["years"] if y in VALID_YEARS]
+    if params.get("year") in VALID_YEARS:
+        return [params["year"]]
+    return default
+
+
+def apply_action(users: dict, email_index: dict, params: dict):
+    """Returns (status, body, changed) like applyAction() in the users route."""
+    action = resolve_action(params)
+    email = params.get("email")
+
+    if action == "create":
+        name, password = params.get("name"), params.get("password")
+        if not name or not email or not password:
+            return 400, {"error": "Nom, email et mot de passe requis"}, False
+        if email.lower() in email_index:
+            return 400, {"error": "Un utilisateur avec cet email existe déjà"}, False
+        years = resolve_years(params, ["3ème année"]) or ["3ème année"]
+        days = params.get("activation_days")
+        days = days if isinstance(days, int) and days > 0 else 7
+        has_paid = params.get("has_paid") is True
+        user_id = f"user_{os.urandom(4).hex()}"
+        now = now_iso()
+        users[user_id] = {
+            "id": user_id, "name": name, "email": email.lower(), "password_hash": hash_password(password),
+            "must_change_password": True, "created_at": now, "last_login": None, "is_active": True,
+            "years": years, "activation_days": days, "activated_at": now, "has_paid": has_paid,
+            "subscription_status": "paid" if has_paid else "free", "daily_answer_count": 0, "daily_answer_reset": now,
+        }
+        email_index[email.lower()] = user_id
+        return 200, {"success": True, "user": {
+            "id": user_id, "name": name, "email": email.lower(), "years": years, "activation_days": days,
+            "has_paid": has_paid, "subscription_status": "paid" if has_paid else "free",
+        }, "temp_password": password}, True
+
+    if not email:
+        return 400, {"error": "Email requis"}, False
+    user_id = email_index.get(email.lower())
+    if not user_id:
+        return 404, {"error": "Utilisateur non trouvé"}, False
+    user = users[user_id]
+
+    if action == "activate":
+        migrate_user(user)
+        user["is_active"] = True
+        user["activated_at"] = now_iso()
+        if user.get("subscription_status") in (None, "inactive"):
+            user["subscription_status"] = "paid"
+        user["daily_answer_count"] = 0
+        user["daily_answer_reset"] = now_iso()
+        return 200, {"success": True, "message": "Compte activé avec succès"}, True
+
+    if action == "update_user":
+        migrate_user(user)
+        years = resolve_years(params, None)
+        if years:
+            user["years"] = years
+        days = params.get("activation_days")
+        if isinstance(days, int) and days > 0:
+            user["activation_days"] = days
+        if isinstance(params.get("has_paid"), bool):
+            user["has_paid"] = params["has_paid"]
+            if params["has_paid"] and not user.get("activated_at"):
+                user["activated_at"] = now_iso()
+        if params.get("is_trial") is not None:
+            user["is_trial"] = bool(params["is_trial"])
+            if not user["is_trial"]:
+                user["trial_started_at"] = None
+        if "trial_started_at" in params:
+            user["trial_started_at"] = params["trial_started_at"]
+        status = params.get("subscription_status")
+        if status in ("inactive", "free", "paid"):
+            user["subscription_status"] = status
+            user["has_paid"] = status == "paid"
+            user["is_active"] = status != "inactive"
+        return 200, {"success": True, "message": "Utilisateur mis à jour"}, True
+
+    if action == "reset_password":
+        if not params.get("new_password"):
+            return 400, {"error": "Nouveau mot de passe requis"}, False
+        user["password_hash"] = hash_password(params["new_password"])
+        user["must_change_password"] = True
+        return 200, {"success": True, "message": "Mot de passe réinitialisé"}, True
+
+    if action == "set_active":
+        user["is_active"] = params["is_active"]
+        if params["is_active"]:
+            migrate_user(user)
+            if user.get("subscription_status") in (None, "inactive"):
+                user["subscription_status"] = "free"
+        else:
+            user["subscription_status"] = "inactive"
+        return 200, {"success": True, "message": f"Utilisateur {'activé' if params['is_active'] else 'désactivé'}"}, True
+
+    if action == "delete":
+        del users[user_id]
+        email_index.pop(email.lower(), None)
+        return 200, {"success": True, "message": "Utilisateur supprimé"}, True
+
+    return 400, {"error": f"Action inconnue: {action}"}, False
+
+
+PUBLIC_USER_FIELDS = ["id", "name", "email", "must_change_password", "created_at", "last_login", "is_active", "years",
+                      "activation_days", "activated_at", "has_paid"]
+
+
+def public_user(user: dict) -> dict:
+    record = {field: user.get(field) for field in PUBLIC_USER_FIELDS}
+    record.update({
+        "is_trial": user.get("is_trial") or False,
+        "trial_started_at": user.get("trial_started_at") or None,
+        "subscription_status": user.get("subscription_status") or
+        ("paid" if user.get("has_paid") else "free" if user.get("is_active") else "inactive"),
+        "daily_answer_count": user.get("daily_answer_count") or 0,
+        "daily_answer_reset": user.get("daily_answer_reset") or None,
+    })
+    return record
+
+
+# ==================== Pushgateway ====================
+
+def parse_metrics_text(text: str) -> Dict[str, dict]:
+    """Split Prometheus/OpenMetrics text into {family: {help, type, samples}}."""
+    families: Dict[str, dict] = {}
+    current = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line == "# EOF":
+            continue
+        if line.startswith("#"):
+            parts = line.split(None, 3)
+            if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                family = families.setdefault(parts[2], {"help": None, "type": None, "samples": []})
+                family[parts[1].lower()] = parts[3] if len(parts) > 3 else ""
+                current = parts[2]
+            continue
+        match = METRIC_NAME.match(line)
+        value = line[match.end():].rsplit("}", 1)[-1].split() if match else []
+        try:
+            float(value[0])
+        except (IndexError, ValueError):
+            raise ValueError(f"Ligne invalide: {line[:80]}")
+        # _total, _bucket, _count, _sum samples belong to the family declared above them
+        if current is None or not match.group(0).startswith(current):
+            current = match.group(0)
+        families.setdefault(current, {"help": None, "type": None, "samples": []})["samples"].append(line)
+    return families
+
+
+def _with_labels(sample: str, key: tuple) -> str:
+    end = METRIC_NAME.match(sample).end()
+    rest = sample[end:]
+    # Grouping labels the sample already carries (with the same value, or the push is invalid) are not repeated
+    own = set(re.findall(r'([a-zA-Z_][a-zA-Z0-9_]*)="', rest.split("}")[0])) if rest.startswith("{") else set()
+    labels = ",".join(f'{name}="{value}"' for name, value in key if name not in own)
+    if not labels:
+        return sample
+    if rest.startswith("{"):
+        return f"{sample[:end]}{{{labels}{'' if rest.startswith('{}') else ','}{rest[1:]}"
+    return f"{sample[:end]}{{{labels}}}{rest}"
+
+
+class MetricsRegistry:
+    """Metric groups pushed like to a pushgateway: PUT replaces a group, POST
+    replaces the families it sends, GET /metrics serves every group with its
+    grouping labels and push_time_seconds."""
+
+    def __init__(self):
+        self.groups: Dict[tuple, dict] = {}
+        self.lock = threading.Lock()
+
+    def push(self, key: tuple, families: Dict[str, dict], replace: bool):
+        with self.lock:
+            group = self.groups.get(key)
+            if replace or group is None:
+                group = self.groups[key] = {"families": {}}
+            group["families"].update(families)
+            group["pushed_at"] = time.time()
+
+    def delete(self, key: tuple):
+        with self.lock:
+            self.groups.pop(key, None)
+
+    def exposition(self) -> str:
+        with self.lock:
+            groups = [(key, dict(group["families"]), group["pushed_at"]) for key, group in self.groups.items()]
+        merged: Dict[str, dict] = {}
+        for key, families, pushed_at in groups:
+            for name, family in families.items():
+                target = merged.setdefault(name, {"help": family["help"], "type": family["type"], "samples": []})
+                target["samples"].extend(_with_labels(sample, key) for sample in family["samples"])
+            push_time = merged.setdefault("push_time_seconds", {"help": "Last successful push", "type": "gauge", "samples": []})
+            push_time["samples"].append(_with_labels(f"push_time_seconds {pushed_at:.3f}", key))
+        lines = []
+        for name, family in sorted(merged.items()):
+            if family["help"] is not None:
+                lines.append(f"# HELP {name} {family['help']}")
+            if family["type"]:
+                lines.append(f"# TYPE {name} {family['type']}")
+            lines.extend(family["samples"])
+        return "\n".join(lines) + "\n"
+
+
+# ==================== HTTP ====================
+
+class ApiHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "LearnFMPA-dev"
+    store: Store = None
+    admin_secret = DEFAULT_ADMIN_SECRET
+    latency = 0.0
+    verbose = False
+    metrics = MetricsRegistry()
+
+    # --- plumbing ---
+
+    def _send(self, status: int, body: Optional[dict] = None, headers: Optional[Dict[str, str]] = None):
+        if self.latency:
+            time.sleep(self.latency)
+        payload = json.dumps(body, ensure_ascii=False).encode("utf-8") if body is not None else b""
+        self.send_response(status)
+        if payload:
+            self.send_header("Content-Type", "application/json")
+            if len(payload) >= GZIP_MIN_BYTES and "gzip" in (self.headers.get("Accept-Encoding") or ""):
+                payload = gzip.compress(payload, compresslevel=5)
+                self.send_header("Content-Encoding", "gzip")
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _body(self) -> dict:
+        length = int(self.headers.get("Content-Length") or 0)
+        if not length:
+            return {}
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            return {}
+
+    def _admin(self, secret) -> bool:
+        if secret in (self.admin_secret, "learnfmpa2024"):
+            return True
+        self._send(403, {"error": "Non autorisé"})
+        return False
+
+    def _dispatch(self, method: str):
+        start = time.perf_counter()
+        parts = urllib.parse.urlsplit(self.path)
+        query = {k: v[-1] for k, v in urllib.parse.parse_qs(parts.query).items()}
+        path = parts.path.rstrip("/")
+        route = ROUTES.get((method, path))
+        if route is None and path.startswith(PUSH_PREFIX) and method in ("PUT", "POST", "DELETE"):
+            route = ApiHandler.metrics_push
+        try:
+            if route is None:
+                self._send(404, {"error": "Not found"})
+            else:
+                route(self, query)
+        except Exception as e:
+            self._send(500, {"error": "Erreur serveur", "detail": str(e)})
+        if self.verbose:
+            sys.stderr.write(f"{method} {self.path.split('admin_secret=')[0]} {(time.perf_counter() - start) * 1000:.1f}ms\n")
+
+    def do_GET(self):
+        self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _send_text(self, status: int, text: str, content_type: str):
+        payload = text.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+    # --- /api/admin/users ---
+
+    def admin_users_get(self, query):
+        if not self._admin(query.get("admin_secret")):
+            return
+        email = query.get("email")
+        if not email:
+            etag = f"\"users-{self.store.users_version()}\""
+            if self.headers.get("If-None-Match") == etag:
+                return self._send(304, None, {"ETag": etag})
+        users, index, version = self.store.users_snapshot()
+        if email:
+            user_id = index.get(email.lower())
+            if not user_id:
+                return self._send(404, {"error": "Utilisateur non trouvé"})
+            return self._send(200, {"success": True, "user": public_user(migrate_user(dict(users[user_id])))})
+        records = [public_user(migrate_user(dict(u))) for u in users.values()]
+        self._send(200, {"success": True, "users": records, "total": len(records)},
+                   {"Cache-Control": "no-cache", "ETag": f"\"users-{version}\""})
+
+    def admin_users_post(self, query):
+        body = self._body()
+        if not self._admin(body.get("admin_secret")):
+            return
+        if body.get("action") == "bulk":
+            actions = body.get("actions")
+            if not isinstance(actions, list) or not actions:
+                return self._send(400, {"error": "Liste d'actions requise"})
+            if len(actions) > MAX_BULK_ACTIONS:
+                return self._send(400, {"error": f"Maximum {MAX_BULK_ACTIONS} actions par requête"})
+            results = []
+
+            def mutate(users):
+                index = {u["email"].lower(): uid for uid, u in users.items()}
+                results[:] = [apply_action(users, index, params) for params in actions]
+                return any(changed for _, _, changed in results)
+
+            self.store.update_users(mutate)
+            return self._send(200, {
+                "success": True,
+                "results": [dict(body, status=status) for status, body, _ in results],
+                "succeeded": sum(1 for r in results if r[2]),
+                "failed": sum(1 for r in results if not r[2]),
+            })
+        self._single_action(body)
+
+    def admin_users_delete(self, query):
+        if not self._admin(query.get("admin_secret")):
+            return
+        if not query.get("email"):
+            return self._send(400, {"error": "Email requis"})
+        self._single_action({"action": "delete", "email": query["email"]})
+
+    def _single_action(self, params: dict):
+        result = [500, {"error": "Erreur serveur"}, False]
+
+        def mutate(users):
+            index = {u["email"].lower(): uid for uid, u in users.items()}
+            result[:] = apply_action(users, index, params)
+            return result[2]
+
+        self.store.update_users(mutate)
+        self._send(result[0], result[1])
+
+    # --- /api/admin/users/progress ---
+
+    def admin_progress_get(self, query):
+        if not self._admin(query.get("admin_secret")):
+            return
+        email = query.get("email")
+        if not email:
+            return self._send(400, {"error": "Email requis"})
+        _, index, _ = self.store.users_snapshot()
+        user_id = index.get(email.lower())
+        if not user_id:
+            return self._send(404, {"error": "Utilisateur non trouvé"})
+        self._send(200, {"success": True, "email": email, "progress": self.store.load_progress(user_id)})
+
+    # --- /api/admin/signup-toggle ---
+
+    def signup_get(self, query):
+        if self._admin(query.get("admin_secret")):
+            self._send(200, {"success": True, "signup_open": self.store.get_signup_open()})
+
+    def signup_post(self, query):
+        body = self._body()
+        if not self._admin(body.get("admin_secret")):
+            return
+        if not isinstance(body.get("signup_open"), bool):
+            return self._send(400, {"error": "signup_open doit être true ou false"})
+        self.store.set_signup_open(body["signup_open"])
+        self._send(200, {"success": True, "signup_open": body["signup_open"],
+                         "message": "Inscriptions ouvertes" if body["signup_open"] else "Inscriptions fermées"})
+
+    # --- /api/statistics ---
+
+    def statistics_get(self, query):
+        module_id = query.get("module_id")
+        if not module_id:
+            return self._send(400, {"error": "ID module requis"})
+        module_id = int(module_id)
+        question_id = query.get("question_id")
+        no_store = {"Cache-Control": "no-store"}
+
+        trend = query.get("trend")
+        if trend:
+            if trend not in TREND_BUCKET_SECONDS:
+                return self._send(400, {"error": "Résolution invalide (hourly ou daily)"})
+            return self._send(200, {"success": True, "resolution": trend,
+                                    "buckets": self.store.trend(module_id, trend, question_id)}, no_store)
+
+        stats = self.store.load_stats(module_id)
+        if question_id:
+            return self._send(200, {"success": True, "statistics": stats.get(question_id)}, no_store)
+
+        cursor = query.get("cursor")
+        if cursor:
+            match = re.fullmatch(r"(?:b:)?(\d+)", cursor)
+            if not match:
+                return self._send(409, {"error": "Curseur invalide, relancez l'export"})
+            offset = int(match.group(1))
+            size = min(max(int(query.get("count") or 500), 1), STATS_PAGE_MAX)
+            ids = sorted(stats, key=lambda x: int(x) if x.isdigit() else 0)
+            page = {qid: stats[qid] for qid in ids[offset:offset + size]}
+            next_cursor = f"b:{offset + size}" if offset + size < len(ids) else None
+            return self._send(200, {"success": True, "statistics": page, "next_cursor": next_cursor}, no_store)
+
+        self._send(200, {"success": True, "statistics": stats}, no_store)
+
+    def statistics_post(self, query):
+        body = self._body()
+        if body.get("module_id") is None or not body.get("question_id") or not body.get("selected_options") \
+                or body.get("is_correct") is None:
+            return self._send(400, {"error": "Champs requis manquants"})
+        selected = body["selected_options"]
+        options = [int(o) for o in (selected if isinstance(selected, list) else [selected])]
+        stats = self.store.record_answers(int(body["module_id"]), [(str(body["question_id"]), options, bool(body["is_correct"]))])
+        self._send(200, {"success": True, "statistics": stats})
+
+    def statistics_put(self, query):
+        body = self._body()
+        if not self._admin(body.get("admin_secret")):
+            return
+        if body.get("module_id") is None or not body.get("stats"):
+            return self._send(400, {"error": "Champs requis manquants"})
+        with self.store.lock:
+            self.store.save_stats(int(body["module_id"]), body["stats"])
+        self._send(200, {"success": True})
+
+    def statistics_delete(self, query):
+        body = self._body()
+        if not self._admin(body.get("admin_secret") or query.get("admin_secret")):
+            return
+        module_id = query.get("module_id") or body.get("module_id")
+        if not module_id:
+            return self._send(400, {"error": "ID module requis"})
+        if isinstance(body.get("question_ids"), list):
+            question_ids = [str(q) for q in body["question_ids"]]
+        elif query.get("question_ids"):
+            question_ids = [q.strip() for q in query["question_ids"].split(",") if q.strip()]
+        else:
+            question_ids = None
+        if question_ids is not None:
+            if not question_ids:
+                return self._send(400, {"error": "Aucune question spécifiée"})
+            removed = self.store.reset_questions(int(module_id), question_ids)
+            return self._send(200, {"success": True, "removed": removed,
+                                    "message": f"Statistiques réinitialisées pour {removed} question(s)"})
+        with self.store.lock:
+            self.store.save_stats(int(module_id), {})
+        self._send(200, {"success": True, "message": "Statistiques du module réinitialisées"})
+
+    # --- /api/auth/login, /api/answer, /api/progress ---
+
+    def _auth(self, user_id) -> bool:
+        token = (self.headers.get("Authorization") or "").replace("Bearer ", "")
+        if not token:
+            self._send(401, {"error": "Non autorisé", "code": "SESSION_INVALID"})
+            return False
+        if not user_id:
+            self._send(400, {"error": "ID utilisateur requis"})
+            return False
+        if not self.store.validate_session(user_id, token):
+            self._send(401, {"error": "Session expirée.", "code": "SESSION_INVALID"})
+            return False
+        return True
+
+    def login_post(self, query):
+        body = self._body()
+        email, password = body.get("email"), body.get("password")
+        if not email or not password:
+            return self._send(400, {"error": "Email et mot de passe requis"})
+        _, index, _ = self.store.users_snapshot()
+        user_id = index.get(email.lower())
+        result = {}
+
+        def mutate(users):
+            user = users.get(user_id)
+            if not user or user.get("password_hash") != hash_password(password):
+                result["error"] = (401, {"error": "Email ou mot de passe incorrect"})
+                return False
+            migrate_user(user)
+            if not user.get("is_active"):
+                result["error"] = (403, {"error": "Votre compte n'a pas encore été activé.", "code": "ACCOUNT_NOT_ACTIVATED"})
+                return False
+            if user["subscription_status"] == "paid" and trial_expired(user):
+                user["subscription_status"] = "free"
+                user["has_paid"] = False
+            user["last_login"] = now_iso()
+            result["user"] = dict(user)
+            return True
+
+        self.store.update_users(mutate)
+        if "error" in result:
+            return self._send(*result["error"])
+        user = result["user"]
+        token = os.urandom(32).hex()
+        self.store.create_session(user["id"], token)
+        days_left = None
+        if user["subscription_status"] == "paid" and user.get("activated_at"):
+            expires = parse_iso(user["activated_at"]) + timedelta(days=user["activation_days"])
+            days_left = max(0, -(-(expires - datetime.now(timezone.utc)).total_seconds() // 86400))
+        self._send(200, {"success": True, "user": {
+            "id": user["id"], "name": user["name"], "email": user["email"],
+            "must_change_password": user.get("must_change_password"), "years": user["years"],
+            "subscription_status": user["subscription_status"], "daily_answer_count": user.get("daily_answer_count") or 0,
+            "trial_days_left": int(days_left) if days_left is not None else None, "token": token,
+        }})
+
+    def answer_post(self, query):
+        body = self._body()
+        user_id, answers = body.get("user_id"), body.get("answers")
+        if not self._auth(user_id):
+            return
+        if not isinstance(answers, list) or not answers:
+            return self._send(400, {"error": "Champs requis manquants"})
+        today = datetime.now(timezone.utc).strftime("%Y-%m-%d")
+        result = {}
+
+        def mutate(users):
+            user = users.get(user_id)
+            if not user:
+                return False
+            status = user.get("subscription_status") or ("paid" if user.get("has_paid") else "free" if user.get("is_active") else "inactive")
+            count = user.get("daily_answer_count") or 0
+            reset = user.get("daily_answer_reset") or user.get("activated_at") or user.get("created_at")
+            if (reset or today)[:10] != today:
+                count = 0
+            count += len(answers)
+            user.update(daily_answer_count=count, daily_answer_reset=now_iso(), subscription_status=status)
+            result.update(status=status, count=count)
+            return True
+
+        if not self.store.update_users(mutate):
+            return self._send(404, {"error": "Utilisateur non trouvé"})
+        is_paid = result["status"] == "paid"
+        limit_reached = not is_paid and result["count"] > FREE_DAILY_LIMIT
+        if limit_reached:
+            self.store.record_limit_hit(user_id, result["count"] - len(answers) <= FREE_DAILY_LIMIT)
+
+        progress, last_stats = {}, None
+        if is_paid:
+            entries: Dict[int, list] = {}
+            with self.store.lock:
+                progress = json.loads(json.dumps(self.store.load_progress(user_id)))
+                for answer in answers:
+                    module_key = f"module_{answer.get('module_id')}"
+                    progress.setdefault(module_key, {})[str(answer.get("question_id"))] = {
+                        "is_correct": answer.get("is_correct"), "answered_at": now_iso()}
+                    selected = answer.get("selected_options")
+                    if selected:
+                        options = [int(o) for o in (selected if isinstance(selected, list) else [selected])]
+                        entries.setdefault(int(answer["module_id"]), []).append(
+                            (str(answer["question_id"]), options, bool(answer.get("is_correct"))))
+                self.store.save_progress(user_id, progress)
+            last_by_module = {m: self.store.record_answers(m, e) for m, e in entries.items()}
+            last = answers[-1]
+            module_entries = entries.get(int(last.get("module_id", -1)))
+            if module_entries and module_entries[-1][0] == str(last.get("question_id")):
+                last_stats = last_by_module[int(last["module_id"])]
+
+        self._send(200, {"success": True, "statistics": last_stats if is_paid else None, "progress": progress,
+                         "free_limit_reached": limit_reached, "daily_answer_count": result["count"],
+                         "daily_limit": FREE_DAILY_LIMIT})
+
+    def progress_get(self, query):
+        if not self._auth(query.get("user_id")):
+            return
+        with self.store.lock:
+            progress = json.loads(json.dumps(self.store.load_progress(query["user_id"])))
+        self._send(200, {"success": True, "progress": progress}, {"Cache-Control": "no-store"})
+
+    def progress_post(self, query):
+        body = self._body()
+        user_id = body.get("user_id")
+        if not self._auth(user_id):
+            return
+        if body.get("module_id") is None or body.get("question_id") is None or body.get("is_correct") is None:
+            return self._send(400, {"error": "Champs requis manquants"})
+        with self.store.lock:
+            progress = json.loads(json.dumps(self.store.load_progress(user_id)))
+            module = progress.setdefault(f"module_{body['module_id']}", {})
+            module[str(body["question_id"])] = {"is_correct": body["is_correct"], "answered_at": now_iso()}
+            self.store.save_progress(user_id, progress)
+        correct = sum(1 for p in module.values() if p.get("is_correct"))
+        self._send(200, {"success": True, "stats": {
+            "total_answered": len(module), "total_correct": correct,
+            "success_rate": round(correct / len(module) * 100) if module else 0,
+        }})
+
+    def progress_delete(self, query):
+        user_id, module_id = query.get("user_id"), query.get("module_id")
+        if not self._auth(user_id):
+            return
+        with self.store.lock:
+            progress = json.loads(json.dumps(self.store.load_progress(user_id)))
+            for key in [k for k in progress if k == f"module_{module_id}" or (not module_id and k.startswith("module_"))]:
+                del progress[key]
+            self.store.save_progress(user_id, progress)
+        self._send(200, {"success": True, "message": "Progression du module réinitialisée" if module_id
+                         else "Toute la progression réinitialisée"})
+
+    # --- /api/admin/statistics/live ---
+
+    def live_get(self, query):
+        if not self._admin(query.get("admin_secret")):
+            return
+        since = query.get("since")
+        if since and not re.fullmatch(r"\d+-\d+", since):
+            return self._send(400, {"error": "Paramètre since invalide"})
+        count = min(int(query.get("count") or MAX_EVENTS) or MAX_EVENTS, MAX_EVENTS)
+        self._send(200, dict(self.store.read_events(since, count), success=True), {"Cache-Control": "no-store"})
+
+    # --- /metrics (pushgateway stand-in) ---
+
+    def metrics_push(self, query):
+        parts = urllib.parse.urlsplit(self.path).path[len("/metrics/"):].rstrip("/").split("/")
+        if len(parts) % 2 or not all(parts[1::2]):
+            return self._send(400, {"error": "Groupe invalide: /metrics/job/<job>{/<label>/<value>}"})
+        key = tuple((parts[i], urllib.parse.unquote(parts[i + 1])) for i in range(0, len(parts), 2))
+        if self.command == "DELETE":
+            self.metrics.delete(key)
+            return self._send(202)
+        length = int(self.headers.get("Content-Length") or 0)
+        try:
+            families = parse_metrics_text(self.rfile.read(length).decode("utf-8"))
+        except (ValueError, UnicodeDecodeError) as e:
+            return self._send(400, {"error": str(e)})
+        self.metrics.push(key, families, replace=self.command == "PUT")
+        self._send(200)
+
+    def metrics_get(self, query):
+        self._send_text(200, self.metrics.exposition(), "text/plain; version=0.0.4; charset=utf-8")
+
+
+ROUTES = {
+    ("GET", "/api/admin/users"): ApiHandler.admin_users_get,
+    ("POST", "/api/admin/users"): ApiHandler.admin_users_post,
+    ("DELETE", "/api/admin/users"): ApiHandler.admin_users_delete,
+    ("GET", "/api/admin/users/progress"): ApiHandler.admin_progress_get,
+    ("GET", "/api/admin/signup-toggle"): ApiHandler.signup_get,
+    ("POST", "/api/admin/signup-toggle"): ApiHandler.signup_post,
+    ("GET", "/api/statistics"): ApiHandler.statistics_get,
+    ("POST", "/api/statistics"): ApiHandler.statistics_post,
+    ("PUT", "/api/statistics"): ApiHandler.statistics_put,
+    ("DELETE", "/api/statistics"): ApiHandler.statistics_delete,
+    ("GET", "/api/admin/statistics/live"): ApiHandler.live_get,
+    ("POST", "/api/auth/login"): ApiHandler.login_post,
+    ("POST", "/api/answer"): ApiHandler.answer_post,
+    ("GET", "/api/progress"): ApiHandler.progress_get,
+    ("POST", "/api/progress"): ApiHandler.progress_post,
+    ("DELETE", "/api/progress"): ApiHandler.progress_delete,
+    ("GET", "/metrics"): ApiHandler.metrics_get,
+}
+
+
+class ApiServer(ThreadingHTTPServer):
+    # The default backlog of 5 drops connections when a load test opens hundreds at once
+    request_queue_size = 1024
+    daemon_threads = True
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="LearnFMPA Local API Server (stand-in for the deployed API)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog=f"""
+Examples:
+  python dev_server.py --users 10000
+  python dev_server.py --users 500 --seed 7 --latency 40 --verbose
+  python dev_server.py --store redis --redis-url redis://localhost:6379/15 --reseed
+
+Then point any admin script at it:
+  API_URL=http://127.0.0.1:{DEFAULT_PORT} python manage_users.py list
+  python manage_statistics.py --url http://127.0.0.1:{DEFAULT_PORT} summary
+""",
+    )
+    parser.add_argument("--host", default="127.0.0.1", help="Bind address (default: 127.0.0.1)")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help=f"Port (default: {DEFAULT_PORT})")
+    parser.add_argument("--store", choices=["memory", "redis"], default="memory", help="Backing store (default: memory)")
+    parser.add_argument("--redis-url", default="redis://localhost:6379/15", help="Local Redis for --store redis (default: db 15)")
+    parser.add_argument("--reseed", action="store_true", help="With --store redis, overwrite existing data with fresh fixtures")
+    parser.add_argument("--users", type=int, default=10000, help="Seeded users (default: 10000)")
+    parser.add_argument("--progress-answers", type=int, default=120, help="Mean answers per module in a paid user's progress (default: 120)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED, help=f"Fixture seed (default: {DEFAULT_SEED})")
+    parser.add_argument("--secret", default=DEFAULT_ADMIN_SECRET, help="Admin secret to accept (default: $ADMIN_SECRET)")
+    parser.add_argument("--latency", type=float, default=0.0, help="Milliseconds added to every response")
+    parser.add_argument("--verbose", action="store_true", help="Log every request with its handling time")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.start(args)
+
+    start = time.perf_counter()
+    try:
+        if args.store == "redis":
+            store = RedisStore(args.redis_url, args.seed, args.users, args.progress_answers, args.reseed)
+        else:
+            store = MemoryStore(args.seed, args.users, args.progress_answers)
+    except Exception as e:
+        print(f"\n✗ Cannot prepare the {args.store} store: {e}\n")
+        sys.exit(1)
+
+    users, _, version = store.users_snapshot()
+    ApiHandler.store = store
+    ApiHandler.admin_secret = args.secret
+    ApiHandler.latency = args.latency / 1000
+    ApiHandler.verbose = args.verbose
+
+    server = ApiServer((args.host, args.port), ApiHandler)
+    print(f"\n{'='*60}")
+    print(f"  LearnFMPA local API on http://{args.host}:{server.server_port}")
+    print(f"  Store:    {args.store}" + (f" ({args.redis_url})" if args.store == "redis" else ""))
+    print(f"  Users:    {len(users)} (version {version}), seed {args.seed}")
+    print(f"  Modules:  {len(load_modules())}, ready in {time.perf_counter() - start:.1f}s")
+    print(f"{'='*60}")
+    print(f"  Ctrl+C to stop\n")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nStopped.\n")
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,526 @@
+#!/usr/bin/env python3
+"""
+LearnFMPA Instrumentation
+
+Shows where a tool's time goes, without editing it:
+
+  --profile FILE   cProfile the whole run, dump pstats to FILE and print the
+                   top functions by cumulative time
+  --timings        per-stage and per-HTTP-call timing tables with latency
+                   histograms, plus a heartbeat on stderr every few seconds
+                   naming the function that is running (for long runs)
+  --trace FILE     Chrome trace JSON (open in chrome://tracing or Perfetto)
+  --metrics FILE   structured metrics for the run (counts, per-endpoint request
+                   latencies and error rates, every request's duration) as
+                   JSON or OpenMetrics; "-" writes them to stdout and moves
+                   the usual output to stderr
+  --push-metrics URL
+                   push the run's metrics to a Prometheus pushgateway (or the
+                   stand-in in dev_server.py), grouped by tool and command
+
+Stages are the functions of the entry script (recorded automatically) and
+any `with stage("name"):` block. HTTP calls are every request made through
+http.client, which covers admin_client and urllib.
+
+The scripts in scripts/ take the flags directly:
+
+  python manage_users.py --timings activate-batch --edu
+  python manage_statistics.py --trace stats.json export --format csv
+  python manage_users.py --metrics - --metrics-format openmetrics list | grep http_
+  python manage_users.py --push-metrics http://127.0.0.1:9091 progress-report
+
+Any other Python tool (the module pipeline scripts, module_manager.py) runs
+through this file, from the folder the tool expects to run in:
+
+  cd src/data/modules/Cardiologie
+  python ../../../../scripts/instrumentation.py --timings json_to_exam.py
+  python ../../../../scripts/instrumentation.py --profile combine.prof --trace combine.json Programmer/json_combiner.py
+
+Library use:
+  from instrumentation import count, stage
+
+  with stage("fetch users"):
+      ...
+  count("users_activated", len(rows))
+"""
+
+import argparse
+import atexit
+import contextlib
+import cProfile
+import http.client
+import io
+import json
+import os
+import pstats
+import runpy
+import sys
+import threading
+import time
+import urllib.parse
+import urllib.request
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+HISTOGRAM_EDGES_MS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000]
+HEARTBEAT_SECONDS = 5.0
+# Function spans shorter than this stay in the timing tables but not in the trace
+TRACE_MIN_MS = 0.5
+PROFILE_TOP = 15
+METRICS_PREFIX = "learnfmpa_admin"
+PUSH_JOB = "learnfmpa_admin"
+OPENMETRICS_CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Instrumentation:
+    def __init__(self, profile: Optional[str] = None, timings: bool = False, trace: Optional[str] = None,
+                 entry_files: Optional[List[str]] = None, metrics: Optional[str] = None,
+                 metrics_format: str = "json", push_url: Optional[str] = None, tool: str = "",
+                 command: Optional[str] = None):
+        self.profile_path = profile
+        self.timings = timings
+        self.trace_path = trace
+        self.metrics_path = metrics
+        self.metrics_format = metrics_format
+        self.push_url = push_url
+        self.tool = tool
+        self.command = command
+        self.entry_files = {os.path.realpath(f) for f in (entry_files or [])}
+        self.origin = time.perf_counter()
+        self.started_at = time.time()
+        self.requests: List[dict] = []
+        self.counts: Dict[str, int] = defaultdict(int)
+        self.exception: Optional[str] = None
+        self.stdout = sys.stdout
+        self.durations: Dict[str, Dict[str, List[float]]] = defaultdict(lambda: defaultdict(list))
+        self.events: List[dict] = []
+        self.lock = threading.Lock()
+        self.stacks: Dict[int, List[str]] = defaultdict(list)
+        self.profiler: Optional[cProfile.Profile] = None
+        self.finished = False
+
+    # --- recording ---
+
+    def record(self, category: str, name: str, start: float, end: float, args: Optional[dict] = None,
+               always_trace: bool = True):
+        duration_ms = (end - start) * 1000
+        with self.lock:
+            self.durations[category][name].append(duration_ms)
+            if self.trace_path and (always_trace or duration_ms >= TRACE_MIN_MS):
+                event = {
+                    "name": name, "cat": category, "ph": "X",
+                    "ts": round((start - self.origin) * 1e6, 1), "dur": round(duration_ms * 1000, 1),
+                    "pid": os.getpid(), "tid": threading.get_ident(),
+                }
+                if args:
+                    event["args"] = args
+                self.events.append(event)
+
+    @contextlib.contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        stack = self.stacks[threading.get_ident()]
+        stack.append(name)
+        try:
+            yield
+        finally:
+            stack.pop()
+            self.record("stage", name, start, time.perf_counter())
+
+    def count(self, item: str, value: int = 1):
+        with self.lock:
+            self.counts[item] += value
+
+    def record_request(self, method: str, endpoint: str, host: str, start: float, status: Optional[int] = None,
+                       error: Optional[str] = None):
+        if self.finished:
+            return
+        end = time.perf_counter()
+        self.record("http", f"{method} {endpoint}", start, end, {"host": host, "status": status or error})
+        with self.lock:
+            self.requests.append({
+                "method": method, "endpoint": endpoint, "status": status, "error": error,
+                "started_at": round(self.started_at + (start - self.origin), 3),
+                "duration_ms": round((end - start) * 1000, 2),
+            })
+
+    # --- hooks ---
+
+    def _trace_calls(self, frame, event, arg):
+        # Global tracer: only frames of the entry script get a local tracer, and
+        # only for their 'return' event (line events are switched off)
+        if event != "call" or os.path.realpath(frame.f_code.co_filename) not in self.entry_files:
+            return None
+        name = frame.f_code.co_name
+        if name.startswith("<"):
+            return None
+        start = time.perf_counter()
+        stack = self.stacks[threading.get_ident()]
+        stack.append(name)
+        frame.f_trace_lines = False
+
+        def on_return(frame, event, arg):
+            if event == "return":
+                if stack and stack[-1] == name:
+                    stack.pop()
+                self.record("stage", name, start, time.perf_counter(), always_trace=False)
+            return on_return
+
+        return on_return
+
+    def _patch_http(self):
+        instrumentation = self
+        original_request = http.client.HTTPConnection.request
+        original_getresponse = http.client.HTTPConnection.getresponse
+
+        def request(conn, method, url, *args, **kwargs):
+            conn._instrumentation_call = (method, url.split("?")[0], time.perf_counter())
+            try:
+                return original_request(conn, method, url, *args, **kwargs)
+            except (OSError, http.client.HTTPException) as e:
+                conn._instrumentation_call = None
+                instrumentation.record_request(method, url.split("?")[0], conn.host,
+                                               time.perf_counter(), error=type(e).__name__)
+                raise
+
+        def getresponse(conn, *args, **kwargs):
+            call = getattr(conn, "_instrumentation_call", None)
+            conn._instrumentation_call = None
+            try:
+                response = original_getresponse(conn, *args, **kwargs)
+            except (OSError, http.client.HTTPException) as e:
+                if call:
+                    instrumentation.record_request(call[0], call[1], conn.host, call[2], error=type(e).__name__)
+                raise
+            if call:
+                instrumentation.record_request(call[0], call[1], conn.host, call[2], status=response.status)
+            return response
+
+        http.client.HTTPConnection.request = request
+        http.client.HTTPConnection.getresponse = getresponse
+
+    def _heartbeat(self):
+        main = threading.main_thread().ident
+        while not self.finished:
+            time.sleep(HEARTBEAT_SECONDS)
+            if self.finished:
+                break
+            stack = list(self.stacks.get(main) or [])
+            calls = {name: len(values) for name, values in self.durations["stage"].items()}
+            busiest = max(calls.items(), key=lambda item: item[1], default=None)
+            where = " > ".join(stack[-3:]) if stack else "-"
+            extra = f"; {busiest[0]} called {busiest[1]:,}x" if busiest else ""
+            http_calls = sum(len(v) for v in self.durations["http"].values())
+            sys.stderr.write(f"[{time.perf_counter() - self.origin:6.0f}s] in {where}{extra}; {http_calls} HTTP call(s)\n")
+
+    def _excepthook(self, previous):
+        def hook(kind, value, tb):
+            self.exception = kind.__name__
+            previous(kind, value, tb)
+        return hook
+
+    # --- lifecycle ---
+
+    def start(self):
+        if self.metrics_path or self.push_url:
+            sys.excepthook = self._excepthook(sys.excepthook)
+            if self.metrics_path == "-":
+                # stdout carries only the metrics; tables and prompts go to stderr
+                sys.stdout = sys.stderr
+        if self.timings or self.trace_path or self.metrics_path or self.push_url:
+            self._patch_http()
+            if self.entry_files:
+                sys.settrace(self._trace_calls)
+                threading.settrace(self._trace_calls)
+        if self.timings:
+            threading.Thread(target=self._heartbeat, daemon=True).start()
+        if self.profile_path:
+            self.profiler = cProfile.Profile()
+            self.profiler.enable()
+        atexit.register(self.finish)
+
+    def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        total = time.perf_counter() - self.origin
+        sys.settrace(None)
+        threading.settrace(None)
+        if self.profiler:
+            self.profiler.disable()
+            self.profiler.dump_stats(self.profile_path)
+            out = io.StringIO()
+            pstats.Stats(self.profiler, stream=out).sort_stats("cumulative").print_stats(PROFILE_TOP)
+            sys.stderr.write(out.getvalue())
+            sys.stderr.write(f"Profile written to {self.profile_path} (python -m pstats {self.profile_path})\n")
+        if self.timings:
+            sys.stderr.write(self.report(total))
+        if self.trace_path:
+            with open(self.trace_path, "w", encoding="utf-8") as f:
+                json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+            sys.stderr.write(f"Trace written to {self.trace_path} ({len(self.events)} events)\n")
+        if self.metrics_path or self.push_url:
+            data = self.metrics(total)
+            if self.metrics_path:
+                if self.metrics_format == "openmetrics":
+                    text = render_metrics(data, openmetrics=True)
+                else:
+                    text = json.dumps(data, indent=2, ensure_ascii=False) + "\n"
+                if self.metrics_path == "-":
+                    self.stdout.write(text)
+                    self.stdout.flush()
+                else:
+                    with open(self.metrics_path, "w", encoding="utf-8") as f:
+                        f.write(text)
+                    sys.stderr.write(f"Metrics written to {self.metrics_path} ({self.metrics_format})\n")
+            if self.push_url:
+                self.push(render_metrics(data, openmetrics=False))
+
+    def metrics(self, total: float) -> dict:
+        with self.lock:
+            requests = list(self.requests)
+            stages = {name: sorted(values) for name, values in self.durations.get("stage", {}).items()}
+            counts = dict(self.counts)
+        by_endpoint: Dict[tuple, List[dict]] = defaultdict(list)
+        for request in requests:
+            by_endpoint[(request["method"], request["endpoint"])].append(request)
+        endpoints = []
+        for (method, endpoint), calls in sorted(by_endpoint.items(), key=lambda item: -len(item[1])):
+            statuses: Dict[str, int] = defaultdict(int)
+            for call in calls:
+                statuses[str(call["status"] or call["error"])] += 1
+            errors = sum(1 for call in calls if _is_error(call))
+            endpoints.append(dict(
+                method=method, endpoint=endpoint, requests=len(calls), errors=errors,
+                error_rate=round(errors / len(calls), 4), statuses=dict(statuses),
+                **_latency_summary(sorted(call["duration_ms"] for call in calls)),
+            ))
+        errors = sum(1 for request in requests if _is_error(request))
+        return {
+            "tool": self.tool,
+            "command": self.command,
+            "started_at": round(self.started_at, 3),
+            "duration_seconds": round(total, 3),
+            "failed": self.exception is not None,
+            "exception": self.exception,
+            "counts": counts,
+            "http": dict(
+                requests=len(requests), errors=errors,
+                error_rate=round(errors / len(requests), 4) if requests else 0.0,
+                **_latency_summary(sorted(request["duration_ms"] for request in requests)),
+                endpoints=endpoints,
+            ),
+            "stages": [
+                dict(name=name, calls=len(values), total_ms=round(sum(values), 2), **_latency_summary(values))
+                for name, values in sorted(stages.items(), key=lambda item: -sum(item[1]))
+            ],
+            "requests": requests,
+        }
+
+    def push(self, text: str):
+        path = f"/metrics/job/{PUSH_JOB}/tool/{urllib.parse.quote(self.tool, safe='')}"
+        if self.command:
+            path += f"/command/{urllib.parse.quote(self.command, safe='')}"
+        request = urllib.request.Request(
+            self.push_url.rstrip("/") + path, data=text.encode("utf-8"), method="PUT",
+            headers={"Content-Type": PROMETHEUS_CONTENT_TYPE},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                response.read()
+            sys.stderr.write(f"Metrics pushed to {self.push_url}{path}\n")
+        except OSError as e:
+            sys.stderr.write(f"Could not push metrics to {self.push_url}: {e}\n")
+
+    def report(self, total: float) -> str:
+        lines = [f"\n{'='*100}", f"  Timings - {total:.2f}s total", f"{'='*100}"]
+        for category, title in (("stage", "Stage"), ("http", "HTTP call")):
+            rows = self.durations.get(category)
+            if not rows:
+                continue
+            lines.append(f"  {title:<38} {'Calls':>7} {'Total':>9} {'Mean':>8} {'p50':>8} {'p95':>8} {'Max':>8}  Histogram (ms)")
+            lines.append(f"  {'-'*96}")
+            for name, values in sorted(rows.items(), key=lambda item: -sum(item[1]))[:25]:
+                ordered = sorted(values)
+                lines.append(
+                    f"  {name[:38]:<38} {len(ordered):>7} {sum(ordered) / 1000:>8.2f}s {sum(ordered) / len(ordered):>6.1f}ms "
+                    f"{_percentile(ordered, 50):>6.1f}ms {_percentile(ordered, 95):>6.1f}ms {ordered[-1]:>6.1f}ms  "
+                    f"{_sparkline(ordered)}"
+                )
+            lines.append("")
+        lines.append(f"  Histogram buckets (ms): {' '.join(str(e) for e in HISTOGRAM_EDGES_MS)} +")
+        lines.append(f"{'='*100}\n")
+        return "\n".join(lines)
+
+
+def _is_error(request: dict) -> bool:
+    return request["status"] is None or request["status"] >= 400
+
+
+def _latency_summary(ordered: List[float]) -> dict:
+    if not ordered:
+        return {}
+    return {
+        "mean_ms": round(sum(ordered) / len(ordered), 2),
+        "p50_ms": round(_percentile(ordered, 50), 2),
+        "p95_ms": round(_percentile(ordered, 95), 2),
+        "p99_ms": round(_percentile(ordered, 99), 2),
+        "max_ms": round(ordered[-1], 2),
+    }
+
+
+def _label_value(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _sample(name: str, value, **labels) -> str:
+    label_text = ",".join(f'{key}="{_label_value(v)}"' for key, v in labels.items())
+    return f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}"
+
+
+def render_metrics(data: dict, openmetrics: bool = True) -> str:
+    """Render metrics() output as OpenMetrics, or as Prometheus text (for pushgateways)."""
+    lines = []
+
+    def family(name: str, kind: str, help_text: str):
+        # OpenMetrics names the family without the _total/_info suffix its samples carry
+        if not openmetrics and kind == "counter":
+            name += "_total"
+        elif not openmetrics and kind == "info":
+            name, kind = name + "_info", "gauge"
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+
+    run = f"{METRICS_PREFIX}_run"
+    family(run, "info", "Tool and command of the run")
+    lines.append(_sample(f"{run}_info", 1, tool=data["tool"], command=data["command"] or ""))
+    family(f"{run}_start_timestamp_seconds", "gauge", "Start of the run")
+    lines.append(_sample(f"{run}_start_timestamp_seconds", data["started_at"]))
+    family(f"{run}_duration_seconds", "gauge", "Wall time of the run")
+    lines.append(_sample(f"{run}_duration_seconds", data["duration_seconds"]))
+    family(f"{run}_failed", "gauge", "1 if the run ended with an uncaught exception")
+    lines.append(_sample(f"{run}_failed", int(data["failed"])))
+
+    if data["counts"]:
+        family(f"{METRICS_PREFIX}_items", "counter", "Items processed by the command")
+        for item, value in sorted(data["counts"].items()):
+            lines.append(_sample(f"{METRICS_PREFIX}_items_total", value, item=item))
+
+    http = f"{METRICS_PREFIX}_http_request"
+    if data["requests"]:
+        family(f"{http}s", "counter", "HTTP requests by endpoint and status")
+        for endpoint in data["http"]["endpoints"]:
+            for status, value in sorted(endpoint["statuses"].items()):
+                lines.append(_sample(f"{http}s_total", value, method=endpoint["method"],
+                                     endpoint=endpoint["endpoint"], status=status))
+        family(f"{http}_errors", "counter", "HTTP requests that failed to connect or returned 4xx/5xx")
+        for endpoint in data["http"]["endpoints"]:
+            lines.append(_sample(f"{http}_errors_total", endpoint["errors"], method=endpoint["method"],
+                                 endpoint=endpoint["endpoint"]))
+        family(f"{http}_duration_seconds", "histogram", "HTTP request duration")
+        durations: Dict[tuple, List[float]] = defaultdict(list)
+        for request in data["requests"]:
+            durations[(request["method"], request["endpoint"])].append(request["duration_ms"])
+        for (method, endpoint), values in durations.items():
+            for edge in HISTOGRAM_EDGES_MS:
+                lines.append(_sample(f"{http}_duration_seconds_bucket", sum(1 for v in values if v <= edge),
+                                     method=method, endpoint=endpoint, le=edge / 1000))
+            lines.append(_sample(f"{http}_duration_seconds_bucket", len(values), method=method, endpoint=endpoint, le="+Inf"))
+            lines.append(_sample(f"{http}_duration_seconds_count", len(values), method=method, endpoint=endpoint))
+            lines.append(_sample(f"{http}_duration_seconds_sum", round(sum(values) / 1000, 6), method=method, endpoint=endpoint))
+
+    if data["stages"]:
+        stage_name = f"{METRICS_PREFIX}_stage_duration_seconds"
+        family(stage_name, "summary", "Time spent per stage (function of the tool or stage() block)")
+        for entry in data["stages"]:
+            lines.append(_sample(f"{stage_name}_count", entry["calls"], stage=entry["name"]))
+            lines.append(_sample(f"{stage_name}_sum", round(entry["total_ms"] / 1000, 6), stage=entry["name"]))
+
+    if openmetrics:
+        lines.append("# EOF")
+    return "\n".join(lines) + "\n"
+
+
+def _percentile(ordered: List[float], p: float) -> float:
+    return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+
+def _sparkline(ordered: List[float]) -> str:
+    counts = [0] * (len(HISTOGRAM_EDGES_MS) + 1)
+    for value in ordered:
+        index = next((i for i, edge in enumerate(HISTOGRAM_EDGES_MS) if value < edge), len(HISTOGRAM_EDGES_MS))
+        counts[index] += 1
+    peak = max(counts)
+    return "".join(" ▁▂▃▄▅▆▇█"[min(8, -(-8 * c // peak))] if c else "·" for c in counts)
+
+
+_active: Optional[Instrumentation] = None
+
+
+def stage(name: str):
+    """Time a block as a stage; does nothing unless instrumentation is on."""
+    if _active is None:
+        return contextlib.nullcontext()
+    return _active.stage(name)
+
+
+def count(item: str, value: int = 1):
+    """Add to a named count in the metrics output; does nothing unless instrumentation is on."""
+    if _active is not None:
+        _active.count(item, value)
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    group = parser.add_argument_group("instrumentation")
+    group.add_argument("--profile", metavar="FILE", help="cProfile the run and dump pstats to FILE")
+    group.add_argument("--timings", action="store_true", help="Print per-stage and per-HTTP-call timings")
+    group.add_argument("--trace", metavar="FILE", help="Write a Chrome trace JSON to FILE")
+    group.add_argument("--metrics", metavar="FILE", help='Write structured run metrics to FILE ("-" for stdout)')
+    group.add_argument("--metrics-format", choices=["json", "openmetrics"], default="json",
+                       help="Format for --metrics (default: json)")
+    group.add_argument("--push-metrics", metavar="URL", help="Push run metrics to a Prometheus pushgateway at URL")
+
+
+def start(args: argparse.Namespace, entry_file: Optional[str] = None) -> Optional[Instrumentation]:
+    """Start instrumentation if any of the flags from add_arguments() is set."""
+    global _active
+    if not (args.profile or args.timings or args.trace or args.metrics or args.push_metrics):
+        return None
+    entry_file = entry_file or getattr(sys.modules.get("__main__"), "__file__", None)
+    tool = os.path.splitext(os.path.basename(entry_file))[0] if entry_file else "python"
+    _active = Instrumentation(args.profile, args.timings, args.trace, [entry_file] if entry_file else [],
+                              args.metrics, args.metrics_format, args.push_metrics, tool,
+                              getattr(args, "command", None))
+    _active.start()
+    return _active
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run a Python tool with LearnFMPA instrumentation",
+        usage="python instrumentation.py [--profile FILE] [--timings] [--trace FILE] [--metrics FILE] "
+              "[--push-metrics URL] SCRIPT [ARGS...]",
+    )
+    add_arguments(parser)
+    parser.add_argument("script", help="Python script to run")
+    parser.add_argument("script_args", nargs=argparse.REMAINDER, help="Arguments for the script")
+    args = parser.parse_args()
+
+    script = os.path.abspath(args.script)
+    if not os.path.isfile(script):
+        print(f"\n✗ Script not found: {args.script}\n")
+        sys.exit(1)
+    if not (args.profile or args.timings or args.trace or args.metrics or args.push_metrics):
+        args.timings = True
+
+    # Run the tool as it would run on its own: from its argv, with its folder importable
+    sys.argv = [script] + args.script_args
+    sys.path.insert(0, os.path.dirname(script))
+    start(args, script)
+    with stage(os.path.basename(script)):
+        runpy.run_path(script, run_name="__main__")
+
+
+if __name__ == "__main__":
+    main()
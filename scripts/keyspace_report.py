@@ -0,0 +1,635 @@
+#!/usr/bin/env python3
+"""
+LearnFMPA Keyspace Report
+
+Shows how big the app's Redis values are, how fast they grow and which ones
+are hot, from a live Redis (ideally a replica) or an RDB dump:
+
+  sizes        every key is SCANned and grouped by pattern (users, user:{id},
+               stats:module_{N}, progress:{id}, session:{id}, ...); a sample
+               of each group is measured with MEMORY USAGE, STRLEN/HLEN and TTL
+  hotness      OBJECT FREQ under an LFU maxmemory policy, else OBJECT IDLETIME
+               (for a dump, the server is started with allkeys-lfu so the LFU
+               counters saved in the dump are kept)
+  rewrites     the app serializes whole JSON values: users (blob layout),
+               stats:module_N (blob layout) and progress:{id} are rewritten on
+               every answer batch. Write rates come from the stats:events
+               stream (one entry per paid answer batch and module) and, with
+               --watch, from users:version, which every users write increments
+  growth       user sign-ups over the last 30 days, bytes per answered question
+               in progress values and per question in stats blobs, projected
+               over --days; with --baseline, also the growth observed since an
+               earlier --json report
+  advice       which blobs to split (migrate_users.py, migrate_stats.py,
+               progress per module), sessions without a TTL, leftover backups
+
+Usage:
+  python keyspace_report.py --redis-url redis://replica:6379
+  python keyspace_report.py --rdb dump.rdb --json keyspace_2026-10.json
+  python keyspace_report.py --watch 60 --sample-rate 0.2
+  python keyspace_report.py --baseline keyspace_2026-09.json --days 180
+
+Requires redis-py (pip install redis); redis-server for --rdb.
+"""
+
+import os
+import re
+import sys
+import json
+import time
+import random
+import argparse
+from collections import Counter, defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional
+
+import redis
+
+from module_registry import load_modules, load_questions
+from rdb_loader import open_rdb
+import instrumentation
+
+DEFAULT_REDIS_URL = os.environ.get("REDIS_URL") or os.environ.get("KV_REST_API_URL") or "redis://localhost:6379"
+SCAN_BATCH = 1000
+# Every key of a group is measured up to this many, then a --sample-rate fraction
+SAMPLE_MIN = 200
+PROGRESS_SAMPLE = 500
+EVENTS_KEY = "stats:events"
+SIGNUP_WINDOW_DAYS = 30
+# A JSON value above this is worth splitting: it is read and rewritten whole
+SPLIT_BYTES = 128 * 1024
+# Rewriting more than this per second for one key group is worth fixing first
+HOT_REWRITE_BYTES = 1024 * 1024
+
+KEY_GROUPS = [(re.compile(f"^{pattern}$"), group) for pattern, group in [
+    (r"user:[^:]+", "user:{id}"),
+    (r"users:status:.+", "users:status:{status}"),
+    (r"stats:module_\d+", "stats:module_{N}"),
+    (r"stats:module_\d+:q:.+", "stats:module_{N}:q:{id}"),
+    (r"stats:module_\d+:trend:q:.+", "stats:module_{N}:trend:q:{id}"),
+    (r"stats:module_\d+:([a-z_]+)", r"stats:module_{N}:\1"),
+    (r"stats:limit_hits:.+", "stats:limit_hits:{day}"),
+    (r"progress:.+", "progress:{id}"),
+    (r"session:.+", "session:{id}"),
+]]
+LENGTH_COMMANDS = {"string": "strlen", "hash": "hlen", "set": "scard", "zset": "zcard", "list": "llen", "stream": "xlen"}
+
+
+def key_group(key: str) -> str:
+    for regex, group in KEY_GROUPS:
+        match = regex.match(key)
+        if match:
+            return match.expand(group)
+    return re.sub(r"\d+", "{n}", key)
+
+
+def _percentile(ordered: List[float], p: float) -> float:
+    if not ordered:
+        return 0
+    return ordered[min(len(ordered) - 1, max(0, int(round(p / 100 * len(ordered))) - 1))]
+
+
+def _size(n: Optional[float]) -> str:
+    if n is None:
+        return "-"
+    for unit in ("B", "KB", "MB"):
+        if abs(n) < 1024:
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+    return f"{n:.2f}GB"
+
+
+def _parse_time(value) -> Optional[datetime]:
+    try:
+        return datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return None
+
+
+# ==================== Sampling ====================
+
+def hotness_command(client) -> Optional[str]:
+    """'freq' under an LFU maxmemory policy, else 'idletime' (Redis refuses the other one)."""
+    key = client.randomkey()
+    if key is None:
+        return None
+    for subcommand in ("freq", "idletime"):
+        try:
+            client.object(subcommand, key)
+            return subcommand
+        except redis.ResponseError:
+            continue
+    return None
+
+
+def _measure(client, batch: List[tuple], hotness: Optional[str]) -> List[dict]:
+    if not batch:
+        return []
+    pipe = client.pipeline(transaction=False)
+    for key, _ in batch:
+        pipe.type(key)
+        pipe.memory_usage(key)
+        pipe.ttl(key)
+        if hotness:
+            pipe.object(hotness, key)
+    per_key = 4 if hotness else 3
+    results = pipe.execute(raise_on_error=False)
+
+    records = []
+    for i, (key, group) in enumerate(batch):
+        kind, memory, ttl, *heat = results[i * per_key:(i + 1) * per_key]
+        # Deleted between SCAN and now
+        if not isinstance(kind, str) or kind == "none":
+            continue
+        records.append({
+            "key": key, "group": group, "type": kind,
+            "bytes": memory if isinstance(memory, int) else 0,
+            "ttl": ttl if isinstance(ttl, int) else -1,
+            "heat": heat[0] if heat and isinstance(heat[0], int) else None,
+            "length": None,
+        })
+
+    sized = [r for r in records if r["type"] in LENGTH_COMMANDS]
+    pipe = client.pipeline(transaction=False)
+    for record in sized:
+        getattr(pipe, LENGTH_COMMANDS[record["type"]])(record["key"])
+    for record, length in zip(sized, pipe.execute(raise_on_error=False)):
+        record["length"] = length if isinstance(length, int) else None
+    return records
+
+
+def scan_keyspace(client, sample_rate: float, seed: int) -> dict:
+    rng = random.Random(seed)
+    hotness = hotness_command(client)
+    counts: Dict[str, int] = defaultdict(int)
+    measured: List[dict] = []
+    batch: List[tuple] = []
+    for key in client.scan_iter(count=SCAN_BATCH):
+        group = key_group(key)
+        counts[group] += 1
+        if counts[group] <= SAMPLE_MIN or rng.random() < sample_rate:
+            batch.append((key, group))
+        if len(batch) >= SCAN_BATCH:
+            measured.extend(_measure(client, batch, hotness))
+            batch = []
+    measured.extend(_measure(client, batch, hotness))
+    return {"hotness": hotness, "counts": dict(counts), "measured": measured}
+
+
+def summarize_groups(scan: dict) -> List[dict]:
+    by_group: Dict[str, List[dict]] = defaultdict(list)
+    for record in scan["measured"]:
+        by_group[record["group"]].append(record)
+    rows = []
+    for group, count in scan["counts"].items():
+        records = by_group.get(group, [])
+        sizes = sorted(r["bytes"] for r in records)
+        lengths = [r["length"] for r in records if r["length"] is not None]
+        scale = count / len(records) if records else 0
+        rows.append({
+            "group": group,
+            "keys": count,
+            "measured": len(records),
+            "type": Counter(r["type"] for r in records).most_common(1)[0][0] if records else "?",
+            "total_bytes": round(sum(sizes) * scale),
+            "mean_bytes": round(sum(sizes) / len(sizes)) if sizes else 0,
+            "p95_bytes": _percentile(sizes, 95),
+            "max_bytes": sizes[-1] if sizes else 0,
+            "mean_length": round(sum(lengths) / len(lengths)) if lengths else None,
+            "no_ttl": round(sum(1 for r in records if r["ttl"] == -1) * scale),
+        })
+    rows.sort(key=lambda r: -r["total_bytes"])
+    return rows
+
+
+# ==================== Content ====================
+
+def analyze_users(client) -> dict:
+    layout = client.get("users:layout") or "blob"
+    blob_bytes = None
+    if layout == "hash":
+        ids = list(client.smembers("users:ids"))
+        pipe = client.pipeline(transaction=False)
+        for user_id in ids:
+            pipe.hget(f"user:{user_id}", "created_at")
+        created = [json.loads(value) for value in pipe.execute() if value]
+    else:
+        raw = client.get("users")
+        users = json.loads(raw).get("users", {}) if raw else {}
+        blob_bytes = len(raw.encode("utf-8")) if raw else 0
+        created = [user.get("created_at") for user in users.values()]
+        ids = list(users)
+
+    since = datetime.now(timezone.utc) - timedelta(days=SIGNUP_WINDOW_DAYS)
+    dates = [d if d.tzinfo else d.replace(tzinfo=timezone.utc) for d in map(_parse_time, created) if d]
+    recent = sum(1 for d in dates if d >= since)
+    return {
+        "layout": layout,
+        "users": len(ids),
+        "new_per_day": round(recent / SIGNUP_WINDOW_DAYS, 2),
+        "blob_bytes": blob_bytes,
+        "bytes_per_user": round(blob_bytes / len(ids)) if blob_bytes and ids else None,
+    }
+
+
+def analyze_progress(client, scan: dict) -> dict:
+    keys = [r["key"] for r in scan["measured"] if r["group"] == "progress:{id}" and r["type"] == "string"]
+    keys = keys[:PROGRESS_SAMPLE]
+    total_bytes = answered = 0
+    for key, raw in zip(keys, client.mget(keys) if keys else []):
+        if not raw:
+            continue
+        try:
+            progress = json.loads(raw)
+        except ValueError:
+            continue
+        total_bytes += len(raw.encode("utf-8"))
+        answered += sum(len(m) for m in progress.values() if isinstance(m, dict))
+    registry_questions = 0
+    for module in load_modules():
+        try:
+            registry_questions += len(load_questions(module["id"]))
+        except (KeyError, OSError, ValueError):
+            continue
+    bytes_per_answer = total_bytes / answered if answered else None
+    return {
+        "sampled": len(keys),
+        "bytes_per_answer": round(bytes_per_answer, 1) if bytes_per_answer else None,
+        "registry_questions": registry_questions,
+        "full_bytes": round(bytes_per_answer * registry_questions) if bytes_per_answer else None,
+    }
+
+
+def analyze_stats(client) -> List[dict]:
+    modules = []
+    for module in load_modules():
+        module_id = module["id"]
+        base = f"stats:module_{module_id}"
+        layout = client.get(f"{base}:layout") or "blob"
+        try:
+            questions = len(load_questions(module_id))
+        except (KeyError, OSError, ValueError):
+            questions = None
+        entry = {"module_id": module_id, "title": module.get("title", ""), "layout": layout,
+                 "questions": questions, "bytes": None, "with_stats": None, "full_bytes": None}
+        if layout != "hash":
+            raw = client.get(base)
+            if raw:
+                stats = json.loads(raw)
+                entry["bytes"] = len(raw.encode("utf-8"))
+                entry["with_stats"] = len(stats)
+                if stats and questions:
+                    entry["full_bytes"] = round(entry["bytes"] / len(stats) * max(questions, len(stats)))
+        else:
+            entry["with_stats"] = client.scard(f"{base}:questions")
+        modules.append(entry)
+    return modules
+
+
+# ==================== Write rates ====================
+
+def _next_stream_id(stream_id: str) -> str:
+    ms, _, seq = stream_id.partition("-")
+    return f"{ms}-{int(seq or 0) + 1}"
+
+
+def _count_events(entries: List[tuple]) -> dict:
+    per_module: Dict[int, int] = defaultdict(int)
+    limits = 0
+    for _, fields in entries:
+        if fields.get("type") == "limit":
+            limits += 1
+        else:
+            try:
+                per_module[int(fields.get("module", 0))] += 1
+            except ValueError:
+                continue
+    return {"per_module": per_module, "limits": limits}
+
+
+def stream_rates(client) -> Optional[dict]:
+    """Answer batches per second per module over the span the stats:events stream still holds."""
+    try:
+        entries = client.xrange(EVENTS_KEY)
+    except redis.ResponseError:
+        return None
+    if len(entries) < 2:
+        return None
+    span = (int(entries[-1][0].split("-")[0]) - int(entries[0][0].split("-")[0])) / 1000
+    if span <= 0:
+        return None
+    counted = _count_events(entries)
+    return {
+        "source": f"{EVENTS_KEY} ({len(entries)} entries over {span / 3600:.1f}h)",
+        "seconds": span,
+        "users_writes_per_second": None,
+        "batches_per_second": {m: n / span for m, n in counted["per_module"].items()},
+        "limit_hits_per_second": counted["limits"] / span,
+    }
+
+
+def watch_rates(client, seconds: float) -> dict:
+    version_before = int(client.get("users:version") or 0)
+    latest = client.xrevrange(EVENTS_KEY, count=1) if client.exists(EVENTS_KEY) else []
+    last_id = latest[0][0] if latest else "0-0"
+    start = time.perf_counter()
+    print(f"  Watching writes for {seconds:.0f}s...")
+    time.sleep(seconds)
+    elapsed = time.perf_counter() - start
+    version_after = int(client.get("users:version") or 0)
+    entries = client.xrange(EVENTS_KEY, min=_next_stream_id(last_id)) if client.exists(EVENTS_KEY) else []
+    counted = _count_events(entries)
+    return {
+        "source": f"--watch {seconds:.0f}s (users:version, {EVENTS_KEY})",
+        "seconds": elapsed,
+        "users_writes_per_second": (version_after - version_before) / elapsed,
+        "batches_per_second": {m: n / elapsed for m, n in counted["per_module"].items()},
+        "limit_hits_per_second": counted["limits"] / elapsed,
+    }
+
+
+def rewrite_costs(groups: List[dict], users: dict, stats: List[dict], rates: Optional[dict]) -> List[dict]:
+    """Bytes serialized per second for each value the app rewrites whole."""
+    if not rates:
+        return []
+    by_group = {g["group"]: g for g in groups}
+    batches = sum(rates["batches_per_second"].values())
+    # Every answer request writes its user; without --watch, paid batches are a lower bound
+    users_writes = rates["users_writes_per_second"]
+    users_writes = users_writes if users_writes is not None else batches
+    costs = []
+    if users["layout"] != "hash" and users["blob_bytes"]:
+        costs.append({"key": "users", "bytes": users["blob_bytes"], "writes_per_second": users_writes})
+    elif "user:{id}" in by_group:
+        costs.append({"key": "user:{id}", "bytes": by_group["user:{id}"]["mean_bytes"], "writes_per_second": users_writes})
+    for module in stats:
+        if module["layout"] != "hash" and module["bytes"]:
+            costs.append({"key": f"stats:module_{module['module_id']}", "bytes": module["bytes"],
+                          "writes_per_second": rates["batches_per_second"].get(module["module_id"], 0.0)})
+    progress = by_group.get("progress:{id}")
+    if progress and progress["mean_length"]:
+        costs.append({"key": "progress:{id}", "bytes": progress["mean_length"], "writes_per_second": batches})
+    for cost in costs:
+        cost["bytes_per_second"] = cost["bytes"] * cost["writes_per_second"]
+    costs.sort(key=lambda c: -c["bytes_per_second"])
+    return costs
+
+
+# ==================== Growth and advice ====================
+
+def project_growth(groups: List[dict], users: dict, progress: dict, stats: List[dict], days: int,
+                   baseline: Optional[dict]) -> List[dict]:
+    base_groups = {}
+    base_days = None
+    if baseline:
+        base_groups = {g["group"]: g for g in baseline.get("groups", [])}
+        elapsed = time.time() - baseline.get("generated_at", time.time())
+        base_days = elapsed / 86400 if elapsed > 0 else None
+
+    growth = (users["users"] + days * users["new_per_day"]) / users["users"] if users["users"] else 1.0
+    per_user = {"users", "user:{id}", "session:{id}", "progress:{id}", "users:by_email", "users:ids"}
+    rows = []
+    for group in groups:
+        row = {"group": group["group"], "now_bytes": group["total_bytes"], "projected_bytes": None,
+               "observed_per_day": None, "basis": ""}
+        if group["group"] in per_user:
+            row["projected_bytes"] = round(group["total_bytes"] * growth)
+            row["basis"] = f"+{users['new_per_day']:.1f} users/day"
+        previous = base_groups.get(group["group"])
+        if previous and base_days and base_days >= 1:
+            row["observed_per_day"] = round((group["total_bytes"] - previous["total_bytes"]) / base_days)
+            if row["projected_bytes"] is None:
+                row["projected_bytes"] = round(group["total_bytes"] + row["observed_per_day"] * days)
+                row["basis"] = f"observed over {base_days:.0f}d"
+        if row["projected_bytes"] is not None:
+            rows.append(row)
+
+    if progress["full_bytes"]:
+        rows.append({"group": "progress:{id} (one student, every question)", "now_bytes": None,
+                     "projected_bytes": progress["full_bytes"], "observed_per_day": None,
+                     "basis": f"{progress['bytes_per_answer']:.0f}B x {progress['registry_questions']} questions"})
+    for module in stats:
+        if module["full_bytes"] and module["with_stats"] < (module["questions"] or 0):
+            rows.append({"group": f"stats:module_{module['module_id']} (every question answered)",
+                         "now_bytes": module["bytes"], "projected_bytes": module["full_bytes"],
+                         "observed_per_day": None,
+                         "basis": f"{module['with_stats']}/{module['questions']} questions have stats"})
+    return rows
+
+
+def recommendations(groups: List[dict], users: dict, progress: dict, stats: List[dict], costs: List[dict],
+                    days: int) -> List[dict]:
+    advice = []
+    cost_by_key = {c["key"]: c for c in costs}
+    by_group = {g["group"]: g for g in groups}
+
+    if users["layout"] != "hash" and users["blob_bytes"]:
+        projected = (users["bytes_per_user"] or 0) * (users["users"] + days * users["new_per_day"])
+        cost = cost_by_key.get("users", {})
+        if users["blob_bytes"] > SPLIT_BYTES or projected > SPLIT_BYTES or cost.get("bytes_per_second", 0) > HOT_REWRITE_BYTES:
+            advice.append({
+                "key": "users",
+                "reason": f"{_size(users['blob_bytes'])} for {users['users']} users ({_size(projected)} in {days}d), "
+                          f"rewritten ~{cost.get('writes_per_second', 0):.1f}x/s = {_size(cost.get('bytes_per_second', 0))}/s",
+                "action": "split into one hash per user: python migrate_users.py migrate",
+            })
+
+    for module in stats:
+        if module["layout"] == "hash" or not module["bytes"]:
+            continue
+        cost = cost_by_key.get(f"stats:module_{module['module_id']}", {})
+        if max(module["bytes"], module["full_bytes"] or 0) > SPLIT_BYTES or cost.get("bytes_per_second", 0) > HOT_REWRITE_BYTES:
+            advice.append({
+                "key": f"stats:module_{module['module_id']}",
+                "reason": f"{_size(module['bytes'])} now, {_size(module['full_bytes'])} with every question answered, "
+                          f"rewritten ~{cost.get('writes_per_second', 0):.2f}x/s",
+                "action": "split into counter hashes per question: python migrate_stats.py migrate",
+            })
+
+    group = by_group.get("progress:{id}")
+    if group and (group["p95_bytes"] > SPLIT_BYTES or (progress["full_bytes"] or 0) > SPLIT_BYTES):
+        advice.append({
+            "key": "progress:{id}",
+            "reason": f"p95 {_size(group['p95_bytes'])}, max {_size(group['max_bytes'])}; a student who answers "
+                      f"everything reaches {_size(progress['full_bytes'])}, rewritten on every answer batch",
+            "action": "store progress per module (progress:{id}:module_N) or as a hash of question -> answer",
+        })
+
+    group = by_group.get("session:{id}")
+    if group and group["no_ttl"]:
+        advice.append({
+            "key": "session:{id}",
+            "reason": f"{group['no_ttl']} of {group['keys']} sessions never expire ({_size(group['total_bytes'])})",
+            "action": "set an expiry when the session is created (SET ... EX) and refresh it on use",
+        })
+
+    for key, command in (("users:backup", "migrate_users.py cleanup"), ("stats:module_{N}:backup", "migrate_stats.py cleanup")):
+        group = by_group.get(key)
+        if group:
+            advice.append({
+                "key": key,
+                "reason": f"{group['keys']} pre-migration backup(s), {_size(group['total_bytes'])}",
+                "action": f"once the migration is verified: python {command}",
+            })
+    return advice
+
+
+def hot_keys(scan: dict, top: int) -> List[dict]:
+    records = [r for r in scan["measured"] if r["heat"] is not None]
+    if scan["hotness"] == "freq":
+        records.sort(key=lambda r: (-r["heat"], -r["bytes"]))
+    else:
+        records.sort(key=lambda r: (r["heat"], -r["bytes"]))
+    return records[:top]
+
+
+# ==================== Output ====================
+
+def print_report(report: dict, top: int):
+    source = report["source"]
+    print(f"\n{'='*100}")
+    print(f"  Keyspace Report - {source} ({report['keys']:,} keys, {report['scan_seconds']:.1f}s)")
+    print(f"{'='*100}")
+    print(f"  {'Group':<34} {'Keys':>8} {'Sampled':>8} {'Type':<7} {'Total':>9} {'Mean':>8} {'p95':>8} {'Max':>8} {'No TTL':>7}")
+    print(f"  {'-'*96}")
+    for g in report["groups"][:40]:
+        print(f"  {g['group'][:34]:<34} {g['keys']:>8,} {g['measured']:>8,} {g['type']:<7} {_size(g['total_bytes']):>9} "
+              f"{_size(g['mean_bytes']):>8} {_size(g['p95_bytes']):>8} {_size(g['max_bytes']):>8} {g['no_ttl']:>7,}")
+    if len(report["groups"]) > 40:
+        print(f"  ... {len(report['groups']) - 40} more group(s) in --json")
+    print(f"  Sizes are MEMORY USAGE (value plus Redis overhead); totals extrapolate the sampled keys.")
+
+    users = report["users"]
+    print(f"\n  Users: {users['users']:,} ({users['layout']} layout), +{users['new_per_day']:.1f}/day over the last "
+          f"{SIGNUP_WINDOW_DAYS} days" + (f", {_size(users['blob_bytes'])} blob" if users["blob_bytes"] else ""))
+
+    rates = report["write_rates"]
+    print(f"\n  Rewrite cost" + (f" (rates from {rates['source']})" if rates else ""))
+    print(f"  {'-'*96}")
+    if not report["rewrites"]:
+        print(f"  No write rates: {EVENTS_KEY} is empty or missing (try --watch 60)")
+    for cost in report["rewrites"][:top]:
+        print(f"  {cost['key']:<34} {_size(cost['bytes']):>9} x {cost['writes_per_second']:>7.2f}/s = "
+              f"{_size(cost['bytes_per_second']):>9}/s serialized")
+
+    heat_label = {"freq": "LFU frequency", "idletime": "idle seconds"}.get(report["hotness"])
+    if report["hot_keys"]:
+        print(f"\n  Hot key candidates")
+        print(f"  {'Key':<60} {'Type':<7} {'Size':>9} {heat_label:>16}")
+        print(f"  {'-'*96}")
+        for record in report["hot_keys"]:
+            print(f"  {record['key'][:60]:<60} {record['type']:<7} {_size(record['bytes']):>9} {record['heat']:>16}")
+    elif not report["hotness"]:
+        print(f"\n  Hot keys: OBJECT FREQ and OBJECT IDLETIME are both unavailable on this server")
+
+    print(f"\n  Growth over {report['days']} days")
+    print(f"  {'-'*96}")
+    for row in report["projections"]:
+        observed = f"{_size(row['observed_per_day'])}/day" if row["observed_per_day"] is not None else ""
+        print(f"  {row['group'][:48]:<48} {_size(row['now_bytes']):>9} -> {_size(row['projected_bytes']):>9}  "
+              f"{observed:>12}  {row['basis']}")
+
+    print(f"\n  Recommendations")
+    print(f"  {'-'*96}")
+    if not report["recommendations"]:
+        print(f"  Nothing to split: every value is under {_size(SPLIT_BYTES)} and no group rewrites "
+              f"more than {_size(HOT_REWRITE_BYTES)}/s")
+    for item in report["recommendations"]:
+        print(f"  • {item['key']}: {item['reason']}")
+        print(f"      → {item['action']}")
+    print(f"{'='*100}\n")
+
+
+def build_report(client, source: str, args) -> dict:
+    start = time.perf_counter()
+    print(f"  Scanning {source}...")
+    scan = scan_keyspace(client, args.sample_rate, args.seed)
+    scan_seconds = time.perf_counter() - start
+    instrumentation.count("keys_scanned", sum(scan["counts"].values()))
+    instrumentation.count("keys_measured", len(scan["measured"]))
+
+    groups = summarize_groups(scan)
+    users = analyze_users(client)
+    progress = analyze_progress(client, scan)
+    stats = analyze_stats(client)
+    rates = watch_rates(client, args.watch) if args.watch else stream_rates(client)
+    costs = rewrite_costs(groups, users, stats, rates)
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+    return {
+        "generated_at": time.time(),
+        "source": source,
+        "keys": sum(scan["counts"].values()),
+        "scan_seconds": scan_seconds,
+        "hotness": scan["hotness"],
+        "days": args.days,
+        "groups": groups,
+        "users": users,
+        "progress": progress,
+        "stats": stats,
+        "write_rates": rates,
+        "rewrites": costs,
+        "hot_keys": hot_keys(scan, args.top),
+        "projections": project_growth(groups, users, progress, stats, args.days, baseline),
+        "recommendations": recommendations(groups, users, progress, stats, costs, args.days),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="LearnFMPA Keyspace Report (value sizes, growth and hot keys in Redis)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python keyspace_report.py --redis-url redis://replica:6379
+  python keyspace_report.py --rdb dump.rdb --json keyspace_2026-10.json
+  python keyspace_report.py --watch 60 --sample-rate 0.2
+  python keyspace_report.py --baseline keyspace_2026-09.json --days 180
+""",
+    )
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--redis-url", default=DEFAULT_REDIS_URL, help="Redis to SCAN (default: $REDIS_URL; prefer a replica)")
+    source.add_argument("--rdb", help="RDB dump file to read instead of a live Redis")
+    parser.add_argument("--sample-rate", type=float, default=0.1,
+                        help=f"Fraction of keys measured once a group has {SAMPLE_MIN} (default: 0.1)")
+    parser.add_argument("--seed", type=int, default=1, help="Sampling seed (default: 1)")
+    parser.add_argument("--watch", type=float, default=0, metavar="SECONDS",
+                        help="Measure write rates live for SECONDS instead of from the event stream")
+    parser.add_argument("--days", type=int, default=90, help="Projection horizon in days (default: 90)")
+    parser.add_argument("--baseline", metavar="FILE", help="Earlier --json report to measure observed growth against")
+    parser.add_argument("--top", type=int, default=15, help="Hot keys and rewrite rows to show (default: 15)")
+    parser.add_argument("--json", metavar="FILE", help="Also write the full report as JSON (usable as --baseline)")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.start(args)
+
+    if not 0 <= args.sample_rate <= 1:
+        print(f"\n✗ --sample-rate must be between 0 and 1\n")
+        sys.exit(1)
+    if args.rdb and args.watch:
+        print(f"\n✗ --watch needs a live Redis, not a dump\n")
+        sys.exit(1)
+
+    try:
+        if args.rdb:
+            with open_rdb(args.rdb, ["--maxmemory-policy", "allkeys-lfu"]) as client:
+                report = build_report(client, os.path.basename(args.rdb), args)
+        else:
+            client = redis.Redis.from_url(args.redis_url, decode_responses=True)
+            report = build_report(client, args.redis_url.split("@")[-1], args)
+    except (redis.RedisError, RuntimeError, OSError) as e:
+        print(f"\n✗ Error: {e}\n")
+        sys.exit(1)
+
+    print_report(report, args.top)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"✓ Report written to {args.json}\n")
+
+
+if __name__ == "__main__":
+    main()
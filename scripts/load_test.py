@@ -0,0 +1,541 @@
+#!/usr/bin/env python3
+"""
+LearnFMPA Load Test
+
+Simulates exam-week answer traffic: hundreds of students answering questions
+at the same time. Each virtual student logs in, loads their progress, picks a
+module and works through it from the start of a chapter, the way the app
+does it:
+
+  - answers are queued and flushed as one POST /api/answer batch every 3 s
+    (10 s for free accounts), like AuthContext
+  - progress is reloaded with GET /api/progress every --progress-every answers
+  - selected options come from the real question JSONs; a student picks the
+    correct options with a per-student probability, otherwise a plausible
+    wrong combination
+
+The run reports throughput and p50/p95/p99 latency per endpoint, then checks
+the data: statistics counters are read before and after, and every increment
+the accepted answers should have produced is compared with what the counters
+actually moved by (lost updates). Progress is checked the same way per user.
+
+Accounts are created for the run through the admin API (bulk create, with a
+paid/free mix) and deleted afterwards unless --keep-users is given. Their
+answers do land in the question statistics, so point it at a local stand-in
+(dev_server.py) or a staging deployment, not production.
+
+Usage:
+  python dev_server.py --users 1000 &
+  python load_test.py --students 300 --duration 60
+  python load_test.py --url http://localhost:3000 --students 500 --think 2 --json run.json
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import asyncio
+import argparse
+import urllib.parse
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from admin_client import get_client
+from module_registry import load_chapters, load_modules, load_questions, question_options
+import instrumentation
+
+DEFAULT_API_URL = os.environ.get("API_URL", "http://127.0.0.1:3001")
+DEFAULT_ADMIN_SECRET = os.environ.get("ADMIN_SECRET", "learnfmpa2024")
+PRODUCTION_HOSTS = {"www.learnfmpa.com", "learnfmpa.com"}
+
+FLUSH_INTERVAL = 3.0
+FREE_FLUSH_INTERVAL = 10.0
+LOGIN_CONCURRENCY = 50
+BULK_SIZE = 500
+
+
+# ==================== HTTP ====================
+
+class Connection:
+    """One keep-alive HTTP/1.1 connection, like a browser tab's."""
+
+    def __init__(self, api_url: str, timeout: float):
+        parts = urllib.parse.urlsplit(api_url)
+        self.host = parts.hostname
+        self.tls = parts.scheme == "https"
+        self.port = parts.port or (443 if self.tls else 80)
+        self.timeout = timeout
+        self.reader = self.writer = None
+
+    async def request(self, method: str, path: str, body: Optional[dict] = None,
+                      headers: Optional[Dict[str, str]] = None) -> Tuple[int, dict]:
+        for attempt in (1, 2):
+            reused = self.writer is not None
+            try:
+                if not reused:
+                    self.reader, self.writer = await asyncio.wait_for(
+                        asyncio.open_connection(self.host, self.port, ssl=self.tls or None), self.timeout)
+                return await asyncio.wait_for(self._exchange(method, path, body, headers or {}), self.timeout)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                self.close()
+                if not reused or attempt == 2:
+                    raise
+            except BaseException:
+                self.close()
+                raise
+        raise ConnectionError("unreachable")
+
+    async def _exchange(self, method, path, body, headers) -> Tuple[int, dict]:
+        payload = json.dumps(body).encode("utf-8") if body is not None else b""
+        lines = [f"{method} {path} HTTP/1.1", f"Host: {self.host}", "Connection: keep-alive",
+                 f"Content-Length: {len(payload)}"]
+        if payload:
+            lines.append("Content-Type: application/json")
+        lines += [f"{k}: {v}" for k, v in headers.items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1") + payload)
+        await self.writer.drain()
+
+        status = int((await self.reader.readuntil(b"\r\n")).split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readuntil(b"\r\n")
+            if line == b"\r\n":
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get("transfer-encoding", "").lower() == "chunked":
+            data = b""
+            while True:
+                size = int((await self.reader.readuntil(b"\r\n")).split(b";")[0], 16)
+                chunk = await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+                data += chunk[:-2]
+        else:
+            data = await self.reader.readexactly(int(response_headers.get("content-length") or 0))
+        if response_headers.get("connection", "").lower() == "close":
+            self.close()
+        try:
+            return status, json.loads(data) if data else {}
+        except ValueError:
+            return status, {"error": data[:200].decode("utf-8", errors="replace")}
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+        self.reader = self.writer = None
+
+
+class Metrics:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+
+    async def timed(self, name: str, call) -> Tuple[Optional[int], dict]:
+        start = time.perf_counter()
+        try:
+            status, body = await call
+        except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError, ValueError) as e:
+            self.latencies[name].append((time.perf_counter() - start) * 1000)
+            self.errors[name][type(e).__name__] += 1
+            return None, {}
+        self.latencies[name].append((time.perf_counter() - start) * 1000)
+        if status >= 400:
+            self.errors[name][f"HTTP {status}"] += 1
+        return status, body
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(round(p / 100 * len(sorted_values))) - 1))]
+
+
+# ==================== Answer streams ====================
+
+class ModuleStream:
+    """A module's questions as the students see them: option lists and chapter starts."""
+
+    def __init__(self, module_id: int):
+        self.module_id = module_id
+        self.questions = [question_options(q) for q in load_questions(module_id)]
+        self.chapter_starts = sorted(min(c["question_ids"]) for c in load_chapters(module_id) if c["question_ids"])
+
+    def answer(self, index: int, skill: float, rng: random.Random) -> Optional[dict]:
+        options = self.questions[index]
+        if not options:
+            return None
+        correct = [i for i, o in enumerate(options) if o["is_correct"]]
+        wrong = [i for i, o in enumerate(options) if not o["is_correct"]]
+        selected = list(correct)
+        if rng.random() > skill:
+            if len(selected) > 1 and rng.random() < 0.5:
+                selected.remove(rng.choice(selected))
+            elif wrong:
+                selected = ([] if rng.random() < 0.6 else selected[:-1]) + [rng.choice(wrong)]
+        selected = sorted(set(selected)) or [rng.randrange(len(options))]
+        return {
+            "module_id": self.module_id,
+            "question_id": index,
+            "is_correct": selected == correct,
+            "selected_options": selected,
+        }
+
+
+class Account:
+    def __init__(self, email: str, paid: bool):
+        self.email = email
+        self.paid = paid
+        self.user_id: Optional[str] = None
+        self.token: Optional[str] = None
+        self.answered: Dict[Tuple[int, str], bool] = {}
+
+
+class Run:
+    def __init__(self, args, accounts: List[Account], streams: List[ModuleStream]):
+        self.args = args
+        self.accounts = accounts
+        self.streams = streams
+        self.weights = [len(s.questions) for s in streams]
+        self.metrics = Metrics()
+        self.expected: Dict[Tuple[int, str], Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self.answers_sent = 0
+        self.answers_accepted = 0
+        self.limit_refusals = 0
+
+    def accept(self, account: Account, batch: List[dict], body: dict):
+        self.answers_accepted += len(batch)
+        if body.get("free_limit_reached"):
+            self.limit_refusals += 1
+        if not account.paid:
+            return
+        for answer in batch:
+            key = (answer["module_id"], str(answer["question_id"]))
+            account.answered[key] = True
+            counters = self.expected[key]
+            counters["total_answers"] += 1
+            counters["correct_answers"] += 1 if answer["is_correct"] else 0
+            for option in answer["selected_options"]:
+                counters[f"option:{option}"] += 1
+
+    async def student(self, account: Account, rng: random.Random, deadline: float):
+        conn = Connection(self.args.url, self.args.timeout)
+        auth = {"Authorization": f"Bearer {account.token}"}
+        progress_path = f"/api/progress?user_id={account.user_id}"
+        flush_every = FLUSH_INTERVAL if account.paid else FREE_FLUSH_INTERVAL
+        try:
+            await asyncio.sleep(rng.uniform(0, self.args.ramp))
+            await self.metrics.timed("GET /api/progress", conn.request("GET", progress_path, headers=auth))
+
+            stream = rng.choices(self.streams, self.weights)[0]
+            position = rng.choice(stream.chapter_starts or [0])
+            skill = rng.uniform(0.4, 0.9)
+            pending: List[dict] = []
+            next_flush = time.monotonic() + flush_every
+            answered = 0
+
+            while time.monotonic() < deadline:
+                await asyncio.sleep(min(rng.expovariate(1 / self.args.think), max(0.0, deadline - time.monotonic())))
+                answer = stream.answer(position, skill, rng)
+                position = (position + 1) % len(stream.questions)
+                if answer:
+                    pending.append(answer)
+                    answered += 1
+                    if answered % self.args.progress_every == 0:
+                        await self.metrics.timed("GET /api/progress", conn.request("GET", progress_path, headers=auth))
+                if pending and time.monotonic() >= next_flush:
+                    await self.flush(conn, account, auth, pending)
+                    pending = []
+                    next_flush = time.monotonic() + flush_every
+            if pending:
+                # Keep the student's own flush cadence so the run does not end in a burst
+                await asyncio.sleep(max(0.0, next_flush - time.monotonic()))
+                await self.flush(conn, account, auth, pending)
+        finally:
+            conn.close()
+
+    async def flush(self, conn: Connection, account: Account, auth: dict, batch: List[dict]):
+        self.answers_sent += len(batch)
+        status, body = await self.metrics.timed("POST /api/answer", conn.request(
+            "POST", "/api/answer", {"user_id": account.user_id, "answers": batch}, auth))
+        if status == 200 and body.get("success"):
+            self.accept(account, batch, body)
+
+
+# ==================== Phases ====================
+
+def create_accounts(client, run_id: str, count: int, paid_ratio: float, rng: random.Random) -> Tuple[List[Account], str]:
+    password = f"lt-{run_id}-{rng.getrandbits(32):08x}"
+    accounts = [Account(f"lt-{run_id}-{n}@loadtest.invalid", rng.random() < paid_ratio) for n in range(count)]
+    for start in range(0, count, BULK_SIZE):
+        chunk = accounts[start:start + BULK_SIZE]
+        result = client.request("/api/admin/users", "POST", {"action": "bulk", "actions": [
+            {"action": "create", "name": f"Load Test {a.email.split('@')[0]}", "email": a.email, "password": password,
+             "has_paid": a.paid, "activation_days": 30}
+            for a in chunk
+        ]})
+        if "error" in result:
+            raise RuntimeError(f"account creation failed: {result['error']}")
+        if result.get("failed"):
+            raise RuntimeError(f"{result['failed']} account(s) could not be created")
+    return accounts, password
+
+
+def delete_accounts(client, accounts: List[Account]):
+    for start in range(0, len(accounts), BULK_SIZE):
+        client.request("/api/admin/users", "POST", {"action": "bulk", "actions": [
+            {"action": "delete", "email": a.email} for a in accounts[start:start + BULK_SIZE]
+        ]})
+
+
+async def login_all(run: Run, password: str) -> int:
+    semaphore = asyncio.Semaphore(LOGIN_CONCURRENCY)
+
+    async def login(account: Account):
+        async with semaphore:
+            conn = Connection(run.args.url, run.args.timeout)
+            try:
+                status, body = await run.metrics.timed("POST /api/auth/login", conn.request(
+                    "POST", "/api/auth/login", {"email": account.email, "password": password}))
+            finally:
+                conn.close()
+            if status == 200 and body.get("success"):
+                account.user_id = body["user"]["id"]
+                account.token = body["user"]["token"]
+
+    await asyncio.gather(*(login(a) for a in run.accounts))
+    return sum(1 for a in run.accounts if a.token)
+
+
+async def fetch_stats(url: str, module_ids: List[int], timeout: float) -> Dict[int, dict]:
+    conn = Connection(url, timeout)
+    try:
+        stats = {}
+        for module_id in module_ids:
+            status, body = await conn.request("GET", f"/api/statistics?module_id={module_id}")
+            if status != 200:
+                raise RuntimeError(f"GET /api/statistics?module_id={module_id} returned {status}")
+            stats[module_id] = body.get("statistics") or {}
+        return stats
+    finally:
+        conn.close()
+
+
+def counter_value(stats: Dict[int, dict], key: Tuple[int, str], counter: str) -> int:
+    question = stats.get(key[0], {}).get(key[1]) or {}
+    if counter.startswith("option:"):
+        return int((question.get("option_counts") or {}).get(counter[7:], 0))
+    return int(question.get(counter, 0))
+
+
+def compare_stats(expected, before, after) -> dict:
+    increments = lost = extra = 0
+    questions_with_loss = 0
+    for key, counters in expected.items():
+        question_lost = 0
+        for counter, count in counters.items():
+            moved = counter_value(after, key, counter) - counter_value(before, key, counter)
+            increments += count
+            question_lost += max(0, count - moved)
+            extra += max(0, moved - count)
+        lost += question_lost
+        questions_with_loss += 1 if question_lost else 0
+    return {
+        "questions": len(expected),
+        "expected_increments": increments,
+        "lost_increments": lost,
+        "questions_with_loss": questions_with_loss,
+        "unexpected_increments": extra,
+    }
+
+
+async def check_progress(run: Run) -> dict:
+    semaphore = asyncio.Semaphore(LOGIN_CONCURRENCY)
+    missing = users = checked = 0
+
+    async def check(account: Account):
+        nonlocal missing, users, checked
+        async with semaphore:
+            conn = Connection(run.args.url, run.args.timeout)
+            try:
+                status, body = await conn.request("GET", f"/api/progress?user_id={account.user_id}",
+                                                  headers={"Authorization": f"Bearer {account.token}"})
+            except (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError):
+                return
+            finally:
+                conn.close()
+        if status != 200:
+            return
+        progress = body.get("progress") or {}
+        lost = sum(1 for module_id, question_id in account.answered
+                   if question_id not in (progress.get(f"module_{module_id}") or {}))
+        checked += 1
+        missing += lost
+        users += 1 if lost else 0
+
+    await asyncio.gather(*(check(a) for a in run.accounts if a.paid and a.answered))
+    return {"users_checked": checked, "lost_answers": missing, "users_with_loss": users}
+
+
+# ==================== Report ====================
+
+def endpoint_rows(metrics: Metrics, elapsed: float) -> List[dict]:
+    rows = []
+    for name, values in sorted(metrics.latencies.items()):
+        ordered = sorted(values)
+        rows.append({
+            "endpoint": name,
+            "requests": len(ordered),
+            "errors": sum(metrics.errors[name].values()),
+            "error_kinds": dict(metrics.errors[name]),
+            "rps": round(len(ordered) / elapsed, 1) if elapsed and name != "POST /api/auth/login" else None,
+            "p50_ms": round(percentile(ordered, 50), 1),
+            "p95_ms": round(percentile(ordered, 95), 1),
+            "p99_ms": round(percentile(ordered, 99), 1),
+            "max_ms": round(ordered[-1], 1) if ordered else 0.0,
+        })
+    return rows
+
+
+def print_report(report: dict):
+    print(f"\n{'='*92}")
+    print(f"  Load Test - {report['students']} students ({report['paid']} paid) for {report['duration']:.0f}s "
+          f"against {report['url']}")
+    print(f"{'='*92}")
+    print(f"  {'Endpoint':<24} {'Requests':>9} {'Errors':>7} {'Req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    print(f"  {'-'*86}")
+    for row in report["endpoints"]:
+        rps = f"{row['rps']:.1f}" if row["rps"] is not None else "-"
+        print(f"  {row['endpoint']:<24} {row['requests']:>9} {row['errors']:>7} {rps:>7} "
+              f"{row['p50_ms']:>6.0f}ms {row['p95_ms']:>6.0f}ms {row['p99_ms']:>6.0f}ms {row['max_ms']:>6.0f}ms")
+        for kind, count in sorted(row["error_kinds"].items()):
+            print(f"  {'':<24} {'':>9} {count:>7} {kind}")
+
+    answers = report["answers"]
+    stats = report["statistics"]
+    progress = report["progress"]
+    print(f"\n  Answers: {answers['accepted']}/{answers['sent']} accepted ({answers['per_second']:.1f}/s), "
+          f"{answers['limit_refusals']} batch(es) over the free daily limit")
+    lost_rate = stats["lost_increments"] / stats["expected_increments"] if stats["expected_increments"] else 0
+    marker = "✓" if not stats["lost_increments"] else "✗"
+    print(f"  {marker} Statistics: {stats['lost_increments']} of {stats['expected_increments']} counter increments lost "
+          f"({lost_rate:.2%}) on {stats['questions_with_loss']}/{stats['questions']} questions")
+    if stats["unexpected_increments"]:
+        print(f"    {stats['unexpected_increments']} unexpected increment(s) (other traffic, or timed-out requests that did apply)")
+    marker = "✓" if not progress["lost_answers"] else "✗"
+    print(f"  {marker} Progress: {progress['lost_answers']} answer(s) missing for {progress['users_with_loss']}"
+          f"/{progress['users_checked']} paid students")
+    print(f"{'='*92}\n")
+
+
+async def run_load(args, client, accounts: List[Account], password: str, streams: List[ModuleStream]) -> dict:
+    run = Run(args, accounts, streams)
+    logged_in = await login_all(run, password)
+    if logged_in < len(accounts):
+        print(f"  ⚠️  {len(accounts) - logged_in} login(s) failed; those students are skipped")
+    run.accounts = [a for a in accounts if a.token]
+
+    module_ids = [s.module_id for s in streams]
+    before = await fetch_stats(args.url, module_ids, args.timeout)
+    print(f"  ▶ Running {len(run.accounts)} students for {args.duration:.0f}s (ramp-up {args.ramp:.0f}s)...")
+    start = time.monotonic()
+    await asyncio.gather(*(run.student(a, random.Random(f"{args.seed}:{a.email}"), start + args.duration)
+                           for a in run.accounts))
+    elapsed = time.monotonic() - start
+    after = await fetch_stats(args.url, module_ids, args.timeout)
+
+    return {
+        "url": args.url,
+        "students": len(run.accounts),
+        "paid": sum(1 for a in run.accounts if a.paid),
+        "duration": elapsed,
+        "endpoints": endpoint_rows(run.metrics, elapsed),
+        "answers": {
+            "sent": run.answers_sent,
+            "accepted": run.answers_accepted,
+            "per_second": run.answers_accepted / elapsed if elapsed else 0.0,
+            "limit_refusals": run.limit_refusals,
+        },
+        "statistics": compare_stats(run.expected, before, after),
+        "progress": await check_progress(run),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="LearnFMPA Load Test - simulated exam-week answer traffic",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python load_test.py --students 300 --duration 60
+  python load_test.py --students 500 --think 2 --modules 1 2 --json run.json
+  python load_test.py --url http://localhost:3000 --paid-ratio 0.6 --keep-users
+
+Environment Variables:
+  API_URL       - API endpoint (default: http://127.0.0.1:3001, the dev_server.py default)
+  ADMIN_SECRET  - Admin secret used to create and delete the test accounts
+""",
+    )
+    parser.add_argument("--url", default=DEFAULT_API_URL, help="API URL to load")
+    parser.add_argument("--secret", default=DEFAULT_ADMIN_SECRET, help="Admin secret")
+    parser.add_argument("--students", type=int, default=300, help="Concurrent students (default: 300)")
+    parser.add_argument("--paid-ratio", type=float, default=0.8, help="Share of paid accounts (default: 0.8)")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds of traffic (default: 60)")
+    parser.add_argument("--ramp", type=float, default=10, help="Seconds over which students arrive (default: 10)")
+    parser.add_argument("--think", type=float, default=4.0, help="Mean seconds between a student's answers (default: 4)")
+    parser.add_argument("--progress-every", type=int, default=20, help="Answers between progress reloads (default: 20)")
+    parser.add_argument("--modules", type=int, nargs="+", help="Module IDs to answer (default: all)")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for accounts and answer streams (default: 42)")
+    parser.add_argument("--timeout", type=float, default=30, help="Per-request timeout in seconds (default: 30)")
+    parser.add_argument("--keep-users", action="store_true", help="Do not delete the test accounts afterwards")
+    parser.add_argument("--json", metavar="FILE", help="Also write the report as JSON")
+    parser.add_argument("--allow-production", action="store_true", help="Allow running against the production host")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.start(args)
+
+    args.url = args.url.rstrip("/")
+    if urllib.parse.urlsplit(args.url).hostname in PRODUCTION_HOSTS and not args.allow_production:
+        print(f"\n✗ {args.url} is production; test answers would land in real statistics.")
+        print(f"  Use a local dev_server.py or staging, or pass --allow-production.\n")
+        sys.exit(1)
+
+    modules = [m["id"] for m in load_modules() if not args.modules or m["id"] in args.modules]
+    streams = [s for s in (ModuleStream(m) for m in modules) if s.questions]
+    if not streams:
+        print(f"\n✗ No questions found for modules {args.modules}\n")
+        sys.exit(1)
+
+    rng = random.Random(args.seed)
+    client = get_client(args.url, args.secret)
+    run_id = f"{int(time.time()):x}"
+    print(f"\n  Creating {args.students} test accounts on {args.url}...")
+    try:
+        accounts, password = create_accounts(client, run_id, args.students, args.paid_ratio, rng)
+    except RuntimeError as e:
+        print(f"\n✗ {e}\n")
+        sys.exit(1)
+
+    try:
+        report = asyncio.run(run_load(args, client, accounts, password, streams))
+    except KeyboardInterrupt:
+        print(f"\n  Interrupted.")
+        report = None
+    finally:
+        if not args.keep_users:
+            print(f"  Deleting test accounts...")
+            delete_accounts(client, accounts)
+
+    if report is None:
+        sys.exit(1)
+    print_report(report)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"✓ Report written to {args.json}\n")
+
+
+if __name__ == "__main__":
+    main()
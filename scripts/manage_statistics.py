@@ -7,53 +7,37 @@ Manage question answer statistics via the Vercel deployment API.
 Usage:
   python manage_statistics.py stats <module_id> [question_id]
   python manage_statistics.py top <module_id> [--sort worst|best|most-answered]
-  python manage_statistics.py reset <module_id> [--question <question_id>]
+  python manage_statistics.py reset <module_id> [--question <question_id> ...] [--chapter <id|name>]
   python manage_statistics.py summary
+  python manage_statistics.py analyze <module_id> [--by question|chapter|subtopic|year]
+  python manage_statistics.py trend [module_id] [--question <id>] [--hourly] [--window N] [--since DATE]
+  python manage_statistics.py export [module_id ...] [--format csv|ndjson|parquet] [--with-questions] [-o FILE]
+  python manage_statistics.py watch [--interval 5] [--window 5] [--top 10]
 
 Set environment variables:
   API_URL      - Your Vercel deployment URL (default: https://www.learnfmpa.com)
   ADMIN_SECRET - Admin secret key (default: learnfmpa2024)
 """
 
-import json
 import os
+import csv
+import json
+import sys
 import argparse
-import urllib.request
-import urllib.error
-import urllib.parse
+import time
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import quote
+
+from admin_client import api_request, get_client
+from module_registry import OPTION_LETTERS, load_chapters, load_modules, load_questions, module_title, question_options
+import instrumentation
 
 DEFAULT_API_URL = os.environ.get('API_URL', 'https://www.learnfmpa.com')
 DEFAULT_ADMIN_SECRET = os.environ.get('ADMIN_SECRET', 'learnfmpa2024')
 
 
-def api_request(api_url: str, admin_secret: str, endpoint: str, method: str = 'GET', data: dict = None) -> dict:
-    url = f"{api_url}{endpoint}"
-    headers = {'Content-Type': 'application/json'}
-
-    if method == 'GET' and 'admin_secret' not in endpoint:
-        url = f"{url}{'?' if '?' not in url else '&'}admin_secret={admin_secret}"
-
-    req_data = None
-    if data:
-        data['admin_secret'] = admin_secret
-        req_data = json.dumps(data).encode('utf-8')
-
-    try:
-        req = urllib.request.Request(url, data=req_data, headers=headers, method=method)
-        with urllib.request.urlopen(req, timeout=30) as response:
-            return json.loads(response.read().decode('utf-8'))
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode('utf-8')
-        try:
-            return json.loads(error_body)
-        except Exception:
-            return {'error': error_body}
-    except urllib.error.URLError as e:
-        return {'error': f'Cannot connect to {api_url}: {e}'}
-    except Exception as e:
-        return {'error': str(e)}
-
-
 def show_stats(api_url: str, admin_secret: str, module_id: int, question_id: str = None):
     endpoint = f'/api/statistics?module_id={module_id}'
     if question_id:
@@ -139,37 +123,65 @@ def show_top(api_url: str, admin_secret: str, module_id: int, sort_by: str = 'wo
         question_rates.sort(key=lambda x: x[1])
         title = "Worst"
 
-    print(f"\n{'='*70}")
-    print(f"  {title} Questions - Module {module_id}")
-    print(f"{'='*70}")
-    print(f"  {'Question':<15} {'Rate':>8} {'Answers':>10} {'Correct':>10}")
-    print(f"  {'-'*50}")
+    try:
+        questions = load_questions(module_id)
+    except (KeyError, OSError, ValueError):
+        questions = []
+
+    print(f"\n{'='*110}")
+    print(f"  {title} Questions - {module_title(module_id)} (module {module_id})")
+    print(f"{'='*110}")
+    print(f"  {'Question':<10} {'Rate':>6} {'Answers':>8} {'Correct':>8}  {'Chapter':<30} {'Text':<40}")
+    print(f"  {'-'*106}")
 
     for qid, rate, total, correct in question_rates[:20]:
-        print(f"  {qid:<15} {rate:>6}% {total:>10} {correct:>10}")
+        index = int(qid) if qid.isdigit() else -1
+        question = questions[index] if 0 <= index < len(questions) else {}
+        chapter = (question.get('Subtopic') or '')[:30]
+        text = ' '.join((question.get('QuestionText') or '').split())[:40]
+        print(f"  {qid:<10} {rate:>5}% {total:>8} {correct:>8}  {chapter:<30} {text:<40}")
 
-    print(f"{'='*70}\n")
+    print(f"{'='*110}\n")
 
 
-def reset_stats(api_url: str, admin_secret: str, module_id: int, question_id: str = None):
-    if question_id:
-        endpoint = f'/api/statistics?module_id={module_id}'
-        result = api_request(api_url, admin_secret, endpoint, 'GET')
-        if not result.get('success'):
-            print(f"\n✗ Error: {result.get('error', 'Unknown error')}\n")
+def _resolve_chapter(module_id: int, chapter: str):
+    chapters = load_chapters(module_id)
+    if chapter.isdigit():
+        matches = [c for c in chapters if c['id'] == int(chapter)]
+    else:
+        matches = [c for c in chapters if c['name'].lower() == chapter.lower()]
+        if not matches:
+            matches = [c for c in chapters if chapter.lower() in c['name'].lower()]
+    if len(matches) > 1:
+        names = ', '.join(f"{c['id']}. {c['name']}" for c in matches[:5])
+        raise ValueError(f"'{chapter}' matches several chapters: {names}")
+    if not matches:
+        raise ValueError(f"chapter '{chapter}' not found in module {module_id}")
+    return matches[0]
+
+
+def reset_stats(api_url: str, admin_secret: str, module_id: int, question_ids: list = None, chapter: str = None):
+    if chapter:
+        try:
+            found = _resolve_chapter(module_id, chapter)
+        except (KeyError, OSError, ValueError) as e:
+            print(f"\n✗ Error: {e}\n")
             return
+        question_ids = (question_ids or []) + [str(i) for i in found['question_ids']]
+        print(f"\n  Chapter {found['id']}. {found['name']}: {found['questionCount']} questions")
 
-        stats = result.get('statistics', {})
-        if question_id in stats:
-            del stats[question_id]
-            data = {'module_id': module_id, 'stats': stats}
-            update_result = api_request(api_url, admin_secret, '/api/statistics', 'PUT', data)
-            if update_result.get('success'):
-                print(f"\n✓ Statistics for question {question_id} reset.\n")
-            else:
-                print(f"\n✗ Error: {update_result.get('error', 'Unknown error')}\n")
+    if question_ids:
+        ids = list(dict.fromkeys(q.strip() for qid in question_ids for q in str(qid).split(',') if q.strip()))
+        data = {'module_id': module_id, 'question_ids': ids}
+        result = api_request(api_url, admin_secret, '/api/statistics', 'DELETE', data)
+        if not result.get('success'):
+            print(f"\n✗ Error: {result.get('error', 'Unknown error')}\n")
+        elif 'removed' not in result:
+            print(f"\n✗ Error: the API does not support targeted resets; nothing was changed.\n")
+        elif result['removed'] == 0:
+            print(f"\n  No statistics found for the {len(ids)} selected question(s).\n")
         else:
-            print(f"\n  Question {question_id} not found in statistics.\n")
+            print(f"\n✓ Statistics reset for {result['removed']} of {len(ids)} selected question(s).\n")
     else:
         data = {'module_id': module_id}
         result = api_request(api_url, admin_secret, '/api/statistics', 'DELETE', data)
@@ -179,27 +191,476 @@ def reset_stats(api_url: str, admin_secret: str, module_id: int, question_id: st
             print(f"\n✗ Error: {result.get('error', 'Unknown error')}\n")
 
 
+def _fetch_module_stats(client, module_id: int):
+    start = time.perf_counter()
+    result = client.request(f'/api/statistics?module_id={module_id}', 'GET')
+    return result, time.perf_counter() - start
+
+
 def show_summary(api_url: str, admin_secret: str):
-    modules = [1, 2]
-    print(f"\n{'='*70}")
-    print(f"  LearnFMPA Statistics Summary")
-    print(f"{'='*70}")
+    modules = load_modules()
+    if not modules:
+        print(f"\n✗ Error: no modules found in the module registry\n")
+        return
 
-    for module_id in modules:
-        endpoint = f'/api/statistics?module_id={module_id}'
-        result = api_request(api_url, admin_secret, endpoint, 'GET')
+    client = get_client(api_url, admin_secret)
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=min(client.pool_size, len(modules))) as executor:
+        results = list(executor.map(lambda m: _fetch_module_stats(client, m['id']), modules))
+    elapsed = time.perf_counter() - start
+
+    print(f"\n{'='*90}")
+    print(f"  LearnFMPA Statistics Summary")
+    print(f"{'='*90}")
+    print(f"  {'ID':<4} {'Module':<24} {'Questions':>10} {'Answers':>10} {'Success':>9} {'Fetch':>10}")
+    print(f"  {'-'*72}")
+
+    grand_questions = grand_answers = grand_correct = 0
+    failed = 0
+    for module, (result, duration) in zip(modules, results):
+        title = module.get('title', '')[:24]
         if result.get('success'):
-            stats = result.get('statistics', {})
-            total_answers = sum(s.get('total_answers', 0) for s in stats.values()) if stats else 0
-            total_correct = sum(s.get('correct_answers', 0) for s in stats.values()) if stats else 0
+            stats = result.get('statistics') or {}
+            total_answers = sum(s.get('total_answers', 0) for s in stats.values())
+            total_correct = sum(s.get('correct_answers', 0) for s in stats.values())
             rate = round((total_correct / total_answers) * 100) if total_answers > 0 else 0
-            print(f"  Module {module_id}: {len(stats)} questions | {total_answers} answers | {rate}% success")
+            grand_questions += len(stats)
+            grand_answers += total_answers
+            grand_correct += total_correct
+            print(f"  {module['id']:<4} {title:<24} {len(stats):>10} {total_answers:>10} {rate:>8}% {duration * 1000:>8.0f}ms")
         else:
-            print(f"  Module {module_id}: Error loading stats")
+            failed += 1
+            print(f"  {module['id']:<4} {title:<24} {'Error loading stats: ' + str(result.get('error', 'Unknown error'))[:40]}")
+
+    grand_rate = round((grand_correct / grand_answers) * 100) if grand_answers > 0 else 0
+    print(f"  {'-'*72}")
+    print(f"  {'':<4} {'All modules':<24} {grand_questions:>10} {grand_answers:>10} {grand_rate:>8}% {elapsed * 1000:>8.0f}ms")
+    print(f"{'='*90}")
+    print(f"  {len(modules)} modules fetched concurrently" + (f", {failed} failed" if failed else ""))
+    print(f"{'='*90}\n")
+
+
+def analyze_module(api_url: str, admin_secret: str, module_id: int, by: str = 'question', sort_by: str = None,
+                   min_answers: int = 1, limit: int = 20, fmt: str = 'table', output: str = None):
+    try:
+        from question_analytics import ModuleAnalytics
+    except ImportError as e:
+        print(f"\n✗ Error: analyze requires numpy ({e}). Install it with: pip install numpy\n")
+        return
+
+    result = api_request(api_url, admin_secret, f'/api/statistics?module_id={module_id}', 'GET')
+    if not result.get('success'):
+        print(f"\n✗ Error: {result.get('error', 'Unknown error')}\n")
+        return
+
+    try:
+        analytics = ModuleAnalytics.from_module(module_id, result.get('statistics') or {})
+    except (KeyError, OSError, ValueError) as e:
+        print(f"\n✗ Error: cannot load questions for module {module_id}: {e}\n")
+        return
+
+    if by == 'question':
+        rows = analytics.rank(sort_by or 'difficulty', min_answers=min_answers, limit=limit)
+        columns = ['question_id', 'answers', 'facility', 'discrimination', 'top_distractor',
+                   'top_distractor_rate', 'weak_distractors', 'subtopic', 'year', 'text']
+    else:
+        rows = analytics.group_by(by, min_answers=min_answers)
+        if sort_by:
+            key = {'discrimination': 'mean_discrimination'}.get(sort_by, sort_by)
+            rows.sort(key=lambda r: (r[key] is None, r[key] if r[key] is not None else 0),
+                      reverse=sort_by != 'discrimination')
+        rows = rows[:limit] if limit else rows
+        columns = [by, 'name', 'questions', 'answered_questions', 'answers', 'facility',
+                   'mean_discrimination', 'weak_distractors', 'misleading_questions']
+
+    if fmt in ('csv', 'json'):
+        stream = open(output, 'w', encoding='utf-8', newline='') if output else sys.stdout
+        try:
+            if fmt == 'json':
+                json.dump(rows, stream, indent=2, ensure_ascii=False)
+                stream.write('\n')
+            else:
+                writer = csv.DictWriter(stream, fieldnames=columns, extrasaction='ignore')
+                writer.writeheader()
+                writer.writerows(rows)
+        finally:
+            if output:
+                stream.close()
+        if output:
+            print(f"\n✓ {len(rows)} rows written to {output}\n")
+        return
+
+    answered = int(analytics.answered.sum())
+    print(f"\n{'='*110}")
+    print(f"  Question Analytics - {module_title(module_id)} (module {module_id}), by {by}")
+    print(f"  {analytics.size} questions, {answered} with answers, {int(analytics.total.sum())} answers recorded")
+    if analytics.unmatched:
+        print(f"  ⚠️  {analytics.unmatched} stats entries do not match any question in the module JSON")
+    print(f"{'='*110}")
+
+    def fmt_value(value, pct=True):
+        if value is None:
+            return '-'
+        return f"{round(value * 100)}%" if pct else f"{value:+.2f}"
+
+    if by == 'question':
+        print(f"  {'Q':<6} {'Answers':>7} {'Facil.':>7} {'Discr.':>7} {'Top distr.':>11} {'Weak':>5}  {'Chapter':<28} {'Text':<30}")
+        print(f"  {'-'*106}")
+        for row in rows:
+            distractor = f"{row['top_distractor']} {fmt_value(row['top_distractor_rate'])}" if row['top_distractor'] else '-'
+            text = ' '.join(row['text'].split())[:30]
+            print(f"  {row['question_id']:<6} {row['answers']:>7} {fmt_value(row['facility']):>7} "
+                  f"{fmt_value(row['discrimination'], False):>7} {distractor:>11} {row['weak_distractors']:>5}  "
+                  f"{row['subtopic'][:28]:<28} {text:<30}")
+    else:
+        print(f"  {'Group':<42} {'Qs':>5} {'Answered':>9} {'Answers':>8} {'Facil.':>7} {'Discr.':>7} {'Weak':>5} {'Mislead.':>9}")
+        print(f"  {'-'*106}")
+        for row in rows:
+            label = f"{row[by]}. {row['name']}" if by == 'chapter' else str(row['name'])
+            print(f"  {label[:42]:<42} {row['questions']:>5} {row['answered_questions']:>9} {row['answers']:>8} "
+                  f"{fmt_value(row['facility']):>7} {fmt_value(row['mean_discrimination'], False):>7} "
+                  f"{row['weak_distractors']:>5} {row['misleading_questions']:>9}")
 
+    print(f"{'='*110}")
+    print(f"  Facil. = share of fully correct answers; Discr. = key selection rate minus top distractor rate")
+    print(f"  Weak = distractors chosen by < 5% of answers; Mislead. = questions where a distractor beats the key")
+    print(f"{'='*110}\n")
+
+
+TREND_BUCKET_SECONDS = {'hourly': 3600, 'daily': 86400}
+TREND_DEFAULT_WINDOW = {'hourly': 24, 'daily': 7}
+
+
+def _parse_trend_time(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).astimezone(timezone.utc)
+
+
+def show_trend(api_url: str, admin_secret: str, module_id: int = None, question_id: str = None,
+               resolution: str = 'daily', window: int = None, since: str = None):
+    if module_id is None and question_id:
+        print(f"\n✗ Error: --question needs a module ID\n")
+        return
+    window = window or TREND_DEFAULT_WINDOW[resolution]
+    module_ids = [module_id] if module_id is not None else [m['id'] for m in load_modules()]
+    query = f'&trend={resolution}' + (f'&question_id={question_id}' if question_id else '')
+
+    client = get_client(api_url, admin_secret)
+    with ThreadPoolExecutor(max_workers=min(client.pool_size, len(module_ids))) as executor:
+        results = list(executor.map(
+            lambda m: client.request(f'/api/statistics?module_id={m}{query}', 'GET'), module_ids))
+
+    # Rollup: the same bucket of every requested module is summed.
+    totals = {}
+    for mid, result in zip(module_ids, results):
+        if not result.get('success'):
+            print(f"\n✗ Error for module {mid}: {result.get('error', 'Unknown error')}\n")
+            return
+        for bucket in result.get('buckets', []):
+            start = _parse_trend_time(bucket['start'])
+            answers, correct = totals.get(start, (0, 0))
+            totals[start] = (answers + bucket['answers'], correct + bucket['correct'])
+
+    if module_id is None:
+        scope = 'All modules'
+    else:
+        scope = module_title(module_id) + (f' - question {question_id}' if question_id else '')
+    if not totals:
+        print(f"\nNo answers recorded for {scope} in the {resolution} window\n")
+        return
+
+    step = TREND_BUCKET_SECONDS[resolution]
+    first = int(min(totals).timestamp()) // step
+    last = int(time.time()) // step
+    rows = []
+    for bucket in range(first, last + 1):
+        start = datetime.fromtimestamp(bucket * step, timezone.utc)
+        answers, correct = totals.get(start, (0, 0))
+        rows.append((start, answers, correct))
+
+    peak = max(answers for _, answers, _ in rows)
+    label_format = '%Y-%m-%d %H:00' if resolution == 'hourly' else '%Y-%m-%d'
+    print(f"\n{'='*80}")
+    print(f"  {scope} - {resolution} trend (UTC), rolling success over {window} buckets")
+    print(f"{'='*80}")
+    print(f"  {'Start':<17} {'Answers':>8} {'Success':>8} {'Rolling':>8}  Load")
+    print(f"  {'-'*76}")
+    for i, (start, answers, correct) in enumerate(rows):
+        recent = rows[max(0, i - window + 1):i + 1]
+        recent_answers = sum(r[1] for r in recent)
+        rolling = f"{round(sum(r[2] for r in recent) / recent_answers * 100)}%" if recent_answers else '-'
+        rate = f"{round(correct / answers * 100)}%" if answers else '-'
+        bar = '█' * round(answers / peak * 30) if peak else ''
+        print(f"  {start.strftime(label_format):<17} {answers:>8} {rate:>8} {rolling:>8}  {bar}")
+
+    total_answers = sum(r[1] for r in rows)
+    total_correct = sum(r[2] for r in rows)
+    busiest = max(rows, key=lambda r: r[1])
+    print(f"  {'-'*76}")
+    print(f"  Total: {total_answers} answers, {round(total_correct / total_answers * 100)}% success; "
+          f"peak {busiest[1]} at {busiest[0].strftime(label_format)}")
+
+    if since:
+        try:
+            cutoff = datetime.fromisoformat(since)
+        except ValueError:
+            print(f"\n✗ Error: invalid --since date '{since}' (expected YYYY-MM-DD or ISO time)\n")
+            return
+        cutoff = cutoff.replace(tzinfo=cutoff.tzinfo or timezone.utc)
+        for label, part in (('Before', [r for r in rows if r[0] < cutoff]), ('Since', [r for r in rows if r[0] >= cutoff])):
+            answers = sum(r[1] for r in part)
+            rate = f"{round(sum(r[2] for r in part) / answers * 100)}%" if answers else '-'
+            print(f"  {label} {cutoff.strftime(label_format)}: {answers} answers, {rate} success")
+    print(f"{'='*80}\n")
+
+
+EXPORT_COLUMNS = ['module_id', 'question_id', 'total_answers', 'correct_answers', 'success_rate'] + \
+    [f'option_{letter}' for letter in OPTION_LETTERS]
+QUESTION_COLUMNS = ['chapter', 'subtopic', 'year', 'correct', 'question_text']
+EXPORT_EXTENSIONS = {'csv': 'csv', 'ndjson': 'ndjson', 'parquet': 'parquet'}
+
+
+def _stats_pages(client, module_id: int, page_size: int):
+    cursor = '0'
+    while cursor:
+        result = client.request(f'/api/statistics?module_id={module_id}&cursor={quote(cursor)}&count={page_size}', 'GET')
+        if not result.get('success'):
+            raise RuntimeError(result.get('error', 'Unknown error'))
+        yield result.get('statistics') or {}
+        cursor = result.get('next_cursor')
+
+
+def _export_rows(module_id: int, page: dict, questions: list = None, chapters: dict = None):
+    for qid, qstats in sorted(page.items(), key=lambda x: int(x[0]) if x[0].isdigit() else 0):
+        total = qstats.get('total_answers', 0)
+        correct = qstats.get('correct_answers', 0)
+        row = {
+            'module_id': module_id,
+            'question_id': qid,
+            'total_answers': total,
+            'correct_answers': correct,
+            'success_rate': round(correct / total, 4) if total else None,
+        }
+        question = questions[int(qid)] if questions is not None and qid.isdigit() and int(qid) < len(questions) else None
+        # Option indices count non-empty choices only; with the question at
+        # hand they map to its real letters, otherwise to A-E by position.
+        letters = [o['letter'] for o in question_options(question)] if question else list(OPTION_LETTERS)
+        counts = qstats.get('option_counts') or {}
+        for letter in OPTION_LETTERS:
+            row[f'option_{letter}'] = 0
+        for index, count in counts.items():
+            if index.isdigit() and int(index) < len(letters):
+                row[f'option_{letters[int(index)]}'] += count
+        if questions is not None:
+            row.update({
+                'chapter': chapters.get(int(qid)) if question else None,
+                'subtopic': question.get('Subtopic') if question else None,
+                'year': question.get('YearAsked') if question else None,
+                'correct': ''.join(o['letter'] for o in question_options(question) if o['is_correct']) if question else None,
+                'question_text': question.get('QuestionText') if question else None,
+            })
+        yield row
+
+
+class _ExportWriter:
+    """Appends rows to a CSV, NDJSON or Parquet file one page at a time."""
+
+    def __init__(self, fmt: str, path: str, columns: list):
+        self.fmt = fmt
+        self.columns = columns
+        self.rows = 0
+        if fmt == 'parquet':
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+            types = {'module_id': pa.int32(), 'question_id': pa.string(), 'success_rate': pa.float64()}
+            self.schema = pa.schema([
+                (c, types.get(c, pa.int64() if c in EXPORT_COLUMNS else pa.string())) for c in columns
+            ])
+            self.pa = pa
+            self.writer = pq.ParquetWriter(path, self.schema)
+        else:
+            self.stream = open(path, 'w', encoding='utf-8', newline='')
+            if fmt == 'csv':
+                self.writer = csv.DictWriter(self.stream, fieldnames=columns)
+                self.writer.writeheader()
+
+    def write(self, rows: list):
+        if not rows:
+            return
+        if self.fmt == 'parquet':
+            self.writer.write_table(self.pa.Table.from_pylist(rows, schema=self.schema))
+        elif self.fmt == 'csv':
+            self.writer.writerows(rows)
+        else:
+            self.stream.writelines(json.dumps(row, ensure_ascii=False) + '\n' for row in rows)
+        self.rows += len(rows)
+
+    def close(self):
+        if self.fmt == 'parquet':
+            self.writer.close()
+        else:
+            self.stream.close()
+
+
+def export_stats(api_url: str, admin_secret: str, module_ids: list = None, fmt: str = 'csv', output: str = None,
+                 with_questions: bool = False, page_size: int = 500):
+    module_ids = module_ids or [m['id'] for m in load_modules()]
+    output = output or f"statistics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{EXPORT_EXTENSIONS[fmt]}"
+    columns = EXPORT_COLUMNS + (QUESTION_COLUMNS if with_questions else [])
+    try:
+        writer = _ExportWriter(fmt, output, columns)
+    except ImportError:
+        print(f"\n✗ Error: Parquet export requires pyarrow (pip install pyarrow)\n")
+        return
+
+    client = get_client(api_url, admin_secret)
+    start = time.perf_counter()
+    print(f"\n{'='*70}")
+    print(f"  Exporting statistics to {output} ({fmt})")
+    print(f"{'='*70}")
+    try:
+        for module_id in module_ids:
+            questions = chapters = None
+            if with_questions:
+                questions = load_questions(module_id)
+                chapters = {qid: c['name'] for c in load_chapters(module_id) for qid in c['question_ids']}
+            module_start = time.perf_counter()
+            before = writer.rows
+            pages = 0
+            try:
+                for page in _stats_pages(client, module_id, page_size):
+                    writer.write(list(_export_rows(module_id, page, questions, chapters)))
+                    pages += 1
+            except RuntimeError as e:
+                print(f"  ✗ {module_title(module_id)[:24]:<24} {e}")
+                continue
+            print(f"  ✓ {module_title(module_id)[:24]:<24} {writer.rows - before:>6} questions  "
+                  f"{pages:>3} page(s)  {(time.perf_counter() - module_start) * 1000:>7.0f}ms")
+    finally:
+        writer.close()
+    print(f"{'='*70}")
+    print(f"  {writer.rows} rows written in {time.perf_counter() - start:.1f}s")
+    instrumentation.count('rows_exported', writer.rows)
     print(f"{'='*70}\n")
 
 
+LIVE_ENDPOINT = '/api/admin/statistics/live'
+WATCH_MIN_ANSWERS = 3
+
+
+def _question_label(module_id: int, question_id: str, width: int = 40) -> str:
+    try:
+        questions = load_questions(module_id)
+        text = questions[int(question_id)].get('QuestionText', '') if question_id.isdigit() else ''
+    except (KeyError, IndexError, OSError):
+        text = ''
+    text = ' '.join(text.split())
+    return text[:width - 1] + '…' if len(text) > width else text
+
+
+def watch_stats(api_url: str, admin_secret: str, interval: float = 5.0, window: int = 5, top: int = 10,
+                iterations: int = None):
+    client = get_client(api_url, admin_secret)
+    result = client.request(LIVE_ENDPOINT, 'GET')
+    if not result.get('success'):
+        print(f"\n✗ Error: {result.get('error', 'Unknown error')}\n")
+        return
+
+    # Only entries newer than last_id are fetched, and the window counters
+    # are updated incrementally as answers enter and leave it.
+    last_id = result['last_id']
+    limit_hits_today = result.get('limit_hits_today', 0)
+    answers = deque()
+    limits = deque()
+    per_module = Counter()
+    correct_per_module = Counter()
+    per_question = Counter()
+    wrong_per_question = Counter()
+    started = time.time()
+    polls = 0
+    received = 0
+    interactive = sys.stdout.isatty()
+
+    try:
+        while iterations is None or polls < iterations:
+            poll_start = time.perf_counter()
+            more = True
+            while more:
+                result = client.request(f'{LIVE_ENDPOINT}?since={quote(last_id)}', 'GET')
+                if not result.get('success'):
+                    print(f"\n✗ Error: {result.get('error', 'Unknown error')}\n")
+                    return
+                for event in result.get('events', []):
+                    timestamp = int(event['id'].split('-')[0]) / 1000
+                    received += 1
+                    if event['type'] == 'limit':
+                        limits.append(timestamp)
+                        continue
+                    module_id = event['module_id']
+                    for question_id, is_correct in event.get('answers', []):
+                        answers.append((timestamp, module_id, question_id, is_correct))
+                        per_module[module_id] += 1
+                        correct_per_module[module_id] += is_correct
+                        per_question[(module_id, question_id)] += 1
+                        wrong_per_question[(module_id, question_id)] += 1 - is_correct
+                last_id = result.get('last_id', last_id)
+                limit_hits_today = result.get('limit_hits_today', limit_hits_today)
+                more = result.get('more', False)
+            poll_ms = (time.perf_counter() - poll_start) * 1000
+            polls += 1
+
+            now = time.time()
+            cutoff = now - window * 60
+            while answers and answers[0][0] < cutoff:
+                _, module_id, question_id, is_correct = answers.popleft()
+                per_module[module_id] -= 1
+                correct_per_module[module_id] -= is_correct
+                per_question[(module_id, question_id)] -= 1
+                wrong_per_question[(module_id, question_id)] -= 1 - is_correct
+                if per_question[(module_id, question_id)] == 0:
+                    del per_question[(module_id, question_id)], wrong_per_question[(module_id, question_id)]
+            while limits and limits[0] < cutoff:
+                limits.popleft()
+
+            minutes = max(min(window, (now - started) / 60), 1 / 60)
+            if interactive:
+                print('\033[H\033[J', end='')
+            print(f"{'='*80}")
+            print(f"  LearnFMPA Live Statistics - {datetime.now().strftime('%H:%M:%S')}  "
+                  f"(last {window} min, every {interval:g}s, poll {poll_ms:.0f}ms)")
+            print(f"{'='*80}")
+            print(f"  {'ID':<4} {'Module':<28} {'Answers':>8} {'Per min':>8} {'Success':>8}")
+            print(f"  {'-'*60}")
+            for module_id, count in sorted(per_module.items(), key=lambda x: -x[1]):
+                if count <= 0:
+                    continue
+                rate = round(correct_per_module[module_id] / count * 100)
+                print(f"  {module_id:<4} {module_title(module_id)[:28]:<28} {count:>8} {count / minutes:>8.1f} {rate:>7}%")
+            total = len(answers)
+            print(f"  {'-'*60}")
+            print(f"  {'':<4} {'All modules':<28} {total:>8} {total / minutes:>8.1f}")
+
+            failing = [(key, wrong) for key, wrong in wrong_per_question.items()
+                       if wrong > 0 and per_question[key] >= WATCH_MIN_ANSWERS]
+            failing.sort(key=lambda x: (-x[1], -per_question[x[0]]))
+            print(f"\n  Top failing questions (≥{WATCH_MIN_ANSWERS} answers in window)")
+            print(f"  {'Module':<7} {'Q':>5} {'Wrong':>6} {'Fail':>5}  Question")
+            for (module_id, question_id), wrong in failing[:top]:
+                fail = round(wrong / per_question[(module_id, question_id)] * 100)
+                print(f"  {module_id:<7} {question_id:>5} {wrong:>6} {fail:>4}%  {_question_label(module_id, question_id)}")
+            if not failing:
+                print(f"  (none yet)")
+
+            print(f"\n  Daily limit hits: {len(limits)} in window, {limit_hits_today} users today")
+            print(f"  {received} event(s) received over {polls} poll(s); Ctrl+C to stop")
+            print(f"{'='*80}")
+            sys.stdout.flush()
+
+            if iterations is None or polls < iterations:
+                time.sleep(interval)
+    except KeyboardInterrupt:
+        print(f"\n\nStopped.\n")
+
+
 def main():
     parser = argparse.ArgumentParser(
         description="LearnFMPA Statistics Management Script",
@@ -217,7 +678,21 @@ Examples:
   python manage_statistics.py top 1 --sort most-answered
   python manage_statistics.py reset 1
   python manage_statistics.py reset 1 --question 5
+  python manage_statistics.py reset 1 --question 5 --question 12,13
+  python manage_statistics.py reset 1 --chapter 3
+  python manage_statistics.py reset 1 --chapter "Psychopharmacologie"
   python manage_statistics.py summary
+  python manage_statistics.py analyze 1
+  python manage_statistics.py analyze 1 --sort discrimination --min-answers 20
+  python manage_statistics.py analyze 1 --by chapter
+  python manage_statistics.py analyze 2 --by year --format csv -o cardio_years.csv
+  python manage_statistics.py trend 1
+  python manage_statistics.py trend 1 --question 42 --since 2026-10-01
+  python manage_statistics.py trend --hourly
+  python manage_statistics.py export --format parquet -o exam_period.parquet
+  python manage_statistics.py export 1 2 --with-questions --format ndjson
+  python manage_statistics.py watch
+  python manage_statistics.py watch --interval 2 --window 15 --top 5
 """
     )
 
@@ -236,11 +711,43 @@ Examples:
 
     reset_parser = subparsers.add_parser("reset", help="Reset statistics for a module or specific question")
     reset_parser.add_argument("module_id", type=int, help="Module ID")
-    reset_parser.add_argument("--question", default=None, help="Specific question ID to reset")
+    reset_parser.add_argument("--question", action='append', default=None, help="Question ID(s) to reset (repeatable, comma-separated)")
+    reset_parser.add_argument("--chapter", default=None, help="Reset every question of a chapter (chapter number or name)")
 
     subparsers.add_parser("summary", help="Show summary of statistics across all modules")
 
+    analyze_parser = subparsers.add_parser("analyze", help="Difficulty, discrimination and distractor analysis (requires numpy)")
+    analyze_parser.add_argument("module_id", type=int, help="Module ID")
+    analyze_parser.add_argument("--by", choices=['question', 'chapter', 'subtopic', 'year'], default='question', help="Rank questions or aggregate by chapter / Subtopic / YearAsked")
+    analyze_parser.add_argument("--sort", choices=['difficulty', 'discrimination', 'weak_distractors', 'answers'], default=None, help="Ranking metric (default: difficulty)")
+    analyze_parser.add_argument("--min-answers", type=int, default=1, help="Ignore questions with fewer answers")
+    analyze_parser.add_argument("--limit", type=int, default=20, help="Rows to show (0 for all)")
+    analyze_parser.add_argument("--format", choices=['table', 'csv', 'json'], default='table', help="Output format")
+    analyze_parser.add_argument("-o", "--output", default=None, help="Write csv/json output to a file")
+
+    trend_parser = subparsers.add_parser("trend", help="Answers and success over time (daily or hourly buckets)")
+    trend_parser.add_argument("module_id", type=int, nargs='?', default=None, help="Module ID (default: all modules combined)")
+    trend_parser.add_argument("--question", default=None, help="Trend of a single question")
+    trend_parser.add_argument("--hourly", action='store_true', help="Hourly buckets (last 7 days per module, 24 hours per question) instead of daily (90 days)")
+    trend_parser.add_argument("--window", type=int, default=None, help="Rolling window in buckets (default: 7 days or 24 hours)")
+    trend_parser.add_argument("--since", default=None, help="Compare success before and since this date (e.g. an explanation fix)")
+
+    export_parser = subparsers.add_parser("export", help="Stream statistics to CSV, NDJSON or Parquet, page by page")
+    export_parser.add_argument("module_ids", type=int, nargs='*', help="Module IDs (default: all modules)")
+    export_parser.add_argument("--format", choices=['csv', 'ndjson', 'parquet'], default='csv', help="Output format (parquet requires pyarrow)")
+    export_parser.add_argument("-o", "--output", default=None, help="Output file (default: statistics_<timestamp>.<format>)")
+    export_parser.add_argument("--with-questions", action='store_true', help="Add chapter, Subtopic, year, answer key and question text")
+    export_parser.add_argument("--page-size", type=int, default=500, help="Questions per request (max 1000)")
+
+    watch_parser = subparsers.add_parser("watch", help="Live answers per minute, failing questions and daily-limit hits")
+    watch_parser.add_argument("--interval", type=float, default=5.0, help="Seconds between polls (default: 5)")
+    watch_parser.add_argument("--window", type=int, default=5, help="Sliding window in minutes (default: 5)")
+    watch_parser.add_argument("--top", type=int, default=10, help="Failing questions to show (default: 10)")
+    watch_parser.add_argument("--iterations", type=int, default=None, help="Stop after N refreshes (default: run until Ctrl+C)")
+
+    instrumentation.add_arguments(parser)
     args = parser.parse_args()
+    instrumentation.start(args)
 
     api_url = args.url
     admin_secret = args.secret
@@ -256,9 +763,20 @@ Examples:
     elif args.command == "top":
         show_top(api_url, admin_secret, args.module_id, args.sort)
     elif args.command == "reset":
-        reset_stats(api_url, admin_secret, args.module_id, args.question)
+        reset_stats(api_url, admin_secret, args.module_id, args.question, args.chapter)
     elif args.command == "summary":
         show_summary(api_url, admin_secret)
+    elif args.command == "analyze":
+        analyze_module(api_url, admin_secret, args.module_id, args.by, args.sort,
+                       args.min_answers, args.limit or None, args.format, args.output)
+    elif args.command == "trend":
+        show_trend(api_url, admin_secret, args.module_id, args.question,
+                   'hourly' if args.hourly else 'daily', args.window, args.since)
+    elif args.command == "export":
+        export_stats(api_url, admin_secret, args.module_ids, args.format, args.output,
+                     args.with_questions, args.page_size)
+    elif args.command == "watch":
+        watch_stats(api_url, admin_secret, max(args.interval, 1.0), args.window, args.top, args.iterations)
 
 
 if __name__ == "__main__":
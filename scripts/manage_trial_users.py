@@ -17,58 +17,28 @@ Usage:
   python manage_trial_users.py activate "email@example.com"
   python manage_trial_users.py delete "email@example.com"
   python manage_trial_users.py stats
+  python manage_trial_users.py --offline list --active
+  python manage_trial_users.py list --where "years~3ème expires<2d sort=expires"
 
 Set environment variables:
   API_URL      - Your Vercel deployment URL (default: https://www.learnfmpa.com)
   ADMIN_SECRET - Admin secret key (default: learnfmpa2024)
 """
 
-import json
 import os
 import argparse
-import urllib.request
-import urllib.error
-import urllib.parse
 from datetime import datetime, timedelta, timezone
 
+from admin_client import api_request
+from user_cache import get_user, is_offline, load_users, set_offline, snapshot_age
+from user_query import QueryError, run_query
+import instrumentation
+
 DEFAULT_API_URL = os.environ.get("API_URL", "https://www.learnfmpa.com")
 DEFAULT_ADMIN_SECRET = os.environ.get("ADMIN_SECRET", "learnfmpa2024")
 TRIAL_DAYS = 7
 DEFAULT_CONVERT_DAYS = 150
-
-
-def api_request(
-    api_url: str,
-    admin_secret: str,
-    endpoint: str,
-    method: str = "GET",
-    data: dict = None,
-) -> dict:
-    url = f"{api_url}{endpoint}"
-    headers = {"Content-Type": "application/json"}
-
-    if "admin_secret" not in endpoint:
-        url = f"{url}{'?' if '?' not in url else '&'}admin_secret={admin_secret}"
-
-    req_data = None
-    if data:
-        data["admin_secret"] = admin_secret
-        req_data = json.dumps(data).encode("utf-8")
-
-    try:
-        req = urllib.request.Request(url, data=req_data, headers=headers, method=method)
-        with urllib.request.urlopen(req, timeout=30) as response:
-            return json.loads(response.read().decode("utf-8"))
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode("utf-8")
-        try:
-            return json.loads(error_body)
-        except Exception:
-            return {"error": error_body}
-    except urllib.error.URLError as e:
-        return {"error": f"Cannot connect to {api_url}: {e}"}
-    except Exception as e:
-        return {"error": str(e)}
+OFFLINE_COMMANDS = ["list", "details", "stats"]
 
 
 def is_trial_expired(user: dict) -> bool:
@@ -112,18 +82,22 @@ def compute_trial_status(user: dict) -> str:
     return "Active Trial"
 
 
-def list_trial_users(api_url: str, admin_secret: str, show_active: bool = False, show_expired: bool = False):
-    result = api_request(api_url, admin_secret, "/api/admin/users", "GET")
+def list_trial_users(api_url: str, admin_secret: str, show_active: bool = False, show_expired: bool = False, where: str = None):
+    result = load_users(api_url, admin_secret)
 
     if not result.get("success"):
         print(f"\n✗ Error: {result.get('error', 'Unknown error')}\n")
         return
 
     users = result.get("users", [])
-    trial_users = [u for u in users if u.get("is_trial", False)]
+    try:
+        trial_users = run_query(users, f"trial=yes {where or ''}")
+    except QueryError as e:
+        print(f"\n✗ Error: {e}\n")
+        return
 
     if not trial_users:
-        print("\nNo trial users found.\n")
+        print("\nNo trial users found.\n" if not where else "\nNo trial users matching the filter.\n")
         return
 
     if show_active:
@@ -165,13 +139,12 @@ def list_trial_users(api_url: str, admin_secret: str, show_active: bool = False,
 
     print(f"{'=' * 160}")
     print(f"Total trial users: {len(trial_users)}")
-    print(f"API: {api_url}\n")
+    instrumentation.count("trial_users_listed", len(trial_users))
+    print(f"API: {api_url} (snapshot fetched {snapshot_age(result)}{', offline' if is_offline() else ''})\n")
 
 
 def get_trial_details(api_url: str, admin_secret: str, email: str):
-    result = api_request(
-        api_url, admin_secret, f"/api/admin/users?email={email}", "GET"
-    )
+    result = get_user(api_url, admin_secret, email)
 
     if not result.get("success"):
         print(f"\n✗ Error: {result.get('error', 'Unknown error')}\n")
@@ -221,9 +194,7 @@ def get_trial_details(api_url: str, admin_secret: str, email: str):
 
 
 def convert_trial_user(api_url: str, admin_secret: str, email: str, activation_days: int = None):
-    result = api_request(
-        api_url, admin_secret, f"/api/admin/users?email={email}", "GET"
-    )
+    result = get_user(api_url, admin_secret, email)
 
     if not result.get("success"):
         print(f"\n✗ Error: {result.get('error', 'Unknown error')}\n")
@@ -257,9 +228,7 @@ def convert_trial_user(api_url: str, admin_secret: str, email: str, activation_d
 
 
 def extend_trial(api_url: str, admin_secret: str, email: str, extra_days: int):
-    result = api_request(
-        api_url, admin_secret, f"/api/admin/users?email={email}", "GET"
-    )
+    result = get_user(api_url, admin_secret, email)
 
     if not result.get("success"):
         print(f"\n✗ Error: {result.get('error', 'Unknown error')}\n")
@@ -291,9 +260,7 @@ def extend_trial(api_url: str, admin_secret: str, email: str, extra_days: int):
 
 
 def deactivate_trial_user(api_url: str, admin_secret: str, email: str):
-    result = api_request(
-        api_url, admin_secret, f"/api/admin/users?email={email}", "GET"
-    )
+    result = get_user(api_url, admin_secret, email)
 
     if not result.get("success"):
         print(f"\n✗ Error: {result.get('error', 'Unknown error')}\n")
@@ -319,9 +286,7 @@ def deactivate_trial_user(api_url: str, admin_secret: str, email: str):
 
 
 def activate_trial_user(api_url: str, admin_secret: str, email: str):
-    result = api_request(
-        api_url, admin_secret, f"/api/admin/users?email={email}", "GET"
-    )
+    result = get_user(api_url, admin_secret, email)
 
     if not result.get("success"):
         print(f"\n✗ Error: {result.get('error', 'Unknown error')}\n")
@@ -347,9 +312,7 @@ def activate_trial_user(api_url: str, admin_secret: str, email: str):
 
 
 def delete_trial_user(api_url: str, admin_secret: str, email: str):
-    result = api_request(
-        api_url, admin_secret, f"/api/admin/users?email={email}", "GET"
-    )
+    result = get_user(api_url, admin_secret, email)
 
     if not result.get("success"):
         print(f"\n✗ Error: {result.get('error', 'Unknown error')}\n")
@@ -376,7 +339,7 @@ def delete_trial_user(api_url: str, admin_secret: str, email: str):
 
 
 def show_trial_stats(api_url: str, admin_secret: str):
-    result = api_request(api_url, admin_secret, "/api/admin/users", "GET")
+    result = load_users(api_url, admin_secret)
 
     if not result.get("success"):
         print(f"\n✗ Error: {result.get('error', 'Unknown error')}\n")
@@ -433,6 +396,10 @@ Examples:
     parser.add_argument(
         "--secret", default=DEFAULT_ADMIN_SECRET, help="Override admin secret"
     )
+    parser.add_argument(
+        "--offline", action="store_true",
+        help="Answer read-only commands from the local user snapshot without contacting the API"
+    )
 
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
 
@@ -440,6 +407,10 @@ Examples:
     list_group = list_parser.add_mutually_exclusive_group()
     list_group.add_argument("--active", action="store_true", help="Show only active trials")
     list_group.add_argument("--expired", action="store_true", help="Show only expired trials")
+    list_parser.add_argument(
+        "--where", default=None,
+        help="Filter expression from user_query.py, e.g. \"years~3ème expires<2d sort=expires\""
+    )
 
     details_parser = subparsers.add_parser("details", help="Get trial user details")
     details_parser.add_argument("email", help="Trial user's email address")
@@ -469,7 +440,9 @@ Examples:
     delete_parser = subparsers.add_parser("delete", help="Delete a trial user")
     delete_parser.add_argument("email", help="Trial user's email address")
 
+    instrumentation.add_arguments(parser)
     args = parser.parse_args()
+    instrumentation.start(args)
 
     api_url = args.url
     admin_secret = args.secret
@@ -478,10 +451,17 @@ Examples:
         parser.print_help()
         return
 
-    print(f"\n📡 Connecting to: {api_url}")
+    if args.offline:
+        if args.command not in OFFLINE_COMMANDS:
+            print(f"\n✗ '{args.command}' modifies users and cannot run with --offline.\n")
+            return
+        set_offline(True)
+        print(f"\n📦 Offline: using cached user snapshot for {api_url}")
+    else:
+        print(f"\n📡 Connecting to: {api_url}")
 
     if args.command == "list":
-        list_trial_users(api_url, admin_secret, show_active=args.active, show_expired=args.expired)
+        list_trial_users(api_url, admin_secret, show_active=args.active, show_expired=args.expired, where=args.where)
     elif args.command == "details":
         get_trial_details(api_url, admin_secret, args.email)
     elif args.command == "convert":
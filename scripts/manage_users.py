@@ -17,30 +17,47 @@ Usage:
   python manage_users.py activate "student@edu.uiz.ac.ma" --days 30
   python manage_users.py activate-batch --edu
   python manage_users.py activate-batch --edu --paid --days 3650
+  python manage_users.py activate-batch --edu --workers 8 --output activations.csv
+  python manage_users.py activate-batch --edu --mail eml
   python manage_users.py list
+  python manage_users.py --offline list --edu
+  python manage_users.py list --where "sub=paid years~3ème"
+  python manage_users.py query "expires<7d sort=expires" --format csv -o expiring.csv
   python manage_users.py details "student@edu.uiz.ac.ma"
   python manage_users.py set-subscription "student@edu.uiz.ac.ma" paid
   python manage_users.py set-days "student@edu.uiz.ac.ma" 30
   python manage_users.py reset "student@edu.uiz.ac.ma"
   python manage_users.py deactivate "student@edu.uiz.ac.ma"
   python manage_users.py delete "student@edu.uiz.ac.ma"
-  python manage_users.py progress "student@edu.uiz.ac.ma"
+  python manage_users.py progress "student@edu.uiz.ac.ma" --chapters
+  python manage_users.py progress-report --where "sub=paid years~3ème"
 
 Environment Variables:
-  API_URL       - API endpoint (default: https://www.learnfmpa.com)
-  ADMIN_SECRET  - Admin key (default: learnfmpa2024)
+  API_URL             - API endpoint (default: https://www.learnfmpa.com)
+  ADMIN_SECRET        - Admin key (default: learnfmpa2024)
+  LEARNFMPA_CACHE_DIR - User snapshot cache (default: ~/.cache/learnfmpa)
 """
 
+import csv
 import json
 import os
+import random
 import secrets
 import string
+import sys
+import time
 import argparse
-import urllib.request
-import urllib.error
 import urllib.parse
 import webbrowser
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+
+from admin_client import api_request, get_client
+from user_cache import get_user, is_offline, load_users, set_offline, snapshot_age
+from user_query import QueryError, run_query, write_results
+from progress_engine import ProgressEngine, class_summary
+import instrumentation
 
 
 DEFAULT_API_URL = os.environ.get("API_URL", "https://www.learnfmpa.com")
@@ -57,38 +74,48 @@ VALID_YEARS = [
 
 VALID_STATUSES = ["inactive", "free", "paid"]
 
+OFFLINE_COMMANDS = ["list", "details", "query"]
+
+BATCH_WORKERS = 4
+BATCH_CHUNK_USERS = 100
+BULK_MAX_ACTIONS = 500
+BULK_CONFLICT_RETRIES = 5
+BULK_CONFLICT_BACKOFF = 0.2
+
 
 def generate_temp_password(length: int = 12) -> str:
     alphabet = string.ascii_letters + string.digits + "!@#$%^&*"
     return "".join(secrets.choice(alphabet) for _ in range(length))
 
 
-def api_request(api_url, admin_secret, endpoint, method="GET", data=None):
-    url = f"{api_url}{endpoint}"
-    headers = {"Content-Type": "application/json"}
-
-    if "admin_secret" not in endpoint:
-        url = f"{url}{'?' if '?' not in url else '&'}admin_secret={admin_secret}"
-
-    req_data = None
-    if data:
-        data["admin_secret"] = admin_secret
-        req_data = json.dumps(data).encode("utf-8")
-
-    try:
-        req = urllib.request.Request(url, data=req_data, headers=headers, method=method)
-        with urllib.request.urlopen(req, timeout=30) as response:
-            return json.loads(response.read().decode("utf-8"))
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode("utf-8")
-        try:
-            return json.loads(error_body)
-        except Exception:
-            return {"error": error_body}
-    except urllib.error.URLError as e:
-        return {"error": f"Cannot connect to {api_url}: {e}"}
-    except Exception as e:
-        return {"error": str(e)}
+def api_bulk(api_url, admin_secret, actions):
+    """Apply admin user actions with one POST (one users load/save) per 500 actions.
+
+    Returns one result per action, in order. Falls back to one request per
+    action only when the server rejects "bulk" as an unknown action (it does
+    not support the format yet); any other failure is reported for every
+    action of the chunk, since the server may have applied it.
+    """
+    client = get_client(api_url, admin_secret)
+    results = []
+    for start in range(0, len(actions), BULK_MAX_ACTIONS):
+        chunk = actions[start:start + BULK_MAX_ACTIONS]
+        response = client.request("/api/admin/users", "POST", {"action": "bulk", "actions": chunk})
+        # A conflict means concurrent writers won every compare-and-set and
+        # nothing was saved: back off (with jitter, so chunks spread out) and resend
+        for attempt in range(BULK_CONFLICT_RETRIES):
+            if not response.get("conflict"):
+                break
+            delay = BULK_CONFLICT_BACKOFF * (2 ** attempt)
+            time.sleep(delay + random.uniform(0, delay))
+            response = client.request("/api/admin/users", "POST", {"action": "bulk", "actions": chunk})
+        if isinstance(response.get("results"), list):
+            results.extend(response["results"])
+        elif response.get("error", "").startswith("Action inconnue"):
+            results.extend(client.request("/api/admin/users", "POST", action) for action in chunk)
+        else:
+            results.extend(response for _ in chunk)
+    return results
 
 
 def add_user(api_url, admin_secret, name, email, temp_password=None, years=None, activation_days=None, has_paid=False, subscription_status=None):
@@ -165,49 +192,61 @@ def add_user(api_url, admin_secret, name, email, temp_password=None, years=None,
         print(f"\n  Error: {result.get('error', 'Unknown error')}\n")
 
 
+def build_activation_email(user_name, email, temp_password, plan_line, login_url):
+    subject = "\U0001f680 Votre compte LearnFMPA est activ\u00e9 !"
+    body = (
+        f"Bonjour {user_name},\n\n"
+        f"\U0001f389 Bonne nouvelle : votre compte LearnFMPA est maintenant activ\u00e9 !\n\n"
+        f"Vous pouvez d\u00e8s \u00e0 pr\u00e9sent acc\u00e9der \u00e0 toutes les annales de m\u00e9decine et commencer \u00e0 r\u00e9viser efficacement. J'ai con\u00e7u cette plateforme pour que chaque \u00e9tudiant puisse progresser \u00e0 son rythme, avec des outils pens\u00e9s pour la r\u00e9ussite.\n\n"
+        f"\U0001f511 Vos identifiants de connexion :\n"
+        f"   \U0001f4e7  Email : {email}\n"
+        f"   \U0001f510  Mot de passe temporaire : {temp_password}\n"
+        f"   {plan_line}\n\n"
+        f"\u26a0\ufe0f  Important : veuillez changer ce mot de passe lors de votre premi\u00e8re connexion.\n\n"
+        f"\U0001f449 Connectez-vous ici : {login_url}\n\n"
+        f"\U0001f4ab Ce qui vous attend :\n"
+        f"   \u2022 Des annales class\u00e9es par module et par ann\u00e9e\n"
+        f"   \u2022 Des corrections r\u00e9dig\u00e9es par des enseignants\n"
+        f"   \u2022 Un tableau de bord pour suivre votre progression\n"
+        f"   \u2022 Un mode entra\u00eenement pour vous tester\n\n"
+        f"Si vous avez besoin d'aide, n'h\u00e9sitez pas \u00e0 me contacter. Je suis l\u00e0 pour \u00e7a.\n\n"
+        f"\U0001f4aa Bonnes r\u00e9visions !\n\n"
+        f"Cherellement,\n"
+        f"Le cr\u00e9ateur de LearnFMPA"
+    )
+    return subject, body
+
+
+def build_activation_mailto(user_name, email, temp_password, plan_line, login_url):
+    subject, body = build_activation_email(user_name, email, temp_password, plan_line, login_url)
+    encoded_subject = urllib.parse.quote(subject)
+    encoded_body = urllib.parse.quote(body)
+    return f"mailto:{email}?subject={encoded_subject}&body={encoded_body}"
+
+
 def activate_user(api_url, admin_secret, email, paid=False, days=None):
     duration = f"{days}" if days else "7"
-    user_result = api_request(api_url, admin_secret, f"/api/admin/users?email={email}", "GET")
+    user_result = get_user(api_url, admin_secret, email)
     user_name = email
     if user_result.get("success"):
         user_name = user_result.get("user", {}).get("name", email)
 
-    result = api_request(api_url, admin_secret, "/api/admin/users", "POST", {
-        "action": "activate",
-        "email": email,
-    })
+    temp_password = generate_temp_password()
+    results = api_bulk(api_url, admin_secret, _activation_actions(email, temp_password, paid, days))
 
-    if not result.get("success"):
-        print(f"\n  Error: {result.get('error', 'Unknown error')}\n")
+    if not results[0].get("success"):
+        print(f"\n  Error: {results[0].get('error', 'Unknown error')}\n")
         return
 
-    if days is not None:
-        api_request(api_url, admin_secret, "/api/admin/users", "POST", {
-            "action": "update_user",
-            "email": email,
-            "activation_days": days,
-        })
-
-    temp_password = generate_temp_password()
-    reset_result = api_request(api_url, admin_secret, "/api/admin/users", "POST", {
-        "action": "reset_password",
-        "email": email,
-        "new_password": temp_password,
-    })
+    if not results[1].get("success"):
+        print(f"\n  Account activated but failed to set temp password: {results[1].get('error')}\n")
+        return
 
-    if not reset_result.get("success"):
-        print(f"\n  Account activated but failed to set temp password: {reset_result.get('error')}\n")
+    if len(results) > 2 and not results[2].get("success"):
+        print(f"\n  Account activated but subscription update failed: {results[2].get('error')}\n")
         return
 
     if paid:
-        update_result = api_request(api_url, admin_secret, "/api/admin/users", "POST", {
-            "action": "update_user",
-            "email": email,
-            "subscription_status": "paid",
-        })
-        if not update_result.get("success"):
-            print(f"\n  Account activated but subscription update failed: {update_result.get('error')}\n")
-            return
         sub = "PAID"
         sub_display = "PAID (acc\u00e8s complet)"
     else:
@@ -221,33 +260,7 @@ def activate_user(api_url, admin_secret, email, paid=False, days=None):
     else:
         plan_line = f"\u2728 Essai Premium de {duration} jours, puis acc\u00e8s gratuit (10 questions expliqu\u00e9es/jour, pratique illimit\u00e9e)"
 
-    subject = "\U0001f680 Votre compte LearnFMPA est activ\u00e9 !"
-    body = (
-        f"Bonjour {user_name},\n\n"
-        f"\U0001f389 Bonne nouvelle : votre compte LearnFMPA est maintenant activ\u00e9 !\n\n"
-        f"Vous pouvez d\u00e8s \u00e0 pr\u00e9sent acc\u00e9der \u00e0 toutes les annales de m\u00e9decine et commencer \u00e0 r\u00e9viser efficacement. J'ai con\u00e7u cette plateforme pour que chaque \u00e9tudiant puisse progresser \u00e0 son rythme, avec des outils pens\u00e9s pour la r\u00e9ussite.\n\n"
-        f"\U0001f511 Vos identifiants de connexion :\n"
-        f"   \U0001f4e7  Email : {email}\n"
-        f"   \U0001f510  Mot de passe temporaire : {temp_password}\n"
-        f"   {plan_line}\n\n"
-        f"\u26a0\ufe0f  Important : veuillez changer ce mot de passe lors de votre premi\u00e8re connexion.\n\n"
-        f"\U0001f449 Connectez-vous ici : {login_url}\n\n"
-        f"\U0001f4ab Ce qui vous attend :\n"
-        f"   \u2022 Des annales class\u00e9es par module et par ann\u00e9e\n"
-        f"   \u2022 Des corrections r\u00e9dig\u00e9es par des enseignants\n"
-        f"   \u2022 Un tableau de bord pour suivre votre progression\n"
-        f"   \u2022 Un mode entra\u00eenement pour vous tester\n\n"
-        f"Si vous avez besoin d'aide, n'h\u00e9sitez pas \u00e0 me contacter. Je suis l\u00e0 pour \u00e7a.\n\n"
-        f"\U0001f4aa Bonnes r\u00e9visions !\n\n"
-        f"Cherellement,\n"
-        f"Le cr\u00e9ateur de LearnFMPA"
-    )
-
-    encoded_subject = urllib.parse.quote(subject)
-    encoded_body = urllib.parse.quote(body)
-    mailto_link = f"mailto:{email}?subject={encoded_subject}&body={encoded_body}"
-
-    webbrowser.open(mailto_link)
+    webbrowser.open(build_activation_mailto(user_name, email, temp_password, plan_line, login_url))
 
     print(f"\n  \u2705 Account activated successfully!")
     print(f"  {'=' * 48}")
@@ -260,14 +273,103 @@ def activate_user(api_url, admin_secret, email, paid=False, days=None):
     print(f"\n  \u2709\ufe0f  Email client opened with pre-filled message for {email}\n")
 
 
-def activate_batch(api_url, admin_secret, emails, paid=False, edu_only=False, days=None):
+def _activation_actions(email, temp_password, paid, days):
+    actions = [
+        {"action": "activate", "email": email},
+        {"action": "reset_password", "email": email, "new_password": temp_password},
+    ]
+    update = {}
+    if paid:
+        update["subscription_status"] = "paid"
+    if days is not None:
+        update["activation_days"] = days
+    if update:
+        actions.append({"action": "update_user", "email": email, **update})
+    return actions
+
+
+def _activation_row(email, temp_password, results):
+    if not results[0].get("success"):
+        return {"email": email, "status": "failed", "error": results[0].get("error", "Failed")}
+    if not results[1].get("success"):
+        return {"email": email, "status": "failed", "error": "activated but failed to set temp password"}
+    if len(results) > 2 and not results[2].get("success"):
+        return {
+            "email": email,
+            "status": "partial",
+            "temp_password": temp_password,
+            "error": f"subscription update failed: {results[2].get('error')}",
+        }
+    return {"email": email, "status": "activated", "temp_password": temp_password}
+
+
+def _activate_chunk(api_url, admin_secret, emails, paid, days):
+    passwords = [generate_temp_password() for _ in emails]
+    per_user = [_activation_actions(e, p, paid, days) for e, p in zip(emails, passwords)]
+    results = api_bulk(api_url, admin_secret, [a for actions in per_user for a in actions])
+    rows = []
+    offset = 0
+    for email, password, actions in zip(emails, passwords, per_user):
+        rows.append(_activation_row(email, password, results[offset:offset + len(actions)]))
+        offset += len(actions)
+    return rows
+
+
+def _print_progress(done, total, width=30):
+    filled = int(width * done / total) if total else width
+    bar = "\u2588" * filled + "\u2591" * (width - filled)
+    sys.stderr.write(f"\r  [{bar}] {done}/{total}")
+    if done == total:
+        sys.stderr.write("\n")
+    sys.stderr.flush()
+
+
+def _open_private(path, mode="w", **kwargs):
+    """Open a file for writing that only the current user can read (it holds temp passwords)."""
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    os.chmod(path, 0o600)
+    return os.fdopen(fd, mode, **kwargs)
+
+
+def write_batch_summary(path, rows):
+    fields = ["email", "name", "status", "temp_password", "error"]
+    if path.endswith(".json"):
+        with _open_private(path, "w", encoding="utf-8") as f:
+            json.dump([{k: r.get(k) for k in fields} for r in rows], f, indent=2, ensure_ascii=False)
+    else:
+        with _open_private(path, "w", encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def write_batch_emails(directory, rows, plan_line, login_url):
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    os.chmod(directory, 0o700)
+    for row in rows:
+        subject, body = build_activation_email(row["name"], row["email"], row["temp_password"], plan_line, login_url)
+        message = EmailMessage()
+        message["To"] = row["email"]
+        message["Subject"] = subject
+        message["X-Unsent"] = "1"
+        message.set_content(body)
+        with _open_private(os.path.join(directory, f"{row['email']}.eml"), "wb") as f:
+            f.write(bytes(message))
+
+
+def activate_batch(api_url, admin_secret, emails, paid=False, edu_only=False, days=None,
+                   workers=BATCH_WORKERS, output=None, mail="none"):
+    # One (cached) user list gives both the --edu selection and every name
+    # for the emails, instead of one GET per activated user.
+    result = load_users(api_url, admin_secret)
+    if not result.get("success"):
+        print(f"\n  Error: {result.get('error', 'Unknown error')}\n")
+        return
+    all_users = result.get("users", [])
+    names = {u.get("email", "").lower(): u.get("name") for u in all_users}
+
     if edu_only:
-        print("  Fetching inactive @edu.uiz.ac.ma accounts...")
-        result = api_request(api_url, admin_secret, "/api/admin/users", "GET")
-        if not result.get("success"):
-            print(f"\n  Error: {result.get('error', 'Unknown error')}\n")
-            return
-        all_users = result.get("users", [])
+        print("  Selecting inactive @edu.uiz.ac.ma accounts...")
         emails = [u["email"] for u in all_users if u.get("email", "").endswith("@edu.uiz.ac.ma") and not u.get("is_active", True)]
         if not emails:
             print("\n  No inactive @edu.uiz.ac.ma accounts found.\n")
@@ -277,104 +379,84 @@ def activate_batch(api_url, admin_secret, emails, paid=False, edu_only=False, da
             print(f"    - {e}")
         print()
 
-    success = 0
-    failed = 0
     duration_num = days if days else 7
     duration = f"{duration_num} jours"
     login_url = f"{api_url}/login"
 
     if paid:
-        sub_display = "PAID (acc\u00e8s complet)"
         plan_line = "\U0001f451 Acc\u00e8s complet et illimit\u00e9 \u2014 questions, explications et suivi de progression"
     else:
-        sub_display = f"Essai Premium ({duration}, puis acc\u00e8s gratuit)"
         plan_line = f"\u2728 Essai Premium de {duration_num} jours, puis acc\u00e8s gratuit (10 questions expliqu\u00e9es/jour, pratique illimit\u00e9e)"
 
-    for email in emails:
-        activate_result = api_request(api_url, admin_secret, "/api/admin/users", "POST", {
-            "action": "activate",
-            "email": email,
-        })
-        if not activate_result.get("success"):
-            print(f"  \u2717 {email}: {activate_result.get('error', 'Failed')}")
-            failed += 1
-            continue
-
-        temp_password = generate_temp_password()
-        reset_result = api_request(api_url, admin_secret, "/api/admin/users", "POST", {
-            "action": "reset_password",
-            "email": email,
-            "new_password": temp_password,
-        })
-
-        if not reset_result.get("success"):
-            print(f"  \u2248 {email}: activated but failed to set temp password")
-            failed += 1
-            continue
-
-        if paid:
-            api_request(api_url, admin_secret, "/api/admin/users", "POST", {
-                "action": "update_user",
-                "email": email,
-                "subscription_status": "paid",
-            })
-            print(f"  \u2705 {email}: activated (PAID) | temp: {temp_password}")
+    # Each chunk is one bulk request (one users load/save on the server);
+    # chunks are sent concurrently.
+    chunks = [emails[i:i + BATCH_CHUNK_USERS] for i in range(0, len(emails), BATCH_CHUNK_USERS)]
+    print(f"  Activating {len(emails)} account(s) in {len(chunks)} bulk request(s), {workers} concurrent...")
+    rows = [None] * len(emails)
+    done = 0
+    _print_progress(done, len(emails))
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        futures = {executor.submit(_activate_chunk, api_url, admin_secret, chunk, paid, days): i for i, chunk in enumerate(chunks)}
+        for future in as_completed(futures):
+            i = futures[future]
+            try:
+                chunk_rows = future.result()
+            except Exception as e:
+                chunk_rows = [{"email": email, "status": "failed", "error": str(e)} for email in chunks[i]]
+            for j, row in enumerate(chunk_rows):
+                row["name"] = names.get(row["email"].lower()) or row["email"]
+                rows[i * BATCH_CHUNK_USERS + j] = row
+            done += len(chunk_rows)
+            _print_progress(done, len(emails))
+
+    print()
+    for row in rows:
+        if row["status"] == "activated":
+            print(f"  \u2705 {row['email']}: activated ({'PAID' if paid else f'TRIAL {duration}'}) | temp: {row['temp_password']}")
+        elif row["status"] == "partial":
+            print(f"  \u2248 {row['email']}: {row['error']} | temp: {row['temp_password']}")
         else:
-            print(f"  \u2705 {email}: activated (TRIAL {duration}) | temp: {temp_password}")
+            print(f"  \u2717 {row['email']}: {row['error']}")
 
-        if days is not None:
-            api_request(api_url, admin_secret, "/api/admin/users", "POST", {
-                "action": "update_user",
-                "email": email,
-                "activation_days": days,
-            })
-
-        user_result = api_request(api_url, admin_secret, f"/api/admin/users?email={email}", "GET")
-        user_name = email
-        if user_result.get("success"):
-            user_name = user_result.get("user", {}).get("name", email)
-
-        subject = "\U0001f680 Votre compte LearnFMPA est activ\u00e9 !"
-        body = (
-            f"Bonjour {user_name},\n\n"
-            f"\U0001f389 Bonne nouvelle : votre compte LearnFMPA est maintenant activ\u00e9 !\n\n"
-            f"Vous pouvez d\u00e8s \u00e0 pr\u00e9sent acc\u00e9der \u00e0 toutes les annales de m\u00e9decine et commencer \u00e0 r\u00e9viser efficacement. J'ai con\u00e7u cette plateforme pour que chaque \u00e9tudiant puisse progresser \u00e0 son rythme, avec des outils pens\u00e9s pour la r\u00e9ussite.\n\n"
-            f"\U0001f511 Vos identifiants de connexion :\n"
-            f"   \U0001f4e7  Email : {email}\n"
-            f"   \U0001f510  Mot de passe temporaire : {temp_password}\n"
-            f"   {plan_line}\n\n"
-            f"\u26a0\ufe0f  Important : veuillez changer ce mot de passe lors de votre premi\u00e8re connexion.\n\n"
-            f"\U0001f449 Connectez-vous ici : {login_url}\n\n"
-            f"\U0001f4ab Ce qui vous attend :\n"
-            f"   \u2022 Des annales class\u00e9es par module et par ann\u00e9e\n"
-            f"   \u2022 Des corrections r\u00e9dig\u00e9es par des enseignants\n"
-            f"   \u2022 Un tableau de bord pour suivre votre progression\n"
-            f"   \u2022 Un mode entra\u00eenement pour vous tester\n\n"
-            f"Si vous avez besoin d'aide, n'h\u00e9sitez pas \u00e0 me contacter. Je suis l\u00e0 pour \u00e7a.\n\n"
-            f"\U0001f4aa Bonnes r\u00e9visions !\n\n"
-            f"Cherellement,\n"
-            f"Le cr\u00e9ateur de LearnFMPA"
-        )
-
-        encoded_subject = urllib.parse.quote(subject)
-        encoded_body = urllib.parse.quote(body)
-        mailto_link = f"mailto:{email}?subject={encoded_subject}&body={encoded_body}"
-        webbrowser.open(mailto_link)
+    activated = [r for r in rows if r.get("temp_password")]
+    failed = len(rows) - len([r for r in rows if r["status"] == "activated"])
+    sub_type = "PAID" if paid else f"TRIAL ({duration})"
+    print(f"\n  \u2705 Batch activation complete ({sub_type}): {len(rows) - failed} activated, {failed} failed.")
+    instrumentation.count("users_activated", len(rows) - failed)
+    instrumentation.count("users_failed", failed)
 
-        success += 1
+    if output:
+        write_batch_summary(output, rows)
+        print(f"  \U0001f4c4 Summary with temporary passwords written to {os.path.abspath(output)} (readable by you only)")
 
-    sub_type = "PAID" if paid else f"TRIAL ({duration})"
-    print(f"\n  \u2705 Batch activation complete ({sub_type}): {success} activated, {failed} failed.")
-    print(f"  \u2709\ufe0f  Email client opened for each activated user.\n")
+    if not activated:
+        print()
+        return
+    if mail == "eml":
+        directory = f"activation_emails_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        write_batch_emails(directory, activated, plan_line, login_url)
+        print(f"  \u2709\ufe0f  {len(activated)} pre-filled email(s) written to {os.path.abspath(directory)}/ "
+              f"(readable by you only; open them in your mail client to send, then delete them).\n")
+    elif mail == "browser":
+        for row in activated:
+            webbrowser.open(build_activation_mailto(row["name"], row["email"], row["temp_password"], plan_line, login_url))
+        print(f"  \u2709\ufe0f  Email client opened for each activated user.\n")
+    else:
+        print()
 
 
-def list_users(api_url, admin_secret, edu_only=False):
-    result = api_request(api_url, admin_secret, "/api/admin/users", "GET")
+def list_users(api_url, admin_secret, edu_only=False, where=None):
+    result = load_users(api_url, admin_secret)
 
     if result.get("success"):
         users = result.get("users", [])
-        if edu_only:
-            users = [u for u in users if u.get("email", "").endswith("@edu.uiz.ac.ma")]
+        expression = " ".join(filter(None, ["domain=edu.uiz.ac.ma" if edu_only else None, where]))
+        if expression:
+            try:
+                users = run_query(users, expression)
+            except QueryError as e:
+                print(f"\n  Error: {e}\n")
+                return
         if not users:
             print("\n  No users found.\n")
             return
@@ -395,17 +477,41 @@ def list_users(api_url, admin_secret, edu_only=False):
             print(f"{user['email']:<36} {user['name']:<18} {sub:<10} {years_str:<26} {active:<8} {days:<6} {daily:<5}")
 
         print(f"{'=' * 130}")
-        if edu_only:
+        if where:
+            print(f"Matching: {len(users)} users")
+        elif edu_only:
             print(f"Edu accounts: {len(users)}")
         else:
             print(f"Total: {len(users)} users")
-        print(f"API: {api_url}\n")
+        instrumentation.count("users_listed", len(users))
+        print(f"API: {api_url} (snapshot fetched {snapshot_age(result)}{', offline' if is_offline() else ''})\n")
     else:
         print(f"\n  Error: {result.get('error', 'Unknown error')}\n")
 
 
+def query_users(api_url, admin_secret, expression, fmt="table", columns=None, output=None):
+    result = load_users(api_url, admin_secret)
+    if not result.get("success"):
+        print(f"\n  Error: {result.get('error', 'Unknown error')}\n")
+        return
+
+    try:
+        users = run_query(result.get("users", []), expression)
+    except QueryError as e:
+        print(f"\n  Error: {e}\n")
+        return
+
+    if fmt == "table" and not output:
+        print()
+    write_results(users, fmt, columns, output)
+    if output:
+        print(f"\n  \U0001f4c4 {len(users)} users written to {output}\n")
+    elif fmt == "table":
+        print(f"Matching: {len(users)} users (snapshot fetched {snapshot_age(result)}{', offline' if is_offline() else ''})\n")
+
+
 def get_user_details(api_url, admin_secret, email):
-    result = api_request(api_url, admin_secret, f"/api/admin/users?email={email}", "GET")
+    result = get_user(api_url, admin_secret, email)
 
     if result.get("success"):
         user = result.get("user", {})
@@ -524,15 +630,16 @@ def reset_password(api_url, admin_secret, email, new_password=None):
     if not new_password:
         new_password = generate_temp_password()
 
+    user_result = get_user(api_url, admin_secret, email)
+    user_name = email
+    if user_result.get("success"):
+        user_name = user_result.get("user", {}).get("name", email)
+
     result = api_request(api_url, admin_secret, "/api/admin/users", "POST", {
         "action": "reset_password", "email": email, "new_password": new_password,
     })
 
     if result.get("success"):
-        user_result = api_request(api_url, admin_secret, f"/api/admin/users?email={email}", "GET")
-        user_name = email
-        if user_result.get("success"):
-            user_name = user_result.get("user", {}).get("name", email)
 
         login_url = f"{api_url}/login"
         subject = "\U0001f512 R\u00e9initialisation de votre mot de passe LearnFMPA"
@@ -591,26 +698,142 @@ def delete_user(api_url, admin_secret, email):
         print(f"\n  Error: {result.get('error', 'Unknown error')}\n")
 
 
-def show_progress(api_url, admin_secret, email):
-    result = api_request(api_url, admin_secret, f"/api/admin/users/progress?email={email}", "GET")
+def _bar(fraction, width=20):
+    filled = min(width, int(round(width * fraction)))
+    return "\u2588" * filled + "\u2591" * (width - filled)
 
-    if result.get("success"):
-        progress = result.get("progress", {})
-        print(f"\n{'=' * 60}")
-        print(f"Progress for: {email}")
-        print(f"{'=' * 60}")
-
-        total_answered = 0
-        for key, value in progress.items():
-            if key.startswith("module_"):
-                answered = len([k for k, v in value.items() if v]) if isinstance(value, dict) else 0
-                total_answered += answered
-                print(f"  {key}: {answered} questions answered")
-
-        print(f"\n  Total questions answered: {total_answered}")
-        print(f"{'=' * 60}\n")
-    else:
+
+def _percent(value):
+    return f"{round(value * 100)}%" if value is not None else "-"
+
+
+def show_progress(api_url, admin_secret, email, chapters=False):
+    result = api_request(api_url, admin_secret, f"/api/admin/users/progress?email={urllib.parse.quote(email)}", "GET")
+
+    if not result.get("success"):
+        print(f"\n  Error: {result.get('error', 'Unknown error')}\n")
+        return
+
+    modules = ProgressEngine().score(result.get("progress", {}))
+    print(f"\n{'=' * 78}")
+    print(f"Progress for: {email}")
+    print(f"{'=' * 78}")
+    if not modules:
+        print(f"  No questions answered yet.")
+        print(f"{'=' * 78}\n")
+        return
+
+    print(f"  {'Module':<26} {'Answered':>10} {'Done':>6}  {'':<20} {'Accuracy':>8}")
+    print(f"  {'-' * 74}")
+    for module in modules:
+        print(f"  {module['title'][:26]:<26} {module['answered']:>5}/{module['questions']:<4} "
+              f"{_percent(module['completion']):>6}  {_bar(module['completion'])} {_percent(module['accuracy']):>8}")
+        if chapters:
+            for chapter in module["chapters"]:
+                if chapter["answered"]:
+                    print(f"    {chapter['id']:>2}. {chapter['name'][:20]:<20} {chapter['answered']:>5}/{chapter['questions']:<4} "
+                          f"{_percent(chapter['completion']):>6}  {_bar(chapter['completion'])} {_percent(chapter['accuracy']):>8}")
+        if module["stale"]:
+            print(f"    ({module['stale']} answers to questions no longer in this module)")
+
+    answered = sum(m["answered"] for m in modules)
+    correct = sum(m["correct"] for m in modules)
+    print(f"  {'-' * 74}")
+    print(f"  Total questions answered: {answered}  (accuracy {_percent(correct / answered if answered else None)})")
+    print(f"{'=' * 78}\n")
+
+
+def _fetch_progress(client, email):
+    result = client.request(f"/api/admin/users/progress?email={urllib.parse.quote(email)}", "GET")
+    return email, result
+
+
+def progress_report(api_url, admin_secret, where=None, module_id=None, chapters=False, workers=BATCH_WORKERS,
+                    output=None):
+    result = load_users(api_url, admin_secret)
+    if not result.get("success"):
         print(f"\n  Error: {result.get('error', 'Unknown error')}\n")
+        return
+
+    users = result.get("users", [])
+    if where:
+        try:
+            users = run_query(users, where)
+        except QueryError as e:
+            print(f"\n  Error: {e}\n")
+            return
+    emails = [u["email"] for u in users if u.get("email")]
+    if not emails:
+        print(f"\n  No matching users.\n")
+        return
+
+    engine = ProgressEngine([module_id] if module_id else None)
+    if not engine.layouts:
+        print(f"\n  Error: unknown module {module_id}\n")
+        return
+
+    client = get_client(api_url, admin_secret)
+    progress_by_user = {}
+    failed = []
+    done = 0
+    _print_progress(done, len(emails))
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(emails)))) as executor:
+        futures = [executor.submit(_fetch_progress, client, email) for email in emails]
+        for future in as_completed(futures):
+            email, response = future.result()
+            if response.get("success"):
+                progress_by_user[email] = response.get("progress", {})
+            else:
+                failed.append(email)
+            done += 1
+            _print_progress(done, len(emails))
+
+    summary = class_summary(engine, progress_by_user)
+    instrumentation.count("students_reported", len(progress_by_user))
+    instrumentation.count("students_failed", len(failed))
+
+    if output:
+        rows = []
+        for email, progress in sorted(progress_by_user.items()):
+            for module in engine.score(progress):
+                rows.append({
+                    "email": email,
+                    "module_id": module["module_id"],
+                    "module": module["title"],
+                    "answered": module["answered"],
+                    "questions": module["questions"],
+                    "completion": module["completion"],
+                    "accuracy": module["accuracy"],
+                })
+        fields = ["email", "module_id", "module", "answered", "questions", "completion", "accuracy"]
+        if output.endswith(".json"):
+            with open(output, "w", encoding="utf-8") as f:
+                json.dump({"modules": summary, "students": rows}, f, indent=2, ensure_ascii=False)
+        else:
+            with open(output, "w", encoding="utf-8", newline="") as f:
+                writer = csv.DictWriter(f, fieldnames=fields)
+                writer.writeheader()
+                writer.writerows(rows)
+
+    print(f"\n{'=' * 88}")
+    print(f"  Class Progress Report - {len(progress_by_user)} students" + (f" matching \"{where}\"" if where else ""))
+    print(f"{'=' * 88}")
+    print(f"  {'ID':<4} {'Module':<24} {'Questions':>9} {'Started':>8} {'Mean':>6} {'Median':>7} {'Done':>5} {'Accuracy':>9}")
+    print(f"  {'-' * 84}")
+    for module in summary:
+        print(f"  {module['module_id']:<4} {module['title'][:24]:<24} {module['questions']:>9} {module['students']:>8} "
+              f"{_percent(module['mean_completion']):>6} {_percent(module['median_completion']):>7} "
+              f"{module['completed']:>5} {_percent(module['accuracy']):>9}")
+        if chapters:
+            for chapter in module["chapters"]:
+                print(f"       {chapter['id']:>2}. {chapter['name'][:36]:<36} {chapter['questions']:>5} questions  "
+                      f"mean {_percent(chapter['mean_completion']):>4}  {_bar(chapter['mean_completion'], 15)}")
+    print(f"{'=' * 88}")
+    if failed:
+        print(f"  {len(failed)} user(s) could not be fetched: {', '.join(failed[:5])}{' ...' if len(failed) > 5 else ''}")
+    if output:
+        print(f"  \U0001f4c4 Per-student results written to {output}")
+    print()
 
 
 def main():
@@ -640,6 +863,14 @@ Examples:
   # List only edu accounts
   python manage_users.py list --edu
 
+  # Query the local user snapshot without contacting the API
+  python manage_users.py --offline list --edu
+
+  # Filter with the query language (see user_query.py for all fields)
+  python manage_users.py list --where "sub=paid years~3ème"
+  python manage_users.py query "sub=free trial=no expires<7d sort=expires"
+  python manage_users.py query "domain=edu.uiz.ac.ma created>-30d sort=-created" --format json -o recent.json
+
   # View detailed info for a user (shows trial expiration date)
   python manage_users.py details "a.benali@edu.uiz.ac.ma"
 
@@ -667,6 +898,12 @@ Examples:
   # Batch activate as permanently paid
   python manage_users.py activate-batch --edu --paid --days 365
 
+  # Batch activate 8 bulk requests at a time, save temp passwords (file readable by you only)
+  python manage_users.py activate-batch --edu --workers 8 --output activations.csv
+
+  # Batch activate and write one pre-filled .eml email per user (private directory)
+  python manage_users.py activate-batch --edu --mail eml
+
   # Batch activate specific emails
   python manage_users.py activate-batch a@edu.uiz.ac.ma b@edu.uiz.ac.ma
 
@@ -684,13 +921,19 @@ Examples:
   python manage_users.py deactivate "a.benali@edu.uiz.ac.ma"
   python manage_users.py delete "a.benali@edu.uiz.ac.ma"
 
-  # View user progress
+  # View user progress (per module, --chapters for the chapter breakdown)
   python manage_users.py progress "a.benali@edu.uiz.ac.ma"
+  python manage_users.py progress "a.benali@edu.uiz.ac.ma" --chapters
+
+  # Class-wide completion (progress of every matching user, fetched concurrently)
+  python manage_users.py progress-report --where "sub=paid years~3ème"
+  python manage_users.py progress-report --module 2 --chapters -o cardio_progress.csv
 """,
     )
 
     parser.add_argument("--url", default=DEFAULT_API_URL, help="Override API URL")
     parser.add_argument("--secret", default=DEFAULT_ADMIN_SECRET, help="Override admin secret")
+    parser.add_argument("--offline", action="store_true", help="Answer read-only commands from the local user snapshot without contacting the API")
 
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
 
@@ -705,6 +948,13 @@ Examples:
 
     list_parser = subparsers.add_parser("list", help="List users")
     list_parser.add_argument("--edu", action="store_true", help="Show only @edu.uiz.ac.ma accounts")
+    list_parser.add_argument("--where", default=None, help="Filter expression, e.g. \"sub=paid years~3ème expires<7d\"")
+
+    query_parser = subparsers.add_parser("query", help="Filter and sort users with a query expression")
+    query_parser.add_argument("expression", help="e.g. \"sub=paid years~3ème expires<7d sort=expires limit=20\"")
+    query_parser.add_argument("-f", "--format", choices=["table", "csv", "json"], default="table", help="Output format (default: table)")
+    query_parser.add_argument("-c", "--columns", default=None, help="Comma-separated columns (default: email,name,subscription_status,years,...)")
+    query_parser.add_argument("-o", "--output", default=None, help="Write results to a file instead of stdout")
 
     activate_parser = subparsers.add_parser("activate", help="Activate a registered but inactive user")
     activate_parser.add_argument("email", help="User's @edu.uiz.ac.ma email")
@@ -716,6 +966,9 @@ Examples:
     batch_parser.add_argument("--edu", action="store_true", help="Auto-select all inactive @edu.uiz.ac.ma accounts")
     batch_parser.add_argument("--paid", action="store_true", help="Set all to 'paid' subscription")
     batch_parser.add_argument("--days", type=int, default=None, help="Premium trial duration in days (default: 7)")
+    batch_parser.add_argument("-w", "--workers", type=int, default=BATCH_WORKERS, help=f"Concurrent bulk requests (default: {BATCH_WORKERS})")
+    batch_parser.add_argument("-o", "--output", default=None, help="Write a summary with temp passwords (.csv or .json)")
+    batch_parser.add_argument("--mail", choices=["eml", "browser", "none"], default="none", help="How to prepare activation emails: .eml files holding the temp passwords (private to you), one mailto per user, or none (default)")
 
     reset_parser = subparsers.add_parser("reset", help="Reset user's password")
     reset_parser.add_argument("email", help="User's email")
@@ -744,8 +997,18 @@ Examples:
 
     progress_parser = subparsers.add_parser("progress", help="Show user progress")
     progress_parser.add_argument("email", help="User's email")
+    progress_parser.add_argument("--chapters", action="store_true", help="Show completion and accuracy per chapter")
+
+    report_parser = subparsers.add_parser("progress-report", help="Class-wide completion report over many users")
+    report_parser.add_argument("--where", default=None, help="Only users matching a query expression, e.g. \"sub=paid years~3ème\"")
+    report_parser.add_argument("--module", type=int, default=None, help="Only this module")
+    report_parser.add_argument("--chapters", action="store_true", help="Show mean completion per chapter")
+    report_parser.add_argument("--workers", type=int, default=BATCH_WORKERS, help=f"Concurrent requests (default: {BATCH_WORKERS})")
+    report_parser.add_argument("-o", "--output", default=None, help="Write per-student results (.csv or .json)")
 
+    instrumentation.add_arguments(parser)
     args = parser.parse_args()
+    instrumentation.start(args)
 
     if not args.command:
         parser.print_help()
@@ -754,20 +1017,30 @@ Examples:
     api_url = args.url
     admin_secret = args.secret
 
-    print(f"\n  Connecting to: {api_url}")
+    if args.offline:
+        if args.command not in OFFLINE_COMMANDS:
+            print(f"\n  Error: '{args.command}' modifies users and cannot run with --offline.\n")
+            return
+        set_offline(True)
+        print(f"\n  Offline: using cached user snapshot for {api_url}")
+    else:
+        print(f"\n  Connecting to: {api_url}")
 
     if args.command == "add":
         sub = args.sub or ("paid" if args.paid else "free")
         add_user(api_url, admin_secret, args.name, args.email, args.password, args.year, args.days, args.paid, sub)
     elif args.command == "list":
-        list_users(api_url, admin_secret, args.edu)
+        list_users(api_url, admin_secret, args.edu, args.where)
+    elif args.command == "query":
+        columns = args.columns.split(",") if args.columns else None
+        query_users(api_url, admin_secret, args.expression, args.format, columns, args.output)
     elif args.command == "activate":
         activate_user(api_url, admin_secret, args.email, args.paid, args.days)
     elif args.command == "activate-batch":
         if not args.emails and not args.edu:
             print("\n  Error: provide emails or use --edu to auto-select inactive edu accounts.\n")
             return
-        activate_batch(api_url, admin_secret, args.emails, args.paid, args.edu, args.days)
+        activate_batch(api_url, admin_secret, args.emails, args.paid, args.edu, args.days, args.workers, args.output, args.mail)
     elif args.command == "reset":
         reset_password(api_url, admin_secret, args.email, args.password)
     elif args.command == "details":
@@ -783,7 +1056,9 @@ Examples:
     elif args.command == "delete":
         delete_user(api_url, admin_secret, args.email)
     elif args.command == "progress":
-        show_progress(api_url, admin_secret, args.email)
+        show_progress(api_url, admin_secret, args.email, args.chapters)
+    elif args.command == "progress-report":
+        progress_report(api_url, admin_secret, args.where, args.module, args.chapters, args.workers, args.output)
 
 
 if __name__ == "__main__":
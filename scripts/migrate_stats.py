@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+LearnFMPA Statistics Storage Migration
+
+Converts question statistics between the two layouts understood by
+src/lib/user-store.ts:
+
+  blob  - stats:module_N holds the whole module as one JSON value
+  hash  - one counter hash per question, stats:module_N:q:<id>
+          (total_answers, correct_answers, opt:<option index>), listed in the
+          stats:module_N:questions set; stats:module_N:layout = "hash"
+
+With the hash layout every answer is a few HINCRBY calls on one small hash
+instead of rewriting the module's stats.
+
+Each module is switched in a single MULTI/EXEC guarded by WATCH, so answers
+recorded during the migration are never lost. The original blob is kept as
+stats:module_N:backup until 'cleanup' (or 'rollback', which rebuilds the
+blob from the hashes, new answers included).
+
+Usage:
+  python migrate_stats.py status
+  python migrate_stats.py migrate --dry-run
+  python migrate_stats.py migrate [--module 1 --module 2]
+  python migrate_stats.py verify
+  python migrate_stats.py rollback [--module 1]
+  python migrate_stats.py cleanup
+
+Environment Variables:
+  REDIS_URL - Redis connection string (same one the app uses)
+
+Requires redis-py (pip install redis).
+"""
+
+import os
+import re
+import sys
+import json
+import argparse
+
+import redis
+
+from module_registry import load_questions, module_ids, module_title, question_options
+import instrumentation
+
+DEFAULT_REDIS_URL = os.environ.get("REDIS_URL") or os.environ.get("KV_REST_API_URL") or "redis://localhost:6379"
+HASH_LAYOUT = "hash"
+OPTION_FIELD_PREFIX = "opt:"
+MODULE_KEY_RE = re.compile(r"^stats:module_(\d+)(?::(layout|questions|backup|q:.*))?$")
+
+
+def stats_keys(module_id: int) -> dict:
+    base = f"stats:module_{module_id}"
+    return {
+        "blob": base,
+        "layout": f"{base}:layout",
+        "index": f"{base}:questions",
+        "backup": f"{base}:backup",
+        "question_prefix": f"{base}:q:",
+    }
+
+
+def question_key(module_id: int, question_id: str) -> str:
+    return f"{stats_keys(module_id)['question_prefix']}{question_id}"
+
+
+def to_hash(stats: dict) -> dict:
+    fields = {
+        "total_answers": int(stats.get("total_answers", 0)),
+        "correct_answers": int(stats.get("correct_answers", 0)),
+    }
+    for option, count in (stats.get("option_counts") or {}).items():
+        fields[f"{OPTION_FIELD_PREFIX}{option}"] = int(count)
+    return fields
+
+
+def from_hash(fields: dict) -> dict:
+    option_counts = {
+        field[len(OPTION_FIELD_PREFIX):]: int(value)
+        for field, value in fields.items()
+        if field.startswith(OPTION_FIELD_PREFIX)
+    }
+    return {
+        "total_answers": int(fields.get("total_answers", 0)),
+        "correct_answers": int(fields.get("correct_answers", 0)),
+        "option_counts": dict(sorted(option_counts.items(), key=lambda x: int(x[0]) if x[0].isdigit() else 0)),
+    }
+
+
+def dump_blob(stats: dict) -> str:
+    # Same compact form as JSON.stringify in the app.
+    ordered = dict(sorted(stats.items(), key=lambda x: int(x[0]) if x[0].isdigit() else 0))
+    return json.dumps(ordered, ensure_ascii=False, separators=(",", ":"))
+
+
+def discover_modules(r: redis.Redis) -> list:
+    found = set(module_ids())
+    for key in r.scan_iter(match="stats:module_*", count=1000):
+        match = MODULE_KEY_RE.match(key)
+        if match:
+            found.add(int(match.group(1)))
+    return sorted(found)
+
+
+def get_layout(r: redis.Redis, module_id: int) -> str:
+    return "hash" if r.get(stats_keys(module_id)["layout"]) == HASH_LAYOUT else "blob"
+
+
+def read_hash_stats(r: redis.Redis, module_id: int) -> dict:
+    ids = sorted(r.smembers(stats_keys(module_id)["index"]), key=lambda x: int(x) if x.isdigit() else 0)
+    pipe = r.pipeline(transaction=False)
+    for qid in ids:
+        pipe.hgetall(question_key(module_id, qid))
+    return {qid: from_hash(fields) for qid, fields in zip(ids, pipe.execute()) if fields}
+
+
+def check_question(module_id: int, qid: str, stats: dict, questions: list) -> list:
+    problems = []
+    total = stats.get("total_answers", 0)
+    correct = stats.get("correct_answers", 0)
+    if total < 0 or correct < 0:
+        problems.append(f"q{qid}: negative counters (total={total}, correct={correct})")
+    if correct > total:
+        problems.append(f"q{qid}: correct_answers {correct} > total_answers {total}")
+    for option, count in (stats.get("option_counts") or {}).items():
+        if not option.isdigit():
+            problems.append(f"q{qid}: non-numeric option '{option}'")
+        elif count < 0:
+            problems.append(f"q{qid}: option {option} has negative count {count}")
+    if questions:
+        index = int(qid) if qid.isdigit() else -1
+        if not 0 <= index < len(questions):
+            problems.append(f"q{qid}: no such question in {module_title(module_id)} ({len(questions)} questions)")
+        else:
+            options = len(question_options(questions[index]))
+            extra = [o for o in (stats.get("option_counts") or {}) if o.isdigit() and int(o) >= options]
+            if extra:
+                problems.append(f"q{qid}: counts for options {', '.join(extra)} but the question has {options} choices")
+    return problems
+
+
+def module_questions(module_id: int) -> list:
+    try:
+        return load_questions(module_id)
+    except (KeyError, OSError, ValueError):
+        return []
+
+
+def migrate_module(r: redis.Redis, module_id: int, dry_run: bool = False) -> bool:
+    keys = stats_keys(module_id)
+    with r.pipeline() as pipe:
+        while True:
+            try:
+                pipe.watch(keys["blob"], keys["layout"], keys["index"])
+                if pipe.get(keys["layout"]) == HASH_LAYOUT:
+                    pipe.unwatch()
+                    print(f"  Module {module_id}: already migrated")
+                    return True
+                raw = pipe.get(keys["blob"])
+                stats = json.loads(raw) if raw else {}
+                leftovers = list(pipe.smembers(keys["index"]))
+
+                problems = []
+                questions = module_questions(module_id)
+                for qid, qstats in stats.items():
+                    problems.extend(check_question(module_id, qid, qstats, questions))
+                answers = sum(q.get("total_answers", 0) for q in stats.values())
+                if dry_run:
+                    pipe.unwatch()
+                    print(f"  Module {module_id}: would write {len(stats)} question hashes ({answers} answers)")
+                    for problem in problems[:10]:
+                        print(f"    ⚠️  {problem}")
+                    return True
+
+                pipe.multi()
+                for qid in leftovers:
+                    pipe.delete(question_key(module_id, qid))
+                pipe.delete(keys["index"])
+                for qid, qstats in stats.items():
+                    pipe.hset(question_key(module_id, qid), mapping=to_hash(qstats))
+                if stats:
+                    pipe.sadd(keys["index"], *stats.keys())
+                if raw is not None:
+                    pipe.rename(keys["blob"], keys["backup"])
+                pipe.set(keys["layout"], HASH_LAYOUT)
+                pipe.execute()
+                print(f"  ✓ Module {module_id}: {len(stats)} questions ({answers} answers) moved to hashes")
+                for problem in problems[:10]:
+                    print(f"    ⚠️  {problem}")
+                return True
+            except redis.WatchError:
+                # An answer was recorded meanwhile; start over from the new value.
+                continue
+
+
+def rollback_module(r: redis.Redis, module_id: int, dry_run: bool = False) -> bool:
+    keys = stats_keys(module_id)
+    with r.pipeline() as pipe:
+        while True:
+            try:
+                pipe.watch(keys["layout"], keys["index"])
+                if pipe.get(keys["layout"]) != HASH_LAYOUT:
+                    pipe.unwatch()
+                    print(f"  Module {module_id}: not migrated, nothing to roll back")
+                    return True
+                ids = list(pipe.smembers(keys["index"]))
+                hash_keys = [question_key(module_id, qid) for qid in ids]
+                if hash_keys:
+                    pipe.watch(*hash_keys)
+                stats = {}
+                for qid, key in zip(ids, hash_keys):
+                    fields = pipe.hgetall(key)
+                    if fields:
+                        stats[qid] = from_hash(fields)
+                answers = sum(q["total_answers"] for q in stats.values())
+                if dry_run:
+                    pipe.unwatch()
+                    print(f"  Module {module_id}: would rebuild the JSON blob from {len(stats)} hashes ({answers} answers)")
+                    return True
+
+                pipe.multi()
+                pipe.set(keys["blob"], dump_blob(stats))
+                for key in hash_keys:
+                    pipe.delete(key)
+                pipe.delete(keys["index"], keys["layout"], keys["backup"])
+                pipe.execute()
+                print(f"  ✓ Module {module_id}: {len(stats)} questions ({answers} answers) moved back to the JSON blob")
+                return True
+            except redis.WatchError:
+                continue
+
+
+def verify_module(r: redis.Redis, module_id: int) -> list:
+    keys = stats_keys(module_id)
+    questions = module_questions(module_id)
+    problems = []
+
+    if get_layout(r, module_id) == "blob":
+        raw = r.get(keys["blob"])
+        try:
+            stats = json.loads(raw) if raw else {}
+        except ValueError as e:
+            return [f"stats blob is not valid JSON: {e}"]
+        for qid, qstats in stats.items():
+            problems.extend(check_question(module_id, qid, qstats, questions))
+        stray = r.scard(keys["index"]) or next(r.scan_iter(match=f"{keys['question_prefix']}*", count=1000), None)
+        if stray:
+            problems.append("question hashes exist but the module uses the JSON blob (partial migration?)")
+        return problems
+
+    indexed = r.smembers(keys["index"])
+    existing = {k[len(keys["question_prefix"]):] for k in r.scan_iter(match=f"{keys['question_prefix']}*", count=1000)}
+    for qid in sorted(indexed - existing):
+        problems.append(f"q{qid}: listed in {keys['index']} but has no hash")
+    for qid in sorted(existing - indexed):
+        problems.append(f"q{qid}: hash not listed in {keys['index']}")
+
+    stats = read_hash_stats(r, module_id)
+    for qid, qstats in stats.items():
+        problems.extend(check_question(module_id, qid, qstats, questions))
+
+    if r.exists(keys["blob"]):
+        problems.append(f"{keys['blob']} was written after migration (an old deployment still writes the blob?)")
+
+    backup_raw = r.get(keys["backup"])
+    if backup_raw:
+        backup = json.loads(backup_raw)
+        for qid, old in backup.items():
+            new = stats.get(qid)
+            if new is None:
+                problems.append(f"q{qid}: in the backup but missing from the hashes (reset since migration?)")
+            elif new["total_answers"] < old.get("total_answers", 0) or new["correct_answers"] < old.get("correct_answers", 0):
+                problems.append(f"q{qid}: counters went down since migration "
+                                f"({old.get('total_answers', 0)} -> {new['total_answers']} answers)")
+            else:
+                for option, count in (old.get("option_counts") or {}).items():
+                    if new["option_counts"].get(option, 0) < count:
+                        problems.append(f"q{qid}: option {option} count went down since migration")
+                        break
+    return problems
+
+
+def show_status(r: redis.Redis, modules: list):
+    print(f"\n{'='*90}")
+    print(f"  {'ID':<4} {'Module':<26} {'Layout':<8} {'Questions':>10} {'Answers':>10} {'Backup':>8} {'Memory':>10}")
+    print(f"  {'-'*84}")
+    for module_id in modules:
+        keys = stats_keys(module_id)
+        layout = get_layout(r, module_id)
+        if layout == "hash":
+            stats = read_hash_stats(r, module_id)
+            memory = sum(r.memory_usage(question_key(module_id, qid)) or 0 for qid in stats)
+        else:
+            raw = r.get(keys["blob"])
+            stats = json.loads(raw) if raw else {}
+            memory = r.memory_usage(keys["blob"]) or 0 if raw else 0
+        answers = sum(q.get("total_answers", 0) for q in stats.values())
+        backup = "yes" if r.exists(keys["backup"]) else "-"
+        print(f"  {module_id:<4} {module_title(module_id)[:26]:<26} {layout:<8} {len(stats):>10} {answers:>10} {backup:>8} {memory / 1024:>8.1f}KB")
+    print(f"{'='*90}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="LearnFMPA Statistics Storage Migration (JSON blob <-> per-question hashes)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Typical sequence:
+  python migrate_stats.py migrate --dry-run     # preview, check for bad data
+  python migrate_stats.py migrate               # switch all modules to hashes
+  python migrate_stats.py verify                # consistency check
+  python migrate_stats.py cleanup               # drop the JSON backups once happy
+
+  python migrate_stats.py rollback              # back to JSON blobs (keeps new answers)
+""",
+    )
+    parser.add_argument("--redis-url", default=DEFAULT_REDIS_URL, help="Redis URL (default: $REDIS_URL)")
+
+    subparsers = parser.add_subparsers(dest="command", help="Available commands")
+    subparsers.add_parser("status", help="Show the storage layout and size of every module's stats")
+    for name, help_text in [
+        ("migrate", "Convert JSON blobs to per-question hashes"),
+        ("rollback", "Convert per-question hashes back to JSON blobs"),
+        ("verify", "Check stats consistency for the current layout"),
+        ("cleanup", "Delete JSON backups of migrated modules that verify cleanly"),
+    ]:
+        sub = subparsers.add_parser(name, help=help_text)
+        sub.add_argument("--module", type=int, action="append", default=None, help="Module ID (repeatable, default: all)")
+        if name in ("migrate", "rollback"):
+            sub.add_argument("--dry-run", action="store_true", help="Show what would change without writing")
+
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.start(args)
+    if not args.command:
+        parser.print_help()
+        return
+
+    r = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    try:
+        r.ping()
+    except redis.RedisError as e:
+        print(f"\n✗ Cannot connect to Redis: {e}\n")
+        sys.exit(1)
+
+    modules = getattr(args, "module", None) or discover_modules(r)
+    print(f"\n🗄️  Redis: {args.redis_url.split('@')[-1]} — modules {', '.join(map(str, modules))}")
+
+    if args.command == "status":
+        show_status(r, modules)
+    elif args.command == "migrate":
+        print()
+        for module_id in modules:
+            migrate_module(r, module_id, args.dry_run)
+        print()
+    elif args.command == "rollback":
+        print()
+        for module_id in modules:
+            rollback_module(r, module_id, args.dry_run)
+        print()
+    elif args.command in ("verify", "cleanup"):
+        failed = 0
+        print()
+        for module_id in modules:
+            problems = verify_module(r, module_id)
+            layout = get_layout(r, module_id)
+            if problems:
+                failed += 1
+                print(f"  ✗ Module {module_id} ({layout}): {len(problems)} problem(s)")
+                for problem in problems[:20]:
+                    print(f"      {problem}")
+                if len(problems) > 20:
+                    print(f"      ... and {len(problems) - 20} more")
+            else:
+                print(f"  ✓ Module {module_id} ({layout}): consistent")
+                if args.command == "cleanup" and layout == "hash" and r.delete(stats_keys(module_id)["backup"]):
+                    print(f"      backup removed")
+        print()
+        if failed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,401 @@
+#!/usr/bin/env python3
+"""
+LearnFMPA Users Storage Migration
+
+Converts user records between the two layouts understood by
+src/lib/user-store.ts:
+
+  blob  - the single 'users' key: {"users": {"<id>": {...}, ...}}
+  hash  - one hash per user, user:<id>, every field JSON-encoded, plus
+          users:ids           set of user IDs
+          users:by_email      hash, lowercase email -> user ID
+          users:status:<s>    sets per subscription status (inactive/free/paid)
+          users:trial_expiry  zset of trial users scored by expiry (ms)
+          users:layout        "hash"
+
+With the hash layout a login or an answer reads and writes one small hash
+instead of the whole user base.
+
+The switch happens in one MULTI/EXEC guarded by WATCH on the blob and on
+users:version (which every app write increments), so no concurrent write is
+lost. The original blob is kept as users:backup until 'cleanup'.
+
+Usage:
+  python migrate_users.py status
+  python migrate_users.py migrate --dry-run
+  python migrate_users.py migrate
+  python migrate_users.py verify
+  python migrate_users.py rollback [--dry-run]
+  python migrate_users.py cleanup
+
+Environment Variables:
+  REDIS_URL - Redis connection string (same one the app uses)
+
+Requires redis-py (pip install redis).
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timezone
+
+import redis
+
+import instrumentation
+
+DEFAULT_REDIS_URL = os.environ.get("REDIS_URL") or os.environ.get("KV_REST_API_URL") or "redis://localhost:6379"
+
+BLOB_KEY = "users"
+BACKUP_KEY = "users:backup"
+VERSION_KEY = "users:version"
+LAYOUT_KEY = "users:layout"
+IDS_KEY = "users:ids"
+EMAIL_INDEX_KEY = "users:by_email"
+TRIAL_EXPIRY_KEY = "users:trial_expiry"
+STATUSES = ["inactive", "free", "paid"]
+HASH_LAYOUT = "hash"
+DEFAULT_TRIAL_DAYS = 7
+DAY_MS = 24 * 60 * 60 * 1000
+
+
+def user_key(user_id: str) -> str:
+    return f"user:{user_id}"
+
+
+def status_key(status: str) -> str:
+    return f"users:status:{status}"
+
+
+def effective_status(user: dict) -> str:
+    # Same rule as effectiveSubscriptionStatus() in user-store.ts.
+    if user.get("subscription_status"):
+        return user["subscription_status"]
+    if user.get("has_paid"):
+        return "paid"
+    return "free" if user.get("is_active") else "inactive"
+
+
+def trial_expiry(user: dict):
+    if not user.get("is_trial"):
+        return None
+    start = user.get("trial_started_at") or user.get("activated_at")
+    if not start:
+        return None
+    try:
+        start_dt = datetime.fromisoformat(start.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if start_dt.tzinfo is None:
+        start_dt = start_dt.replace(tzinfo=timezone.utc)
+    days = user.get("activation_days")
+    if days is None:
+        days = DEFAULT_TRIAL_DAYS
+    return int(start_dt.timestamp() * 1000) + days * DAY_MS
+
+
+def encode_fields(user: dict) -> dict:
+    return {field: json.dumps(value, ensure_ascii=False, separators=(",", ":")) for field, value in user.items()}
+
+
+def decode_fields(fields: dict) -> dict:
+    return {field: json.loads(value) for field, value in fields.items()}
+
+
+def check_users(users: dict) -> list:
+    problems = []
+    seen = {}
+    for user_id, user in users.items():
+        if not isinstance(user, dict):
+            problems.append(f"{user_id}: record is not an object")
+            continue
+        if user.get("id") != user_id:
+            problems.append(f"{user_id}: id field is {user.get('id')!r}")
+        email = (user.get("email") or "").lower()
+        if not email:
+            problems.append(f"{user_id}: no email")
+        elif email in seen:
+            problems.append(f"{user_id}: email {email} already used by {seen[email]}")
+        else:
+            seen[email] = user_id
+        if effective_status(user) not in STATUSES:
+            problems.append(f"{user_id}: unknown subscription_status {user.get('subscription_status')!r}")
+    return problems
+
+
+def read_hash_users(r: redis.Redis) -> dict:
+    ids = sorted(r.smembers(IDS_KEY))
+    pipe = r.pipeline(transaction=False)
+    for user_id in ids:
+        pipe.hgetall(user_key(user_id))
+    return {user_id: decode_fields(fields) for user_id, fields in zip(ids, pipe.execute()) if fields}
+
+
+def queue_user_writes(pipe, users: dict):
+    for user_id, user in users.items():
+        pipe.hset(user_key(user_id), mapping=encode_fields(dict(user, id=user_id)))
+    if users:
+        pipe.sadd(IDS_KEY, *users.keys())
+        pipe.hset(EMAIL_INDEX_KEY, mapping={u["email"].lower(): user_id for user_id, u in users.items()})
+    by_status = {}
+    for user_id, user in users.items():
+        by_status.setdefault(effective_status(user), []).append(user_id)
+    for status, ids in by_status.items():
+        pipe.sadd(status_key(status), *ids)
+    trials = {user_id: trial_expiry(u) for user_id, u in users.items() if trial_expiry(u) is not None}
+    if trials:
+        pipe.zadd(TRIAL_EXPIRY_KEY, trials)
+
+
+def queue_hash_cleanup(pipe, user_ids):
+    for user_id in user_ids:
+        pipe.delete(user_key(user_id))
+    pipe.delete(IDS_KEY, EMAIL_INDEX_KEY, TRIAL_EXPIRY_KEY, *[status_key(s) for s in STATUSES])
+
+
+def migrate(r: redis.Redis, dry_run: bool = False, force: bool = False) -> bool:
+    with r.pipeline() as pipe:
+        while True:
+            try:
+                pipe.watch(BLOB_KEY, VERSION_KEY, LAYOUT_KEY)
+                if pipe.get(LAYOUT_KEY) == HASH_LAYOUT:
+                    pipe.unwatch()
+                    print("  Users are already migrated.")
+                    return True
+                raw = pipe.get(BLOB_KEY)
+                users = (json.loads(raw) if raw else {}).get("users", {})
+                leftovers = list(pipe.smembers(IDS_KEY))
+                problems = check_users(users)
+
+                by_status = {}
+                for user in users.values():
+                    by_status[effective_status(user)] = by_status.get(effective_status(user), 0) + 1
+                trials = sum(1 for u in users.values() if trial_expiry(u) is not None)
+                summary = (f"{len(users)} users ({', '.join(f'{s}: {n}' for s, n in sorted(by_status.items()))}; "
+                           f"{trials} trials with an expiry)")
+                for problem in problems[:20]:
+                    print(f"    ⚠️  {problem}")
+                if len(problems) > 20:
+                    print(f"    ... and {len(problems) - 20} more")
+
+                if dry_run:
+                    pipe.unwatch()
+                    print(f"  Would migrate {summary}")
+                    return True
+                if problems and not force:
+                    pipe.unwatch()
+                    print(f"\n✗ {len(problems)} problem(s) found; fix them or rerun with --force "
+                          f"(the last user wins on duplicate emails).")
+                    return False
+
+                pipe.multi()
+                queue_hash_cleanup(pipe, leftovers)
+                queue_user_writes(pipe, users)
+                if raw is not None:
+                    pipe.rename(BLOB_KEY, BACKUP_KEY)
+                pipe.set(LAYOUT_KEY, HASH_LAYOUT)
+                pipe.incr(VERSION_KEY)
+                pipe.execute()
+                print(f"  ✓ Migrated {summary}")
+                return True
+            except redis.WatchError:
+                # The app wrote users meanwhile; start over from the new state.
+                continue
+
+
+def rollback(r: redis.Redis, dry_run: bool = False) -> bool:
+    with r.pipeline() as pipe:
+        while True:
+            try:
+                # Every hash-layout write increments users:version.
+                pipe.watch(VERSION_KEY, LAYOUT_KEY, IDS_KEY)
+                if pipe.get(LAYOUT_KEY) != HASH_LAYOUT:
+                    pipe.unwatch()
+                    print("  Users are not migrated, nothing to roll back.")
+                    return True
+                ids = sorted(pipe.smembers(IDS_KEY))
+                users = {}
+                for user_id in ids:
+                    fields = pipe.hgetall(user_key(user_id))
+                    if fields:
+                        users[user_id] = decode_fields(fields)
+                if dry_run:
+                    pipe.unwatch()
+                    print(f"  Would rebuild the users blob from {len(users)} user hashes")
+                    return True
+
+                pipe.multi()
+                pipe.set(BLOB_KEY, json.dumps({"users": users}, ensure_ascii=False, separators=(",", ":")))
+                queue_hash_cleanup(pipe, ids)
+                pipe.delete(LAYOUT_KEY, BACKUP_KEY)
+                pipe.incr(VERSION_KEY)
+                pipe.execute()
+                print(f"  ✓ {len(users)} users moved back to the single 'users' key")
+                return True
+            except redis.WatchError:
+                continue
+
+
+def verify(r: redis.Redis) -> list:
+    if r.get(LAYOUT_KEY) != HASH_LAYOUT:
+        raw = r.get(BLOB_KEY)
+        try:
+            users = (json.loads(raw) if raw else {}).get("users", {})
+        except ValueError as e:
+            return [f"users blob is not valid JSON: {e}"]
+        problems = check_users(users)
+        if r.exists(IDS_KEY) or r.exists(EMAIL_INDEX_KEY):
+            problems.append("user hashes/indexes exist but the blob layout is active (partial migration?)")
+        return problems
+
+    problems = []
+    ids = r.smembers(IDS_KEY)
+    existing = {k[len("user:"):] for k in r.scan_iter(match="user:*", count=1000)}
+    for user_id in sorted(ids - existing):
+        problems.append(f"{user_id}: listed in {IDS_KEY} but has no hash")
+    for user_id in sorted(existing - ids):
+        problems.append(f"{user_id}: hash not listed in {IDS_KEY}")
+
+    try:
+        users = read_hash_users(r)
+    except ValueError as e:
+        return problems + [f"a user hash has a field that is not valid JSON: {e}"]
+    problems.extend(check_users(users))
+
+    email_index = r.hgetall(EMAIL_INDEX_KEY)
+    for user_id, user in users.items():
+        email = (user.get("email") or "").lower()
+        if email and email_index.get(email) != user_id:
+            problems.append(f"{user_id}: {EMAIL_INDEX_KEY}[{email}] is {email_index.get(email)!r}")
+    for email, user_id in email_index.items():
+        if user_id not in users:
+            problems.append(f"{EMAIL_INDEX_KEY}[{email}] points to missing user {user_id}")
+
+    for status in STATUSES:
+        members = r.smembers(status_key(status))
+        expected = {user_id for user_id, user in users.items() if effective_status(user) == status}
+        for user_id in sorted(expected - members):
+            problems.append(f"{user_id}: missing from {status_key(status)}")
+        for user_id in sorted(members - expected):
+            problems.append(f"{user_id}: should not be in {status_key(status)}")
+
+    indexed_trials = dict(r.zrange(TRIAL_EXPIRY_KEY, 0, -1, withscores=True))
+    for user_id, user in users.items():
+        expiry = trial_expiry(user)
+        if expiry is None and user_id in indexed_trials:
+            problems.append(f"{user_id}: in {TRIAL_EXPIRY_KEY} but not a dated trial")
+        elif expiry is not None and abs(indexed_trials.get(user_id, -1) - expiry) > 1:
+            problems.append(f"{user_id}: {TRIAL_EXPIRY_KEY} score does not match the trial expiry")
+    for user_id in indexed_trials:
+        if user_id not in users:
+            problems.append(f"{TRIAL_EXPIRY_KEY} lists missing user {user_id}")
+
+    if r.exists(BLOB_KEY):
+        problems.append("the 'users' key was written after migration (an old deployment still writes the blob?)")
+
+    backup_raw = r.get(BACKUP_KEY)
+    if backup_raw:
+        for user_id in json.loads(backup_raw).get("users", {}):
+            if user_id not in users:
+                problems.append(f"{user_id}: in the backup but not in the hashes (deleted since migration?)")
+    return problems
+
+
+def show_status(r: redis.Redis):
+    layout = "hash" if r.get(LAYOUT_KEY) == HASH_LAYOUT else "blob"
+    if layout == "hash":
+        users = read_hash_users(r)
+        memory = sum(r.memory_usage(user_key(user_id)) or 0 for user_id in users)
+        memory += sum(r.memory_usage(k) or 0 for k in [IDS_KEY, EMAIL_INDEX_KEY, TRIAL_EXPIRY_KEY] if r.exists(k))
+    else:
+        raw = r.get(BLOB_KEY)
+        users = (json.loads(raw) if raw else {}).get("users", {})
+        memory = (r.memory_usage(BLOB_KEY) or 0) if raw else 0
+
+    print(f"\n{'='*60}")
+    print(f"  Layout:        {layout}")
+    print(f"  Users:         {len(users)}")
+    print(f"  Version:       {r.get(VERSION_KEY) or 0}")
+    print(f"  Memory:        {memory / 1024:.1f} KB")
+    print(f"  Backup:        {'yes' if r.exists(BACKUP_KEY) else 'no'}")
+    for status in STATUSES:
+        count = sum(1 for u in users.values() if effective_status(u) == status)
+        print(f"  {status.capitalize() + ':':<14} {count}")
+    if layout == "hash":
+        now_ms = int(time.time() * 1000)
+        expiring = r.zcount(TRIAL_EXPIRY_KEY, now_ms, now_ms + 7 * DAY_MS)
+        expired = r.zcount(TRIAL_EXPIRY_KEY, "-inf", now_ms)
+        print(f"  Trials:        {r.zcard(TRIAL_EXPIRY_KEY)} ({expiring} expiring within 7 days, {expired} expired)")
+    print(f"{'='*60}\n")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="LearnFMPA Users Storage Migration (single 'users' key <-> per-user hashes)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Typical sequence:
+  python migrate_users.py migrate --dry-run     # preview, check for bad records
+  python migrate_users.py migrate               # switch to per-user hashes
+  python migrate_users.py verify                # indexes and records agree
+  python migrate_users.py cleanup               # drop the backup once happy
+
+  python migrate_users.py rollback              # back to the single key (keeps new writes)
+""",
+    )
+    parser.add_argument("--redis-url", default=DEFAULT_REDIS_URL, help="Redis URL (default: $REDIS_URL)")
+
+    subparsers = parser.add_subparsers(dest="command", help="Available commands")
+    subparsers.add_parser("status", help="Show layout, counts and memory")
+    migrate_parser = subparsers.add_parser("migrate", help="Split the users blob into per-user hashes")
+    migrate_parser.add_argument("--dry-run", action="store_true", help="Show what would change without writing")
+    migrate_parser.add_argument("--force", action="store_true", help="Migrate even if records have problems")
+    rollback_parser = subparsers.add_parser("rollback", help="Rebuild the users blob from the hashes")
+    rollback_parser.add_argument("--dry-run", action="store_true", help="Show what would change without writing")
+    subparsers.add_parser("verify", help="Check records and indexes for the current layout")
+    subparsers.add_parser("cleanup", help="Delete the pre-migration backup if verify passes")
+
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.start(args)
+    if not args.command:
+        parser.print_help()
+        return
+
+    r = redis.Redis.from_url(args.redis_url, decode_responses=True)
+    try:
+        r.ping()
+    except redis.RedisError as e:
+        print(f"\n✗ Cannot connect to Redis: {e}\n")
+        sys.exit(1)
+
+    print(f"\n🗄️  Redis: {args.redis_url.split('@')[-1]}\n")
+
+    if args.command == "status":
+        show_status(r)
+    elif args.command == "migrate":
+        if not migrate(r, args.dry_run, args.force):
+            sys.exit(1)
+        print()
+    elif args.command == "rollback":
+        rollback(r, args.dry_run)
+        print()
+    elif args.command in ("verify", "cleanup"):
+        problems = verify(r)
+        if problems:
+            print(f"  ✗ {len(problems)} problem(s):")
+            for problem in problems[:30]:
+                print(f"      {problem}")
+            if len(problems) > 30:
+                print(f"      ... and {len(problems) - 30} more")
+            print()
+            sys.exit(1)
+        print("  ✓ Users and indexes are consistent")
+        if args.command == "cleanup" and r.get(LAYOUT_KEY) == HASH_LAYOUT and r.delete(BACKUP_KEY):
+            print("      backup removed")
+        print()
+
+
+if __name__ == "__main__":
+    main()
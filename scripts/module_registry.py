@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+LearnFMPA Module Registry
+
+Read-only access to the module list maintained by
+src/data/modules/module_manager.py (parsed from index.ts), so admin scripts
+pick up new modules without hardcoded IDs.
+
+Question and chapter helpers mirror src/data/modules/index.ts: a question's
+ID is its index in the module JSON, option indices count only non-empty
+choices, and chapters are Subtopic groups numbered by size. Questions go
+through normalize_text.py, as in the bundles the app serves.
+
+Usage:
+  from module_registry import load_modules, load_questions, load_chapters
+
+  for module in load_modules():
+      print(module["id"], module["title"])
+  questions = load_questions(1)
+  chapters = load_chapters(1)
+"""
+
+import json
+import os
+import sys
+from typing import Dict, List, Optional
+
+MODULES_DIR = os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src", "data", "modules"))
+
+if MODULES_DIR not in sys.path:
+    sys.path.insert(0, MODULES_DIR)
+
+from module_manager import ModuleManager  # noqa: E402
+from normalize_text import normalize_questions  # noqa: E402
+
+_modules: Optional[List[Dict]] = None
+_questions: Dict[int, List[Dict]] = {}
+
+OPTION_LETTERS = "ABCDE"
+UNCLASSIFIED_CHAPTER = "Non classé"
+
+
+def load_modules() -> List[Dict]:
+    """Registered modules sorted by id, each with at least id, title and json_filename."""
+    global _modules
+    if _modules is None:
+        modules = []
+        for module in ModuleManager().modules:
+            try:
+                module = dict(module, id=int(module.get("id")))
+            except (TypeError, ValueError):
+                continue
+            module.setdefault("json_filename", module.get("title", ""))
+            modules.append(module)
+        _modules = sorted(modules, key=lambda m: m["id"])
+    return _modules
+
+
+def module_ids() -> List[int]:
+    return [m["id"] for m in load_modules()]
+
+
+def get_module(module_id: int) -> Optional[Dict]:
+    for module in load_modules():
+        if module["id"] == module_id:
+            return module
+    return None
+
+
+def module_title(module_id: int) -> str:
+    module = get_module(module_id)
+    return module["title"] if module else f"Module {module_id}"
+
+
+def load_questions(module_id: int) -> List[Dict]:
+    """Question list of a module; the question ID used by the stats API is the list index."""
+    if module_id not in _questions:
+        module = get_module(module_id)
+        if module is None:
+            raise KeyError(f"Unknown module {module_id}")
+        path = os.path.join(MODULES_DIR, f"{module['json_filename']}.json")
+        with open(path, "r", encoding="utf-8") as f:
+            _questions[module_id] = normalize_questions(json.load(f))
+    return _questions[module_id]
+
+
+def question_options(question: Dict) -> List[Dict]:
+    """Non-empty choices of a question, in the order the app indexes them."""
+    options = []
+    for letter in OPTION_LETTERS:
+        text = question.get(f"Choice_{letter}_Text") or ""
+        if text.strip():
+            options.append({
+                "letter": letter,
+                "text": text,
+                "is_correct": bool(question.get(f"Choice_{letter}_isCorrect")),
+            })
+    return options
+
+
+def load_chapters(module_id: int) -> List[Dict]:
+    """Chapters as built by extractChaptersFromQuestions: id, name, startPosition, questionCount, question_ids."""
+    groups: Dict[str, List[int]] = {}
+    for index, question in enumerate(load_questions(module_id)):
+        groups.setdefault(question.get("Subtopic") or UNCLASSIFIED_CHAPTER, []).append(index)
+    chapters = [
+        {"name": name, "startPosition": ids[0], "questionCount": len(ids), "question_ids": ids}
+        for name, ids in groups.items()
+    ]
+    chapters.sort(key=lambda c: c["questionCount"], reverse=True)
+    for i, chapter in enumerate(chapters):
+        chapter["id"] = i + 1
+    return chapters
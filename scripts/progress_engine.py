@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+LearnFMPA Progress Engine
+
+Scores a progress blob (progress:<user_id>, as returned by
+GET /api/admin/users/progress) against the module registry: completion and
+accuracy per module and per chapter.
+
+The chapter of every question is precomputed once per module as a flat list
+(question index -> chapter position), so scoring a blob is a single pass over
+its answers with O(1) lookups, and one engine serves every user of a
+class-wide report. Answers to question IDs the module no longer has are
+counted as "stale" and left out of completion.
+
+Usage:
+  from progress_engine import ProgressEngine, class_summary
+
+  engine = ProgressEngine()
+  modules = engine.score(progress)
+  summary = class_summary(engine, {"student@edu.uiz.ac.ma": progress, ...})
+"""
+
+from statistics import median
+from typing import Dict, List, Optional
+
+from module_registry import load_chapters, load_modules, load_questions
+
+
+class ModuleLayout:
+    def __init__(self, module_id: int, title: str):
+        self.module_id = module_id
+        self.title = title
+        self.size = len(load_questions(module_id))
+        self.chapters = load_chapters(module_id)
+        self.chapter_of = [0] * self.size
+        for position, chapter in enumerate(self.chapters):
+            for question_id in chapter["question_ids"]:
+                self.chapter_of[question_id] = position
+
+    def score(self, answers: dict) -> dict:
+        answered = [0] * len(self.chapters)
+        correct = [0] * len(self.chapters)
+        stale = 0
+        for question_id, answer in answers.items():
+            if not answer:
+                continue
+            index = int(question_id) if str(question_id).isdigit() else -1
+            if not 0 <= index < self.size:
+                stale += 1
+                continue
+            position = self.chapter_of[index]
+            answered[position] += 1
+            if isinstance(answer, dict) and answer.get("is_correct"):
+                correct[position] += 1
+
+        chapters = [
+            _rates({"id": chapter["id"], "name": chapter["name"], "questions": chapter["questionCount"],
+                    "answered": answered[i], "correct": correct[i]})
+            for i, chapter in enumerate(self.chapters)
+        ]
+        return _rates({
+            "module_id": self.module_id,
+            "title": self.title,
+            "questions": self.size,
+            "answered": sum(answered),
+            "correct": sum(correct),
+            "stale": stale,
+            "chapters": chapters,
+        })
+
+
+class ProgressEngine:
+    def __init__(self, module_ids: Optional[List[int]] = None):
+        self.layouts: Dict[int, ModuleLayout] = {}
+        for module in load_modules():
+            if module_ids is None or module["id"] in module_ids:
+                self.layouts[module["id"]] = ModuleLayout(module["id"], module["title"])
+
+    def score(self, progress: dict, include_empty: bool = False) -> List[dict]:
+        """Per-module results (with chapters) for one progress blob, in module order."""
+        results = []
+        for module_id, layout in self.layouts.items():
+            answers = progress.get(f"module_{module_id}") or {}
+            if answers or include_empty:
+                results.append(layout.score(answers if isinstance(answers, dict) else {}))
+        return results
+
+
+def class_summary(engine: ProgressEngine, progress_by_user: Dict[str, dict]) -> List[dict]:
+    """Per-module class totals: students who started, completion spread, accuracy and per-chapter completion."""
+    scored = {user: engine.score(progress) for user, progress in progress_by_user.items()}
+    summary = []
+    for module_id, layout in engine.layouts.items():
+        results = [r for modules in scored.values() for r in modules if r["module_id"] == module_id]
+        completions = [r["completion"] for r in results]
+        answered = sum(r["answered"] for r in results)
+        correct = sum(r["correct"] for r in results)
+        chapters = []
+        for i, chapter in enumerate(layout.chapters):
+            chapter_completions = [r["chapters"][i]["completion"] for r in results]
+            chapters.append({
+                "id": chapter["id"],
+                "name": chapter["name"],
+                "questions": chapter["questionCount"],
+                "mean_completion": round(sum(chapter_completions) / len(chapter_completions), 3) if results else 0.0,
+            })
+        summary.append({
+            "module_id": module_id,
+            "title": layout.title,
+            "questions": layout.size,
+            "students": len(results),
+            "mean_completion": round(sum(completions) / len(completions), 3) if results else 0.0,
+            "median_completion": round(median(completions), 3) if results else 0.0,
+            "completed": sum(1 for c in completions if c >= 1),
+            "answered": answered,
+            "accuracy": round(correct / answered, 3) if answered else None,
+            "chapters": chapters,
+        })
+    return summary
+
+
+def _rates(row: dict) -> dict:
+    row["completion"] = round(row["answered"] / row["questions"], 3) if row["questions"] else 0.0
+    row["accuracy"] = round(row["correct"] / row["answered"], 3) if row["answered"] else None
+    return row
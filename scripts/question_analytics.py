@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+LearnFMPA Question Analytics
+
+Joins a module's answer statistics (stats:module_N, as returned by
+GET /api/statistics) with its question JSON and computes per-question item
+metrics with NumPy:
+
+  facility        share of answers that were fully correct (p-value)
+  difficulty      1 - facility
+  discrimination  mean selection rate of the correct options minus the
+                  selection rate of the most attractive distractor
+                  (-1..1; negative means a distractor beats the key)
+  distractors     selection rate of every wrong option; a distractor chosen
+                  by < 5% of answers is "non-functioning"
+
+The stats store only aggregate counters, not per-student responses, so the
+classical upper/lower-group discrimination index cannot be computed;
+the key-vs-distractor gap above is the closest aggregate equivalent.
+
+Questions, chapters (Subtopic), and exam sessions (YearAsked) are held as
+parallel arrays, so ranking and grouping are vectorized (np.bincount) and
+take one pass regardless of module size.
+
+Requires numpy (pip install numpy).
+
+Usage:
+  from question_analytics import ModuleAnalytics
+
+  analytics = ModuleAnalytics.from_module(1, stats)
+  worst = analytics.rank("discrimination", min_answers=20)
+  chapters = analytics.group_by("chapter")
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from module_registry import OPTION_LETTERS, load_chapters, load_questions, question_options
+
+MAX_OPTIONS = len(OPTION_LETTERS)
+WEAK_DISTRACTOR_SHARE = 0.05
+
+QUESTION_METRICS = ["facility", "difficulty", "discrimination", "weak_distractors", "answers"]
+GROUP_KEYS = ["chapter", "subtopic", "year"]
+
+
+class ModuleAnalytics:
+    def __init__(self, module_id: int, questions: List[Dict], stats: Dict[str, Dict], chapters: List[Dict] = None):
+        n = len(questions)
+        self.module_id = module_id
+        self.questions = questions
+        self.size = n
+
+        self.subtopic = np.array([q.get("Subtopic") or "Non classé" for q in questions], dtype=object)
+        self.year = np.array([q.get("YearAsked") or "?" for q in questions], dtype=object)
+        self.valid = np.zeros((n, MAX_OPTIONS), dtype=bool)
+        self.correct = np.zeros((n, MAX_OPTIONS), dtype=bool)
+        self.letters = np.full((n, MAX_OPTIONS), "", dtype="<U1")
+        for i, question in enumerate(questions):
+            for j, option in enumerate(question_options(question)):
+                self.valid[i, j] = True
+                self.correct[i, j] = option["is_correct"]
+                self.letters[i, j] = option["letter"]
+
+        self.chapter_id = np.zeros(n, dtype=np.int64)
+        self.chapter_names: Dict[int, str] = {}
+        for chapter in chapters or []:
+            self.chapter_id[chapter["question_ids"]] = chapter["id"]
+            self.chapter_names[chapter["id"]] = chapter["name"]
+
+        self.total = np.zeros(n, dtype=np.int64)
+        self.correct_answers = np.zeros(n, dtype=np.int64)
+        self.option_counts = np.zeros((n, MAX_OPTIONS), dtype=np.int64)
+        self.unmatched = 0
+        for qid, qstats in (stats or {}).items():
+            index = int(qid) if str(qid).isdigit() else -1
+            if not 0 <= index < n:
+                self.unmatched += 1
+                continue
+            self.total[index] = qstats.get("total_answers", 0)
+            self.correct_answers[index] = qstats.get("correct_answers", 0)
+            for opt, count in (qstats.get("option_counts") or {}).items():
+                if str(opt).isdigit() and int(opt) < MAX_OPTIONS:
+                    self.option_counts[index, int(opt)] = count
+
+        self._compute()
+
+    @classmethod
+    def from_module(cls, module_id: int, stats: Dict[str, Dict]) -> "ModuleAnalytics":
+        return cls(module_id, load_questions(module_id), stats, load_chapters(module_id))
+
+    def _compute(self):
+        answered = self.total > 0
+        denom = np.where(answered, self.total, 1)[:, None]
+
+        self.answered = answered
+        self.facility = np.where(answered, self.correct_answers / denom[:, 0], np.nan)
+        self.difficulty = 1.0 - self.facility
+
+        self.selection = np.where(self.valid, self.option_counts / denom, np.nan)
+        self.distractor = self.valid & ~self.correct
+
+        key_count = self.correct.sum(axis=1)
+        key_rate = np.where(self.correct, self.selection, 0.0).sum(axis=1) / np.maximum(key_count, 1)
+        distractor_rates = np.where(self.distractor, self.selection, -np.inf)
+        top_distractor = distractor_rates.max(axis=1)
+        self.top_distractor = np.where(np.isfinite(top_distractor), top_distractor, 0.0)
+        self.top_distractor_letter = self.letters[np.arange(self.size), distractor_rates.argmax(axis=1)]
+
+        has_key = key_count > 0
+        self.discrimination = np.where(answered & has_key, key_rate - self.top_distractor, np.nan)
+        self.weak_distractors = np.where(
+            answered,
+            (self.distractor & (np.nan_to_num(self.selection) < WEAK_DISTRACTOR_SHARE)).sum(axis=1),
+            0,
+        )
+        self.distractor_count = self.distractor.sum(axis=1)
+
+    def metric(self, name: str) -> np.ndarray:
+        if name == "answers":
+            return self.total.astype(float)
+        return getattr(self, name)
+
+    def rank(self, by: str = "difficulty", descending: bool = None, min_answers: int = 1, limit: Optional[int] = None) -> List[Dict]:
+        """Questions with at least min_answers answers, ordered by a metric.
+
+        By default the most problematic come first: hardest, least
+        discriminating, most non-functioning distractors, most answered.
+        """
+        if descending is None:
+            descending = by != "discrimination"
+        values = self.metric(by)
+        mask = self.total >= max(min_answers, 1)
+        ids = np.flatnonzero(mask)
+        order = np.argsort(values[ids], kind="stable")
+        if descending:
+            order = order[::-1]
+        ids = ids[order]
+        if limit is not None:
+            ids = ids[:limit]
+        return [self.question_record(int(i)) for i in ids]
+
+    def question_record(self, index: int) -> Dict:
+        distractors = {
+            str(self.letters[index, j]): round(float(self.selection[index, j]), 3)
+            for j in np.flatnonzero(self.distractor[index])
+        } if self.answered[index] else {}
+        return {
+            "question_id": str(index),
+            "chapter_id": int(self.chapter_id[index]),
+            "subtopic": self.subtopic[index],
+            "year": self.year[index],
+            "text": self.questions[index].get("QuestionText", ""),
+            "answers": int(self.total[index]),
+            "correct": int(self.correct_answers[index]),
+            "facility": _round(self.facility[index]),
+            "difficulty": _round(self.difficulty[index]),
+            "discrimination": _round(self.discrimination[index]),
+            "top_distractor": str(self.top_distractor_letter[index]) if self.distractor_count[index] else "",
+            "top_distractor_rate": _round(self.top_distractor[index]),
+            "weak_distractors": int(self.weak_distractors[index]),
+            "distractors": distractors,
+        }
+
+    def group_by(self, key: str = "chapter", min_answers: int = 1) -> List[Dict]:
+        """Aggregate per chapter, Subtopic or YearAsked in one vectorized pass, hardest first."""
+        if key == "chapter":
+            labels = self.chapter_id
+        elif key == "subtopic":
+            labels = self.subtopic
+        elif key == "year":
+            labels = self.year
+        else:
+            raise ValueError(f"Unknown group key '{key}' (expected one of {', '.join(GROUP_KEYS)})")
+
+        groups, inverse = np.unique(labels, return_inverse=True)
+        size = len(groups)
+        counted = self.total >= max(min_answers, 1)
+        questions = np.bincount(inverse, minlength=size)
+        answered = np.bincount(inverse, weights=counted, minlength=size)
+        answers = np.bincount(inverse, weights=self.total, minlength=size)
+        correct = np.bincount(inverse, weights=self.correct_answers, minlength=size)
+        disc = np.bincount(inverse, weights=np.where(counted, np.nan_to_num(self.discrimination), 0.0), minlength=size)
+        weak = np.bincount(inverse, weights=np.where(counted, self.weak_distractors, 0), minlength=size)
+        misleading = np.bincount(
+            inverse, weights=counted & (np.nan_to_num(self.discrimination, nan=1.0) < 0), minlength=size
+        )
+
+        with np.errstate(invalid="ignore", divide="ignore"):
+            facility = np.where(answers > 0, correct / np.maximum(answers, 1), np.nan)
+            mean_disc = np.where(answered > 0, disc / np.maximum(answered, 1), np.nan)
+
+        order = np.argsort(np.nan_to_num(facility, nan=2.0), kind="stable")
+        results = []
+        for g in order:
+            label = groups[g]
+            name = self.chapter_names.get(int(label), "Non classé") if key == "chapter" else label
+            results.append({
+                key: int(label) if key == "chapter" else label,
+                "name": name,
+                "questions": int(questions[g]),
+                "answered_questions": int(answered[g]),
+                "answers": int(answers[g]),
+                "facility": _round(facility[g]),
+                "difficulty": _round(1.0 - facility[g]),
+                "mean_discrimination": _round(mean_disc[g]),
+                "weak_distractors": int(weak[g]),
+                "misleading_questions": int(misleading[g]),
+            })
+        return results
+
+
+def _round(value, digits: int = 3):
+    value = float(value)
+    return None if np.isnan(value) else round(value, digits)
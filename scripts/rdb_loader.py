@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+LearnFMPA RDB Loader
+
+Opens an RDB dump for reading: the dump is loaded into a throwaway
+redis-server (no TCP port, no saving, private working directory) and a
+redis-py client on its unix socket is handed to the caller. Used by
+snapshot_analytics.py and keyspace_report.py.
+
+Usage:
+  from rdb_loader import open_rdb
+
+  with open_rdb("dump.rdb") as client:
+      print(client.dbsize())
+
+Requires redis-py (pip install redis) and redis-server in PATH.
+"""
+
+import os
+import time
+import shutil
+import tempfile
+import subprocess
+from contextlib import contextmanager
+from typing import Iterator, Sequence
+
+LOAD_TIMEOUT = 120
+
+
+@contextmanager
+def open_rdb(rdb_path: str, server_args: Sequence[str] = ()) -> Iterator["redis.Redis"]:
+    """Yields a decode_responses client on a private redis-server loaded from rdb_path."""
+    import redis
+
+    server = shutil.which("redis-server")
+    if not server:
+        raise RuntimeError("redis-server not found in PATH (needed to read RDB files)")
+
+    workdir = tempfile.mkdtemp(prefix="learnfmpa-rdb-")
+    socket = os.path.join(workdir, "redis.sock")
+    shutil.copy(rdb_path, os.path.join(workdir, "dump.rdb"))
+    proc = subprocess.Popen(
+        [server, "--port", "0", "--unixsocket", socket, "--dir", workdir, "--dbfilename", "dump.rdb",
+         "--save", "", "--appendonly", "no", *server_args],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    try:
+        client = redis.Redis(unix_socket_path=socket, decode_responses=True)
+        deadline = time.time() + LOAD_TIMEOUT
+        while True:
+            try:
+                if client.info("persistence").get("loading") == 0:
+                    break
+            except (redis.ConnectionError, redis.BusyLoadingError):
+                pass
+            if proc.poll() is not None:
+                raise RuntimeError("redis-server exited while loading the dump (incompatible RDB version?)")
+            if time.time() > deadline:
+                raise RuntimeError("timed out loading the dump")
+            time.sleep(0.1)
+        yield client
+    finally:
+        proc.terminate()
+        proc.wait()
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,417 @@
+#!/usr/bin/env python3
+"""
+LearnFMPA Snapshot Analytics
+
+Cohort-level reporting on an offline copy of the datastore, so heavy
+reports never touch production Redis.
+
+A snapshot is a gzipped JSON-lines file with one {"key", "type", "value"}
+record per key, taken with 'export' either from a live Redis (ideally a
+replica; SCAN in batches, no blocking commands) or from an RDB dump, which
+is loaded into a throwaway local redis-server first. Only the keys the
+reports need are exported: users / user:* / users:*, stats:* and progress:*.
+Both storage layouts (single JSON values and per-user / per-question
+hashes) are understood. Users keep only the fields the reports read (no
+password hashes), and the file is created readable by its owner only.
+
+The snapshot is turned into pandas DataFrames:
+
+  users     user_id, email, status, is_trial, years, created_at, last_login
+  progress  user_id, module_id, question_id, is_correct, answered_at
+  stats     module_id, question_id, total_answers, correct_answers
+  options   module_id, question_id, option, count
+
+which 'tables' can save as Parquet (requires pyarrow); every report accepts
+either a snapshot file or such a Parquet directory.
+
+Reports:
+  accuracy    answers and accuracy by year level, module or subscription status
+  completion  per module: students started, questions answered, completion
+  load        answers by hour of day or weekday (local time)
+
+progress:<id> keeps only the latest answer per question, so 'load' shows
+when questions were last answered, not every attempt.
+
+Usage:
+  python snapshot_analytics.py export --redis-url redis://replica:6379 -o snapshot.jsonl.gz
+  python snapshot_analytics.py export --rdb dump.rdb -o snapshot.jsonl.gz
+  python snapshot_analytics.py tables snapshot.jsonl.gz --parquet tables/
+  python snapshot_analytics.py accuracy snapshot.jsonl.gz --by year
+  python snapshot_analytics.py completion tables/
+  python snapshot_analytics.py load tables/ --by hour --format csv -o load.csv
+
+Requires pandas (pip install pandas); redis-py for 'export', pyarrow for
+Parquet.
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import argparse
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from module_registry import load_modules, load_questions, module_title
+from rdb_loader import open_rdb
+import instrumentation
+
+DEFAULT_REDIS_URL = os.environ.get("REDIS_URL") or os.environ.get("KV_REST_API_URL") or "redis://localhost:6379"
+EXPORT_PATTERNS = ["users", "user:*", "users:*", "stats:*", "progress:*"]
+SCAN_BATCH = 1000
+TABLES = ["users", "progress", "stats", "options"]
+DEFAULT_TIMEZONE = "Africa/Casablanca"
+WEEKDAYS = ["Lundi", "Mardi", "Mercredi", "Jeudi", "Vendredi", "Samedi", "Dimanche"]
+
+# What the reports read from a user record; everything else stays out of snapshots
+USER_FIELDS = ["email", "subscription_status", "has_paid", "is_active", "is_trial", "years", "created_at", "last_login"]
+
+TABLE_COLUMNS = {
+    "users": ["user_id", "email", "status", "is_trial", "years", "created_at", "last_login"],
+    "progress": ["user_id", "module_id", "question_id", "is_correct", "answered_at"],
+    "stats": ["module_id", "question_id", "total_answers", "correct_answers"],
+    "options": ["module_id", "question_id", "option", "count"],
+}
+
+
+# ==================== Export ====================
+
+def _read_values(client, keys: List[str]) -> Iterator[Dict]:
+    pipe = client.pipeline(transaction=False)
+    for key in keys:
+        pipe.type(key)
+    types = pipe.execute()
+
+    readers = {
+        "string": pipe.get,
+        "hash": pipe.hgetall,
+        "set": pipe.smembers,
+        "list": lambda k: pipe.lrange(k, 0, -1),
+        "zset": lambda k: pipe.zrange(k, 0, -1, withscores=True),
+    }
+    wanted = [(key, kind) for key, kind in zip(keys, types) if kind in readers]
+    for key, kind in wanted:
+        readers[kind](key)
+    for (key, kind), value in zip(wanted, pipe.execute()):
+        if kind == "set":
+            value = sorted(value)
+        elif kind == "zset":
+            value = [[member, score] for member, score in value]
+        yield {"key": key, "type": kind, "value": value}
+
+
+def _user_fields(user: dict) -> dict:
+    return {field: user[field] for field in USER_FIELDS if field in user}
+
+
+def _snapshot_record(record: Dict) -> Dict:
+    if record["key"].startswith("user:") and record["type"] == "hash":
+        record["value"] = _user_fields(record["value"])
+    elif record["key"] == "users" and record["type"] == "string":
+        users = json.loads(record["value"]).get("users", {})
+        record["value"] = json.dumps({"users": {user_id: _user_fields(user) for user_id, user in users.items()}},
+                                     ensure_ascii=False)
+    return record
+
+
+def export_snapshot(client, output: str) -> int:
+    count = 0
+    fd = os.open(output, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    os.chmod(output, 0o600)
+    with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+        for pattern in EXPORT_PATTERNS:
+            batch = []
+            for key in client.scan_iter(match=pattern, count=SCAN_BATCH):
+                # 'users:*' would also match the pre-migration backup blob.
+                if key == "users:backup":
+                    continue
+                batch.append(key)
+                if len(batch) >= SCAN_BATCH:
+                    for record in _read_values(client, batch):
+                        f.write(json.dumps(_snapshot_record(record), ensure_ascii=False) + "\n")
+                        count += 1
+                    batch = []
+            for record in _read_values(client, batch):
+                f.write(json.dumps(_snapshot_record(record), ensure_ascii=False) + "\n")
+                count += 1
+    return count
+
+
+def export_rdb(rdb_path: str, output: str) -> int:
+    """Loads an RDB dump into a private redis-server (no TCP port, no saving) and exports it."""
+    with open_rdb(rdb_path) as client:
+        return export_snapshot(client, output)
+
+
+# ==================== Tables ====================
+
+def read_snapshot(path: str) -> Dict[str, Dict]:
+    opener = gzip.open if path.endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        return {record["key"]: record for record in map(json.loads, f) if record}
+
+
+def _status(user: dict) -> str:
+    # Same rule as effectiveSubscriptionStatus() in user-store.ts.
+    if user.get("subscription_status"):
+        return user["subscription_status"]
+    if user.get("has_paid"):
+        return "paid"
+    return "free" if user.get("is_active") else "inactive"
+
+
+def _users_from_snapshot(records: Dict[str, Dict]) -> Dict[str, dict]:
+    layout = records.get("users:layout", {}).get("value")
+    if layout == "hash":
+        users = {}
+        for key, record in records.items():
+            if key.startswith("user:") and record["type"] == "hash":
+                users[key[len("user:"):]] = {field: json.loads(value) for field, value in record["value"].items()}
+        return users
+    blob = records.get("users", {}).get("value")
+    return json.loads(blob).get("users", {}) if blob else {}
+
+
+def _module_stats_from_snapshot(records: Dict[str, Dict]) -> Dict[int, Dict[str, dict]]:
+    modules: Dict[int, Dict[str, dict]] = {}
+    for key, record in records.items():
+        parts = key.split(":")
+        if len(parts) < 2 or parts[0] != "stats" or not parts[1].startswith("module_"):
+            continue
+        try:
+            module_id = int(parts[1][len("module_"):])
+        except ValueError:
+            continue
+        hash_layout = records.get(f"stats:{parts[1]}:layout", {}).get("value") == "hash"
+        if len(parts) == 2 and record["type"] == "string" and not hash_layout:
+            modules.setdefault(module_id, {}).update(json.loads(record["value"]))
+        elif len(parts) == 4 and parts[2] == "q" and hash_layout:
+            fields = record["value"]
+            modules.setdefault(module_id, {})[parts[3]] = {
+                "total_answers": int(fields.get("total_answers", 0)),
+                "correct_answers": int(fields.get("correct_answers", 0)),
+                "option_counts": {f[len("opt:"):]: int(v) for f, v in fields.items() if f.startswith("opt:")},
+            }
+    return modules
+
+
+def build_tables(records: Dict[str, Dict]) -> Dict[str, pd.DataFrame]:
+    users = _users_from_snapshot(records)
+    user_rows = [{
+        "user_id": user_id,
+        "email": user.get("email", ""),
+        "status": _status(user),
+        "is_trial": bool(user.get("is_trial")),
+        "years": list(user.get("years") or []),
+        "created_at": user.get("created_at"),
+        "last_login": user.get("last_login"),
+    } for user_id, user in users.items()]
+
+    progress_rows = []
+    for key, record in records.items():
+        if not key.startswith("progress:") or record["type"] != "string":
+            continue
+        user_id = key[len("progress:"):]
+        for module_key, answers in json.loads(record["value"]).items():
+            if not module_key.startswith("module_"):
+                continue
+            module_id = int(module_key[len("module_"):])
+            for question_id, answer in (answers or {}).items():
+                progress_rows.append((user_id, module_id, str(question_id), bool(answer.get("is_correct")), answer.get("answered_at")))
+
+    stats_rows, option_rows = [], []
+    for module_id, questions in _module_stats_from_snapshot(records).items():
+        for question_id, q in questions.items():
+            stats_rows.append((module_id, str(question_id), q.get("total_answers", 0), q.get("correct_answers", 0)))
+            for option, count in (q.get("option_counts") or {}).items():
+                option_rows.append((module_id, str(question_id), int(option), count))
+
+    tables = {
+        "users": pd.DataFrame(user_rows, columns=TABLE_COLUMNS["users"]),
+        "progress": pd.DataFrame(progress_rows, columns=TABLE_COLUMNS["progress"]),
+        "stats": pd.DataFrame(stats_rows, columns=TABLE_COLUMNS["stats"]),
+        "options": pd.DataFrame(option_rows, columns=TABLE_COLUMNS["options"]),
+    }
+    for table, column in [("users", "created_at"), ("users", "last_login"), ("progress", "answered_at")]:
+        tables[table][column] = pd.to_datetime(tables[table][column], utc=True, errors="coerce", format="ISO8601")
+    for table, columns in [("progress", ["module_id"]), ("stats", ["module_id", "total_answers", "correct_answers"]),
+                           ("options", ["module_id", "option", "count"])]:
+        tables[table][columns] = tables[table][columns].astype("int64")
+    return tables
+
+
+def load_tables(source: str) -> Dict[str, pd.DataFrame]:
+    """Tables from a snapshot file or from a directory written by save_parquet()."""
+    if os.path.isdir(source):
+        return {name: pd.read_parquet(os.path.join(source, f"{name}.parquet")) for name in TABLES}
+    return build_tables(read_snapshot(source))
+
+
+def save_parquet(tables: Dict[str, pd.DataFrame], directory: str):
+    os.makedirs(directory, exist_ok=True)
+    for name, frame in tables.items():
+        frame.to_parquet(os.path.join(directory, f"{name}.parquet"), index=False)
+
+
+# ==================== Reports ====================
+
+def accuracy_report(tables: Dict[str, pd.DataFrame], by: str = "year") -> pd.DataFrame:
+    answers = tables["progress"].merge(tables["users"][["user_id", "status", "years"]], on="user_id", how="left")
+    if by == "year":
+        answers = answers.explode("years").rename(columns={"years": "year"})
+        answers["year"] = answers["year"].fillna("?")
+        key = "year"
+    elif by == "module":
+        key = "module_id"
+    elif by == "status":
+        answers["status"] = answers["status"].fillna("?")
+        key = "status"
+    else:
+        raise ValueError(f"Unknown grouping '{by}' (expected year, module or status)")
+
+    report = answers.groupby(key).agg(
+        students=("user_id", "nunique"),
+        answers=("is_correct", "size"),
+        correct=("is_correct", "sum"),
+    ).reset_index()
+    report["accuracy"] = (report["correct"] / report["answers"]).round(3)
+    if by == "module":
+        report.insert(1, "module", report["module_id"].map(module_title))
+    return report.sort_values("accuracy", kind="stable").reset_index(drop=True)
+
+
+def completion_report(tables: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    progress = tables["progress"]
+    per_student = progress.groupby(["module_id", "user_id"]).size().rename("answered").reset_index()
+    sizes = {m["id"]: len(load_questions(m["id"])) for m in load_modules()}
+
+    rows = []
+    for module_id in sorted(set(sizes) | set(per_student["module_id"])):
+        answered = per_student.loc[per_student["module_id"] == module_id, "answered"]
+        size = sizes.get(module_id, 0)
+        completion = answered / size if size else answered * float("nan")
+        rows.append({
+            "module_id": module_id,
+            "module": module_title(module_id),
+            "questions": size,
+            "students": int(answered.size),
+            "mean_answered": round(float(answered.mean()), 1) if answered.size else 0.0,
+            "median_completion": round(float(completion.median()), 3) if answered.size else None,
+            "half_done": int((completion >= 0.5).sum()),
+            "completed": int((completion >= 1).sum()),
+        })
+    return pd.DataFrame(rows)
+
+
+def load_report(tables: Dict[str, pd.DataFrame], by: str = "hour", tz: str = DEFAULT_TIMEZONE) -> pd.DataFrame:
+    times = tables["progress"]["answered_at"].dropna().dt.tz_convert(tz)
+    if by == "hour":
+        counts = times.dt.hour.value_counts().reindex(range(24), fill_value=0)
+        labels = [f"{h:02d}:00" for h in range(24)]
+    elif by == "weekday":
+        counts = times.dt.weekday.value_counts().reindex(range(7), fill_value=0)
+        labels = WEEKDAYS
+    else:
+        raise ValueError(f"Unknown grouping '{by}' (expected hour or weekday)")
+    total = max(int(counts.sum()), 1)
+    return pd.DataFrame({by: labels, "answers": counts.values, "share": (counts.values / total).round(3)})
+
+
+def write_report(frame: pd.DataFrame, fmt: str = "table", output: Optional[str] = None):
+    if fmt == "csv":
+        text = frame.to_csv(index=False)
+    elif fmt == "json":
+        text = frame.to_json(orient="records", force_ascii=False, indent=2) + "\n"
+    else:
+        body = frame.to_string(index=False, na_rep="-")
+        rule = "=" * max(len(line) for line in body.splitlines())
+        text = f"{rule}\n{body}\n{rule}\n"
+    if output:
+        with open(output, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        print(f"✓ Report written to {output}")
+    else:
+        sys.stdout.write(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="LearnFMPA Snapshot Analytics (offline reports from a Redis snapshot)",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="""
+Examples:
+  python snapshot_analytics.py export --redis-url redis://replica:6379 -o snapshot.jsonl.gz
+  python snapshot_analytics.py export --rdb dump.rdb -o snapshot.jsonl.gz
+  python snapshot_analytics.py tables snapshot.jsonl.gz --parquet tables/
+  python snapshot_analytics.py accuracy tables/ --by year
+  python snapshot_analytics.py completion snapshot.jsonl.gz
+  python snapshot_analytics.py load snapshot.jsonl.gz --by weekday
+""",
+    )
+    subparsers = parser.add_subparsers(dest="command", help="Available commands")
+
+    export_parser = subparsers.add_parser("export", help="Write a snapshot of users, stats and progress")
+    source = export_parser.add_mutually_exclusive_group()
+    source.add_argument("--redis-url", default=DEFAULT_REDIS_URL, help="Redis to SCAN (default: $REDIS_URL; prefer a replica)")
+    source.add_argument("--rdb", help="RDB dump file to read instead of a live Redis")
+    export_parser.add_argument("-o", "--output", default="snapshot.jsonl.gz", help="Snapshot file (default: snapshot.jsonl.gz)")
+
+    tables_parser = subparsers.add_parser("tables", help="Show table sizes, optionally save them as Parquet")
+    tables_parser.add_argument("source", help="Snapshot file or Parquet directory")
+    tables_parser.add_argument("--parquet", metavar="DIR", help="Write one .parquet file per table to DIR")
+
+    report_parsers = {
+        "accuracy": subparsers.add_parser("accuracy", help="Accuracy by year level, module or status"),
+        "completion": subparsers.add_parser("completion", help="Progress completion per module"),
+        "load": subparsers.add_parser("load", help="Answers by hour of day or weekday"),
+    }
+    report_parsers["accuracy"].add_argument("--by", choices=["year", "module", "status"], default="year")
+    report_parsers["load"].add_argument("--by", choices=["hour", "weekday"], default="hour")
+    report_parsers["load"].add_argument("--tz", default=DEFAULT_TIMEZONE, help=f"Time zone (default: {DEFAULT_TIMEZONE})")
+    for report_parser in report_parsers.values():
+        report_parser.add_argument("source", help="Snapshot file or Parquet directory")
+        report_parser.add_argument("--format", choices=["table", "csv", "json"], default="table")
+        report_parser.add_argument("-o", "--output", help="Write the report to a file")
+
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    instrumentation.start(args)
+    if not args.command:
+        parser.print_help()
+        return
+
+    if args.command == "export":
+        start = time.perf_counter()
+        try:
+            if args.rdb:
+                count = export_rdb(args.rdb, args.output)
+            else:
+                import redis
+                count = export_snapshot(redis.Redis.from_url(args.redis_url, decode_responses=True), args.output)
+        except Exception as e:
+            print(f"\n✗ Export failed: {e}\n")
+            sys.exit(1)
+        print(f"\n✓ {count} keys exported to {args.output} in {time.perf_counter() - start:.1f}s\n")
+        return
+
+    tables = load_tables(args.source)
+    if args.command == "tables":
+        print(f"\n{'='*40}")
+        for name, frame in tables.items():
+            print(f"  {name:<10} {len(frame):>10} rows")
+        print(f"{'='*40}\n")
+        if args.parquet:
+            save_parquet(tables, args.parquet)
+            print(f"✓ Parquet tables written to {args.parquet}\n")
+    elif args.command == "accuracy":
+        write_report(accuracy_report(tables, args.by), args.format, args.output)
+    elif args.command == "completion":
+        write_report(completion_report(tables), args.format, args.output)
+    elif args.command == "load":
+        write_report(load_report(tables, args.by, args.tz), args.format, args.output)
+
+
+if __name__ == "__main__":
+    main()
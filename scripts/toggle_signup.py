@@ -16,86 +16,45 @@ Set environment variables:
   ADMIN_SECRET - Admin secret key (default: learnfmpa2024)
 """
 
-import json
 import os
 import argparse
-import urllib.request
-import urllib.error
+
+from admin_client import api_request
+import instrumentation
 
 DEFAULT_API_URL = os.environ.get("API_URL", "https://www.learnfmpa.com")
 DEFAULT_ADMIN_SECRET = os.environ.get("ADMIN_SECRET", "learnfmpa2024")
 
 
 def toggle_signup(api_url: str, admin_secret: str, enabled: bool):
-    data = {
-        "admin_secret": admin_secret,
+    result = api_request(api_url, admin_secret, "/api/admin/signup-toggle", "POST", {
         "signup_open": enabled,
-    }
-
-    url = f"{api_url}/api/admin/signup-toggle"
-    headers = {"Content-Type": "application/json"}
-    req_data = json.dumps(data).encode("utf-8")
-
-    try:
-        req = urllib.request.Request(url, data=req_data, headers=headers, method="POST")
-        with urllib.request.urlopen(req, timeout=30) as response:
-            result = json.loads(response.read().decode("utf-8"))
-
-        if result.get("success"):
-            state = "OPEN" if enabled else "CLOSED"
-            label = "open" if enabled else "closed"
-            print(f"\n✓ Sign-up page is now {state}")
-            print(f"  Users {'can' if enabled else 'cannot'} register for a free trial.")
-            print(f"  The /signup page {'shows the registration form' if enabled else 'shows the registrations closed message'}.\n")
-        else:
-            print(f"\n✗ Error: {result.get('error', 'Unknown error')}\n")
+    })
 
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode("utf-8")
-        try:
-            result = json.loads(error_body)
-            print(f"\n✗ Error: {result.get('error', 'HTTP error')}\n")
-        except Exception:
-            print(f"\n✗ HTTP Error {e.code}: {error_body}\n")
-    except urllib.error.URLError as e:
-        print(f"\n✗ Cannot connect to {api_url}: {e}\n")
-    except Exception as e:
-        print(f"\n✗ Error: {e}\n")
+    if result.get("success"):
+        state = "OPEN" if enabled else "CLOSED"
+        print(f"\n✓ Sign-up page is now {state}")
+        print(f"  Users {'can' if enabled else 'cannot'} register for a free trial.")
+        print(f"  The /signup page {'shows the registration form' if enabled else 'shows the registrations closed message'}.\n")
+    else:
+        print(f"\n✗ Error: {result.get('error', 'Unknown error')}\n")
 
 
 def check_status(api_url: str, admin_secret: str):
-    url = f"{api_url}/api/admin/signup-toggle?admin_secret={admin_secret}"
-    headers = {"Content-Type": "application/json"}
-
-    try:
-        req = urllib.request.Request(url, headers=headers, method="GET")
-        with urllib.request.urlopen(req, timeout=30) as response:
-            result = json.loads(response.read().decode("utf-8"))
-
-        if result.get("success"):
-            is_open = result.get("signup_open", False)
-            state = "OPEN" if is_open else "CLOSED"
-            print(f"\n  Sign-up status: {state}")
-            if is_open:
-                print("  Users can register for a 7-day free trial.")
-                print("  The /signup page shows the registration form.\n")
-            else:
-                print("  Users cannot register.")
-                print("  The /signup page shows the registrations closed message.\n")
+    result = api_request(api_url, admin_secret, "/api/admin/signup-toggle", "GET")
+
+    if result.get("success"):
+        is_open = result.get("signup_open", False)
+        state = "OPEN" if is_open else "CLOSED"
+        print(f"\n  Sign-up status: {state}")
+        if is_open:
+            print("  Users can register for a 7-day free trial.")
+            print("  The /signup page shows the registration form.\n")
         else:
-            print(f"\n✗ Error: {result.get('error', 'Unknown error')}\n")
-
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode("utf-8")
-        try:
-            result = json.loads(error_body)
-            print(f"\n✗ Error: {result.get('error', 'HTTP error')}\n")
-        except Exception:
-            print(f"\n✗ HTTP Error {e.code}: {error_body}\n")
-    except urllib.error.URLError as e:
-        print(f"\n✗ Cannot connect to {api_url}: {e}\n")
-    except Exception as e:
-        print(f"\n✗ Error: {e}\n")
+            print("  Users cannot register.")
+            print("  The /signup page shows the registrations closed message.\n")
+    else:
+        print(f"\n✗ Error: {result.get('error', 'Unknown error')}\n")
 
 
 def main():
@@ -130,7 +89,9 @@ Examples:
         help="Action: 'on' to open signup, 'off' to close, 'status' to check",
     )
 
+    instrumentation.add_arguments(parser)
     args = parser.parse_args()
+    instrumentation.start(args)
 
     api_url = args.url
     admin_secret = args.secret
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+LearnFMPA User Snapshot Cache
+
+On-disk snapshot of GET /api/admin/users shared by the read-only admin
+commands (list, details, trial list/stats, activate-batch --edu, name lookups).
+
+Every online read revalidates the snapshot with If-None-Match; when no admin
+change was made the server answers 304 without reading the users store, so
+repeated queries cost one tiny request. Logins and answers alone do not
+invalidate the snapshot: its last login and daily answer columns may lag by
+up to five minutes. With offline mode the snapshot is used as-is and no
+request is made.
+
+Snapshots live in ~/.cache/learnfmpa/ (override with LEARNFMPA_CACHE_DIR),
+one file per API host, readable only by the current user.
+"""
+
+import http.client
+import json
+import os
+import tempfile
+import time
+import urllib.parse
+from typing import Optional
+
+from admin_client import get_client
+
+CACHE_DIR = os.environ.get(
+    "LEARNFMPA_CACHE_DIR",
+    os.path.join(os.path.expanduser("~"), ".cache", "learnfmpa"),
+)
+
+_offline = False
+_memo = {}
+
+
+def set_offline(offline: bool):
+    global _offline
+    _offline = offline
+
+
+def is_offline() -> bool:
+    return _offline
+
+
+def _snapshot_path(api_url: str) -> str:
+    host = urllib.parse.urlsplit(api_url).netloc or "default"
+    safe = "".join(c if c.isalnum() or c in ".-" else "_" for c in host)
+    return os.path.join(CACHE_DIR, f"users-{safe}.json")
+
+
+def _read_snapshot(api_url: str) -> Optional[dict]:
+    try:
+        with open(_snapshot_path(api_url), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_snapshot(api_url: str, snapshot: dict):
+    os.makedirs(CACHE_DIR, mode=0o700, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=CACHE_DIR, prefix=".users-", suffix=".json")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, ensure_ascii=False)
+        os.chmod(tmp, 0o600)
+        os.replace(tmp, _snapshot_path(api_url))
+    except OSError:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def load_users(api_url: str, admin_secret: str) -> dict:
+    """Return {"success": True, "users": [...], "snapshot": {...}} or {"error": ...}.
+
+    Same shape as the GET /api/admin/users response, served from the local
+    snapshot whenever the server confirms it is still current.
+    """
+    snapshot = _memo.get(api_url) or _read_snapshot(api_url)
+
+    if _offline:
+        if snapshot is None:
+            return {"error": f"No cached user snapshot for {api_url}. Run once without --offline."}
+        _memo[api_url] = snapshot
+        return {"success": True, "users": snapshot["users"], "snapshot": snapshot}
+
+    headers = {}
+    if snapshot and snapshot.get("etag"):
+        headers["If-None-Match"] = snapshot["etag"]
+
+    client = get_client(api_url, admin_secret)
+    try:
+        response = client.send("/api/admin/users", "GET", headers=headers)
+    except (OSError, http.client.HTTPException) as e:
+        return {"error": f"Cannot connect to {api_url}: {e}"}
+
+    if response.status == 304 and snapshot is not None:
+        snapshot["validated_at"] = time.time()
+        _memo[api_url] = snapshot
+        return {"success": True, "users": snapshot["users"], "snapshot": snapshot}
+
+    try:
+        result = response.json()
+    except ValueError:
+        return {"error": response.body.decode("utf-8", errors="replace") or f"HTTP {response.status}"}
+    if not result.get("success"):
+        return result
+
+    snapshot = {
+        "api_url": api_url,
+        "etag": response.headers.get("etag"),
+        "fetched_at": time.time(),
+        "validated_at": time.time(),
+        "users": result.get("users", []),
+    }
+    _memo[api_url] = snapshot
+    _write_snapshot(api_url, snapshot)
+    return {"success": True, "users": snapshot["users"], "snapshot": snapshot}
+
+
+def get_user(api_url: str, admin_secret: str, email: str) -> dict:
+    """Snapshot-backed replacement for GET /api/admin/users?email=..."""
+    result = load_users(api_url, admin_secret)
+    if not result.get("success"):
+        return result
+    email = email.lower()
+    for user in result["users"]:
+        if user.get("email", "").lower() == email:
+            return {"success": True, "user": user}
+    return {"error": "Utilisateur non trouvé"}
+
+
+def snapshot_age(result: dict) -> str:
+    snapshot = result.get("snapshot") or {}
+    fetched_at = snapshot.get("fetched_at")
+    if not fetched_at:
+        return "unknown"
+    minutes = int((time.time() - fetched_at) // 60)
+    if minutes < 1:
+        return "just now"
+    if minutes < 60:
+        return f"{minutes} min ago"
+    return f"{minutes // 60}h{minutes % 60:02d} ago"
@@ -0,0 +1,384 @@
+#!/usr/bin/env python3
+"""
+LearnFMPA User Query Engine
+
+Indexed, in-memory queries over the admin user snapshot (see user_cache.py).
+
+Expression language: space-separated terms, all of which must match.
+Quote values containing spaces.
+
+  field=value     equals             sub=paid   domain=edu.uiz.ac.ma
+  field!=value    not equals         sub!=inactive
+  field~value     contains           years~3ème   name~ben
+  field<value     less than          expires<7d   answers<5
+  field>value     greater than       created>2025-09-01
+  field<=value, field>=value
+
+Fields:
+  email, name, domain, sub (subscription_status), trial, active, paid,
+  must_change (must_change_password), years, days (activation_days),
+  answers (daily_answer_count), expires, created, activated, last_login
+
+Dates accept YYYY-MM-DD or a relative offset from now (7d, 12h, -30d).
+Booleans accept yes/no, true/false, 1/0. expires is the activation (or trial
+start, for trials) plus activation_days, 7 when unset as on the server.
+
+Special terms:
+  sort=FIELD (prefix with - for descending, repeatable)   limit=N
+  Users without a value for a sort field come last in either direction.
+
+Indexes are built once per snapshot for domain, sub, trial, years and
+expires (sorted, for range scans); the other fields are checked only on the
+candidates left after the indexed terms.
+
+Example:
+  python manage_users.py query "sub=paid years~3ème expires<7d sort=expires"
+"""
+
+import bisect
+import csv
+import json
+import re
+import shlex
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Callable, Dict, List, Optional, Set
+
+FIELD_ALIASES = {
+    "sub": "subscription_status",
+    "status": "subscription_status",
+    "trial": "is_trial",
+    "active": "is_active",
+    "paid": "has_paid",
+    "must_change": "must_change_password",
+    "days": "activation_days",
+    "answers": "daily_answer_count",
+    "created": "created_at",
+    "activated": "activated_at",
+}
+
+BOOL_FIELDS = {"is_trial", "is_active", "has_paid", "must_change_password"}
+INT_FIELDS = {"activation_days", "daily_answer_count"}
+DATE_FIELDS = {"expires", "created_at", "activated_at", "last_login"}
+TEXT_FIELDS = {"email", "name", "domain", "subscription_status", "years"}
+INDEXED_FIELDS = {"domain", "subscription_status", "is_trial", "years", "expires"}
+
+DEFAULT_COLUMNS = ["email", "name", "subscription_status", "years", "is_trial", "is_active", "expires", "daily_answer_count"]
+
+# Same default as migrateUser() and trialExpiry() on the server: a user
+# without activation_days gets 7, trial or not.
+DEFAULT_ACTIVATION_DAYS = 7
+
+TERM_RE = re.compile(r"^([a-z_]+)(!=|<=|>=|=|~|<|>)(.*)$")
+RELATIVE_RE = re.compile(r"^(-?\d+(?:\.\d+)?)([dhm])$")
+
+
+class QueryError(ValueError):
+    pass
+
+
+def parse_date(value: str, field: str) -> datetime:
+    if not value:
+        return None
+    match = RELATIVE_RE.match(value)
+    if match:
+        amount, unit = float(match.group(1)), match.group(2)
+        delta = {"d": timedelta(days=amount), "h": timedelta(hours=amount), "m": timedelta(minutes=amount)}[unit]
+        return datetime.now(timezone.utc) + delta
+    try:
+        parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        raise QueryError(f"Invalid date for {field}: '{value}' (use YYYY-MM-DD or 7d / -30d / 12h)")
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+
+def parse_bool(value: str, field: str) -> bool:
+    lowered = value.lower()
+    if lowered in ("yes", "true", "1", "y", "oui"):
+        return True
+    if lowered in ("no", "false", "0", "n", "non"):
+        return False
+    raise QueryError(f"Invalid boolean for {field}: '{value}'")
+
+
+def user_expiry(user: dict) -> Optional[datetime]:
+    if user.get("is_trial"):
+        start = user.get("trial_started_at") or user.get("activated_at")
+    else:
+        start = user.get("activated_at") or user.get("trial_started_at")
+    if not start:
+        return None
+    try:
+        start_dt = parse_date(start, "activated_at")
+    except QueryError:
+        return None
+    days = user.get("activation_days")
+    if days is None:
+        days = DEFAULT_ACTIVATION_DAYS
+    return start_dt + timedelta(days=days)
+
+
+def field_value(user: dict, field: str):
+    if field == "domain":
+        return user.get("email", "").rsplit("@", 1)[-1].lower()
+    if field == "expires":
+        return user_expiry(user)
+    if field == "years":
+        years = user.get("years") or []
+        return years if isinstance(years, list) else [str(years)]
+    if field in DATE_FIELDS:
+        value = user.get(field)
+        if not value:
+            return None
+        try:
+            return parse_date(value, field)
+        except QueryError:
+            return None
+    return user.get(field)
+
+
+class Term:
+    def __init__(self, field: str, op: str, raw: str):
+        self.field = FIELD_ALIASES.get(field, field)
+        self.op = op
+        self.raw = raw
+        if self.field in BOOL_FIELDS:
+            if op not in ("=", "!="):
+                raise QueryError(f"{field} only supports = and !=")
+            self.value = parse_bool(raw, field)
+        elif self.field in INT_FIELDS:
+            try:
+                self.value = int(raw)
+            except ValueError:
+                raise QueryError(f"Invalid number for {field}: '{raw}'")
+        elif self.field in DATE_FIELDS:
+            if op in ("~",):
+                raise QueryError(f"{field} does not support ~")
+            self.value = parse_date(raw, field)
+        elif self.field in TEXT_FIELDS:
+            self.value = raw.lower()
+        else:
+            raise QueryError(f"Unknown field '{field}'")
+
+    def matches(self, user: dict) -> bool:
+        actual = field_value(user, self.field)
+        if self.field == "years":
+            lowered = [y.lower() for y in actual]
+            if self.op == "~":
+                return any(self.value in y for y in lowered)
+            if self.op == "=":
+                return self.value in lowered
+            if self.op == "!=":
+                return self.value not in lowered
+            raise QueryError("years supports =, != and ~")
+        if self.field in TEXT_FIELDS:
+            actual = (actual or "").lower()
+            if self.op == "~":
+                return self.value in actual
+        if actual is None:
+            return self.op == "!="
+        if self.field in BOOL_FIELDS:
+            actual = bool(actual)
+        return {
+            "=": lambda a, b: a == b,
+            "!=": lambda a, b: a != b,
+            "<": lambda a, b: a < b,
+            ">": lambda a, b: a > b,
+            "<=": lambda a, b: a <= b,
+            ">=": lambda a, b: a >= b,
+            "~": lambda a, b: b in str(a).lower(),
+        }[self.op](actual, self.value)
+
+
+class Query:
+    def __init__(self, terms: List[Term], sort: List[str], limit: Optional[int]):
+        self.terms = terms
+        self.sort = sort
+        self.limit = limit
+
+
+def parse_query(expression: str) -> Query:
+    terms, sort, limit = [], [], None
+    try:
+        tokens = shlex.split(expression)
+    except ValueError as e:
+        raise QueryError(str(e))
+    for token in tokens:
+        match = TERM_RE.match(token)
+        if not match:
+            raise QueryError(f"Cannot parse '{token}' (expected field<op>value)")
+        field, op, raw = match.groups()
+        if field == "sort" and op == "=":
+            for key in raw.split(","):
+                name = key.lstrip("-")
+                resolved = FIELD_ALIASES.get(name, name)
+                if resolved not in BOOL_FIELDS | INT_FIELDS | DATE_FIELDS | TEXT_FIELDS:
+                    raise QueryError(f"Unknown sort field '{name}'")
+                sort.append(("-" if key.startswith("-") else "") + resolved)
+        elif field == "limit" and op == "=":
+            try:
+                limit = int(raw)
+            except ValueError:
+                raise QueryError(f"Invalid limit '{raw}'")
+        else:
+            terms.append(Term(field, op, raw))
+    return Query(terms, sort, limit)
+
+
+class UserIndex:
+    """Secondary indexes over a user list, built once and reused by every query."""
+
+    def __init__(self, users: List[dict]):
+        self.users = users
+        self.all_ids: Set[int] = set(range(len(users)))
+        self.by_domain: Dict[str, Set[int]] = {}
+        self.by_status: Dict[str, Set[int]] = {}
+        self.by_trial: Dict[bool, Set[int]] = {True: set(), False: set()}
+        self.by_year: Dict[str, Set[int]] = {}
+        self.expiry_keys: List[float] = []
+        self.expiry_ids: List[int] = []
+        self.no_expiry: Set[int] = set()
+
+        expiries = []
+        for i, user in enumerate(users):
+            self.by_domain.setdefault(field_value(user, "domain"), set()).add(i)
+            self.by_status.setdefault((user.get("subscription_status") or "").lower(), set()).add(i)
+            self.by_trial[bool(user.get("is_trial"))].add(i)
+            for year in field_value(user, "years"):
+                self.by_year.setdefault(year.lower(), set()).add(i)
+            expiry = user_expiry(user)
+            if expiry is None:
+                self.no_expiry.add(i)
+            else:
+                expiries.append((expiry.timestamp(), i))
+        expiries.sort()
+        self.expiry_keys = [k for k, _ in expiries]
+        self.expiry_ids = [i for _, i in expiries]
+
+    def _expiry_range(self, op: str, value: datetime) -> Set[int]:
+        key = value.timestamp()
+        if op == "<":
+            return set(self.expiry_ids[:bisect.bisect_left(self.expiry_keys, key)])
+        if op == "<=":
+            return set(self.expiry_ids[:bisect.bisect_right(self.expiry_keys, key)])
+        if op == ">":
+            return set(self.expiry_ids[bisect.bisect_right(self.expiry_keys, key):])
+        if op == ">=":
+            return set(self.expiry_ids[bisect.bisect_left(self.expiry_keys, key):])
+        lo, hi = bisect.bisect_left(self.expiry_keys, key), bisect.bisect_right(self.expiry_keys, key)
+        matched = set(self.expiry_ids[lo:hi])
+        return matched if op == "=" else self.all_ids - matched
+
+    def candidates(self, term: Term) -> Optional[Set[int]]:
+        """Ids matching an indexed term, or None when the term needs a scan."""
+        if term.field == "domain" and term.op in ("=", "!="):
+            matched = self.by_domain.get(term.value, set())
+        elif term.field == "subscription_status" and term.op in ("=", "!="):
+            matched = self.by_status.get(term.value, set())
+        elif term.field == "is_trial":
+            matched = self.by_trial[term.value]
+        elif term.field == "years" and term.op in ("=", "!="):
+            matched = self.by_year.get(term.value, set())
+        elif term.field == "years" and term.op == "~":
+            return set().union(*(ids for year, ids in self.by_year.items() if term.value in year))
+        elif term.field == "expires" and term.value is not None:
+            return self._expiry_range(term.op, term.value)
+        else:
+            return None
+        return self.all_ids - matched if term.op == "!=" else matched
+
+    def run(self, query: Query) -> List[dict]:
+        ids: Optional[Set[int]] = None
+        scan_terms = []
+        # Intersect the smallest indexed sets first.
+        indexed = []
+        for term in query.terms:
+            matched = self.candidates(term) if term.field in INDEXED_FIELDS else None
+            if matched is None:
+                scan_terms.append(term)
+            else:
+                indexed.append(matched)
+        for matched in sorted(indexed, key=len):
+            ids = matched if ids is None else ids & matched
+            if not ids:
+                break
+        if ids is None:
+            ids = self.all_ids
+
+        rows = [self.users[i] for i in sorted(ids)]
+        if scan_terms:
+            rows = [u for u in rows if all(t.matches(u) for t in scan_terms)]
+
+        for key in reversed(query.sort):
+            field = key.lstrip("-")
+            descending = key.startswith("-")
+            rows.sort(key=_sort_key(field, descending), reverse=descending)
+        if query.limit is not None:
+            rows = rows[:query.limit]
+        return rows
+
+
+_index_cache: Dict[int, UserIndex] = {}
+
+
+def index_for(users: List[dict]) -> UserIndex:
+    """Return the index for this user list, building it only on first use."""
+    index = _index_cache.get(id(users))
+    if index is None or index.users is not users:
+        index = UserIndex(users)
+        _index_cache[id(users)] = index
+    return index
+
+
+def run_query(users: List[dict], expression: str) -> List[dict]:
+    return index_for(users).run(parse_query(expression))
+
+
+def _sort_key(field: str, descending: bool = False) -> Callable[[dict], tuple]:
+    # Missing values sort after present ones; the flag is flipped for a
+    # reversed sort so they stay last there too.
+    def key(user):
+        value = field_value(user, field)
+        if isinstance(value, list):
+            value = ", ".join(value)
+        if isinstance(value, datetime):
+            value = value.timestamp()
+        return ((value is None) != descending, value if value is not None else 0)
+    return key
+
+
+def to_record(user: dict, columns: List[str]) -> dict:
+    record = {}
+    for column in columns:
+        field = FIELD_ALIASES.get(column, column)
+        value = field_value(user, field)
+        if isinstance(value, datetime):
+            value = value.strftime("%Y-%m-%d %H:%M")
+        elif isinstance(value, list):
+            value = ", ".join(value)
+        record[column] = value
+    return record
+
+
+def write_results(rows: List[dict], fmt: str = "table", columns: List[str] = None, output: str = None):
+    columns = columns or DEFAULT_COLUMNS
+    records = [to_record(u, columns) for u in rows]
+    stream = open(output, "w", encoding="utf-8", newline="") if output else sys.stdout
+    try:
+        if fmt == "json":
+            json.dump(records, stream, indent=2, ensure_ascii=False)
+            stream.write("\n")
+        elif fmt == "csv":
+            writer = csv.DictWriter(stream, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(records)
+        else:
+            widths = {c: max([len(c)] + [len(str(r[c] if r[c] is not None else "")) for r in records]) for c in columns}
+            line = "  ".join(f"{c:<{widths[c]}}" for c in columns)
+            stream.write(f"{'=' * len(line)}\n{line}\n{'=' * len(line)}\n")
+            for r in records:
+                stream.write("  ".join(f"{str(r[c] if r[c] is not None else ''):<{widths[c]}}" for c in columns) + "\n")
+            stream.write(f"{'=' * len(line)}\n")
+    finally:
+        if output:
+            stream.close()
@@ -1,5 +1,5 @@
 import { NextRequest, NextResponse } from 'next/server';
-import { loadUserProgress, loadUsers } from '@/lib/user-store';
+import { findUserByEmail, loadUserProgress } from '@/lib/user-store';
 
 export async function GET(request: NextRequest) {
   try {
@@ -15,15 +15,8 @@ export async function GET(request: NextRequest) {
       return NextResponse.json({ error: 'Email requis' }, { status: 400 });
     }
 
-    const usersData = await loadUsers();
-    let userId: string | null = null;
-
-    for (const [id, user] of Object.entries(usersData.users)) {
-      if (user.email.toLowerCase() === email.toLowerCase()) {
-        userId = id;
-        break;
-      }
-    }
+    const user = await findUserByEmail(email);
+    const userId = user ? user.id : null;
 
     if (!userId) {
       return NextResponse.json({ error: 'Utilisateur non trouvé' }, { status: 404 });
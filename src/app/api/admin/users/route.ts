@@ -1,6 +1,6 @@
 import { NextRequest, NextResponse } from 'next/server';
 import crypto from 'crypto';
-import { loadUsers, saveUsers } from '@/lib/user-store';
+import { getUsersListEtag, loadUsersVersioned, updateUsers, User, UsersData } from '@/lib/user-store';
 
 function hashPassword(password: string): string {
   return crypto.createHash('sha256').update(password).digest('hex');
@@ -56,163 +56,59 @@ function migrateUser(user: any): any {
   return user;
 }
 
-export async function POST(request: NextRequest) {
-  try {
-    const body = await request.json();
-    const { action, name, email, password, admin_secret, new_password, is_active, year, years, activation_days, has_paid, is_trial, trial_started_at, subscription_status } = body;
-
-    if (!validateAdmin(admin_secret)) {
-      return NextResponse.json({ error: 'Non autorisé' }, { status: 403 });
-    }
+function needsMigration(user: User): boolean {
+  const userAny = user as any;
+  return !user.years || !Array.isArray(user.years) || userAny.year || user.activation_days === undefined || user.has_paid === undefined || !user.subscription_status;
+}
 
-    // Activate user: set is_active=true and subscription_status='paid' (7-day premium trial)
-    if (action === 'activate') {
-      if (!email) {
-        return NextResponse.json({ error: 'Email requis' }, { status: 400 });
-      }
-      const usersData = await loadUsers();
-      let found = false;
+const MAX_BULK_ACTIONS = 500;
 
-      for (const [userId, user] of Object.entries(usersData.users)) {
-        if (user.email.toLowerCase() === email.toLowerCase()) {
-          const migrated = migrateUser(usersData.users[userId]);
-          migrated.is_active = true;
-          migrated.activated_at = new Date().toISOString();
-          if (!migrated.subscription_status || migrated.subscription_status === 'inactive') {
-            migrated.subscription_status = 'paid';
-          }
-          migrated.daily_answer_count = 0;
-          migrated.daily_answer_reset = new Date().toISOString();
-          found = true;
-          break;
-        }
-      }
+interface ActionResult {
+  status: number;
+  body: Record<string, any>;
+  changed: boolean;
+}
 
-      if (!found) {
-        return NextResponse.json({ error: 'Utilisateur non trouvé' }, { status: 404 });
-      }
+function ok(body: Record<string, any>): ActionResult {
+  return { status: 200, body: { success: true, ...body }, changed: true };
+}
 
-      await saveUsers(usersData);
-      return NextResponse.json({ success: true, message: 'Compte activé avec succès' });
-    }
+function fail(error: string, status: number): ActionResult {
+  return { status, body: { error }, changed: false };
+}
 
-    // Update user properties
-    if (action === 'update_user' || (!action && email && !name && !password && !new_password && is_active === undefined && (year !== undefined || years !== undefined || activation_days !== undefined || has_paid !== undefined || is_trial !== undefined || subscription_status !== undefined))) {
-      const usersData = await loadUsers();
-      let found = false;
-      
-      for (const [userId, user] of Object.entries(usersData.users)) {
-        if (user.email.toLowerCase() === email.toLowerCase()) {
-          const migrated = migrateUser(usersData.users[userId]);
-          const resolvedYears = Array.isArray(years)
-            ? years.filter((y: string) => VALID_YEARS.includes(y))
-            : (year && VALID_YEARS.includes(year) ? [year] : null);
-          if (resolvedYears && resolvedYears.length > 0) {
-            migrated.years = resolvedYears;
-          }
-          if (activation_days !== undefined && typeof activation_days === 'number' && activation_days > 0) {
-            migrated.activation_days = activation_days;
-          }
-          if (has_paid !== undefined && typeof has_paid === 'boolean') {
-            migrated.has_paid = has_paid;
-            if (has_paid && !migrated.activated_at) {
-              migrated.activated_at = new Date().toISOString();
-            }
-          }
-          if (is_trial !== undefined) {
-            migrated.is_trial = !!is_trial;
-            if (!migrated.is_trial) {
-              migrated.trial_started_at = null;
-            }
-          }
-          if (trial_started_at !== undefined) {
-            migrated.trial_started_at = trial_started_at;
-          }
-          if (subscription_status !== undefined && ['inactive', 'free', 'paid'].includes(subscription_status)) {
-            migrated.subscription_status = subscription_status;
-            if (subscription_status === 'paid') {
-              migrated.has_paid = true;
-              migrated.is_active = true;
-            }
-            if (subscription_status === 'free') {
-              migrated.is_active = true;
-              migrated.has_paid = false;
-            }
-            if (subscription_status === 'inactive') {
-              migrated.is_active = false;
-              migrated.has_paid = false;
-            }
-          }
-          found = true;
-          break;
-        }
-      }
-      
-      if (!found) {
-        return NextResponse.json({ error: 'Utilisateur non trouvé' }, { status: 404 });
-      }
-      
-      await saveUsers(usersData);
-      return NextResponse.json({ success: true, message: 'Utilisateur mis à jour' });
-    }
+// Older clients send updates without an explicit `action`; infer it from the fields present.
+function resolveAction(params: any): string {
+  const { action, name, email, password, new_password, is_active, year, years, activation_days, has_paid, is_trial, subscription_status } = params;
+  if (action) return action;
+  if (email && !name && !password && !new_password && is_active === undefined && (year !== undefined || years !== undefined || activation_days !== undefined || has_paid !== undefined || is_trial !== undefined || subscription_status !== undefined)) {
+    return 'update_user';
+  }
+  if (email && new_password && !name) return 'reset_password';
+  if (email && is_active !== undefined && !name) return 'set_active';
+  return 'create';
+}
 
-    // Reset password
-    if (action === 'reset_password' || (!action && email && new_password && !name)) {
-      const usersData = await loadUsers();
-      let found = false;
-      
-      for (const [userId, user] of Object.entries(usersData.users)) {
-        if (user.email.toLowerCase() === email.toLowerCase()) {
-          usersData.users[userId].password_hash = hashPassword(new_password);
-          usersData.users[userId].must_change_password = true;
-          found = true;
-          break;
-        }
-      }
-      
-      if (!found) {
-        return NextResponse.json({ error: 'Utilisateur non trouvé' }, { status: 404 });
-      }
-      
-      await saveUsers(usersData);
-      return NextResponse.json({ success: true, message: 'Mot de passe réinitialisé' });
-    }
+function buildEmailIndex(usersData: UsersData): Map<string, string> {
+  const index = new Map<string, string>();
+  for (const [userId, user] of Object.entries(usersData.users)) {
+    index.set(user.email.toLowerCase(), userId);
+  }
+  return index;
+}
 
-    // Activate/Deactivate user
-    if (action === 'set_active' || (!action && email && is_active !== undefined && !name)) {
-      const usersData = await loadUsers();
-      let found = false;
-      
-      for (const [userId, user] of Object.entries(usersData.users)) {
-        if (user.email.toLowerCase() === email.toLowerCase()) {
-          usersData.users[userId].is_active = is_active;
-          if (is_active) {
-            const migrated = migrateUser(usersData.users[userId]);
-            if (!migrated.subscription_status || migrated.subscription_status === 'inactive') {
-              migrated.subscription_status = 'free';
-            }
-          } else {
-            usersData.users[userId].subscription_status = 'inactive';
-          }
-          found = true;
-          break;
-        }
-      }
-      
-      if (!found) {
-        return NextResponse.json({ error: 'Utilisateur non trouvé' }, { status: 404 });
-      }
-      
-      await saveUsers(usersData);
-      return NextResponse.json({ success: true, message: `Utilisateur ${is_active ? 'activé' : 'désactivé'}` });
-    }
+// Applies one admin action to an already-loaded users blob. Callers load and
+// save the blob once, whether they apply one action or a whole bulk batch.
+function applyAction(usersData: UsersData, emailIndex: Map<string, string>, params: any): ActionResult {
+  const { name, email, password, new_password, is_active, year, years, activation_days, has_paid, is_trial, trial_started_at, subscription_status } = params;
+  const action = resolveAction(params);
 
-    // Create user
+  if (action === 'create') {
     if (!name || !email || !password) {
-      return NextResponse.json(
-        { error: 'Nom, email et mot de passe requis' },
-        { status: 400 }
-      );
+      return fail('Nom, email et mot de passe requis', 400);
+    }
+    if (emailIndex.has(email.toLowerCase())) {
+      return fail('Un utilisateur avec cet email existe déjà', 400);
     }
 
     const resolvedYears = Array.isArray(years)
@@ -221,20 +117,9 @@ export async function POST(request: NextRequest) {
     if (resolvedYears.length === 0) resolvedYears.push('3ème année');
     const userActivationDays = (activation_days && typeof activation_days === 'number' && activation_days > 0) ? activation_days : 7;
 
-    const usersData = await loadUsers();
-    
-    for (const user of Object.values(usersData.users)) {
-      if (user.email.toLowerCase() === email.toLowerCase()) {
-        return NextResponse.json(
-          { error: 'Un utilisateur avec cet email existe déjà' },
-          { status: 400 }
-        );
-      }
-    }
-
     const userId = generateId();
     const now = new Date().toISOString();
-    
+
     usersData.users[userId] = {
       id: userId,
       name,
@@ -252,11 +137,9 @@ export async function POST(request: NextRequest) {
       daily_answer_count: 0,
       daily_answer_reset: now,
     };
+    emailIndex.set(email.toLowerCase(), userId);
 
-    await saveUsers(usersData);
-
-    return NextResponse.json({
-      success: true,
+    return ok({
       user: {
         id: userId,
         name,
@@ -268,8 +151,154 @@ export async function POST(request: NextRequest) {
       },
       temp_password: password
     });
+  }
+
+  if (!email) {
+    return fail('Email requis', 400);
+  }
+  const userId = emailIndex.get(email.toLowerCase());
+  if (!userId) {
+    return fail('Utilisateur non trouvé', 404);
+  }
+
+  // Activate user: set is_active=true and subscription_status='paid' (7-day premium trial)
+  if (action === 'activate') {
+    const migrated = migrateUser(usersData.users[userId]);
+    migrated.is_active = true;
+    migrated.activated_at = new Date().toISOString();
+    if (!migrated.subscription_status || migrated.subscription_status === 'inactive') {
+      migrated.subscription_status = 'paid';
+    }
+    migrated.daily_answer_count = 0;
+    migrated.daily_answer_reset = new Date().toISOString();
+    return ok({ message: 'Compte activé avec succès' });
+  }
+
+  // Update user properties
+  if (action === 'update_user') {
+    const migrated = migrateUser(usersData.users[userId]);
+    const resolvedYears = Array.isArray(years)
+      ? years.filter((y: string) => VALID_YEARS.includes(y))
+      : (year && VALID_YEARS.includes(year) ? [year] : null);
+    if (resolvedYears && resolvedYears.length > 0) {
+      migrated.years = resolvedYears;
+    }
+    if (activation_days !== undefined && typeof activation_days === 'number' && activation_days > 0) {
+      migrated.activation_days = activation_days;
+    }
+    if (has_paid !== undefined && typeof has_paid === 'boolean') {
+      migrated.has_paid = has_paid;
+      if (has_paid && !migrated.activated_at) {
+        migrated.activated_at = new Date().toISOString();
+      }
+    }
+    if (is_trial !== undefined) {
+      migrated.is_trial = !!is_trial;
+      if (!migrated.is_trial) {
+        migrated.trial_started_at = null;
+      }
+    }
+    if (trial_started_at !== undefined) {
+      migrated.trial_started_at = trial_started_at;
+    }
+    if (subscription_status !== undefined && ['inactive', 'free', 'paid'].includes(subscription_status)) {
+      migrated.subscription_status = subscription_status;
+      if (subscription_status === 'paid') {
+        migrated.has_paid = true;
+        migrated.is_active = true;
+      }
+      if (subscription_status === 'free') {
+        migrated.is_active = true;
+        migrated.has_paid = false;
+      }
+      if (subscription_status === 'inactive') {
+        migrated.is_active = false;
+        migrated.has_paid = false;
+      }
+    }
+    return ok({ message: 'Utilisateur mis à jour' });
+  }
+
+  // Reset password
+  if (action === 'reset_password') {
+    if (!new_password) {
+      return fail('Nouveau mot de passe requis', 400);
+    }
+    usersData.users[userId].password_hash = hashPassword(new_password);
+    usersData.users[userId].must_change_password = true;
+    return ok({ message: 'Mot de passe réinitialisé' });
+  }
+
+  // Activate/Deactivate user
+  if (action === 'set_active') {
+    usersData.users[userId].is_active = is_active;
+    if (is_active) {
+      const migrated = migrateUser(usersData.users[userId]);
+      if (!migrated.subscription_status || migrated.subscription_status === 'inactive') {
+        migrated.subscription_status = 'free';
+      }
+    } else {
+      usersData.users[userId].subscription_status = 'inactive';
+    }
+    return ok({ message: `Utilisateur ${is_active ? 'activé' : 'désactivé'}` });
+  }
+
+  if (action === 'delete') {
+    delete usersData.users[userId];
+    emailIndex.delete(email.toLowerCase());
+    return ok({ message: 'Utilisateur supprimé' });
+  }
+
+  return fail(`Action inconnue: ${action}`, 400);
+}
+
+export async function POST(request: NextRequest) {
+  try {
+    const body = await request.json();
+    const { action, actions, admin_secret } = body;
+
+    if (!validateAdmin(admin_secret)) {
+      return NextResponse.json({ error: 'Non autorisé' }, { status: 403 });
+    }
+
+    // Bulk: apply a list of actions with a single load/save of the users blob.
+    // Each action succeeds or fails on its own; results keep the request order.
+    if (action === 'bulk') {
+      if (!Array.isArray(actions) || actions.length === 0) {
+        return NextResponse.json({ error: 'Liste d\'actions requise' }, { status: 400 });
+      }
+      if (actions.length > MAX_BULK_ACTIONS) {
+        return NextResponse.json({ error: `Maximum ${MAX_BULK_ACTIONS} actions par requête` }, { status: 400 });
+      }
+
+      let results: ActionResult[] = [];
+      await updateUsers((usersData) => {
+        const emailIndex = buildEmailIndex(usersData);
+        results = actions.map((params: any) => applyAction(usersData, emailIndex, params));
+        return results.some((r) => r.changed);
+      });
+
+      return NextResponse.json({
+        success: true,
+        results: results.map((r) => ({ ...r.body, status: r.status })),
+        succeeded: results.filter((r) => r.changed).length,
+        failed: results.filter((r) => !r.changed).length,
+      });
+    }
+
+    let result: ActionResult = fail('Erreur serveur', 500);
+    await updateUsers((usersData) => {
+      result = applyAction(usersData, buildEmailIndex(usersData), body);
+      return result.changed;
+    });
+
+    return NextResponse.json(result.body, { status: result.status });
 
   } catch (error) {
+    // Nothing was written when the compare-and-set gave up: safe to resend
+    if (error instanceof Error && error.message.startsWith('Users update conflict')) {
+      return NextResponse.json({ error: 'Conflit de mise à jour, réessayez', conflict: true }, { status: 409 });
+    }
     console.error('Admin POST error:', error);
     return NextResponse.json({ error: 'Erreur serveur' }, { status: 500 });
   }
@@ -285,19 +314,31 @@ export async function GET(request: NextRequest) {
       return NextResponse.json({ error: 'Non autorisé' }, { status: 403 });
     }
 
-    const usersData = await loadUsers();
-    let needsMigration = false;
-
-    for (const [userId, user] of Object.entries(usersData.users)) {
-      const userAny = user as any;
-      if (!user.years || !Array.isArray(user.years) || userAny.year || user.activation_days === undefined || user.has_paid === undefined || !user.subscription_status) {
-        migrateUser(usersData.users[userId]);
-        needsMigration = true;
-      }
+    // The user list is revalidated by ETag (the admin fields version): an
+    // unchanged list answers 304 without reading the users. The ETag is read
+    // before the users, so a concurrent write can only make it look older.
+    const etag = email ? null : await getUsersListEtag();
+    if (etag && request.headers.get('if-none-match') === etag) {
+      return new NextResponse(null, { status: 304, headers: { ETag: etag } });
     }
 
-    if (needsMigration) {
-      await saveUsers(usersData);
+    const { data: usersData } = await loadUsersVersioned();
+
+    // Migrated on a fresh copy, so a write since the read is not reverted
+    if (Object.values(usersData.users).some(needsMigration)) {
+      await updateUsers((current) => {
+        let changed = false;
+        for (const user of Object.values(current.users)) {
+          if (needsMigration(user)) {
+            migrateUser(user);
+            changed = true;
+          }
+        }
+        return changed;
+      }).catch((error) => console.error('User migration error:', error));
+      for (const user of Object.values(usersData.users)) {
+        if (needsMigration(user)) migrateUser(user);
+      }
     }
 
     if (email) {
@@ -348,10 +389,14 @@ export async function GET(request: NextRequest) {
       daily_answer_reset: user.daily_answer_reset || null,
     }));
 
+    // After a migration save the version moved on; skip the ETag rather than
+    // guess which version the response corresponds to.
     return NextResponse.json({
       success: true,
       users,
       total: users.length
+    }, {
+      headers: needsMigration ? { 'Cache-Control': 'no-store' } : { 'Cache-Control': 'no-cache', ETag: etag as string }
     });
 
   } catch (error) {
@@ -374,23 +419,13 @@ export async function DELETE(request: NextRequest) {
       return NextResponse.json({ error: 'Email requis' }, { status: 400 });
     }
 
-    const usersData = await loadUsers();
-    let found = false;
-
-    for (const [userId, user] of Object.entries(usersData.users)) {
-      if (user.email.toLowerCase() === email.toLowerCase()) {
-        delete usersData.users[userId];
-        found = true;
-        break;
-      }
-    }
-
-    if (!found) {
-      return NextResponse.json({ error: 'Utilisateur non trouvé' }, { status: 404 });
-    }
+    let result: ActionResult = fail('Erreur serveur', 500);
+    await updateUsers((usersData) => {
+      result = applyAction(usersData, buildEmailIndex(usersData), { action: 'delete', email });
+      return result.changed;
+    });
 
-    await saveUsers(usersData);
-    return NextResponse.json({ success: true, message: 'Utilisateur supprimé' });
+    return NextResponse.json(result.body, { status: result.status });
 
   } catch (error) {
     console.error('Admin DELETE error:', error);
@@ -1,13 +1,10 @@
 import { NextRequest, NextResponse } from 'next/server';
-import { loadUserProgress, saveUserProgress, loadQuestionStats, saveQuestionStats, loadUsers, saveUsers } from '@/lib/user-store';
+import { recordUserProgress, recordAnswerStats, recordLimitHit, loadUser, addDailyAnswers, AnswerStatEntry, ProgressEntry, QuestionStats } from '@/lib/user-store';
 import { requireAuth } from '@/lib/auth';
+import { isValidQuestionId } from '@/lib/module-catalog';
 
 const FREE_DAILY_LIMIT = 10;
 
-function getTodayString(): string {
-  return new Date().toISOString().split('T')[0];
-}
-
 export async function POST(request: NextRequest) {
   const authResult = await requireAuth(request);
   if (authResult instanceof NextResponse) return authResult;
@@ -23,62 +20,60 @@ export async function POST(request: NextRequest) {
       );
     }
 
-    const usersData = await loadUsers();
-    const user = usersData.users[user_id];
+    const user = await loadUser(user_id);
     if (!user) {
       return NextResponse.json({ error: 'Utilisateur non trouvé' }, { status: 404 });
     }
 
     const subscriptionStatus = user.subscription_status || (user.has_paid ? 'paid' : (user.is_active ? 'free' : 'inactive'));
-    let dailyAnswerCount = user.daily_answer_count || 0;
-    const dailyAnswerReset = user.daily_answer_reset || user.activated_at || user.created_at;
-
-    const today = getTodayString();
-    const resetDate = dailyAnswerReset ? dailyAnswerReset.split('T')[0] : today;
-    if (resetDate !== today) {
-      dailyAnswerCount = 0;
+    // Counted atomically: concurrent requests never lose each other's answers
+    const dailyAnswerCount = await addDailyAnswers(user_id, answers.length, subscriptionStatus);
+    if (dailyAnswerCount === null) {
+      return NextResponse.json({ error: 'Utilisateur non trouvé' }, { status: 404 });
     }
 
-    dailyAnswerCount += answers.length;
-    usersData.users[user_id].daily_answer_count = dailyAnswerCount;
-    usersData.users[user_id].daily_answer_reset = new Date().toISOString();
-    usersData.users[user_id].subscription_status = subscriptionStatus;
-    await saveUsers(usersData);
-
     const isPaid = subscriptionStatus === 'paid';
     const freeLimitReached = !isPaid && dailyAnswerCount > FREE_DAILY_LIMIT;
+    if (freeLimitReached) {
+      await recordLimitHit(user_id, dailyAnswerCount - answers.length <= FREE_DAILY_LIMIT);
+    }
 
     let progress: any = {};
     let lastStats: any = null;
 
     if (isPaid) {
-      progress = await loadUserProgress(user_id);
-      const statsMap: Record<string, any> = {};
+      const progressEntries: ProgressEntry[] = [];
+      const statsEntries: Record<string, AnswerStatEntry[]> = {};
 
       for (const answer of answers) {
         const { module_id, question_id, is_correct, selected_options } = answer;
-        const moduleKey = `module_${module_id}`;
-        if (!progress[moduleKey]) progress[moduleKey] = {};
-        progress[moduleKey][question_id] = { is_correct, answered_at: new Date().toISOString() };
-
-        if (selected_options) {
+        progressEntries.push({
+          moduleKey: `module_${module_id}`,
+          questionId: String(question_id),
+          record: { is_correct, answered_at: new Date().toISOString() },
+        });
+
+        // Only known questions get stats keys; progress is recorded regardless
+        if (selected_options && await isValidQuestionId(parseInt(String(module_id)), String(question_id))) {
           const statsKey = String(module_id);
-          if (!statsMap[statsKey]) statsMap[statsKey] = await loadQuestionStats(parseInt(module_id));
           const options = Array.isArray(selected_options) ? selected_options.map((o: string | number) => parseInt(String(o))) : [parseInt(String(selected_options))];
-          if (!statsMap[statsKey][question_id]) statsMap[statsKey][question_id] = { total_answers: 0, correct_answers: 0, option_counts: {} };
-          statsMap[statsKey][question_id].total_answers += 1;
-          if (is_correct) statsMap[statsKey][question_id].correct_answers += 1;
-          for (const opt of options) statsMap[statsKey][question_id].option_counts[opt] = (statsMap[statsKey][question_id].option_counts[opt] || 0) + 1;
+          if (!statsEntries[statsKey]) statsEntries[statsKey] = [];
+          statsEntries[statsKey].push({ questionId: String(question_id), selectedOptions: options, isCorrect: !!is_correct });
         }
       }
 
-      await saveUserProgress(user_id, progress);
-      for (const [moduleIdStr, stats] of Object.entries(statsMap)) {
-        await saveQuestionStats(parseInt(moduleIdStr), stats);
+      progress = await recordUserProgress(user_id, progressEntries);
+      const lastStatsByModule: Record<string, QuestionStats | null> = {};
+      for (const [moduleIdStr, entries] of Object.entries(statsEntries)) {
+        lastStatsByModule[moduleIdStr] = await recordAnswerStats(parseInt(moduleIdStr), entries);
       }
 
       const lastAnswer = answers[answers.length - 1];
-      lastStats = statsMap[String(lastAnswer.module_id)]?.[lastAnswer.question_id] || null;
+      const moduleEntries = statsEntries[String(lastAnswer.module_id)];
+      // recordAnswerStats returns the stats of the module's last recorded question
+      if (moduleEntries && moduleEntries[moduleEntries.length - 1].questionId === String(lastAnswer.question_id)) {
+        lastStats = lastStatsByModule[String(lastAnswer.module_id)] || null;
+      }
     }
 
     return NextResponse.json({
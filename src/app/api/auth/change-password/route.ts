@@ -1,6 +1,6 @@
 import { NextRequest, NextResponse } from 'next/server';
 import crypto from 'crypto';
-import { loadUsers, saveUsers } from '@/lib/user-store';
+import { findUserByEmail, updateUser } from '@/lib/user-store';
 import { requireAuth } from '@/lib/auth';
 
 function hashPassword(password: string): string {
@@ -29,26 +29,15 @@ export async function POST(request: NextRequest) {
       );
     }
 
-    const usersData = await loadUsers();
-    
-    let foundUserId: string | null = null;
-    
-    for (const [userId, user] of Object.entries(usersData.users)) {
-      if (user.email.toLowerCase() === email.toLowerCase()) {
-        foundUserId = userId;
-        break;
-      }
-    }
+    const user = await findUserByEmail(email);
 
-    if (!foundUserId) {
+    if (!user) {
       return NextResponse.json(
         { error: 'Utilisateur non trouvé' },
         { status: 404 }
       );
     }
 
-    const user = usersData.users[foundUserId];
-
     const currentHash = hashPassword(current_password);
     if (user.password_hash !== currentHash) {
       return NextResponse.json(
@@ -57,19 +46,27 @@ export async function POST(request: NextRequest) {
       );
     }
 
-    usersData.users[foundUserId].password_hash = hashPassword(new_password);
-    usersData.users[foundUserId].must_change_password = false;
+    const newHash = hashPassword(new_password);
+    const saved = await updateUser(user.id, (u) => {
+      u.password_hash = newHash;
+      u.must_change_password = false;
+      if (u.subscription_status === 'inactive') {
+        u.subscription_status = 'paid';
+      }
+      return true;
+    });
 
-    if (usersData.users[foundUserId].subscription_status === 'inactive') {
-      usersData.users[foundUserId].subscription_status = 'paid';
+    if (!saved) {
+      return NextResponse.json(
+        { error: 'Utilisateur non trouvé' },
+        { status: 404 }
+      );
     }
 
-    await saveUsers(usersData);
-
     return NextResponse.json({
       success: true,
       message: 'Mot de passe changé avec succès',
-      subscription_status: usersData.users[foundUserId].subscription_status || 'free'
+      subscription_status: saved.subscription_status || 'free'
     });
 
   } catch (error) {
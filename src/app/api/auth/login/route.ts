@@ -1,6 +1,6 @@
 import { NextRequest, NextResponse } from 'next/server';
 import crypto from 'crypto';
-import { loadUsers, saveUsers, User } from '@/lib/user-store';
+import { findUserByEmail, updateUser, User } from '@/lib/user-store';
 import { createSession } from '@/lib/session-store';
 
 function hashPassword(password: string): string {
@@ -69,28 +69,17 @@ export async function POST(request: NextRequest) {
       );
     }
 
-    const usersData = await loadUsers();
-    
-    let foundUser: User | null = null;
-    let foundUserId: string | null = null;
-    
-    for (const [userId, user] of Object.entries(usersData.users)) {
-      if (user.email.toLowerCase() === email.toLowerCase()) {
-        foundUser = user;
-        foundUserId = userId;
-        break;
-      }
-    }
+    const foundUser: User | null = await findUserByEmail(email);
 
-    if (!foundUser || !foundUserId) {
+    if (!foundUser) {
       return NextResponse.json(
         { error: 'Email ou mot de passe incorrect' },
         { status: 401 }
       );
     }
 
-    const migrated = migrateUser(usersData.users[foundUserId!]);
-    usersData.users[foundUserId!] = migrated;
+    const foundUserId = foundUser.id;
+    const migrated = migrateUser(foundUser);
 
     if (!migrated.is_active) {
       return NextResponse.json(
@@ -100,8 +89,6 @@ export async function POST(request: NextRequest) {
     }
 
     if (migrated.subscription_status === 'paid' && isTrialExpired(migrated)) {
-      usersData.users[foundUserId!].subscription_status = 'free';
-      usersData.users[foundUserId!].has_paid = false;
       migrated.subscription_status = 'free';
       migrated.has_paid = false;
     }
@@ -114,23 +101,18 @@ export async function POST(request: NextRequest) {
       );
     }
 
-    usersData.users[foundUserId!].last_login = new Date().toISOString();
-    if (!Array.isArray(usersData.users[foundUserId!].years)) {
-      const legacyYear = (usersData.users[foundUserId!] as any).year;
-      if (legacyYear && typeof legacyYear === 'string') {
-        usersData.users[foundUserId!].years = [legacyYear];
-        delete (usersData.users[foundUserId!] as any).year;
-      } else {
-        usersData.users[foundUserId!].years = ['3ème année'];
-      }
-    }
-    if (usersData.users[foundUserId!].activation_days === undefined || usersData.users[foundUserId!].activation_days === null) usersData.users[foundUserId!].activation_days = 7;
-    if (!usersData.users[foundUserId!].activated_at) usersData.users[foundUserId!].activated_at = usersData.users[foundUserId!].created_at;
-    if (usersData.users[foundUserId!].has_paid === undefined || usersData.users[foundUserId!].has_paid === null) usersData.users[foundUserId!].has_paid = false;
-    await saveUsers(usersData);
+    // Only what the login changes is written (last_login and the migrated
+    // fields), so admin changes made meanwhile are kept
+    const lastLogin = new Date().toISOString();
+    const saved = await updateUser(foundUserId, (user) => {
+      migrateUser(user);
+      user.last_login = lastLogin;
+      return true;
+    });
+    if (saved) Object.assign(migrated, saved);
 
     const token = generateToken();
-    await createSession(foundUserId!, token);
+    await createSession(foundUserId, token);
 
     const effectiveStatus = migrated.subscription_status || 'free';
     let trialDaysLeft: number | null = null;
@@ -1,6 +1,6 @@
 import { NextRequest, NextResponse } from 'next/server';
 import crypto from 'crypto';
-import { loadUsers, saveUsers } from '@/lib/user-store';
+import { createUser, findUserByEmail } from '@/lib/user-store';
 
 function hashPassword(password: string): string {
   return crypto.createHash('sha256').update(password).digest('hex');
@@ -56,22 +56,18 @@ export async function POST(request: NextRequest) {
       resolvedYears.push('3ème année');
     }
 
-    const usersData = await loadUsers();
-
-    for (const user of Object.values(usersData.users)) {
-      if (user.email.toLowerCase() === emailLower) {
-        return NextResponse.json(
-          { error: 'Un utilisateur avec cet email existe déjà.' },
-          { status: 400 }
-        );
-      }
+    if (await findUserByEmail(emailLower)) {
+      return NextResponse.json(
+        { error: 'Un utilisateur avec cet email existe déjà.' },
+        { status: 400 }
+      );
     }
 
     const userId = generateId();
     const now = new Date().toISOString();
     const tempPassword = generateTempPassword();
 
-    usersData.users[userId] = {
+    const created = await createUser({
       id: userId,
       name,
       email: emailLower,
@@ -87,9 +83,14 @@ export async function POST(request: NextRequest) {
       subscription_status: 'inactive',
       daily_answer_count: 0,
       daily_answer_reset: now,
-    };
+    });
 
-    await saveUsers(usersData);
+    if (!created) {
+      return NextResponse.json(
+        { error: 'Un utilisateur avec cet email existe déjà.' },
+        { status: 400 }
+      );
+    }
 
     return NextResponse.json({
       success: true,
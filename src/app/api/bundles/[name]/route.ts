@@ -0,0 +1,70 @@
+import { NextRequest, NextResponse } from 'next/server';
+import { readFile } from 'fs/promises';
+import path from 'path';
+
+// Serves the files written by src/data/modules/build_bundles.py. Every bundle
+// is stored precompressed next to the JSON (.br, .zst, .gz), so the best
+// variant the client accepts is sent as-is: no compression per request.
+const BUNDLES_DIR = path.join(process.cwd(), 'public', 'bundles');
+const MANIFEST_NAME = 'manifest.json';
+const BUNDLE_NAME = /^[A-Za-z0-9-]+(\.[0-9a-f]+)?\.json$/;
+
+// Server preference order; the client's Accept-Encoding decides what is allowed
+const ENCODINGS: [string, string][] = [
+  ['br', '.br'],
+  ['zstd', '.zst'],
+  ['gzip', '.gz'],
+];
+
+function acceptedEncodings(header: string | null): Set<string> {
+  const accepted = new Set<string>();
+  for (const part of (header || '').split(',')) {
+    const [name, ...params] = part.trim().toLowerCase().split(';');
+    const q = params.map(p => p.trim()).find(p => p.startsWith('q='));
+    if (name && (!q || parseFloat(q.slice(2)) > 0)) accepted.add(name);
+  }
+  return accepted;
+}
+
+export async function GET(request: NextRequest, { params }: { params: Promise<{ name: string }> }) {
+  const { name } = await params;
+  if (!BUNDLE_NAME.test(name)) {
+    return NextResponse.json({ error: 'Bundle introuvable' }, { status: 404 });
+  }
+
+  // Hashed names never change content; the manifest is revalidated on each use
+  const cacheControl = name === MANIFEST_NAME ? 'no-cache' : 'public, max-age=31536000, immutable';
+  const accepted = acceptedEncodings(request.headers.get('accept-encoding'));
+
+  const candidates: [string | null, string][] = name === MANIFEST_NAME ? [] : ENCODINGS
+    .filter(([encoding]) => accepted.has(encoding) || accepted.has('*'))
+    .map(([encoding, extension]) => [encoding, name + extension]);
+  candidates.push([null, name]);
+
+  for (const [encoding, file] of candidates) {
+    let body: Buffer;
+    try {
+      body = await readFile(path.join(BUNDLES_DIR, file));
+    } catch {
+      continue;
+    }
+    const headers: Record<string, string> = {
+      'Content-Type': 'application/json; charset=utf-8',
+      'Content-Length': String(body.length),
+      'Cache-Control': cacheControl,
+      'Vary': 'Accept-Encoding',
+    };
+    if (encoding) headers['Content-Encoding'] = encoding;
+    if (name === MANIFEST_NAME) {
+      // The manifest version is a hash of every module bundle
+      const etag = `"bundles-${JSON.parse(body.toString('utf-8')).version}"`;
+      if (request.headers.get('if-none-match') === etag) {
+        return new NextResponse(null, { status: 304, headers: { ETag: etag, 'Cache-Control': cacheControl } });
+      }
+      headers.ETag = etag;
+    }
+    return new NextResponse(new Uint8Array(body), { headers });
+  }
+
+  return NextResponse.json({ error: 'Bundle introuvable' }, { status: 404 });
+}
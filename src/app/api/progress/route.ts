@@ -1,5 +1,5 @@
 import { NextRequest, NextResponse } from 'next/server';
-import { loadUserProgress, saveUserProgress } from '@/lib/user-store';
+import { loadUserProgress, recordUserProgress, saveUserProgress } from '@/lib/user-store';
 import { requireAuth } from '@/lib/auth';
 
 export async function GET(request: NextRequest) {
@@ -50,19 +50,12 @@ export async function POST(request: NextRequest) {
       );
     }
 
-    let progress = await loadUserProgress(user_id);
-
     const moduleKey = `module_${module_id}`;
-    if (!progress[moduleKey]) {
-      progress[moduleKey] = {};
-    }
-
-    progress[moduleKey][question_id] = {
-      is_correct,
-      answered_at: new Date().toISOString()
-    };
-
-    await saveUserProgress(user_id, progress);
+    const progress = await recordUserProgress(user_id, [{
+      moduleKey,
+      questionId: String(question_id),
+      record: { is_correct, answered_at: new Date().toISOString() },
+    }]);
 
     const moduleProgress = progress[moduleKey] || {};
     const totalAnswered = Object.keys(moduleProgress).length;
@@ -1,5 +1,5 @@
 import { NextRequest, NextResponse } from 'next/server';
-import { loadUsers } from '@/lib/user-store';
+import { loadUser } from '@/lib/user-store';
 import { requireAuth } from '@/lib/auth';
 
 export async function GET(request: NextRequest) {
@@ -17,8 +17,7 @@ export async function GET(request: NextRequest) {
       );
     }
 
-    const usersData = await loadUsers();
-    const user = usersData.users[userId];
+    const user = await loadUser(userId);
 
     if (!user) {
       return NextResponse.json(
@@ -4,7 +4,7 @@ import { useState, useEffect, useRef, useCallback, lazy, Suspense } from 'react'
 import { useParams, useRouter, useSearchParams } from 'next/navigation';
 import Link from 'next/link';
 import Image from 'next/image';
-import { getModuleById, getModuleQuestions, getModuleChapters, preloadModuleData, Question, Chapter, JsonQuestion, extractChaptersFromQuestions } from '@/data/modules';
+import { getModuleById, getModuleQuestions, getModuleChapters, preloadModuleData, precacheChapter, Question, Chapter, JsonQuestion, extractChaptersFromQuestions } from '@/data/modules';
 import { useTheme } from '@/contexts/ThemeContext';
 import { useAuth } from '@/contexts/AuthContext';
 import ThemeToggle from '@/components/ThemeToggle';
@@ -790,6 +790,7 @@ export default function ModulePage() {
       setChapterFilter(null);
     } else {
       setChapterFilter(chapterName);
+      precacheChapter(moduleId, chapterName);
     }
     applyAnsweredQuestionsFilter();
     setStrikethroughOptions({});
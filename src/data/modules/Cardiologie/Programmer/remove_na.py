@@ -1,5 +1,10 @@
 import json
 import os
+import sys
+
+# The normalisation stage is shared by every module's pipeline
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".."))
+from normalize_text import normalize_questions
 
 def remove_na_choices(input_file):
     try:
@@ -11,25 +16,8 @@ def remove_na_choices(input_file):
         with open(input_file, 'r', encoding='utf-8') as f:
             data = json.load(f)
 
-        for question in data:
-            # Identify all choice letters present in the question
-            choice_prefixes = [key.split('_Text')[0] for key in list(question.keys()) if key.endswith('_Text')]
-
-            for prefix in choice_prefixes:
-                text_key = f"{prefix}_Text"
-                
-                # Check if the choice text is "NA"
-                if question.get(text_key) == "NA.":
-                    # Delete the related keys for this choice
-                    keys_to_delete = [
-                        f"{prefix}_Text",
-                        f"{prefix}_isCorrect",
-                        f"{prefix}_Explanation"
-                    ]
-                    
-                    for k in keys_to_delete:
-                        if k in question:
-                            del question[k]
+        # Drops the "NA" choices ("NA", "NA.", "N/A") and puts the text in canonical form
+        data = normalize_questions(data)
 
         # Save the cleaned data
         with open(output_file, 'w', encoding='utf-8') as f:
@@ -1,20 +1,18 @@
 import json
 import os
 import re
+import sys
 from fpdf import FPDF
 from fpdf.enums import XPos, YPos
 
+# The normalisation stage is shared by every module's pipeline
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from normalize_text import latin1_text, normalize_questions
+
 def clean_text(text):
-    """Handles French accents and special characters for standard PDF fonts."""
+    """Fits normalised text to the latin-1 range of the standard PDF fonts."""
     if not isinstance(text, str): return str(text)
-    replacements = {
-        '\u2019': "'", '\u2018': "'", '\u201c': '"', '\u201d': '"',
-        '\u2026': '...', '\u2013': '-', '\u2014': '-',
-        '\u0153': 'oe', '\u0152': 'OE', '\u00a0': ' '
-    }
-    for char, replacement in replacements.items():
-        text = text.replace(char, replacement)
-    return text.encode('latin-1', 'replace').decode('latin-1')
+    return latin1_text(text)
 
 def get_sort_tuple(year_asked_str):
     """
@@ -80,6 +78,9 @@ def run():
         except Exception as e:
             print(f"Erreur lecture {f_name}: {e}")
 
+    # Canonical text, without the "NA" choices
+    all_questions = normalize_questions(all_questions)
+
     # Group questions by their "YearAsked" value
     grouped_data = {}
     for q in all_questions:
@@ -136,7 +137,7 @@ def run():
             pdf.set_font("Helvetica", "", 8.5)
             for char in ['A', 'B', 'C', 'D', 'E']:
                 txt = q.get(f"Choice_{char}_Text", "")
-                if txt and txt != "NA":
+                if txt:
                     pdf.set_x(14)
                     pdf.multi_cell(pdf.epw - 10, 4, f"{char}) {clean_text(txt)}", new_x=XPos.LMARGIN, new_y=YPos.NEXT)
             
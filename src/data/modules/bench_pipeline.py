@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Content Pipeline Benchmarks for LearnFMPA
+
+Times the content tools on synthetic corpora scaled from a real module's raw
+exam files (Cardiologie by default): 1x, 10x and 100x its questions.
+
+Stages:
+  json_combiner      Programmer/json_combiner.py over every exam file
+  remove_na          Programmer/remove_na.py on the combined file
+  normalize          normalize_text.py --write on the combined file
+  add_gdr            Programmer/add_gdr_to_explanation.py with a generated answer key
+  image_maker        Programmer/image_maker.py
+  json_to_exam       json_to_exam.py (needs fpdf2; skipped when it is missing)
+  modules_load       ModuleManager.load_modules on an index.ts with 6 x scale modules
+  modules_update     ModuleManager.update_index_file on the same index.ts
+
+Each stage runs in its own Python process on a fresh copy of its input, with
+the tool's prompts answered automatically, so the numbers are the tool's own:
+wall time, peak RSS and throughput (questions/s or modules/s, MB/s of input).
+The median of --repeat runs is kept.
+
+Results can be saved as a baseline and later runs compared against it; a
+stage that is slower or bigger than the baseline by more than the thresholds
+is reported as a regression and the exit status is 1.
+
+Usage:
+  python bench_pipeline.py                         # all stages, scales 1 10 100
+  python bench_pipeline.py --scales 1 10 --save    # record bench_baseline.json
+  python bench_pipeline.py --scales 1 10           # compare with it
+  python bench_pipeline.py --stages remove_na add_gdr --repeat 5 --threshold 0.05
+"""
+
+import argparse
+import builtins
+import contextlib
+import importlib.util
+import io
+import json
+import os
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List, Optional
+
+MODULES_DIR = Path(__file__).parent
+DEFAULT_BASELINE = MODULES_DIR / "bench_baseline.json"
+DEFAULT_SOURCE = "Cardiologie"
+DEFAULT_SCALES = [1, 10, 100]
+
+STAGES = [
+    "json_combiner",
+    "remove_na",
+    "normalize",
+    "add_gdr",
+    "image_maker",
+    "json_to_exam",
+    "modules_load",
+    "modules_update",
+]
+
+
+# ==================== Corpus ====================
+
+def build_corpus(source: str, scale: int, root: Path) -> Dict:
+    """Write the inputs of every stage for one scale under root."""
+    raw_files = sorted((MODULES_DIR / source / "Programmer").glob("*/*.json"))
+    if not raw_files:
+        raise FileNotFoundError(f"No raw exam files in {source}/Programmer/*/")
+
+    exams_dir = root / "exams"
+    exams_dir.mkdir(parents=True)
+    combined = []
+    for copy in range(scale):
+        for path in raw_files:
+            with open(path, "r", encoding="utf-8") as f:
+                questions = json.load(f)
+            if copy:
+                # A distinct session label per copy, so exam grouping scales too
+                for question in questions:
+                    question["YearAsked"] = f"{question.get('YearAsked', path.stem)} #{copy + 1}"
+            combined.extend(questions)
+            with open(exams_dir / f"{path.stem} #{copy + 1}.json", "w", encoding="utf-8") as f:
+                json.dump(questions, f, indent=4, ensure_ascii=False)
+
+    with open(root / "combined.json", "w", encoding="utf-8") as f:
+        json.dump(combined, f, indent=4, ensure_ascii=False)
+    with open(root / "answers.txt", "w", encoding="utf-8") as f:
+        for number, question in enumerate(combined, 1):
+            letters = "".join(c for c in "ABCDE" if question.get(f"Choice_{c}_isCorrect") is True)
+            f.write(f"{number}: {letters or 'O'}\n")
+
+    build_index(scale, root / "index.ts")
+    return {
+        "questions": len(combined),
+        "exam_files": len(raw_files) * scale,
+        "exams_bytes": sum(p.stat().st_size for p in exams_dir.iterdir()),
+        "combined_bytes": (root / "combined.json").stat().st_size,
+        "index_bytes": (root / "index.ts").stat().st_size,
+    }
+
+
+def build_index(scale: int, index_path: Path):
+    """An index.ts whose modules array is the real one repeated scale times."""
+    module_manager = load_module_manager(MODULES_DIR / "index.ts")
+    with contextlib.redirect_stdout(io.StringIO()):
+        manager = module_manager.ModuleManager()
+    real = manager.modules
+    manager.modules = [
+        dict(module, id=copy * len(real) + position + 1,
+             title=module.get("title", "") + (f" {copy + 1}" if copy else ""))
+        for copy in range(scale)
+        for position, module in enumerate(real)
+    ]
+    shutil.copyfile(MODULES_DIR / "index.ts", index_path)
+    module_manager.INDEX_FILE = index_path
+    manager.update_index_file()
+
+
+# ==================== Stage runner (child process) ====================
+
+def load_tool(path: Path):
+    spec = importlib.util.spec_from_file_location(f"bench_{path.stem}", path)
+    tool = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(tool)
+    return tool
+
+
+def load_module_manager(index_path: Path):
+    module_manager = load_tool(MODULES_DIR / "module_manager.py")
+    module_manager.INDEX_FILE = index_path
+    return module_manager
+
+
+def scripted_input(answers: List[str]):
+    replies = iter(answers)
+    return lambda prompt="": next(replies)
+
+
+def run_stage(stage: str, source: str, corpus: Path, run_dir: Path) -> Dict:
+    """Prepare run_dir, then time one stage. Runs inside the child process."""
+    tools = MODULES_DIR / source
+    run_dir.mkdir(parents=True)
+
+    if stage == "json_combiner":
+        tool = load_tool(tools / "Programmer" / "json_combiner.py")
+        shutil.copytree(corpus / "exams", run_dir / "exams")
+        call = lambda: tool.combine_json_files(str(run_dir / "exams"), str(run_dir / "combined.json"))
+    elif stage == "remove_na":
+        tool = load_tool(tools / "Programmer" / "remove_na.py")
+        shutil.copyfile(corpus / "combined.json", run_dir / "combined.json")
+        call = lambda: tool.remove_na_choices(str(run_dir / "combined.json"))
+    elif stage == "normalize":
+        tool = load_tool(MODULES_DIR / "normalize_text.py")
+        shutil.copyfile(corpus / "combined.json", run_dir / "combined.json")
+        sys.argv = ["normalize_text.py", "--write", str(run_dir / "combined.json")]
+        call = tool.main
+    elif stage == "add_gdr":
+        tool = load_tool(tools / "Programmer" / "add_gdr_to_explanation.py")
+        shutil.copyfile(corpus / "combined.json", run_dir / "combined.json")
+        shutil.copyfile(corpus / "answers.txt", run_dir / "answers.txt")
+        builtins.input = scripted_input(["1", "1"])
+        call = tool.add_gdr_to_explanation
+    elif stage == "image_maker":
+        tool = load_tool(tools / "Programmer" / "image_maker.py")
+        shutil.copyfile(corpus / "combined.json", run_dir / "combined.json")
+        builtins.input = scripted_input(["1", source.lower(), "4"])
+        call = tool.process_pharmacology_data
+    elif stage == "json_to_exam":
+        tool = load_tool(tools / "json_to_exam.py")
+        shutil.copytree(corpus / "exams", run_dir, dirs_exist_ok=True)
+        call = tool.run
+    elif stage in ("modules_load", "modules_update"):
+        shutil.copyfile(corpus / "index.ts", run_dir / "index.ts")
+        module_manager = load_module_manager(run_dir / "index.ts")
+        if stage == "modules_load":
+            call = module_manager.ModuleManager
+        else:
+            with contextlib.redirect_stdout(io.StringIO()):
+                manager = module_manager.ModuleManager()
+            call = manager.update_index_file
+    else:
+        raise ValueError(f"Unknown stage: {stage}")
+
+    os.chdir(run_dir)
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        call()
+        seconds = time.perf_counter() - start
+    return {"seconds": seconds, "peak_rss_mb": peak_rss_mb()}
+
+
+def peak_rss_mb() -> float:
+    # On Linux ru_maxrss survives exec and would include the parent's peak; VmHWM does not
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return peak / (1024 * 1024 if sys.platform == "darwin" else 1024)
+
+
+def child_main(args):
+    result = run_stage(args.child_stage, args.source, Path(args.child_corpus), Path(args.child_run_dir))
+    sys.stdout.write(json.dumps(result) + "\n")
+
+
+# ==================== Benchmark driver ====================
+
+def stage_units(stage: str, corpus_info: Dict, scale: int) -> Dict:
+    if stage in ("modules_load", "modules_update"):
+        return {"items": 6 * scale, "unit": "modules", "bytes": corpus_info["index_bytes"]}
+    input_bytes = corpus_info["exams_bytes"] if stage in ("json_combiner", "json_to_exam") else corpus_info["combined_bytes"]
+    return {"items": corpus_info["questions"], "unit": "questions", "bytes": input_bytes}
+
+
+def measure(stage: str, source: str, corpus: Path, work: Path, repeat: int) -> Optional[Dict]:
+    runs = []
+    for attempt in range(repeat):
+        run_dir = work / f"{stage}-{attempt}"
+        proc = subprocess.run(
+            [sys.executable, __file__, "--source", source, "--child-stage", stage,
+             "--child-corpus", str(corpus), "--child-run-dir", str(run_dir)],
+            capture_output=True, text=True,
+        )
+        shutil.rmtree(run_dir, ignore_errors=True)
+        if proc.returncode != 0:
+            error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit {proc.returncode}"
+            return {"error": error}
+        runs.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+    return {
+        "seconds": statistics.median(r["seconds"] for r in runs),
+        "peak_rss_mb": max(r["peak_rss_mb"] for r in runs),
+    }
+
+
+def compare(result: Dict, baseline: Optional[Dict], threshold: float, rss_threshold: float) -> str:
+    if not baseline or "seconds" not in baseline:
+        return "new"
+    slower = result["seconds"] / baseline["seconds"] - 1 if baseline["seconds"] else 0.0
+    bigger = result["peak_rss_mb"] / baseline["peak_rss_mb"] - 1 if baseline["peak_rss_mb"] else 0.0
+    problems = []
+    if slower > threshold:
+        problems.append(f"time +{slower:.0%}")
+    if bigger > rss_threshold:
+        problems.append(f"RSS +{bigger:.0%}")
+    if problems:
+        return "REGRESSION " + ", ".join(problems)
+    return f"ok ({slower:+.0%} time)"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the LearnFMPA content pipeline tools")
+    parser.add_argument("--source", default=DEFAULT_SOURCE, help=f"Module whose raw exams are scaled (default: {DEFAULT_SOURCE})")
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES, help="Corpus scales (default: 1 10 100)")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES, help="Stages to run (default: all)")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per stage and scale; the median time is kept (default: 3)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE, help="Baseline file")
+    parser.add_argument("--save", action="store_true", help="Write these results as the new baseline")
+    parser.add_argument("--threshold", type=float, default=0.15, help="Allowed slowdown before a regression (default: 0.15)")
+    parser.add_argument("--rss-threshold", type=float, default=0.25, help="Allowed peak RSS growth (default: 0.25)")
+    parser.add_argument("--json", type=Path, help="Also write the results to this file")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated corpora")
+    parser.add_argument("--child-stage", help=argparse.SUPPRESS)
+    parser.add_argument("--child-corpus", help=argparse.SUPPRESS)
+    parser.add_argument("--child-run-dir", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child_stage:
+        child_main(args)
+        return
+
+    stages = [s for s in STAGES if s in args.stages]
+    if "json_to_exam" in stages and importlib.util.find_spec("fpdf") is None:
+        print("Note: fpdf2 is not installed, skipping json_to_exam (pip install fpdf2)")
+        stages.remove("json_to_exam")
+
+    baseline = {}
+    if args.baseline.exists():
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Comparing with {args.baseline} ({baseline.get('python', '?')}, {baseline.get('created_at', '?')})")
+
+    work = Path(tempfile.mkdtemp(prefix="learnfmpa-bench-"))
+    results = {}
+    regressions = 0
+    try:
+        for scale in args.scales:
+            corpus = work / f"corpus-{scale}x"
+            info = build_corpus(args.source, scale, corpus)
+            print(f"\n=== {args.source} x{scale}: {info['questions']} questions, {info['exam_files']} exam files, "
+                  f"{info['combined_bytes'] / 1e6:.1f} MB combined ===")
+            print(f"{'Stage':<16} {'Time':>10} {'Peak RSS':>10} {'Throughput':>22} {'MB/s':>8}  Baseline")
+            for stage in stages:
+                result = measure(stage, args.source, corpus, work, args.repeat)
+                if "error" in result:
+                    print(f"{stage:<16} failed: {result['error']}")
+                    continue
+                units = stage_units(stage, info, scale)
+                result["items_per_second"] = units["items"] / result["seconds"] if result["seconds"] else 0.0
+                result["mb_per_second"] = units["bytes"] / 1e6 / result["seconds"] if result["seconds"] else 0.0
+                result["unit"] = units["unit"]
+                status = compare(result, baseline.get("results", {}).get(stage, {}).get(str(scale)),
+                                 args.threshold, args.rss_threshold)
+                regressions += status.startswith("REGRESSION")
+                results.setdefault(stage, {})[str(scale)] = result
+                throughput = f"{result['items_per_second']:,.0f} {units['unit']}/s"
+                print(f"{stage:<16} {result['seconds'] * 1000:>8.1f}ms {result['peak_rss_mb']:>8.1f}MB "
+                      f"{throughput:>22} {result['mb_per_second']:>8.1f}  {status}")
+            if not args.keep:
+                shutil.rmtree(corpus, ignore_errors=True)
+    finally:
+        if args.keep:
+            print(f"\nCorpora kept in {work}")
+        else:
+            shutil.rmtree(work, ignore_errors=True)
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": sys.version.split()[0],
+        "source": args.source,
+        "results": results,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+
+    if regressions:
+        print(f"\n{regressions} regression(s) over the thresholds (time {args.threshold:.0%}, RSS {args.rss_threshold:.0%})")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,540 @@
+#!/usr/bin/env python3
+"""
+Module Bundle Build for LearnFMPA
+
+Builds what the app serves for each registered module, from the combined
+<json_filename>.json files json_combiner produces, with their text put in
+canonical form by normalize_text.py:
+
+  module-<id>.<hash>.json   the module's questions, minified
+
+plus precompressed variants of each file next to it, at maximum level:
+
+  .br    brotli quality 11
+  .zst   zstandard level 22
+  .gz    gzip level 9
+
+brotli and zstandard are listed in requirements.txt, next to this file. The
+build runs before every `next build` (package.json prebuild), so without them
+it still writes the gzip variants and warns; --strict (or BUNDLES_STRICT=1)
+makes it fail instead, for deployments that install them.
+
+and public/bundles/manifest.json, which lists every file with its size and
+SRI integrity hash ("sha384-...") per encoding. File names carry a content
+hash, so they can be cached forever; /api/bundles/<file> serves the best
+precompressed variant the client accepts.
+
+The manifest also points to precache.<hash>.json, which the service worker
+(public/sw.js) uses for offline study: the revision (content hash) of every
+question image under public/images, and the images each chapter shows. The
+manifest version covers the bundles and that file, so clients revalidate
+their copies only when the version changes, and then only the changed files.
+The module entry lists its chapters (as extractChaptersFromQuestions in
+index.ts numbers them) with their first question and size; the app reads
+them from the module bundle, so there is no file per chapter.
+
+When a module changes, the build also writes a delta from the previous
+bundle (module-<id>-delta.<hash>.json): the questions added, changed and
+removed, by question ID (its position, as Question.id in index.ts). Each
+module entry keeps the chain of its last deltas, oldest first, so a client
+holding any recent version fetches a few deltas instead of the whole module.
+The chain is cut when a delta would be larger than half the bundle (e.g.
+after questions are inserted in the middle, which renumbers the rest).
+
+Compressing at brotli 11 is slow, so a file whose name (content hash)
+already exists is not rebuilt. Files referenced by the previous manifest are
+kept for clients still holding it; older ones are removed. A fresh checkout
+has no previous build: --base-url fetches the deployed manifest and the files
+the deltas need from the live site instead. It defaults to BUNDLES_BASE_URL,
+then to the production URL Vercel sets during its builds
+(VERCEL_PROJECT_PRODUCTION_URL). When a base URL is set or the build runs in
+CI, a previous build is expected: if none is found the build warns and goes
+on without deltas (the first deployment, or the live manifest unreachable),
+unless --no-previous (or BUNDLES_NO_PREVIOUS=1) says so. With --strict it
+fails instead.
+
+Usage:
+  python build_bundles.py                 # every module
+  python build_bundles.py --modules 2 5   # only these (others keep their entry)
+  python build_bundles.py --base-url https://www.learnfmpa.com
+  python build_bundles.py --no-previous   # first build, no deltas
+  python build_bundles.py --strict        # fail without brotli/zstandard or a previous build
+  python build_bundles.py --check         # verify the files against the manifest
+"""
+
+import argparse
+import base64
+import gzip
+import hashlib
+import json
+import os
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from module_manager import ModuleManager
+from normalize_text import normalize_questions
+
+MODULES_DIR = Path(__file__).resolve().parent
+BUNDLES_DIR = MODULES_DIR.parents[2] / "public" / "bundles"
+IMAGES_DIR = MODULES_DIR.parents[2] / "public" / "images"
+MANIFEST_NAME = "manifest.json"
+PRECACHE_STEM = "precache"
+IMAGE_FIELDS = ["QuestionImage"] + [f"Choice_{letter}_Image" for letter in "ABCDE"]
+HASH_LENGTH = 12
+DELTA_STEM = "delta"
+DELTA_CHAIN = 10
+DELTA_MAX_RATIO = 0.5
+UNCLASSIFIED_CHAPTER = "Non classé"
+
+REQUIREMENTS = MODULES_DIR / "requirements.txt"
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+def _gzip(data: bytes) -> bytes:
+    # mtime=0 keeps the output byte-identical between builds
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _brotli(data: bytes) -> bytes:
+    return brotli.compress(data, mode=brotli.MODE_TEXT, quality=11)
+
+
+def _zstd(data: bytes) -> bytes:
+    return zstandard.ZstdCompressor(level=22).compress(data)
+
+
+# Content-Encoding -> (extension, compressor), in the order the server prefers them
+ENCODINGS = {
+    "br": (".br", _brotli if brotli else None),
+    "zstd": (".zst", _zstd if zstandard else None),
+    "gzip": (".gz", _gzip),
+}
+
+
+def missing_compressors() -> List[str]:
+    """The pip packages of the encodings that cannot be written."""
+    return [package for package, module in (("brotli", brotli), ("zstandard", zstandard)) if module is None]
+
+
+def _write_atomic(path: Path, data: bytes):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(path)
+
+
+def integrity(data: bytes) -> str:
+    return "sha384-" + base64.b64encode(hashlib.sha384(data).digest()).decode("ascii")
+
+
+def minified(value) -> bytes:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def chapters_of(questions: List[Dict]) -> List[Dict]:
+    """Chapters as extractChaptersFromQuestions builds them: by Subtopic, largest first."""
+    groups: Dict[str, List[int]] = {}
+    for index, question in enumerate(questions):
+        groups.setdefault(question.get("Subtopic") or UNCLASSIFIED_CHAPTER, []).append(index)
+    chapters = [{"name": name, "start": ids[0], "question_ids": ids} for name, ids in groups.items()]
+    chapters.sort(key=lambda c: len(c["question_ids"]), reverse=True)
+    for i, chapter in enumerate(chapters):
+        chapter["id"] = i + 1
+    return chapters
+
+
+def images_of(question: Dict) -> List[str]:
+    """Local image names of a question, as the module page splits them (comma-separated or lists)."""
+    names = []
+    for field in IMAGE_FIELDS:
+        value = question.get(field) or []
+        for name in value if isinstance(value, list) else value.split(","):
+            name = name.strip()
+            if name and not name.startswith("http") and name not in names:
+                names.append(name)
+    return names
+
+
+def file_version(name: str) -> str:
+    """The content hash in a bundle file name (module-2.<hash>.json)."""
+    return name.rsplit(".", 2)[-2]
+
+
+def question_delta(old: List[Dict], new: List[Dict]) -> Dict:
+    """Changes from old to new by question ID, i.e. by position."""
+    changed = {str(i): question for i, (before, question) in enumerate(zip(old, new))
+               if minified(before) != minified(question)}
+    return {
+        "questions": len(new),
+        "added": {str(i): new[i] for i in range(len(old), len(new))},
+        "changed": changed,
+        "removed": list(range(len(new), len(old))),
+    }
+
+
+def image_revision(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()[:HASH_LENGTH]
+
+
+class BundleBuilder:
+    def __init__(self, out_dir: Path = BUNDLES_DIR, workers: Optional[int] = None, base_url: Optional[str] = None,
+                 strict: bool = False):
+        missing = missing_compressors()
+        if strict and missing:
+            raise ImportError(f"{', '.join(missing)} not installed: pip install -r {REQUIREMENTS}")
+        self.out_dir = out_dir
+        self.workers = workers or os.cpu_count() or 2
+        self.base_url = (base_url or "").rstrip("/")
+        self.encodings = [name for name, (_, compress) in ENCODINGS.items() if compress]
+        self.reused = 0
+        self.written = 0
+        self.missing_images: List[str] = []
+        self.broken_chains: List[int] = []
+        self.lock = threading.Lock()
+
+    def _write_variants(self, stem: str, data: bytes) -> Dict:
+        """Writes <stem>.<hash>.json and its compressed variants; returns the manifest entry."""
+        name = f"{stem}.{hashlib.sha256(data).hexdigest()[:HASH_LENGTH]}.json"
+        entry = {"file": name, "bytes": len(data), "integrity": integrity(data), "encodings": {}}
+        path = self.out_dir / name
+        if not path.exists():
+            _write_atomic(path, data)
+        for encoding in self.encodings:
+            extension, compress = ENCODINGS[encoding]
+            variant = self.out_dir / (name + extension)
+            reused = variant.exists()
+            if reused:
+                packed = variant.read_bytes()
+            else:
+                packed = compress(data)
+                _write_atomic(variant, packed)
+            with self.lock:
+                if reused:
+                    self.reused += 1
+                else:
+                    self.written += 1
+            entry["encodings"][encoding] = {"file": variant.name, "bytes": len(packed), "integrity": integrity(packed)}
+        return entry
+
+    def _download(self, name: str) -> Optional[bytes]:
+        if not self.base_url:
+            return None
+        request = urllib.request.Request(f"{self.base_url}/api/bundles/{name}", headers={"Accept-Encoding": "identity"})
+        try:
+            with urllib.request.urlopen(request, timeout=30) as response:
+                return response.read()
+        except (urllib.error.URLError, OSError):
+            return None
+
+    def _previous_file(self, name: str, expected: str) -> Optional[bytes]:
+        """A file of an earlier build, from the output directory or the live site."""
+        path = self.out_dir / name
+        data = path.read_bytes() if path.exists() else self._download(name)
+        if data is None or integrity(data) != expected:
+            return None
+        if not path.exists():
+            _write_atomic(path, data)
+        return data
+
+    def previous_manifest(self) -> Dict:
+        manifest = load_manifest(self.out_dir)
+        if not manifest:
+            data = self._download(MANIFEST_NAME)
+            try:
+                manifest = json.loads(data) if data else {}
+            except ValueError:
+                manifest = {}
+        return manifest
+
+    def _previous_chain(self, stem: str, previous: Dict) -> List[Dict]:
+        """The deltas of the previous build still available, fetched into the output directory if needed."""
+        chain = []
+        for delta in previous.get("deltas", []):
+            kept = self._previous_file(delta["file"], delta["integrity"])
+            if kept is None:
+                # A client older than the missing delta could not get past it
+                chain = []
+                continue
+            chain.append(dict(self._write_variants(stem, kept), **{"from": delta["from"], "to": delta["to"]}))
+        return chain
+
+    def build_deltas(self, module_id: int, questions: List[Dict], entry: Dict, previous: Optional[Dict]) -> List[Dict]:
+        """The module's delta chain after this build; empty when it cannot continue."""
+        if not previous:
+            return []
+        stem = f"module-{module_id}-{DELTA_STEM}"
+        version, old_version = file_version(entry["file"]), file_version(previous["file"])
+        if version == old_version:
+            return self._previous_chain(stem, previous)
+
+        old = self._previous_file(previous["file"], previous["integrity"])
+        if old is None:
+            self.broken_chains.append(module_id)
+            return []
+        data = minified(dict({"module_id": module_id, "from": old_version, "to": version},
+                             **question_delta(json.loads(old), questions)))
+        if len(data) > entry["bytes"] * DELTA_MAX_RATIO:
+            return []
+
+        chain = self._previous_chain(stem, previous)
+        chain.append(dict(self._write_variants(stem, data), **{"from": old_version, "to": version}))
+
+        chain = chain[-DELTA_CHAIN:]
+        while sum(delta["bytes"] for delta in chain) > entry["bytes"] * DELTA_MAX_RATIO:
+            chain.pop(0)
+        return chain
+
+    def build_module(self, module: Dict, previous: Optional[Dict] = None) -> Dict:
+        start = time.perf_counter()
+        source = MODULES_DIR / f"{module.get('json_filename') or module['title']}.json"
+        with open(source, "r", encoding="utf-8") as f:
+            questions = normalize_questions(json.load(f))
+        stem = f"module-{module['id']}"
+
+        entry = dict(self._write_variants(stem, minified(questions)),
+                     title=module["title"], source=source.name, questions=len(questions), chapters=[])
+        for chapter in chapters_of(questions):
+            images = []
+            for i in chapter["question_ids"]:
+                images += [name for name in images_of(questions[i]) if name not in images]
+            entry["chapters"].append(dict(id=chapter["id"], name=chapter["name"], start=chapter["start"],
+                                          questions=len(chapter["question_ids"]), images=images))
+        entry["deltas"] = self.build_deltas(module["id"], questions, entry, previous)
+        entry["build_seconds"] = round(time.perf_counter() - start, 2)
+        return entry
+
+    def build(self, module_ids: Optional[List[int]] = None, previous: Optional[Dict] = None) -> Dict:
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        if previous is None:
+            previous = self.previous_manifest()
+        modules = {}
+        for module in ModuleManager().modules:
+            module_id = int(module["id"])
+            if module_ids and module_id not in module_ids:
+                if str(module_id) in previous.get("modules", {}):
+                    modules[str(module_id)] = previous["modules"][str(module_id)]
+                continue
+            modules[str(module_id)] = self.build_module(dict(module, id=module_id),
+                                                        previous.get("modules", {}).get(str(module_id)))
+
+        precache = self.build_precache(modules, previous)
+        version = hashlib.sha256("".join(
+            f"{module_id}:{entry['integrity']};" for module_id, entry in sorted(modules.items())
+        ).encode("utf-8") + precache["integrity"].encode("utf-8")).hexdigest()[:HASH_LENGTH]
+        manifest = {
+            "version": version,
+            "previous": previous.get("version") if previous.get("version") != version else previous.get("previous"),
+            "generated_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "encodings": self.encodings,
+            "precache": precache,
+            "modules": modules,
+        }
+        _write_atomic(self.out_dir / MANIFEST_NAME, json.dumps(manifest, indent=2, ensure_ascii=False).encode("utf-8"))
+        self.prune(manifest, previous)
+        return manifest
+
+    def build_precache(self, modules: Dict, previous: Dict) -> Dict:
+        """Writes precache.<hash>.json: image revisions and each chapter's image list.
+
+        The image lists move there from the chapter entries, so the manifest the
+        app fetches on every load stays small. Modules not rebuilt keep the lists
+        of the previous precache file.
+        """
+        kept = {}
+        if previous.get("precache"):
+            try:
+                kept = json.loads((self.out_dir / previous["precache"]["file"]).read_bytes())["modules"]
+            except (OSError, ValueError, KeyError):
+                kept = {}
+
+        chapter_images: Dict[str, Dict[str, List[str]]] = {}
+        for module_id, entry in modules.items():
+            if all(isinstance(chapter.get("images"), list) for chapter in entry["chapters"]):
+                chapter_images[module_id] = {str(chapter["id"]): chapter.pop("images") for chapter in entry["chapters"]}
+            else:
+                chapter_images[module_id] = kept.get(module_id, {})
+
+        names = sorted({name for chapters in chapter_images.values() for images in chapters.values() for name in images})
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            paths = [IMAGES_DIR / name for name in names]
+            found = [(name, path) for name, path in zip(names, paths) if path.is_file()]
+            revisions = dict(zip((name for name, _ in found), executor.map(image_revision, (path for _, path in found))))
+        images = {name: {"revision": revisions[name], "bytes": (IMAGES_DIR / name).stat().st_size} for name in revisions}
+        self.missing_images = [name for name in names if name not in images]
+
+        for module_id, entry in modules.items():
+            for chapter in entry["chapters"]:
+                listed = [name for name in chapter_images[module_id].get(str(chapter["id"]), []) if name in images]
+                chapter_images[module_id][str(chapter["id"])] = listed
+                chapter["images"] = len(listed)
+                chapter["image_bytes"] = sum(images[name]["bytes"] for name in listed)
+
+        entry = self._write_variants(PRECACHE_STEM, minified({"images": images, "modules": chapter_images}))
+        return dict(entry, images=len(images), image_bytes=sum(image["bytes"] for image in images.values()))
+
+    def prune(self, manifest: Dict, previous: Dict) -> int:
+        keep = {MANIFEST_NAME} | manifest_files(manifest) | manifest_files(previous)
+        removed = 0
+        for path in self.out_dir.iterdir():
+            if path.is_file() and path.name not in keep:
+                path.unlink()
+                removed += 1
+        return removed
+
+
+def load_manifest(out_dir: Path = BUNDLES_DIR) -> Dict:
+    try:
+        with open(out_dir / MANIFEST_NAME, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _entries(manifest: Dict):
+    if manifest.get("precache"):
+        yield manifest["precache"]
+    for module in manifest.get("modules", {}).values():
+        yield module
+        yield from module.get("deltas", [])
+
+
+def manifest_files(manifest: Dict) -> set:
+    files = set()
+    for entry in _entries(manifest):
+        files.add(entry["file"])
+        files.update(variant["file"] for variant in entry.get("encodings", {}).values())
+    return files
+
+
+def check_manifest(out_dir: Path = BUNDLES_DIR) -> List[str]:
+    manifest = load_manifest(out_dir)
+    if not manifest:
+        return [f"no manifest in {out_dir}"]
+    problems = []
+    for entry in _entries(manifest):
+        variants = [(entry["file"], entry["integrity"])]
+        variants += [(v["file"], v["integrity"]) for v in entry.get("encodings", {}).values()]
+        for name, expected in variants:
+            path = out_dir / name
+            if not path.exists():
+                problems.append(f"{name}: missing")
+            elif integrity(path.read_bytes()) != expected:
+                problems.append(f"{name}: integrity mismatch")
+    return problems
+
+
+def _size(n: int) -> str:
+    return f"{n / 1024:.0f}KB" if n < 1024 * 1024 else f"{n / 1024 / 1024:.2f}MB"
+
+
+def _deltas(entry: Dict) -> str:
+    """Chain length and the newest delta's best size."""
+    chain = entry.get("deltas", [])
+    if not chain:
+        return "-"
+    latest = chain[-1]
+    best = min([v["bytes"] for v in latest.get("encodings", {}).values()] + [latest["bytes"]])
+    return f"{len(chain)} (last {best / 1024:.1f}KB)"
+
+
+def print_summary(manifest: Dict, builder: BundleBuilder, seconds: float):
+    encodings = manifest["encodings"]
+    print(f"\n{'=' * 114}")
+    print(f"  Module bundles {manifest['version']} -> {builder.out_dir}")
+    print(f"{'=' * 114}")
+    header = "".join(f"{name:>10}" for name in encodings)
+    print(f"  {'ID':<4}{'Module':<24}{'Questions':>10}{'Chapters':>10}{'JSON':>10}{header}{'Best':>8}{'Time':>8}{'Deltas':>16}")
+    print(f"  {'-' * 110}")
+    for module_id, entry in manifest["modules"].items():
+        sizes = [entry["encodings"].get(name, {}).get("bytes") for name in encodings]
+        best = min((s for s in sizes if s), default=entry["bytes"])
+        cells = "".join(f"{_size(s) if s else '-':>10}" for s in sizes)
+        print(f"  {module_id:<4}{entry['title'][:23]:<24}{entry['questions']:>10}{len(entry['chapters']):>10}"
+              f"{_size(entry['bytes']):>10}{cells}{best / entry['bytes']:>7.0%}{entry.get('build_seconds', 0):>7.1f}s"
+              f"{_deltas(entry):>16}")
+    print(f"{'=' * 114}")
+    precache = manifest["precache"]
+    print(f"  Precache {precache['file']}: {precache['images']} images ({_size(precache['image_bytes'])}) "
+          f"in {sum(len(e['chapters']) for e in manifest['modules'].values())} chapters")
+    if builder.missing_images:
+        print(f"  ⚠️  {len(builder.missing_images)} image(s) referenced but not in {IMAGES_DIR}: "
+              f"{', '.join(builder.missing_images[:5])}{'...' if len(builder.missing_images) > 5 else ''}")
+    missing = missing_compressors()
+    if missing:
+        print(f"  ⚠️  {', '.join(missing)} not installed, only {', '.join(encodings)} written: "
+              f"pip install -r {REQUIREMENTS}")
+    if builder.broken_chains:
+        print(f"  ⚠️  Previous bundle unavailable, delta chain restarted for module(s) "
+              f"{', '.join(map(str, builder.broken_chains))}")
+    print(f"  {builder.written} variant(s) compressed, {builder.reused} unchanged, {seconds:.1f}s\n")
+
+
+def _default_base_url() -> Optional[str]:
+    if os.environ.get("BUNDLES_BASE_URL"):
+        return os.environ["BUNDLES_BASE_URL"]
+    host = os.environ.get("VERCEL_PROJECT_PRODUCTION_URL")
+    return f"https://{host}" if host else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build precompressed module bundles and their manifest")
+    parser.add_argument("--modules", type=int, nargs="+", help="Module IDs to rebuild (default: all)")
+    parser.add_argument("--out", type=Path, default=BUNDLES_DIR, help=f"Output directory (default: {BUNDLES_DIR})")
+    parser.add_argument("--workers", type=int, help="Parallel compressions (default: CPU count)")
+    parser.add_argument("--base-url", default=_default_base_url(),
+                        help="Site to fetch the previous build from when --out has none "
+                             "(default: $BUNDLES_BASE_URL, then https://$VERCEL_PROJECT_PRODUCTION_URL)")
+    parser.add_argument("--no-previous", action="store_true", default=bool(os.environ.get("BUNDLES_NO_PREVIOUS")),
+                        help="Build without a previous build, so without deltas (default: $BUNDLES_NO_PREVIOUS)")
+    parser.add_argument("--strict", action="store_true", default=bool(os.environ.get("BUNDLES_STRICT")),
+                        help="Fail when brotli or zstandard is not installed, or when a previous build is "
+                             "expected but not found (default: $BUNDLES_STRICT)")
+    parser.add_argument("--check", action="store_true", help="Only verify the bundles against the manifest")
+    args = parser.parse_args()
+
+    if args.check:
+        problems = check_manifest(args.out)
+        for problem in problems:
+            print(f"✗ {problem}")
+        if problems:
+            sys.exit(1)
+        print(f"✓ Every bundle matches {args.out / MANIFEST_NAME}")
+        return
+
+    start = time.perf_counter()
+    try:
+        builder = BundleBuilder(args.out, args.workers, args.base_url, args.strict)
+    except ImportError as e:
+        print(f"✗ {e}")
+        sys.exit(1)
+    previous = {} if args.no_previous else builder.previous_manifest()
+    if not previous and not args.no_previous and (args.base_url or os.environ.get("CI")):
+        where = f"{args.out} or {args.base_url}" if args.base_url else f"{args.out} (no --base-url or $BUNDLES_BASE_URL)"
+        if args.strict:
+            print(f"✗ No previous build in {where}: clients would lose their deltas.")
+        else:
+            print(f"⚠️  No previous build in {where}: building without deltas.")
+        print("  Set BUNDLES_BASE_URL to the live site, or pass --no-previous (BUNDLES_NO_PREVIOUS=1) for a first build.")
+        if args.strict:
+            sys.exit(1)
+    manifest = builder.build(args.modules, previous)
+    print_summary(manifest, builder, time.perf_counter() - start)
+
+
+if __name__ == "__main__":
+    main()
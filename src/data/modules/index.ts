@@ -6,21 +6,65 @@ export const moduleChaptersCache = new Map<number, Chapter[]>();
 const moduleRawJsonCache = new Map<number, JsonQuestion[]>();
 
 const MODULE_CACHE_KEY = 'learnfmpa_module_cache';
-const MODULE_CACHE_TTL = 24 * 60 * 60 * 1000; // 24 hours
+const MODULE_CACHE_TTL = 24 * 60 * 60 * 1000; // 24 hours, for copies not made from a bundle
+
+// Built by build_bundles.py; revalidated by ETag, so usually a 304
+const BUNDLES_URL = '/api/bundles';
+const BUNDLE_MANIFEST_URL = `${BUNDLES_URL}/manifest.json`;
+
+interface BundleFile {
+  file: string;
+  bytes: number;
+  integrity: string;
+}
+
+export interface BundleManifest {
+  version: string;
+  modules: {
+    [moduleId: string]: BundleFile & {
+      title: string;
+      questions: number;
+      chapters: { id: number; name: string; questions: number; images: number; image_bytes: number }[];
+    };
+  };
+}
+
+let bundleManifestPromise: Promise<BundleManifest | null> | null = null;
+
+export const getBundleManifest = (): Promise<BundleManifest | null> => {
+  if (typeof window === 'undefined') return Promise.resolve(null);
+  if (!bundleManifestPromise) {
+    bundleManifestPromise = fetch(BUNDLE_MANIFEST_URL, { cache: 'no-cache' })
+      .then(response => response.ok ? response.json() : null)
+      .catch(() => null);
+  }
+  return bundleManifestPromise;
+};
+
+const getModuleBundle = async (moduleId: number) => {
+  const manifest = await getBundleManifest();
+  return manifest?.modules[String(moduleId)];
+};
 
 interface ModuleCacheEntry {
   questions: Question[];
   chapters: Chapter[];
   timestamp: number;
+  integrity?: string;
 }
 
-function loadModuleCache(moduleId: number): ModuleCacheEntry | null {
+// A copy made from a bundle stays valid until the bundle changes; without the
+// manifest (offline) it is used as is, so studying offline keeps working
+function loadModuleCache(moduleId: number, integrity?: string): ModuleCacheEntry | null {
   if (typeof window === 'undefined') return null;
   try {
     const stored = localStorage.getItem(`${MODULE_CACHE_KEY}_${moduleId}`);
     if (!stored) return null;
     const entry: ModuleCacheEntry = JSON.parse(stored);
-    if (Date.now() - entry.timestamp > MODULE_CACHE_TTL) {
+    const stale = integrity
+      ? entry.integrity !== integrity
+      : !entry.integrity && Date.now() - entry.timestamp > MODULE_CACHE_TTL;
+    if (stale) {
       localStorage.removeItem(`${MODULE_CACHE_KEY}_${moduleId}`);
       return null;
     }
@@ -30,14 +74,20 @@ function loadModuleCache(moduleId: number): ModuleCacheEntry | null {
   }
 }
 
-function saveModuleCache(moduleId: number, questions: Question[], chapters: Chapter[]) {
+function saveModuleCache(moduleId: number, questions: Question[], chapters: Chapter[], integrity?: string) {
   if (typeof window === 'undefined') return;
   try {
-    const entry: ModuleCacheEntry = { questions, chapters, timestamp: Date.now() };
+    const entry: ModuleCacheEntry = { questions, chapters, timestamp: Date.now(), integrity };
     localStorage.setItem(`${MODULE_CACHE_KEY}_${moduleId}`, JSON.stringify(entry));
   } catch {}
 }
 
+// Asks the service worker to keep a chapter (module bundle and images) for offline use
+export function precacheChapter(moduleId: number, chapterName: string) {
+  if (typeof window === 'undefined' || !('serviceWorker' in navigator)) return;
+  navigator.serviceWorker.controller?.postMessage({ type: 'precache-chapter', moduleId, chapter: chapterName });
+}
+
 export function clearModuleLocalStorageCache() {
   if (typeof window === 'undefined') return;
   try {
@@ -226,6 +276,38 @@ export const extractChaptersFromQuestions = (questions: JsonQuestion[]): Chapter
   return chapters;
 };
 
+const toJsonQuestion = (item: any): JsonQuestion => ({
+  YearAsked: item.YearAsked || '',
+  Subtopic: item.Subtopic || '',
+  QuestionText: item.QuestionText || '',
+  QuestionImage: item.QuestionImage,
+  Choice_A_Text: item.Choice_A_Text || '',
+  Choice_A_isCorrect: !!item.Choice_A_isCorrect,
+  Choice_A_Explanation: item.Choice_A_Explanation || '',
+  Choice_A_Image: item.Choice_A_Image,
+  Choice_B_Text: item.Choice_B_Text || '',
+  Choice_B_isCorrect: !!item.Choice_B_isCorrect,
+  Choice_B_Explanation: item.Choice_B_Explanation || '',
+  Choice_B_Image: item.Choice_B_Image,
+  Choice_C_Text: item.Choice_C_Text || '',
+  Choice_C_isCorrect: !!item.Choice_C_isCorrect,
+  Choice_C_Explanation: item.Choice_C_Explanation || '',
+  Choice_C_Image: item.Choice_C_Image,
+  Choice_D_Text: item.Choice_D_Text || '',
+  Choice_D_isCorrect: !!item.Choice_D_isCorrect,
+  Choice_D_Explanation: item.Choice_D_Explanation || '',
+  Choice_D_Image: item.Choice_D_Image,
+  Choice_E_Text: item.Choice_E_Text || '',
+  Choice_E_isCorrect: !!item.Choice_E_isCorrect,
+  Choice_E_Explanation: item.Choice_E_Explanation || '',
+  Choice_E_Image: item.Choice_E_Image,
+  OverallExplanation: item.OverallExplanation || '',
+  IsChapterStart: item.IsChapterStart,
+  ChapterName: item.ChapterName,
+  ChapterColor: item.ChapterColor,
+  Confirmed: item.Confirmed,
+});
+
 const getModuleRawJson = async (moduleId: number): Promise<JsonQuestion[]> => {
   if (moduleRawJsonCache.has(moduleId)) {
     return moduleRawJsonCache.get(moduleId)!;
@@ -233,210 +315,44 @@ const getModuleRawJson = async (moduleId: number): Promise<JsonQuestion[]> => {
 
   let jsonQuestions: JsonQuestion[] = [];
 
+  // The content-hashed bundle is cached for good by the browser and the
+  // service worker; the bundled JSON below is the fallback when none is built
+  const bundle = await getModuleBundle(moduleId);
+  if (bundle) {
+    try {
+      const response = await fetch(`${BUNDLES_URL}/${bundle.file}`, { integrity: bundle.integrity });
+      if (response.ok) {
+        jsonQuestions = ((await response.json()) as any[]).map(toJsonQuestion);
+        moduleRawJsonCache.set(moduleId, jsonQuestions);
+        return jsonQuestions;
+      }
+    } catch {}
+  }
+
   switch (moduleId) {
     case 1:
       const PharmacologieModule = await import('./Pharmacologie.json', { with: { type: 'json' } });
-      jsonQuestions = (PharmacologieModule.default as any[]).map((item: any) => ({
-        YearAsked: item.YearAsked || '',
-        Subtopic: item.Subtopic || '',
-        QuestionText: item.QuestionText || '',
-        QuestionImage: item.QuestionImage,
-        Choice_A_Text: item.Choice_A_Text || '',
-        Choice_A_isCorrect: !!item.Choice_A_isCorrect,
-        Choice_A_Explanation: item.Choice_A_Explanation || '',
-        Choice_A_Image: item.Choice_A_Image,
-        Choice_B_Text: item.Choice_B_Text || '',
-        Choice_B_isCorrect: !!item.Choice_B_isCorrect,
-        Choice_B_Explanation: item.Choice_B_Explanation || '',
-        Choice_B_Image: item.Choice_B_Image,
-        Choice_C_Text: item.Choice_C_Text || '',
-        Choice_C_isCorrect: !!item.Choice_C_isCorrect,
-        Choice_C_Explanation: item.Choice_C_Explanation || '',
-        Choice_C_Image: item.Choice_C_Image,
-        Choice_D_Text: item.Choice_D_Text || '',
-        Choice_D_isCorrect: !!item.Choice_D_isCorrect,
-        Choice_D_Explanation: item.Choice_D_Explanation || '',
-        Choice_D_Image: item.Choice_D_Image,
-        Choice_E_Text: item.Choice_E_Text || '',
-        Choice_E_isCorrect: !!item.Choice_E_isCorrect,
-        Choice_E_Explanation: item.Choice_E_Explanation || '',
-        Choice_E_Image: item.Choice_E_Image,
-        OverallExplanation: item.OverallExplanation || '',
-        IsChapterStart: item.IsChapterStart,
-        ChapterName: item.ChapterName,
-        ChapterColor: item.ChapterColor,
-        Confirmed: item.Confirmed,
-      }));
+      jsonQuestions = (PharmacologieModule.default as any[]).map(toJsonQuestion);
       break;
     case 2:
       const CardiologieModule = await import('./Cardiologie.json', { with: { type: 'json' } });
-      jsonQuestions = (CardiologieModule.default as any[]).map((item: any) => ({
-        YearAsked: item.YearAsked || '',
-        Subtopic: item.Subtopic || '',
-        QuestionText: item.QuestionText || '',
-        QuestionImage: item.QuestionImage,
-        Choice_A_Text: item.Choice_A_Text || '',
-        Choice_A_isCorrect: !!item.Choice_A_isCorrect,
-        Choice_A_Explanation: item.Choice_A_Explanation || '',
-        Choice_A_Image: item.Choice_A_Image,
-        Choice_B_Text: item.Choice_B_Text || '',
-        Choice_B_isCorrect: !!item.Choice_B_isCorrect,
-        Choice_B_Explanation: item.Choice_B_Explanation || '',
-        Choice_B_Image: item.Choice_B_Image,
-        Choice_C_Text: item.Choice_C_Text || '',
-        Choice_C_isCorrect: !!item.Choice_C_isCorrect,
-        Choice_C_Explanation: item.Choice_C_Explanation || '',
-        Choice_C_Image: item.Choice_C_Image,
-        Choice_D_Text: item.Choice_D_Text || '',
-        Choice_D_isCorrect: !!item.Choice_D_isCorrect,
-        Choice_D_Explanation: item.Choice_D_Explanation || '',
-        Choice_D_Image: item.Choice_D_Image,
-        Choice_E_Text: item.Choice_E_Text || '',
-        Choice_E_isCorrect: !!item.Choice_E_isCorrect,
-        Choice_E_Explanation: item.Choice_E_Explanation || '',
-        Choice_E_Image: item.Choice_E_Image,
-        OverallExplanation: item.OverallExplanation || '',
-        IsChapterStart: item.IsChapterStart,
-        ChapterName: item.ChapterName,
-        ChapterColor: item.ChapterColor,
-        Confirmed: item.Confirmed,
-      }));
+      jsonQuestions = (CardiologieModule.default as any[]).map(toJsonQuestion);
       break;
     case 3:
       const Anatomopathologie1Module = await import('./Anatomo-pathologie 1.json', { with: { type: 'json' } });
-      jsonQuestions = (Anatomopathologie1Module.default as any[]).map((item: any) => ({
-        YearAsked: item.YearAsked || '',
-        Subtopic: item.Subtopic || '',
-        QuestionText: item.QuestionText || '',
-        QuestionImage: item.QuestionImage,
-        Choice_A_Text: item.Choice_A_Text || '',
-        Choice_A_isCorrect: !!item.Choice_A_isCorrect,
-        Choice_A_Explanation: item.Choice_A_Explanation || '',
-        Choice_A_Image: item.Choice_A_Image,
-        Choice_B_Text: item.Choice_B_Text || '',
-        Choice_B_isCorrect: !!item.Choice_B_isCorrect,
-        Choice_B_Explanation: item.Choice_B_Explanation || '',
-        Choice_B_Image: item.Choice_B_Image,
-        Choice_C_Text: item.Choice_C_Text || '',
-        Choice_C_isCorrect: !!item.Choice_C_isCorrect,
-        Choice_C_Explanation: item.Choice_C_Explanation || '',
-        Choice_C_Image: item.Choice_C_Image,
-        Choice_D_Text: item.Choice_D_Text || '',
-        Choice_D_isCorrect: !!item.Choice_D_isCorrect,
-        Choice_D_Explanation: item.Choice_D_Explanation || '',
-        Choice_D_Image: item.Choice_D_Image,
-        Choice_E_Text: item.Choice_E_Text || '',
-        Choice_E_isCorrect: !!item.Choice_E_isCorrect,
-        Choice_E_Explanation: item.Choice_E_Explanation || '',
-        Choice_E_Image: item.Choice_E_Image,
-        OverallExplanation: item.OverallExplanation || '',
-        IsChapterStart: item.IsChapterStart,
-        ChapterName: item.ChapterName,
-        ChapterColor: item.ChapterColor,
-        Confirmed: item.Confirmed,
-      }));
+      jsonQuestions = (Anatomopathologie1Module.default as any[]).map(toJsonQuestion);
       break;
     case 4:
       const Semiologie2Module = await import('./Sémiologie 2.json', { with: { type: 'json' } });
-      jsonQuestions = (Semiologie2Module.default as any[]).map((item: any) => ({
-        YearAsked: item.YearAsked || '',
-        Subtopic: item.Subtopic || '',
-        QuestionText: item.QuestionText || '',
-        QuestionImage: item.QuestionImage,
-        Choice_A_Text: item.Choice_A_Text || '',
-        Choice_A_isCorrect: !!item.Choice_A_isCorrect,
-        Choice_A_Explanation: item.Choice_A_Explanation || '',
-        Choice_A_Image: item.Choice_A_Image,
-        Choice_B_Text: item.Choice_B_Text || '',
-        Choice_B_isCorrect: !!item.Choice_B_isCorrect,
-        Choice_B_Explanation: item.Choice_B_Explanation || '',
-        Choice_B_Image: item.Choice_B_Image,
-        Choice_C_Text: item.Choice_C_Text || '',
-        Choice_C_isCorrect: !!item.Choice_C_isCorrect,
-        Choice_C_Explanation: item.Choice_C_Explanation || '',
-        Choice_C_Image: item.Choice_C_Image,
-        Choice_D_Text: item.Choice_D_Text || '',
-        Choice_D_isCorrect: !!item.Choice_D_isCorrect,
-        Choice_D_Explanation: item.Choice_D_Explanation || '',
-        Choice_D_Image: item.Choice_D_Image,
-        Choice_E_Text: item.Choice_E_Text || '',
-        Choice_E_isCorrect: !!item.Choice_E_isCorrect,
-        Choice_E_Explanation: item.Choice_E_Explanation || '',
-        Choice_E_Image: item.Choice_E_Image,
-        OverallExplanation: item.OverallExplanation || '',
-        IsChapterStart: item.IsChapterStart,
-        ChapterName: item.ChapterName,
-        ChapterColor: item.ChapterColor,
-        Confirmed: item.Confirmed,
-      }));
+      jsonQuestions = (Semiologie2Module.default as any[]).map(toJsonQuestion);
       break;
     case 5:
       const RadiologieModule = await import('./Radiologie.json', { with: { type: 'json' } });
-      jsonQuestions = (RadiologieModule.default as any[]).map((item: any) => ({
-        YearAsked: item.YearAsked || '',
-        Subtopic: item.Subtopic || '',
-        QuestionText: item.QuestionText || '',
-        QuestionImage: item.QuestionImage,
-        Choice_A_Text: item.Choice_A_Text || '',
-        Choice_A_isCorrect: !!item.Choice_A_isCorrect,
-        Choice_A_Explanation: item.Choice_A_Explanation || '',
-        Choice_A_Image: item.Choice_A_Image,
-        Choice_B_Text: item.Choice_B_Text || '',
-        Choice_B_isCorrect: !!item.Choice_B_isCorrect,
-        Choice_B_Explanation: item.Choice_B_Explanation || '',
-        Choice_B_Image: item.Choice_B_Image,
-        Choice_C_Text: item.Choice_C_Text || '',
-        Choice_C_isCorrect: !!item.Choice_C_isCorrect,
-        Choice_C_Explanation: item.Choice_C_Explanation || '',
-        Choice_C_Image: item.Choice_C_Image,
-        Choice_D_Text: item.Choice_D_Text || '',
-        Choice_D_isCorrect: !!item.Choice_D_isCorrect,
-        Choice_D_Explanation: item.Choice_D_Explanation || '',
-        Choice_D_Image: item.Choice_D_Image,
-        Choice_E_Text: item.Choice_E_Text || '',
-        Choice_E_isCorrect: !!item.Choice_E_isCorrect,
-        Choice_E_Explanation: item.Choice_E_Explanation || '',
-        Choice_E_Image: item.Choice_E_Image,
-        OverallExplanation: item.OverallExplanation || '',
-        IsChapterStart: item.IsChapterStart,
-        ChapterName: item.ChapterName,
-        ChapterColor: item.ChapterColor,
-        Confirmed: item.Confirmed,
-      }));
+      jsonQuestions = (RadiologieModule.default as any[]).map(toJsonQuestion);
       break;
     case 6:
       const BiochimiecliniqueModule = await import('./Biochimie clinique.json', { with: { type: 'json' } });
-      jsonQuestions = (BiochimiecliniqueModule.default as any[]).map((item: any) => ({
-        YearAsked: item.YearAsked || '',
-        Subtopic: item.Subtopic || '',
-        QuestionText: item.QuestionText || '',
-        QuestionImage: item.QuestionImage,
-        Choice_A_Text: item.Choice_A_Text || '',
-        Choice_A_isCorrect: !!item.Choice_A_isCorrect,
-        Choice_A_Explanation: item.Choice_A_Explanation || '',
-        Choice_A_Image: item.Choice_A_Image,
-        Choice_B_Text: item.Choice_B_Text || '',
-        Choice_B_isCorrect: !!item.Choice_B_isCorrect,
-        Choice_B_Explanation: item.Choice_B_Explanation || '',
-        Choice_B_Image: item.Choice_B_Image,
-        Choice_C_Text: item.Choice_C_Text || '',
-        Choice_C_isCorrect: !!item.Choice_C_isCorrect,
-        Choice_C_Explanation: item.Choice_C_Explanation || '',
-        Choice_C_Image: item.Choice_C_Image,
-        Choice_D_Text: item.Choice_D_Text || '',
-        Choice_D_isCorrect: !!item.Choice_D_isCorrect,
-        Choice_D_Explanation: item.Choice_D_Explanation || '',
-        Choice_D_Image: item.Choice_D_Image,
-        Choice_E_Text: item.Choice_E_Text || '',
-        Choice_E_isCorrect: !!item.Choice_E_isCorrect,
-        Choice_E_Explanation: item.Choice_E_Explanation || '',
-        Choice_E_Image: item.Choice_E_Image,
-        OverallExplanation: item.OverallExplanation || '',
-        IsChapterStart: item.IsChapterStart,
-        ChapterName: item.ChapterName,
-        ChapterColor: item.ChapterColor,
-        Confirmed: item.Confirmed,
-      }));
+      jsonQuestions = (BiochimiecliniqueModule.default as any[]).map(toJsonQuestion);
       break;
     default:
       return [];
@@ -451,7 +367,8 @@ export const getModuleQuestions = async (moduleId: number): Promise<Question[]>
     return moduleQuestionsCache.get(moduleId)!;
   }
 
-  const cached = loadModuleCache(moduleId);
+  const bundle = await getModuleBundle(moduleId);
+  const cached = loadModuleCache(moduleId, bundle?.integrity);
   if (cached) {
     moduleQuestionsCache.set(moduleId, cached.questions);
     moduleChaptersCache.set(moduleId, cached.chapters);
@@ -553,7 +470,8 @@ export const preloadModuleData = async (moduleId: number): Promise<{ questions:
     getModuleChapters(moduleId)
   ]);
   
-  saveModuleCache(moduleId, questions, chapters);
+  const bundle = await getModuleBundle(moduleId);
+  saveModuleCache(moduleId, questions, chapters, bundle?.integrity);
   
   return { questions, chapters };
 };
\ No newline at end of file
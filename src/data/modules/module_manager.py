@@ -226,6 +226,7 @@ class ModuleManager:
 
         self.modules.append(new_module)
         self.update_index_file()
+        self.build_bundles()
 
         print(f"\nModule '{title}' added successfully!")
         print(f"JSON file: {json_filename}.json")
@@ -303,6 +304,7 @@ class ModuleManager:
 
         self.modules = [m for m in self.modules if int(m.get("id", 0)) != module_id]
         self.update_index_file()
+        self.build_bundles()
 
         print(f"Module '{module_to_remove.get('title')}' removed successfully!")
         return True
@@ -370,6 +372,22 @@ class ModuleManager:
             print(f"Error updating index file: {e}")
             return False
 
+    def build_bundles(self, module_ids: Optional[List[int]] = None) -> bool:
+        """Rebuild the module bundles, the service worker precache file and the manifest"""
+        try:
+            # Imported here: build_bundles reads the registry through this module
+            from build_bundles import BundleBuilder
+
+            manifest = BundleBuilder().build(module_ids)
+        except (Exception, SystemExit) as e:
+            print(f"Error building module bundles: {e}")
+            print("Run build_bundles.py once the module JSON files are in place.")
+            return False
+
+        print(f"Module bundles rebuilt (version {manifest['version']}, "
+              f"{len(manifest['modules'])} modules, {manifest['precache']['images']} images)")
+        return True
+
     def update_case_statements(self):
         """Update the case statements in getModuleRawJson function"""
         try:
@@ -423,38 +441,6 @@ class ModuleManager:
             print(f"Warning: Could not find closing brace of switch in {function_name}")
             return content
 
-        FIELDS = [
-            ("YearAsked", "string"),
-            ("Subtopic", "string"),
-            ("QuestionText", "string"),
-            ("QuestionImage", "optional"),
-            ("Choice_A_Text", "string"),
-            ("Choice_A_isCorrect", "boolean"),
-            ("Choice_A_Explanation", "string"),
-            ("Choice_A_Image", "optional"),
-            ("Choice_B_Text", "string"),
-            ("Choice_B_isCorrect", "boolean"),
-            ("Choice_B_Explanation", "string"),
-            ("Choice_B_Image", "optional"),
-            ("Choice_C_Text", "string"),
-            ("Choice_C_isCorrect", "boolean"),
-            ("Choice_C_Explanation", "string"),
-            ("Choice_C_Image", "optional"),
-            ("Choice_D_Text", "string"),
-            ("Choice_D_isCorrect", "boolean"),
-            ("Choice_D_Explanation", "string"),
-            ("Choice_D_Image", "optional"),
-            ("Choice_E_Text", "string"),
-            ("Choice_E_isCorrect", "boolean"),
-            ("Choice_E_Explanation", "string"),
-            ("Choice_E_Image", "optional"),
-            ("OverallExplanation", "string"),
-            ("IsChapterStart", "passthrough"),
-            ("ChapterName", "passthrough"),
-            ("ChapterColor", "passthrough"),
-            ("Confirmed", "passthrough"),
-        ]
-
         new_cases = "\n"
         for module in self.modules:
             module_id = int(module.get("id", 0))
@@ -466,19 +452,7 @@ class ModuleManager:
 
             new_cases += f"    case {module_id}:\n"
             new_cases += f"      const {var_name}Module = await import('./{filename}.json', {{ with: {{ type: 'json' }} }});\n"
-            new_cases += f"      jsonQuestions = ({var_name}Module.default as any[]).map((item: any) => ({{\n"
-
-            for field_name, field_type in FIELDS:
-                if field_type == "string":
-                    new_cases += f"        {field_name}: item.{field_name} || '',\n"
-                elif field_type == "boolean":
-                    new_cases += f"        {field_name}: !!item.{field_name},\n"
-                elif field_type == "optional":
-                    new_cases += f"        {field_name}: item.{field_name},\n"
-                else:
-                    new_cases += f"        {field_name}: item.{field_name},\n"
-
-            new_cases += "      }));\n"
+            new_cases += f"      jsonQuestions = ({var_name}Module.default as any[]).map(toJsonQuestion);\n"
             new_cases += "      break;\n"
 
         new_cases += "    default:\n      return [];\n  }"
@@ -497,9 +471,10 @@ class ModuleManager:
             print("2. Add module")
             print("3. Remove module")
             print("4. Update case statements")
-            print("5. Exit")
+            print("5. Build module bundles")
+            print("6. Exit")
 
-            choice = input("Enter your choice (1-5): ").strip()
+            choice = input("Enter your choice (1-6): ").strip()
 
             if choice == "1":
                 self.display_modules()
@@ -513,6 +488,8 @@ class ModuleManager:
                 else:
                     print("Failed to update case statements")
             elif choice == "5":
+                self.build_bundles()
+            elif choice == "6":
                 print("Goodbye!")
                 break
             else:
@@ -535,8 +512,10 @@ if __name__ == "__main__":
                 print("Case statements updated successfully!")
             else:
                 print("Failed to update case statements")
+        elif command == "bundles":
+            manager.build_bundles()
         else:
             print(f"Unknown command: {command}")
-            print("Available commands: display, add, remove, update")
+            print("Available commands: display, add, remove, update, bundles")
     else:
         manager.run()
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Question Text Normalisation for LearnFMPA
+
+The one place question text is cleaned. Every string field of a question is
+put in canonical form:
+
+  - typographic quotes become ASCII (’ ‘ → ', “ ” „ → ")
+  - no-break and thin spaces become plain spaces, tabs too
+  - zero-width characters, soft hyphens and carriage returns are removed
+  - runs of spaces collapse to one, lines and the whole text are trimmed
+
+and "NA" placeholders are dropped: a choice whose text is "NA", "NA." or
+"N/A" loses its text, correctness, explanation and image fields, and any
+other field holding only a placeholder becomes empty ("NA [GDR]" keeps
+"[GDR]"). Booleans and image lists are left alone, and questions are never
+added, removed or reordered, so question IDs do not move.
+
+The translation table is built once, and canonical forms are cached per
+string: subtopics, years and explanations repeat across questions, so most
+lookups are cache hits. The stage is idempotent.
+
+build_bundles.py runs it on everything it bundles, so the app only gets
+canonical text. remove_na.py and json_to_exam.py load questions through it
+instead of cleaning text themselves.
+
+Usage:
+  python normalize_text.py                    # report on every registered module
+  python normalize_text.py Cardiologie.json   # only this file
+  python normalize_text.py --write            # rewrite the files in canonical form
+  python normalize_text.py --check            # exit 1 if a file is not canonical
+"""
+
+import argparse
+import json
+import re
+import sys
+from collections import Counter
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, List, Optional
+
+MODULES_DIR = Path(__file__).resolve().parent
+CHOICE_LETTERS = "ABCDE"
+CACHE_SIZE = 1 << 17
+
+CANONICAL_TABLE = str.maketrans({
+    "\u2018": "'", "\u2019": "'", "\u201a": "'", "\u201b": "'", "\u2032": "'",
+    "\u201c": '"', "\u201d": '"', "\u201e": '"', "\u201f": '"', "\u2033": '"',
+    "\u00a0": " ", "\u202f": " ", "\u2007": " ", "\u2009": " ", "\u200a": " ", "\t": " ",
+    "\u200b": None, "\u200c": None, "\u200d": None, "\u2060": None, "\ufeff": None,
+    "\u00ad": None, "\r": None,
+})
+
+# What the standard PDF fonts cannot show (latin-1 only), for json_to_exam.py
+LATIN1_TABLE = str.maketrans({
+    "\u2026": "...", "\u2013": "-", "\u2014": "-", "\u2212": "-",
+    "\u0153": "oe", "\u0152": "OE",
+})
+
+SPACES = re.compile(r" {2,}")
+LINE_EDGES = re.compile(r" *\n *")
+BLANK_LINES = re.compile(r"\n{3,}")
+PLACEHOLDER = re.compile(r"^N/?A\.?(\s*\[GDR\])?$")
+
+
+def _canonical_spacing(text: str) -> str:
+    text = text.translate(CANONICAL_TABLE)
+    if "  " in text:
+        text = SPACES.sub(" ", text)
+    if "\n" in text:
+        text = BLANK_LINES.sub("\n\n", LINE_EDGES.sub("\n", text))
+    return text.strip()
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def canonical_text(text: str) -> str:
+    text = _canonical_spacing(text)
+    placeholder = PLACEHOLDER.match(text)
+    if placeholder:
+        return (placeholder.group(1) or "").strip()
+    return text
+
+
+def latin1_text(text: str) -> str:
+    """Canonical text as the standard PDF fonts can render it."""
+    return text.translate(LATIN1_TABLE).encode("latin-1", "replace").decode("latin-1")
+
+
+def _is_placeholder_choice(question: Dict, letter: str) -> bool:
+    text = question.get(f"Choice_{letter}_Text")
+    return isinstance(text, str) and bool(PLACEHOLDER.match(_canonical_spacing(text)))
+
+
+def normalize_question(question: Dict, stats: Optional[Counter] = None) -> Dict:
+    """A canonical copy of one question."""
+    dropped = {letter for letter in CHOICE_LETTERS if _is_placeholder_choice(question, letter)}
+    result = {}
+    for key, value in question.items():
+        if key.startswith("Choice_") and key[7:8] in dropped and key[8:9] == "_":
+            continue
+        if isinstance(value, str):
+            canonical = canonical_text(value)
+            if stats is not None and canonical != value:
+                stats["strings"] += 1
+            value = canonical
+        result[key] = value
+    if stats is not None:
+        stats["questions"] += 1
+        stats["choices_dropped"] += len(dropped)
+    return result
+
+
+def normalize_questions(questions: List[Dict], stats: Optional[Counter] = None) -> List[Dict]:
+    return [normalize_question(question, stats) for question in questions]
+
+
+def _module_files() -> List[Path]:
+    from module_manager import ModuleManager
+
+    return [MODULES_DIR / f"{module.get('json_filename') or module['title']}.json" for module in ModuleManager().modules]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Put question text in canonical form")
+    parser.add_argument("files", nargs="*", type=Path, help="Question JSON files (default: every registered module)")
+    parser.add_argument("--write", action="store_true", help="Rewrite the files in canonical form")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 if a file is not canonical")
+    args = parser.parse_args()
+
+    files = args.files or _module_files()
+    total = Counter()
+    not_canonical = []
+
+    print(f"\n{'=' * 72}")
+    print(f"  {'File':<36}{'Questions':>10}{'Strings':>10}{'NA choices':>14}")
+    print(f"  {'-' * 68}")
+    for path in files:
+        with open(path, "r", encoding="utf-8-sig") as f:
+            questions = json.load(f)
+        stats = Counter()
+        normalized = normalize_questions(questions, stats)
+        total.update(stats)
+        print(f"  {path.name[:35]:<36}{stats['questions']:>10}{stats['strings']:>10}{stats['choices_dropped']:>14}")
+        if normalized != questions:
+            not_canonical.append(path)
+            if args.write:
+                with open(path, "w", encoding="utf-8") as f:
+                    json.dump(normalized, f, indent=4, ensure_ascii=False)
+    print(f"{'=' * 72}")
+
+    cache = canonical_text.cache_info()
+    lookups = cache.hits + cache.misses
+    print(f"  {total['strings']} string(s) changed, {total['choices_dropped']} NA choice(s) dropped "
+          f"in {total['questions']} questions")
+    print(f"  Cache: {cache.currsize} canonical forms, {cache.hits / max(lookups, 1):.0%} of {lookups} lookups hit")
+    if args.write and not_canonical:
+        print(f"  ✓ Rewrote {len(not_canonical)} file(s)")
+    elif not_canonical:
+        print(f"  {len(not_canonical)} file(s) not canonical (--write to rewrite them)")
+    print()
+
+    if args.check and not_canonical and not args.write:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
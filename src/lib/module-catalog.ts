@@ -0,0 +1,37 @@
+import { readFile } from 'fs/promises';
+import path from 'path';
+
+// Question counts per module, from the manifest build_bundles.py writes at
+// build time. Question IDs are positions in the module (0 .. count - 1); they
+// end up in Redis key names, so they are checked before anything is written.
+const MANIFEST_PATH = path.join(process.cwd(), 'public', 'bundles', 'manifest.json');
+const QUESTION_ID = /^(0|[1-9]\d{0,5})$/;
+
+let questionCountsPromise: Promise<Map<number, number> | null> | null = null;
+
+function questionCounts(): Promise<Map<number, number> | null> {
+  if (!questionCountsPromise) {
+    questionCountsPromise = readFile(MANIFEST_PATH, 'utf-8')
+      .then((raw) => {
+        const manifest = JSON.parse(raw);
+        return new Map(Object.entries(manifest.modules || {}).map(
+          ([moduleId, entry]) => [Number(moduleId), Number((entry as { questions: number }).questions)]
+        ));
+      })
+      .catch(() => null);
+  }
+  return questionCountsPromise;
+}
+
+// Without a manifest (bundles not built) only the format is checked
+export async function isValidModuleId(moduleId: number): Promise<boolean> {
+  if (!Number.isInteger(moduleId) || moduleId <= 0) return false;
+  const counts = await questionCounts();
+  return !counts || counts.has(moduleId);
+}
+
+export async function isValidQuestionId(moduleId: number, questionId: string): Promise<boolean> {
+  if (!QUESTION_ID.test(questionId) || !(await isValidModuleId(moduleId))) return false;
+  const count = (await questionCounts())?.get(moduleId);
+  return count === undefined || Number(questionId) < count;
+}
@@ -1,5 +1,6 @@
 import { createClient } from 'redis';
 import { NextResponse } from 'next/server';
+import { isValidQuestionId } from '@/lib/module-catalog';
 
 let redis: ReturnType<typeof createClient> | null = null;
 
@@ -39,8 +40,262 @@ export interface UsersData {
   users: { [key: string]: User };
 }
 
+// Users live either in the single 'users' JSON value or, once migrated with
+// scripts/migrate_users.py, in one hash per user (user:<id>, every field
+// JSON-encoded) plus indexes: users:ids (set), users:by_email (email -> id),
+// users:status:<status> (sets) and users:trial_expiry (zset, expiry in ms).
+// users:layout = 'hash' marks the migrated layout. Every write increments
+// users:version in both layouts; writes that change what the admin user list
+// shows, other than login/answer activity, also increment users:admin_version.
+const USERS_VERSION_KEY = 'users:version';
+const USERS_ADMIN_VERSION_KEY = 'users:admin_version';
+const USERS_LAYOUT_KEY = 'users:layout';
+const USERS_IDS_KEY = 'users:ids';
+const USERS_BY_EMAIL_KEY = 'users:by_email';
+const USERS_TRIAL_EXPIRY_KEY = 'users:trial_expiry';
+const USERS_HASH_LAYOUT = 'hash';
+const USERS_CAS_ATTEMPTS = 8;
+const USERS_CAS_BACKOFF_MS = 10;
+const DEFAULT_TRIAL_DAYS = 7;
+// Fields every login or answer rewrites; they do not move users:admin_version
+const ACTIVITY_FIELDS = ['last_login', 'daily_answer_count', 'daily_answer_reset'];
+// How long the activity columns of a revalidated admin user list may lag
+const USERS_ETAG_ACTIVITY_MS = 5 * 60 * 1000;
+
+function userKey(userId: string): string {
+  return `user:${userId}`;
+}
+
+async function usesUserHashLayout(): Promise<boolean> {
+  const client = await getRedis();
+  return (await client.get(USERS_LAYOUT_KEY)) === USERS_HASH_LAYOUT;
+}
+
+export function effectiveSubscriptionStatus(user: User): SubscriptionStatus {
+  return user.subscription_status || (user.has_paid ? 'paid' : (user.is_active ? 'free' : 'inactive'));
+}
+
+function trialExpiry(user: User): number | null {
+  if (!user.is_trial) return null;
+  const start = user.trial_started_at || user.activated_at;
+  const startMs = start ? Date.parse(start) : NaN;
+  if (isNaN(startMs)) return null;
+  const days = user.activation_days ?? DEFAULT_TRIAL_DAYS;
+  return startMs + days * 24 * 60 * 60 * 1000;
+}
+
+// A user without its activity fields, to tell admin changes from activity
+function adminView(user: User | undefined): string {
+  if (!user) return '';
+  const fields: Record<string, unknown> = { ...user };
+  for (const field of ACTIVITY_FIELDS) delete fields[field];
+  return JSON.stringify(fields);
+}
+
+function userFromHash(hash: Record<string, string> | null | undefined): User | null {
+  if (!hash || Object.keys(hash).length === 0) return null;
+  const user: Record<string, unknown> = {};
+  for (const [field, value] of Object.entries(hash)) {
+    user[field] = JSON.parse(value);
+  }
+  return user as unknown as User;
+}
+
+function encodeUserFields(user: User | null): Record<string, string> {
+  const fields: Record<string, string> = {};
+  for (const [field, value] of Object.entries(user || {})) {
+    if (value !== undefined) fields[field] = JSON.stringify(value);
+  }
+  return fields;
+}
+
+// One user's change for WRITE_USERS_SCRIPT: only the fields that differ are
+// written, and only if they still hold the values they were read with. When
+// an index input changes, every index input is checked, so the indexes are
+// computed from the user the write actually applies to.
+interface UserWriteOp {
+  id: string;
+  create?: boolean;
+  del?: boolean;
+  expect: Record<string, string | false>;
+  set: Record<string, string>;
+  unset: string[];
+  index?: { email: string; old_email?: string; status: SubscriptionStatus; trial_expiry?: number };
+}
+
+const USER_INDEX_FIELDS = ['email', 'subscription_status', 'has_paid', 'is_active', 'is_trial', 'trial_started_at', 'activated_at', 'activation_days'];
+
+function userWriteOp(before: User | null, after: User): UserWriteOp | null {
+  const old = encodeUserFields(before);
+  const fields = encodeUserFields(after);
+  const op: UserWriteOp = { id: after.id, expect: {}, set: {}, unset: [] };
+  for (const [field, value] of Object.entries(fields)) {
+    if (old[field] === value) continue;
+    op.set[field] = value;
+    op.expect[field] = old[field] ?? false;
+  }
+  for (const field of Object.keys(old)) {
+    if (field in fields) continue;
+    op.unset.push(field);
+    op.expect[field] = old[field];
+  }
+  if (!before) {
+    op.create = true;
+  } else if (Object.keys(op.set).length === 0 && op.unset.length === 0) {
+    return null;
+  }
+
+  if (!before || USER_INDEX_FIELDS.some(field => field in op.set || op.unset.includes(field))) {
+    for (const field of USER_INDEX_FIELDS) op.expect[field] = old[field] ?? false;
+    op.index = {
+      email: after.email.toLowerCase(),
+      old_email: before?.email.toLowerCase(),
+      status: effectiveSubscriptionStatus(after),
+      trial_expiry: trialExpiry(after) ?? undefined,
+    };
+  }
+  return op;
+}
+
+function userStatusKey(status: SubscriptionStatus): string {
+  return `users:status:${status}`;
+}
+
+// Every key WRITE_USERS_SCRIPT touches, in the order it expects them
+const USERS_SCRIPT_KEYS = [
+  USERS_IDS_KEY,
+  USERS_BY_EMAIL_KEY,
+  userStatusKey('inactive'),
+  userStatusKey('free'),
+  userStatusKey('paid'),
+  USERS_TRIAL_EXPIRY_KEY,
+  USERS_VERSION_KEY,
+  USERS_ADMIN_VERSION_KEY,
+];
+
+// Applies user changes to the hash layout and maintains every index, all or
+// nothing. KEYS = USERS_SCRIPT_KEYS, then user:<id> of each op in order;
+// ARGV[1] = JSON { ops: [UserWriteOp], admin } where admin bumps
+// users:admin_version too. The compare-and-set covers only the touched users:
+// returns 1 when written, 0 when a user changed since it was read (or a
+// created one exists already), -1 when an email belongs to another user.
+const WRITE_USERS_SCRIPT = `
+local payload = cjson.decode(ARGV[1])
+local ops = payload.ops
+local statuses = { inactive = KEYS[3], free = KEYS[4], paid = KEYS[5] }
+for i, op in ipairs(ops) do
+  local key = KEYS[8 + i]
+  local exists = redis.call('EXISTS', key) == 1
+  if (op.create and exists) or (not op.create and not exists) then
+    return 0
+  end
+  for field, value in pairs(op.expect) do
+    local current = redis.call('HGET', key, field)
+    if value == false then
+      if current then
+        return 0
+      end
+    elseif current ~= value then
+      return 0
+    end
+  end
+  if op.index then
+    local owner = redis.call('HGET', KEYS[2], op.index.email)
+    if owner and owner ~= op.id then
+      return -1
+    end
+  end
+end
+for i, op in ipairs(ops) do
+  local key = KEYS[8 + i]
+  if op.del then
+    local email = redis.call('HGET', key, 'email')
+    if email then
+      local emailLower = string.lower(cjson.decode(email))
+      if redis.call('HGET', KEYS[2], emailLower) == op.id then
+        redis.call('HDEL', KEYS[2], emailLower)
+      end
+    end
+    for _, statusKey in pairs(statuses) do
+      redis.call('SREM', statusKey, op.id)
+    end
+    redis.call('ZREM', KEYS[6], op.id)
+    redis.call('DEL', key)
+    redis.call('SREM', KEYS[1], op.id)
+  else
+    local args = {}
+    for field, value in pairs(op.set) do
+      args[#args + 1] = field
+      args[#args + 1] = value
+    end
+    if #args > 0 then
+      redis.call('HSET', key, unpack(args))
+    end
+    if #op.unset > 0 then
+      redis.call('HDEL', key, unpack(op.unset))
+    end
+    redis.call('SADD', KEYS[1], op.id)
+    if op.index then
+      local index = op.index
+      if index.old_email and index.old_email ~= index.email and redis.call('HGET', KEYS[2], index.old_email) == op.id then
+        redis.call('HDEL', KEYS[2], index.old_email)
+      end
+      redis.call('HSET', KEYS[2], index.email, op.id)
+      for status, statusKey in pairs(statuses) do
+        if status == index.status then
+          redis.call('SADD', statusKey, op.id)
+        else
+          redis.call('SREM', statusKey, op.id)
+        end
+      end
+      if index.trial_expiry then
+        redis.call('ZADD', KEYS[6], index.trial_expiry, op.id)
+      else
+        redis.call('ZREM', KEYS[6], op.id)
+      end
+    end
+  end
+end
+redis.call('INCR', KEYS[7])
+if payload.admin then
+  redis.call('INCR', KEYS[8])
+end
+return 1
+`;
+
+async function writeUserOps(ops: UserWriteOp[], admin: boolean): Promise<number> {
+  const client = await getRedis();
+  return Number(await client.eval(WRITE_USERS_SCRIPT, {
+    keys: [...USERS_SCRIPT_KEYS, ...ops.map(op => userKey(op.id))],
+    arguments: [JSON.stringify({ ops, admin })],
+  }));
+}
+
+// Jittered exponential backoff between compare-and-set attempts, so writers
+// that conflicted once do not collide again on the next attempt
+function usersCasBackoff(attempt: number): Promise<void> {
+  const delay = USERS_CAS_BACKOFF_MS * 2 ** attempt;
+  return new Promise(resolve => setTimeout(resolve, delay / 2 + Math.random() * delay));
+}
+
+async function loadUserHashes(): Promise<UsersData> {
+  const client = await getRedis();
+  const ids = await client.sMembers(USERS_IDS_KEY);
+  const users: UsersData['users'] = {};
+  if (ids.length === 0) return { users };
+  const multi = client.multi();
+  for (const id of ids) multi.hGetAll(userKey(id));
+  const hashes = (await multi.exec()) as unknown as Record<string, string>[];
+  ids.forEach((id, i) => {
+    const user = userFromHash(hashes[i]);
+    if (user) users[id] = user;
+  });
+  return { users };
+}
+
 export async function loadUsers(): Promise<UsersData> {
   try {
+    if (await usesUserHashLayout()) return await loadUserHashes();
     const client = await getRedis();
     const data = await client.get('users');
     return data ? JSON.parse(data) : { users: {} };
@@ -50,15 +305,207 @@ export async function loadUsers(): Promise<UsersData> {
   }
 }
 
-export async function saveUsers(data: UsersData): Promise<void> {
+// Writes the users blob only if no other write happened since it was read;
+// ARGV[3] = '1' when the write changes admin fields (KEYS[3]).
+const CAS_USERS_SCRIPT = `
+if (redis.call('GET', KEYS[2]) or '0') ~= ARGV[1] then
+  return 0
+end
+redis.call('SET', KEYS[1], ARGV[2])
+redis.call('INCR', KEYS[2])
+if ARGV[3] == '1' then
+  redis.call('INCR', KEYS[3])
+end
+return 1
+`;
+
+// ETag of the admin user list, read without loading any user. It follows
+// users:admin_version, so logins and answers do not invalidate it, plus a
+// time window so their activity columns are refreshed every few minutes.
+export async function getUsersListEtag(): Promise<string> {
+  const client = await getRedis();
+  const version = (await client.get(USERS_ADMIN_VERSION_KEY)) || '0';
+  return `"users-${version}-${Math.floor(Date.now() / USERS_ETAG_ACTIVITY_MS)}"`;
+}
+
+// Users together with the version they were read at. With the hash layout the
+// version is read first, so a concurrent write can only make it look older
+// (and the following compare-and-set retry), never newer.
+export async function loadUsersVersioned(): Promise<{ data: UsersData; version: string }> {
+  const client = await getRedis();
+  if (await usesUserHashLayout()) {
+    const version = (await client.get(USERS_VERSION_KEY)) || '0';
+    return { data: await loadUserHashes(), version };
+  }
+  const [raw, version] = (await client.multi().get('users').get(USERS_VERSION_KEY).exec()) as unknown as [string | null, string | null];
+  return { data: raw ? JSON.parse(raw) : { users: {} }, version: version || '0' };
+}
+
+// Read-modify-write of the users that is safe under concurrent requests. The
+// mutator returns false when nothing changed (nothing is written); it is
+// re-run on a fresh copy, after a jittered backoff, if a write it depends on
+// happened in the meantime. With the hash layout only the fields the mutator
+// changed are written, and only writes to those same users conflict.
+export async function updateUsers(mutate: (data: UsersData) => boolean): Promise<boolean> {
+  const client = await getRedis();
+  for (let attempt = 0; attempt < USERS_CAS_ATTEMPTS; attempt++) {
+    if (attempt > 0) await usersCasBackoff(attempt - 1);
+    const { data, version } = await loadUsersVersioned();
+
+    const before: UsersData['users'] = JSON.parse(JSON.stringify(data.users));
+    if (!mutate(data)) return false;
+    const admin = Object.keys(before).length !== Object.keys(data.users).length
+      || Object.entries(data.users).some(([id, user]) => adminView(before[id]) !== adminView(user));
+
+    if (await usesUserHashLayout()) {
+      const ops: UserWriteOp[] = [];
+      for (const [id, user] of Object.entries(data.users)) {
+        const op = userWriteOp(before[id] || null, user);
+        if (op) ops.push(op);
+      }
+      for (const id of Object.keys(before)) {
+        if (!data.users[id]) ops.push({ id, del: true, expect: {}, set: {}, unset: [] });
+      }
+      if (ops.length === 0 || await writeUserOps(ops, admin) === 1) return true;
+      continue;
+    }
+
+    const written = await client.eval(CAS_USERS_SCRIPT, {
+      keys: ['users', USERS_VERSION_KEY, USERS_ADMIN_VERSION_KEY],
+      arguments: [version, JSON.stringify(data), admin ? '1' : '0'],
+    });
+    if (written === 1) return true;
+  }
+  throw new Error('Users update conflict: too many concurrent writes');
+}
+
+// Single-user access for request handlers (login, answers, sessions): O(1)
+// with the hash layout, a lookup in the users blob otherwise.
+export async function loadUser(userId: string): Promise<User | null> {
   try {
-    const client = await getRedis();
-    await client.set('users', JSON.stringify(data));
+    if (await usesUserHashLayout()) {
+      const client = await getRedis();
+      return userFromHash(await client.hGetAll(userKey(userId)));
+    }
+    return (await loadUsers()).users[userId] || null;
   } catch (error) {
-    console.error('Redis save error:', error);
+    console.error('Redis load user error:', error);
+    return null;
   }
 }
 
+export async function findUserByEmail(email: string): Promise<User | null> {
+  const emailLower = email.toLowerCase();
+  try {
+    if (await usesUserHashLayout()) {
+      const client = await getRedis();
+      const userId = await client.hGet(USERS_BY_EMAIL_KEY, emailLower);
+      return userId ? loadUser(userId) : null;
+    }
+    const usersData = await loadUsers();
+    return Object.values(usersData.users).find(u => u.email.toLowerCase() === emailLower) || null;
+  } catch (error) {
+    console.error('Redis find user error:', error);
+    return null;
+  }
+}
+
+// Read-modify-write of one user (login, password change). The mutator edits
+// the user in place and returns false when nothing changed; only the fields
+// it changed are written, so concurrent admin changes to other fields are
+// kept, and it is re-run on a fresh copy when one of its fields changed
+// meanwhile. Returns the user as written, or null if it does not exist.
+export async function updateUser(userId: string, mutate: (user: User) => boolean): Promise<User | null> {
+  if (!(await usesUserHashLayout())) {
+    let updated: User | null = null;
+    await updateUsers((data) => {
+      updated = data.users[userId] || null;
+      return updated ? mutate(updated) : false;
+    });
+    return updated;
+  }
+
+  const client = await getRedis();
+  for (let attempt = 0; attempt < USERS_CAS_ATTEMPTS; attempt++) {
+    if (attempt > 0) await usersCasBackoff(attempt - 1);
+    const before = userFromHash(await client.hGetAll(userKey(userId)));
+    if (!before) return null;
+    const user: User = JSON.parse(JSON.stringify(before));
+    if (!mutate(user)) return user;
+    const op = userWriteOp(before, user);
+    if (!op || await writeUserOps([op], adminView(before) !== adminView(user)) === 1) return user;
+  }
+  throw new Error('Users update conflict: too many concurrent writes');
+}
+
+// Counts answers toward the user's daily limit and returns the new count.
+// The count restarts on a new (UTC) day; it is incremented inside Redis, so
+// concurrent answer requests never lose each other's answers. KEYS = user,
+// users:version; ARGV = answers, today (YYYY-MM-DD), now and the status to
+// store if none is set (both JSON-encoded). Returns -1 for an unknown user.
+const DAILY_ANSWERS_SCRIPT = `
+if redis.call('EXISTS', KEYS[1]) == 0 then
+  return -1
+end
+local function decoded(field)
+  local raw = redis.call('HGET', KEYS[1], field)
+  local value = raw and cjson.decode(raw)
+  if type(value) == 'string' and value ~= '' then
+    return value
+  end
+  return nil
+end
+local reset = decoded('daily_answer_reset') or decoded('activated_at') or decoded('created_at')
+local count
+if reset and string.sub(reset, 1, 10) == ARGV[2] and tonumber(redis.call('HGET', KEYS[1], 'daily_answer_count') or '0') then
+  count = redis.call('HINCRBY', KEYS[1], 'daily_answer_count', ARGV[1])
+else
+  count = tonumber(ARGV[1])
+  redis.call('HSET', KEYS[1], 'daily_answer_count', count)
+end
+redis.call('HSET', KEYS[1], 'daily_answer_reset', ARGV[3])
+redis.call('HSETNX', KEYS[1], 'subscription_status', ARGV[4])
+redis.call('INCR', KEYS[2])
+return count
+`;
+
+export async function addDailyAnswers(userId: string, answers: number, status: SubscriptionStatus): Promise<number | null> {
+  const now = new Date().toISOString();
+  const today = now.split('T')[0];
+  if (await usesUserHashLayout()) {
+    const client = await getRedis();
+    const count = Number(await client.eval(DAILY_ANSWERS_SCRIPT, {
+      keys: [userKey(userId), USERS_VERSION_KEY],
+      arguments: [String(answers), today, JSON.stringify(now), JSON.stringify(status)],
+    }));
+    return count < 0 ? null : count;
+  }
+
+  const user = await updateUser(userId, (u) => {
+    const reset = u.daily_answer_reset || u.activated_at || u.created_at;
+    const sameDay = !!reset && reset.split('T')[0] === today;
+    u.daily_answer_count = (sameDay ? u.daily_answer_count || 0 : 0) + answers;
+    u.daily_answer_reset = now;
+    if (!u.subscription_status) u.subscription_status = status;
+    return true;
+  });
+  return user ? user.daily_answer_count || 0 : null;
+}
+
+// Adds a user unless the email is already registered; returns false if it is.
+export async function createUser(user: User): Promise<boolean> {
+  if (await usesUserHashLayout()) {
+    const op = userWriteOp(null, user) as UserWriteOp;
+    return (await writeUserOps([op], true)) === 1;
+  }
+  return updateUsers((data) => {
+    const emailLower = user.email.toLowerCase();
+    if (Object.values(data.users).some(u => u.email.toLowerCase() === emailLower)) return false;
+    data.users[user.id] = user;
+    return true;
+  });
+}
+
 export async function loadUserProgress(userId: string): Promise<any> {
   try {
     const client = await getRedis();
@@ -79,6 +526,41 @@ export async function saveUserProgress(userId: string, progress: any): Promise<v
   }
 }
 
+// Merges answered questions into a user's progress inside Redis, so answer
+// requests sent concurrently (several tabs, retried batches) never overwrite
+// each other. ARGV[1] is a JSON array of [moduleKey, questionId, record];
+// returns the merged progress as JSON.
+const MERGE_PROGRESS_SCRIPT = `
+local raw = redis.call('GET', KEYS[1])
+local progress = raw and cjson.decode(raw) or {}
+for _, entry in ipairs(cjson.decode(ARGV[1])) do
+  local moduleProgress = progress[entry[1]]
+  if type(moduleProgress) ~= 'table' then
+    moduleProgress = {}
+    progress[entry[1]] = moduleProgress
+  end
+  moduleProgress[entry[2]] = entry[3]
+end
+local encoded = cjson.encode(progress)
+redis.call('SET', KEYS[1], encoded)
+return encoded
+`;
+
+export interface ProgressEntry {
+  moduleKey: string;
+  questionId: string;
+  record: { is_correct: boolean; answered_at: string };
+}
+
+export async function recordUserProgress(userId: string, entries: ProgressEntry[]): Promise<any> {
+  const client = await getRedis();
+  const result = await client.eval(MERGE_PROGRESS_SCRIPT, {
+    keys: [`progress:${userId}`],
+    arguments: [JSON.stringify(entries.map(e => [e.moduleKey, String(e.questionId), e.record]))],
+  });
+  return JSON.parse(String(result));
+}
+
 export interface QuestionStats {
   total_answers: number;
   correct_answers: number;
@@ -89,21 +571,205 @@ export interface ModuleStats {
   [questionId: string]: QuestionStats;
 }
 
+// Module stats live either in one JSON value (stats:module_N) or, once
+// migrated with scripts/migrate_stats.py, in one counter hash per question
+// (stats:module_N:q:<id>: total_answers, correct_answers, opt:<index>) listed
+// in the stats:module_N:questions set. stats:module_N:layout = 'hash' marks
+// migrated modules; both layouts are read and written here.
+const STATS_HASH_LAYOUT = 'hash';
+const OPTION_FIELD_PREFIX = 'opt:';
+
+function statsKey(moduleId: number): string {
+  return `stats:module_${moduleId}`;
+}
+
+function statsKeys(moduleId: number) {
+  const base = statsKey(moduleId);
+  return {
+    blob: base,
+    layout: `${base}:layout`,
+    index: `${base}:questions`,
+    question: (questionId: string) => `${base}:q:${questionId}`,
+    trend: `${base}:trend`,
+    questionTrend: (questionId: string) => `${base}:trend:q:${questionId}`,
+  };
+}
+
+// Time-bucketed answer counters, kept next to the lifetime stats in both
+// layouts: stats:module_N:trend (module) and stats:module_N:trend:q:<id>
+// (question) are hashes of ring buffers. Field 'h:<slot>' / 'd:<slot>' holds
+// '<bucket>:<answers>:<correct>' where bucket is the UTC hour / day number
+// since the epoch and slot = bucket % slots, so a slot is overwritten once its
+// bucket falls out of the window and the hashes never grow. Question hashes
+// keep fewer hourly slots so they stay under Redis' compact hash encoding
+// threshold (128 fields).
+export type TrendResolution = 'hourly' | 'daily';
+
+export interface TrendBucket {
+  start: string;
+  answers: number;
+  correct: number;
+}
+
+const TREND_BUCKET_SECONDS: Record<TrendResolution, number> = { hourly: 3600, daily: 86400 };
+const TREND_FIELD_PREFIX: Record<TrendResolution, string> = { hourly: 'h:', daily: 'd:' };
+const MODULE_HOURLY_SLOTS = 168;
+const QUESTION_HOURLY_SLOTS = 24;
+const DAILY_SLOTS = 90;
+
+function trendSlots(resolution: TrendResolution, perQuestion: boolean): number {
+  if (resolution === 'daily') return DAILY_SLOTS;
+  return perQuestion ? QUESTION_HOURLY_SLOTS : MODULE_HOURLY_SLOTS;
+}
+
+async function usesHashLayout(moduleId: number): Promise<boolean> {
+  const client = await getRedis();
+  return (await client.get(statsKeys(moduleId).layout)) === STATS_HASH_LAYOUT;
+}
+
+function questionStatsFromHash(hash: Record<string, string> | null | undefined): QuestionStats | null {
+  if (!hash || Object.keys(hash).length === 0) return null;
+  const stats: QuestionStats = {
+    total_answers: parseInt(hash.total_answers || '0'),
+    correct_answers: parseInt(hash.correct_answers || '0'),
+    option_counts: {},
+  };
+  for (const [field, value] of Object.entries(hash)) {
+    if (field.startsWith(OPTION_FIELD_PREFIX)) {
+      stats.option_counts[field.slice(OPTION_FIELD_PREFIX.length)] = parseInt(value);
+    }
+  }
+  return stats;
+}
+
+function questionStatsToHash(stats: QuestionStats): Record<string, number> {
+  const hash: Record<string, number> = {
+    total_answers: stats.total_answers || 0,
+    correct_answers: stats.correct_answers || 0,
+  };
+  for (const [option, count] of Object.entries(stats.option_counts || {})) {
+    hash[`${OPTION_FIELD_PREFIX}${option}`] = count;
+  }
+  return hash;
+}
+
 export async function loadQuestionStats(moduleId: number): Promise<ModuleStats> {
   try {
     const client = await getRedis();
-    const data = await client.get(`stats:module_${moduleId}`);
-    return data ? JSON.parse(data) : {};
+    const keys = statsKeys(moduleId);
+    if (!(await usesHashLayout(moduleId))) {
+      const data = await client.get(keys.blob);
+      return data ? JSON.parse(data) : {};
+    }
+
+    const questionIds = await client.sMembers(keys.index);
+    if (questionIds.length === 0) return {};
+    const multi = client.multi();
+    for (const questionId of questionIds) multi.hGetAll(keys.question(questionId));
+    const hashes = (await multi.exec()) as unknown as Record<string, string>[];
+    const stats: ModuleStats = {};
+    questionIds.forEach((questionId, i) => {
+      const questionStats = questionStatsFromHash(hashes[i]);
+      if (questionStats) stats[questionId] = questionStats;
+    });
+    return stats;
   } catch (error) {
     console.error('Redis load stats error:', error);
     return {};
   }
 }
 
+export interface ModuleStatsPage {
+  statistics: ModuleStats;
+  cursor: string | null;
+}
+
+const STATS_PAGE_MAX = 1000;
+
+// One page of a module's stats for exports. The cursor is opaque: 'h:<n>' is
+// an SSCAN cursor over the question index (hash layout; a question may be
+// returned twice if the index is rehashed mid-scan), 'b:<n>' an offset into
+// the blob's question IDs in numeric order. Start with '0'; a null cursor
+// means the export is complete. A cursor from the other layout (the module was
+// migrated mid-export) throws, and the export has to restart.
+export async function loadQuestionStatsPage(moduleId: number, cursor: string, count: number): Promise<ModuleStatsPage> {
+  const client = await getRedis();
+  const keys = statsKeys(moduleId);
+  const pageSize = Math.min(Math.max(count || 1, 1), STATS_PAGE_MAX);
+  const hashLayout = await usesHashLayout(moduleId);
+  const [kind, position] = cursor === '0' ? [hashLayout ? 'h' : 'b', '0'] : cursor.split(':');
+  if (kind !== (hashLayout ? 'h' : 'b') || !/^\d+$/.test(position || '')) {
+    throw new Error('Invalid statistics cursor');
+  }
+
+  const statistics: ModuleStats = {};
+  if (hashLayout) {
+    const page = await client.sScan(keys.index, position, { COUNT: pageSize });
+    if (page.members.length > 0) {
+      const multi = client.multi();
+      for (const questionId of page.members) multi.hGetAll(keys.question(questionId));
+      const hashes = (await multi.exec()) as unknown as Record<string, string>[];
+      page.members.forEach((questionId, i) => {
+        const questionStats = questionStatsFromHash(hashes[i]);
+        if (questionStats) statistics[questionId] = questionStats;
+      });
+    }
+    return { statistics, cursor: page.cursor === '0' ? null : `h:${page.cursor}` };
+  }
+
+  const data = await client.get(keys.blob);
+  const stats: ModuleStats = data ? JSON.parse(data) : {};
+  const questionIds = Object.keys(stats).sort((a, b) => Number(a) - Number(b));
+  const offset = Number(position);
+  for (const questionId of questionIds.slice(offset, offset + pageSize)) {
+    statistics[questionId] = stats[questionId];
+  }
+  const next = offset + pageSize;
+  return { statistics, cursor: next < questionIds.length ? `b:${next}` : null };
+}
+
+// Stats of a single question; with the hash layout this reads one small hash.
+export async function loadSingleQuestionStats(moduleId: number, questionId: string): Promise<QuestionStats | null> {
+  try {
+    const client = await getRedis();
+    const keys = statsKeys(moduleId);
+    if (await usesHashLayout(moduleId)) {
+      return questionStatsFromHash(await client.hGetAll(keys.question(questionId)));
+    }
+    const data = await client.get(keys.blob);
+    return data ? JSON.parse(data)[questionId] || null : null;
+  } catch (error) {
+    console.error('Redis load stats error:', error);
+    return null;
+  }
+}
+
 export async function saveQuestionStats(moduleId: number, stats: ModuleStats): Promise<void> {
   try {
     const client = await getRedis();
-    await client.set(`stats:module_${moduleId}`, JSON.stringify(stats));
+    const keys = statsKeys(moduleId);
+    const hashLayout = await usesHashLayout(moduleId);
+    const existing = hashLayout
+      ? await client.sMembers(keys.index)
+      : Object.keys(JSON.parse((await client.get(keys.blob)) || '{}'));
+    const dropped = existing.filter(questionId => !stats[questionId]);
+    const trendKeys = dropped.map(keys.questionTrend);
+    if (Object.keys(stats).length === 0) trendKeys.push(keys.trend);
+    if (trendKeys.length > 0) await client.del(trendKeys);
+
+    if (!hashLayout) {
+      await client.set(keys.blob, JSON.stringify(stats));
+      return;
+    }
+
+    const multi = client.multi();
+    for (const questionId of existing) multi.del(keys.question(questionId));
+    multi.del(keys.index);
+    for (const [questionId, questionStats] of Object.entries(stats)) {
+      multi.hSet(keys.question(questionId), questionStatsToHash(questionStats));
+      multi.sAdd(keys.index, questionId);
+    }
+    await multi.exec();
   } catch (error) {
     console.error('Redis save stats error:', error);
   }
@@ -129,31 +795,296 @@ export async function setSignupOpen(open: boolean): Promise<void> {
   }
 }
 
+export interface AnswerStatEntry {
+  questionId: string;
+  selectedOptions: number[];
+  isCorrect: boolean;
+}
+
+// Increments answer counters inside Redis, so concurrent answers (and admin
+// resets) on the same module are never lost to a read-modify-write race.
+// KEYS = blob, layout, index, trend, then the stats hash of each entry's
+// question, then its trend hash; ARGV[1] is a JSON array of [questionId, isCorrect (0/1),
+// [options...]], ARGV[2] the current Unix time and ARGV[3..5] the module
+// hourly, question hourly and daily slot counts.
+// Hash layout: HINCRBY per counter, returns the last question's hash. Blob
+// layout: returns the last question's stats as JSON.
+const RECORD_STATS_SCRIPT = `
+local entries = cjson.decode(ARGV[1])
+local now = tonumber(ARGV[2])
+local hour = math.floor(now / 3600)
+local day = math.floor(now / 86400)
+local function bump(key, prefix, bucket, slots, correct)
+  local field = prefix .. (bucket % slots)
+  local answers, right = 0, 0
+  local current = redis.call('HGET', key, field)
+  if current then
+    local b, a, c = string.match(current, '^(%d+):(%d+):(%d+)$')
+    if tonumber(b) == bucket then
+      answers, right = tonumber(a), tonumber(c)
+    end
+  end
+  redis.call('HSET', key, field, bucket .. ':' .. (answers + 1) .. ':' .. (right + correct))
+end
+for i, entry in ipairs(entries) do
+  local questionTrend = KEYS[4 + #entries + i]
+  bump(KEYS[4], 'h:', hour, tonumber(ARGV[3]), entry[2])
+  bump(KEYS[4], 'd:', day, tonumber(ARGV[5]), entry[2])
+  bump(questionTrend, 'h:', hour, tonumber(ARGV[4]), entry[2])
+  bump(questionTrend, 'd:', day, tonumber(ARGV[5]), entry[2])
+end
+
+if redis.call('GET', KEYS[2]) == 'hash' then
+  for i, entry in ipairs(entries) do
+    local key = KEYS[4 + i]
+    redis.call('HINCRBY', key, 'total_answers', 1)
+    redis.call('HINCRBY', key, 'correct_answers', entry[2])
+    for _, opt in ipairs(entry[3]) do
+      redis.call('HINCRBY', key, 'opt:' .. tostring(opt), 1)
+    end
+    redis.call('SADD', KEYS[3], entry[1])
+  end
+  return redis.call('HGETALL', KEYS[4 + #entries])
+end
+
+local raw = redis.call('GET', KEYS[1])
+local stats = raw and cjson.decode(raw) or {}
+for _, entry in ipairs(entries) do
+  local qid = entry[1]
+  local q = stats[qid]
+  if not q then
+    q = { total_answers = 0, correct_answers = 0, option_counts = {} }
+    stats[qid] = q
+  end
+  q.total_answers = q.total_answers + 1
+  if entry[2] == 1 then
+    q.correct_answers = q.correct_answers + 1
+  end
+  for _, opt in ipairs(entry[3]) do
+    local key = tostring(opt)
+    q.option_counts[key] = (q.option_counts[key] or 0) + 1
+  end
+end
+redis.call('SET', KEYS[1], cjson.encode(stats))
+return cjson.encode(stats[entries[#entries][1]])
+`;
+
+// Removes the given question IDs from a module's stats (and their trend
+// buckets) inside Redis; the module stats never leave the server. KEYS are
+// as for RECORD_STATS_SCRIPT, with one stats and one trend hash per ARGV
+// question ID. Returns how many questions had stats.
+const RESET_STATS_SCRIPT = `
+for i = 1, #ARGV do
+  redis.call('DEL', KEYS[4 + #ARGV + i])
+end
+if redis.call('GET', KEYS[2]) == 'hash' then
+  local removed = 0
+  for i, qid in ipairs(ARGV) do
+    removed = removed + redis.call('DEL', KEYS[4 + i])
+    redis.call('SREM', KEYS[3], qid)
+  end
+  return removed
+end
+
+local raw = redis.call('GET', KEYS[1])
+if not raw then
+  return 0
+end
+local stats = cjson.decode(raw)
+local removed = 0
+for _, qid in ipairs(ARGV) do
+  if stats[qid] ~= nil then
+    stats[qid] = nil
+    removed = removed + 1
+  end
+end
+if removed > 0 then
+  redis.call('SET', KEYS[1], cjson.encode(stats))
+end
+return removed
+`;
+
+// Every key the stats scripts touch is declared: question IDs are validated
+// and their keys built here, never concatenated inside Lua.
+async function statsScriptKeys(moduleId: number, questionIds: string[]): Promise<string[]> {
+  for (const questionId of questionIds) {
+    if (!(await isValidQuestionId(moduleId, questionId))) {
+      throw new Error(`Invalid question ID: ${moduleId}/${questionId}`);
+    }
+  }
+  const keys = statsKeys(moduleId);
+  return [
+    keys.blob, keys.layout, keys.index, keys.trend,
+    ...questionIds.map(keys.question),
+    ...questionIds.map(keys.questionTrend),
+  ];
+}
+
+export async function recordAnswerStats(moduleId: number, entries: AnswerStatEntry[]): Promise<QuestionStats | null> {
+  if (entries.length === 0) return null;
+  const client = await getRedis();
+  const keys = await statsScriptKeys(moduleId, entries.map(e => String(e.questionId)));
+  const payload = entries.map(e => [
+    String(e.questionId),
+    e.isCorrect ? 1 : 0,
+    e.selectedOptions.filter(o => Number.isInteger(o)),
+  ]);
+  const result = await client.eval(RECORD_STATS_SCRIPT, {
+    keys,
+    arguments: [
+      JSON.stringify(payload),
+      String(Math.floor(Date.now() / 1000)),
+      String(MODULE_HOURLY_SLOTS),
+      String(QUESTION_HOURLY_SLOTS),
+      String(DAILY_SLOTS),
+    ],
+  });
+  await appendStatsEvent({
+    type: 'answers',
+    module: String(moduleId),
+    answers: JSON.stringify(payload.map(([questionId, isCorrect]) => [questionId, isCorrect])),
+  });
+  if (Array.isArray(result)) {
+    const hash: Record<string, string> = {};
+    for (let i = 0; i + 1 < result.length; i += 2) hash[String(result[i])] = String(result[i + 1]);
+    return questionStatsFromHash(hash);
+  }
+  return result ? JSON.parse(String(result)) : null;
+}
+
+// Live feed for 'manage_statistics.py watch': a capped stream of recorded
+// answer batches and daily-limit hits. Readers pass the last entry ID they saw
+// and only get newer entries, so an idle poll costs a few bytes.
+const STATS_EVENTS_KEY = 'stats:events';
+const STATS_EVENTS_MAXLEN = 20000;
+const LIMIT_HITS_TTL_SECONDS = 8 * 24 * 60 * 60;
+
+export interface StatsEvent {
+  id: string;
+  type: 'answers' | 'limit';
+  module_id?: number;
+  answers?: [string, number][];
+  user_id?: string;
+}
+
+function limitHitsKey(day: string): string {
+  return `stats:limit_hits:${day}`;
+}
+
+// The feed is best effort: a failure never fails the answer being recorded.
+async function appendStatsEvent(fields: Record<string, string>): Promise<void> {
+  try {
+    const client = await getRedis();
+    await client.xAdd(STATS_EVENTS_KEY, '*', fields, {
+      TRIM: { strategy: 'MAXLEN', strategyModifier: '~', threshold: STATS_EVENTS_MAXLEN },
+    });
+  } catch (error) {
+    console.error('Redis stats event error:', error);
+  }
+}
+
+// Called for every answer request refused by the free daily limit; firstToday
+// marks the request that crossed it, which is what the daily counter counts.
+export async function recordLimitHit(userId: string, firstToday: boolean): Promise<void> {
+  if (firstToday) {
+    try {
+      const client = await getRedis();
+      const key = limitHitsKey(new Date().toISOString().split('T')[0]);
+      await client.multi().incr(key).expire(key, LIMIT_HITS_TTL_SECONDS).exec();
+    } catch (error) {
+      console.error('Redis limit hit error:', error);
+    }
+  }
+  await appendStatsEvent({ type: 'limit', user: userId, first: firstToday ? '1' : '0' });
+}
+
+// Stream IDs are '<ms>-<seq>'; the smallest ID after a given one, so XRANGE
+// can start strictly after the last entry seen.
+function nextStreamId(id: string): string {
+  const [ms, seq] = id.split('-');
+  return `${ms}-${BigInt(seq || '0') + BigInt(1)}`;
+}
+
+// Entries after 'since' (oldest first, at most count). Without 'since' no
+// entries are returned, only the current last ID to start polling from.
+export async function readStatsEvents(since: string | null, count: number): Promise<{
+  events: StatsEvent[];
+  last_id: string;
+  more: boolean;
+  limit_hits_today: number;
+}> {
+  const client = await getRedis();
+  const limitHitsToday = parseInt((await client.get(limitHitsKey(new Date().toISOString().split('T')[0]))) || '0');
+  if (!since) {
+    const latest = await client.xRevRange(STATS_EVENTS_KEY, '+', '-', { COUNT: 1 });
+    return { events: [], last_id: latest[0]?.id || '0-0', more: false, limit_hits_today: limitHitsToday };
+  }
+
+  const entries = await client.xRange(STATS_EVENTS_KEY, nextStreamId(since), '+', { COUNT: count });
+  const events: StatsEvent[] = entries.map(({ id, message }) => (
+    message.type === 'limit'
+      ? { id, type: 'limit', user_id: message.user }
+      : { id, type: 'answers', module_id: parseInt(message.module), answers: JSON.parse(message.answers) }
+  ));
+  return {
+    events,
+    last_id: entries.length > 0 ? entries[entries.length - 1].id : since,
+    more: entries.length === count,
+    limit_hits_today: limitHitsToday,
+  };
+}
+
 export async function recordAnswerStat(
   moduleId: number,
   questionId: string,
   selectedOptions: number[],
   isCorrect: boolean
 ): Promise<QuestionStats> {
-  const stats = await loadQuestionStats(moduleId);
+  const stats = await recordAnswerStats(moduleId, [{ questionId, selectedOptions, isCorrect }]);
+  return stats as QuestionStats;
+}
 
-  if (!stats[questionId]) {
-    stats[questionId] = {
-      total_answers: 0,
-      correct_answers: 0,
-      option_counts: {},
-    };
-  }
+export async function resetQuestionStats(moduleId: number, questionIds: string[]): Promise<number> {
+  if (questionIds.length === 0) return 0;
+  const client = await getRedis();
+  const removed = await client.eval(RESET_STATS_SCRIPT, {
+    keys: await statsScriptKeys(moduleId, questionIds.map(String)),
+    arguments: questionIds.map(String),
+  });
+  return Number(removed) || 0;
+}
 
-  stats[questionId].total_answers += 1;
-  if (isCorrect) {
-    stats[questionId].correct_answers += 1;
-  }
-  for (const opt of selectedOptions) {
-    stats[questionId].option_counts[opt] =
-      (stats[questionId].option_counts[opt] || 0) + 1;
-  }
+// Buckets of the trailing window (oldest first) for a module, or for one
+// question when questionId is given. Buckets without answers are omitted.
+export async function loadStatsTrend(
+  moduleId: number,
+  resolution: TrendResolution,
+  questionId?: string
+): Promise<TrendBucket[]> {
+  try {
+    const client = await getRedis();
+    const keys = statsKeys(moduleId);
+    const hash = await client.hGetAll(questionId ? keys.questionTrend(questionId) : keys.trend);
+    const bucketSeconds = TREND_BUCKET_SECONDS[resolution];
+    const prefix = TREND_FIELD_PREFIX[resolution];
+    const current = Math.floor(Date.now() / 1000 / bucketSeconds);
+    const oldest = current - trendSlots(resolution, !!questionId) + 1;
 
-  await saveQuestionStats(moduleId, stats);
-  return stats[questionId];
+    const buckets: { bucket: number; answers: number; correct: number }[] = [];
+    for (const [field, value] of Object.entries(hash)) {
+      if (!field.startsWith(prefix)) continue;
+      const [bucket, answers, correct] = value.split(':').map(Number);
+      if (bucket >= oldest && bucket <= current) buckets.push({ bucket, answers, correct });
+    }
+    return buckets
+      .sort((a, b) => a.bucket - b.bucket)
+      .map(({ bucket, answers, correct }) => ({
+        start: new Date(bucket * bucketSeconds * 1000).toISOString(),
+        answers,
+        correct,
+      }));
+  } catch (error) {
+    console.error('Redis load trend error:', error);
+    return [];
+  }
 }